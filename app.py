@@ -1,23 +1,41 @@
 # app.py (종료 조건 UI 추가 및 실시간 분석 탭 연동 완료)
 
 import streamlit as st
-import subprocess, os, time, json, signal, re
+import subprocess, os, time, json, re, threading
 import pandas as pd
 import plotly.graph_objects as go
 from binance.client import Client, BinanceAPIException
 from datetime import datetime, date, timedelta, timezone
+from bot_snapshot import load_snapshot, CONDITION_LABELS # [★신규] 봇 지표 스냅샷
+from bot_control import request_control # [★신규] 봇 상태/제어 엔드포인트
+import trade_ledger # [★신규] 로컬 거래 원장
+import report_engine # [★신규] 기간 보고서 집계
+import candle_store # [★신규] 로컬 캔들 저장소 (손익 USDT 환산용)
+import log_index # [★신규] 봇 로그 검색 색인
+import chart_downsample # [★신규] 장기 차트 다운샘플링
+import signal_batch # [★신규] 여러 심볼 일괄 지표/조건 계산
+import signal_scanner # [★신규] 전체 심볼 진입 신호 스캐너
+import exchange_sim # [★신규] 로컬 대역 거래소
+import paper_trading # [★신규] 모의 거래 실행
+import indicators # [★신규] 공용 지표 계산 (pandas_ta 대체)
+import mtf_engine # [★신규] 멀티 타임프레임 엔진
+from candle_series import CandleSeries
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+from collections import OrderedDict
 
 st.set_page_config(page_title="통합 자동매매 대시보드", layout="wide")
 
 # --- 기본 설정 ---
 CONFIG_FILE_PATH = "config.json"
-USD_M_BOT_SCRIPT = "usd_m_bot_logic.py"
-COIN_M_BOT_SCRIPT = "coin_m_bot_logic.py"
-SPOT_BOT_SCRIPT = "spot_bot_logic.py" 
+SUPERVISOR_SCRIPT = "supervisor.py" # [★수정] 봇 실행/재시작은 감독 프로세스가 담당
+MARKET_KEYS = {"USD-M": "usd_m", "COIN-M": "coin_m", "Spot": "spot"} # [★신규] 스냅샷/로그 파일 키
+# 봇 스냅샷이 한 번도 없을 때 사용하는 지표 파라미터 (봇의 기본값과 동일)
+DEFAULT_INDICATOR_PARAMS = {'short_sma_len': 10, 'long_sma_len': 50, 'rsi_len': 14, 'bbands_len': 20,
+                            'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9, 'atr_length': 14}
 
 # --- 세션 상태 초기화 ---
-for key in ['usd_m_process', 'coin_m_process', 'spot_process', 
-            'usd_m_trades_df', 'coin_m_trades_df', 'spot_trades_df', 
+for key in ['usd_m_trades_df', 'coin_m_trades_df', 'spot_trades_df', 
             'futures_client', 'spot_client']: 
     if key not in st.session_state: st.session_state[key] = None
 for key in ['usd_m_auto_refresh', 'coin_m_auto_refresh', 'spot_auto_refresh']: 
@@ -60,10 +78,13 @@ def get_futures_client(config):
     mode = config.get("mode", "Test")
     api_key = config.get("testnet_api_key") if mode == "Test" else config.get("live_api_key")
     secret_key = config.get("testnet_secret_key") if mode == "Test" else config.get("live_secret_key")
+    if mode == "Paper": api_key = secret_key = "paper" # [★신규] 모의 거래는 공개 API + 로컬 매칭 엔진 (키 불필요)
     if not api_key or not secret_key:
         st.error(f"💡 {mode} 모드 선물 API 키가 필요합니다."); return None
     try:
+        exchange_sim.apply_exchange_endpoint(config) # [★신규] exchange_endpoint 설정 시 로컬 대역 거래소로 접속
         client = Client(api_key, secret_key, testnet=(mode == "Test")) 
+        if mode == "Paper": paper_trading.enable_paper_trading(client, config) # [★신규] 봇과 같은 모의 계좌 파일을 읽는다
         client.ping()
         st.session_state.futures_client = client 
         return client
@@ -83,16 +104,19 @@ def get_spot_client(config):
     mode = config.get("mode", "Test")
     api_key = config.get("testnet_api_key") if mode == "Test" else config.get("live_api_key")
     secret_key = config.get("testnet_secret_key") if mode == "Test" else config.get("live_secret_key")
+    if mode == "Paper": api_key = secret_key = "paper" # [★신규]
     
     if not api_key or not secret_key:
         st.error(f"💡 {mode} 모드 현물 API 키가 필요합니다."); return None
     
     try:
+        exchange_sim.apply_exchange_endpoint(config) # [★신규] exchange_endpoint 설정 시 로컬 대역 거래소로 접속
         if mode == "Test":
             client = Client(api_key, secret_key, testnet=True)
             st.info("🔗 현물 테스트넷에 연결 중...")
         else:
             client = Client(api_key, secret_key)
+            if mode == "Paper": paper_trading.enable_paper_trading(client, config) # [★신규]
             st.info("🔗 현물 라이브넷에 연결 중...")
         
         try:
@@ -118,28 +142,194 @@ def get_spot_client(config):
         else: st.error(f"❌ 현물 클라이언트 생성 오류: {e}")
         return None
 
+# --- [★신규] 캔들 데이터 공통 함수 ---
+# 차트/분석 탭이 같은 방식으로 캔들을 받도록 공통화.
+KLINE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore']
+TIMEFRAME_MS = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+                '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000}
+
+def get_last_closed_open_time(timeframe, now_ms=None):
+    interval_ms = TIMEFRAME_MS.get(timeframe, 3_600_000)
+    if now_ms is None: now_ms = int(time.time() * 1000)
+    return (now_ms // interval_ms) * interval_ms - interval_ms
+
+SERVER_TIME_SYNC_SEC = 600 # 거래소 시각과 로컬 시계의 차이를 다시 재는 간격 (초)
+
+@st.cache_resource
+def get_server_time_offsets():
+    return {'lock': threading.Lock(), 'offsets': {}}
+
+def get_server_now_ms(client, mode, market_type):
+    # 캔들 확정 여부는 거래소 시각으로 판단 (로컬 시계가 틀려도 진행 중 캔들이 확정 구간에 섞이지 않도록)
+    cache = get_server_time_offsets()
+    key = (mode, market_type)
+    with cache['lock']: offset, synced_at = cache['offsets'].get(key, (0, None))
+    if synced_at is None or time.time() - synced_at >= SERVER_TIME_SYNC_SEC:
+        try:
+            sent = time.time()
+            if market_type == "USD-M": server_ms = client.futures_time()['serverTime']
+            elif market_type == "COIN-M": server_ms = client.futures_coin_time()['serverTime']
+            else: server_ms = client.get_server_time()['serverTime']
+            received = time.time()
+            offset = int(server_ms - (sent + received) * 500) # 왕복 시간의 절반 보정
+        except Exception: pass # 조회 실패 시 마지막 값(처음이면 로컬 시계) 사용, 다음 주기에 다시 시도
+        with cache['lock']: cache['offsets'][key] = (offset, time.time())
+    return int(time.time() * 1000) + offset
+
+def fetch_klines(client, market_type, symbol, timeframe, limit):
+    if market_type == "USD-M":
+        return client.futures_klines(symbol=symbol, interval=timeframe, limit=limit)
+    elif market_type == "COIN-M":
+        return client.futures_coin_klines(symbol=symbol, interval=timeframe, limit=limit)
+    else: # Spot
+        return client.get_klines(symbol=symbol, interval=timeframe, limit=limit)
+
+def klines_to_dataframe(klines):
+    df = pd.DataFrame(klines, columns=KLINE_COLUMNS)
+    for col in ['open', 'high', 'low', 'close', 'volume']: df[col] = pd.to_numeric(df[col])
+    df['close_time'] = pd.to_numeric(df['close_time'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+# --- [★신규] 세션 공유 캔들 캐시 ---
+# 확정 캔들 구간은 (모드, 시장, 심볼, 타임프레임, 확정 캔들 시각) 단위로 한 번만 받고, 지표도 그 구간에서 한 번만 계산한다.
+# 그 사이에는 진행 중인 캔들 1개만 다시 받는다. st.cache_resource 이므로 여러 브라우저 세션이 같은 캐시를 공유한다.
+CANDLE_CACHE_LIMIT = 200 # 분석 탭 기준 (차트는 이 중 마지막 100개 사용)
+LIVE_BAR_TTL_SEC = 2 # 진행 중 캔들 재조회 최소 간격 (초)
+CANDLE_CACHE_MAX_ENTRIES = 64 # 보관하는 (모드, 시장, 심볼, 타임프레임) 수, 넘으면 가장 오래 안 쓴 것부터 버림
+
+@st.cache_resource
+def get_candle_cache():
+    return {'lock': threading.Lock(), 'key_locks': OrderedDict(), 'entries': OrderedDict()}
+
+def get_candle_key_lock(cache, key):
+    # 키별 잠금. 잠금 수가 항목 한도의 2배를 넘으면 사용 중이 아니고 캐시 항목도 없는 잠금을 버린다
+    with cache['lock']:
+        key_lock = cache['key_locks'].setdefault(key, threading.Lock())
+        if len(cache['key_locks']) > 2 * CANDLE_CACHE_MAX_ENTRIES:
+            for old_key in [k for k, lock in cache['key_locks'].items() if k != key and k not in cache['entries'] and not lock.locked()]:
+                del cache['key_locks'][old_key]
+        return key_lock
+
+def get_candle_entry(cache, key, entry=None):
+    # 캐시 항목 조회(entry=None) 또는 저장. 최근 사용 순서를 갱신하고 한도를 넘은 오래된 항목은 버린다
+    with cache['lock']:
+        if entry is not None: cache['entries'][key] = entry
+        entry = cache['entries'].get(key)
+        if entry is not None: cache['entries'].move_to_end(key)
+        while len(cache['entries']) > CANDLE_CACHE_MAX_ENTRIES: cache['entries'].popitem(last=False)
+        return entry
+
+def make_placeholder_live_bar(closed_df, timeframe):
+    # 거래소가 아직 다음 캔들을 주지 않았을 때 (봉 경계 직후 등): 직전 종가로 고정된 진행 중 캔들 1개
+    last = closed_df.iloc[-1]
+    interval_ms = TIMEFRAME_MS.get(timeframe, 3_600_000)
+    return pd.DataFrame([{'timestamp': last['timestamp'] + pd.Timedelta(milliseconds=interval_ms), 'open': last['close'], 'high': last['close'],
+                          'low': last['close'], 'close': last['close'], 'volume': 0.0, 'close_time': last['close_time'] + interval_ms}])
+
+def compute_analysis_indicators(df, params):
+    return indicators.add_indicator_columns(df, params) # [★수정] pandas_ta 대신 봇과 같은 지표 모듈
+
+def get_cached_candles(client, mode, market_type, symbol, timeframe, indicator_params=None, closed_only=False):
+    cache = get_candle_cache()
+    key = (mode, market_type, symbol, timeframe)
+    key_lock = get_candle_key_lock(cache, key)
+
+    # [★수정] 확정/진행 중 구분은 캔들 close_time 과 거래소 시각으로 (확정 구간 캐시에 진행 중 캔들이 들어가면 한 주기 동안 가격이 멈춘다)
+    server_now = get_server_now_ms(client, mode, market_type)
+    closed_open_time = get_last_closed_open_time(timeframe, server_now)
+    with key_lock:
+        entry = get_candle_entry(cache, key)
+        if entry is None or entry['closed_open_time'] != closed_open_time:
+            # 새 캔들이 확정됨 -> 전체 구간 재조회
+            klines = fetch_klines(client, market_type, symbol, timeframe, limit=CANDLE_CACHE_LIMIT)
+            if not klines: return None
+            df = klines_to_dataframe(klines)
+            is_closed = df['close_time'] < server_now
+            entry = {'closed_open_time': closed_open_time,
+                     'closed': df[is_closed].reset_index(drop=True),
+                     'live': df[~is_closed].reset_index(drop=True),
+                     'live_fetched_at': time.time(), 'indicators': {}}
+            get_candle_entry(cache, key, entry)
+        elif not closed_only and time.time() - entry['live_fetched_at'] >= LIVE_BAR_TTL_SEC:
+            # 확정 구간은 그대로, 진행 중 캔들만 갱신
+            klines = fetch_klines(client, market_type, symbol, timeframe, limit=1)
+            if klines:
+                live_df = klines_to_dataframe(klines)
+                entry['live'] = live_df[live_df['close_time'] >= server_now].reset_index(drop=True)
+            entry['live_fetched_at'] = time.time()
+
+        closed_df = entry['closed']
+        if indicator_params:
+            params_key = tuple(sorted(indicator_params.items()))
+            if params_key not in entry['indicators']:
+                entry['indicators'][params_key] = compute_analysis_indicators(entry['closed'].copy(), indicator_params)
+            closed_df = entry['indicators'][params_key]
+        live_df = entry['live']
+
+    if closed_only or closed_df.empty: return closed_df.copy()
+    # [★수정] 마지막 행은 항상 진행 중 캔들 (호출부는 iloc[-2] 를 직전 확정 캔들로 사용)
+    if live_df.empty: live_df = make_placeholder_live_bar(closed_df, timeframe)
+    return pd.concat([closed_df, live_df], ignore_index=True)
+
+# --- [★신규] 조건 비트셋 히스토리 (분석 탭 what-if) ---
+# 확정 캔들 전체의 조건 충족 여부를 캔들 캐시 항목에 임계값별로 한 번만 계산해 두고,
+# 토글/최소 조건 수 변경은 비트셋 popcount 로만 다시 센다. 새 캔들이 확정되면 캐시 항목과 함께 버려진다.
+def get_condition_history(client, mode, market_type, symbol, timeframe, settings):
+    closed = get_cached_candles(client, mode, market_type, symbol, timeframe, closed_only=True)
+    if closed is None or len(closed) < 3: return None
+    cache = get_candle_cache()
+    key = (mode, market_type, symbol, timeframe)
+    thresholds = tuple(settings[name] for name in signal_batch.THRESHOLD_KEYS)
+    with get_candle_key_lock(cache, key):
+        # [★수정] 그 사이 LRU 로 항목이 밀려났으면 받아 둔 확정 캔들로 계산만 하고 저장하지 않는다
+        entry = get_candle_entry(cache, key)
+        if entry is not None: closed = entry['closed']
+        bitsets = entry.setdefault('condition_bits', {}) if entry is not None else {}
+        if thresholds not in bitsets:
+            panel = signal_batch.stack_candles({symbol: closed})
+            bits = signal_batch.compute_condition_bitsets(signal_batch.compute_indicators(panel), settings)
+            bitsets[thresholds] = {'timestamp': closed['timestamp'], 'close': closed['close'],
+                                   'long': bits['long'][:, 0], 'short': bits['short'][:, 0]}
+        return bitsets[thresholds]
+
+# --- [★신규] 멀티 타임프레임 합류 (분석 탭) ---
+# 분석 탭의 기준 캔들(세션 공유 캔들 캐시)로 상위 타임프레임 캔들/지표를 이어 만든다. 상위 타임프레임은 엔진을 처음 만들 때와 누락 시에만 조회.
+@st.cache_resource
+def get_mtf_engines():
+    return {'lock': threading.Lock(), 'engines': {}}
+
+def get_mtf_engine(client, mode, market_type, symbol, timeframe, timeframes, params, history):
+    df = get_cached_candles(client, mode, market_type, symbol, timeframe)
+    if df is None or len(df) < 2: return None
+    cache = get_mtf_engines()
+    key = (mode, market_type, symbol, timeframe)
+    with cache['lock']:
+        engine = cache['engines'].get(key)
+        if engine is None or not engine.matches(timeframe, timeframes, params, history):
+            engine = cache['engines'][key] = mtf_engine.MultiTimeframeEngine(timeframe, timeframes, params, history)
+        engine.update(CandleSeries.from_dataframe(df))
+        for interval in engine.needs_seed():
+            klines = fetch_klines(client, market_type, symbol, interval, limit=engine.history)
+            if klines: engine.seed(interval, CandleSeries.from_klines(klines))
+    return engine
+
 # --- 실시간 차트 표시 ---
 def display_chart(client, market_type, symbol, timeframe, mode):
     st.subheader(f"📊 {market_type} 실시간 가격 차트 ({symbol}, {timeframe}) - [ {mode} 모드 ]")
     try:
-        if market_type == "USD-M":
-            klines = client.futures_klines(symbol=symbol, interval=timeframe, limit=100)
-        elif market_type == "COIN-M":
-            klines = client.futures_coin_klines(symbol=symbol, interval=timeframe, limit=100)
-        else: # Spot
-            try:
-                klines = client.get_klines(symbol=symbol, interval=timeframe, limit=100) 
-            except Exception as e:
-                if "Invalid symbol" in str(e): st.error(f"'{symbol}'은(는) 현물에서 유효하지 않은 심볼입니다.")
-                else: st.error(f"현물 차트 데이터 조회 오류: {e}")
-                return
-            
-        if not klines: st.warning("차트 데이터를 가져올 수 없습니다."); return
+        try:
+            df = get_cached_candles(client, mode, market_type, symbol, timeframe)
+        except Exception as e:
+            if market_type != "Spot": raise
+            if "Invalid symbol" in str(e): st.error(f"'{symbol}'은(는) 현물에서 유효하지 않은 심볼입니다.")
+            else: st.error(f"현물 차트 데이터 조회 오류: {e}")
+            return
 
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        for col in ['open', 'high', 'low', 'close']: df[col] = pd.to_numeric(df[col])
+        if df is None: st.warning("차트 데이터를 가져올 수 없습니다."); return
+        df = df.tail(100).reset_index(drop=True)
         df['SMA10'] = df['close'].rolling(window=10).mean(); df['SMA50'] = df['close'].rolling(window=50).mean()
+
         fig = go.Figure(data=[go.Candlestick(x=df['timestamp'], open=df['open'], high=df['high'], low=df['low'], close=df['close'], name=symbol)])
         fig.add_trace(go.Scatter(x=df['timestamp'], y=df['SMA10'], mode='lines', name='SMA 10', line=dict(color='orange', width=1)))
         fig.add_trace(go.Scatter(x=df['timestamp'], y=df['SMA50'], mode='lines', name='SMA 50', line=dict(color='purple', width=1)))
@@ -151,6 +341,70 @@ def display_chart(client, market_type, symbol, timeframe, mode):
         if "Invalid symbol" in str(e): st.error(f"'{symbol}'은(는) 유효하지 않은 심볼입니다. 심볼을 확인해주세요.")
         else: st.error(f"차트 표시 중 오류 발생: {e}")
 
+# --- [★신규] 워치리스트 (여러 심볼 가격/봇 조건 수를 한 화면에) ---
+# 새로고침마다 시장별 24시간 티커 일괄 조회 1회 -> 심볼 수와 관계없이 API 가중치 일정.
+# 캔들은 확정 캔들이 바뀔 때만 심볼별로 한 번 받고(세션 공유 캔들 캐시), 지표/조건은 모든 심볼을 한 번에 계산한다.
+WATCHLIST_SPARKLINE_BARS = 48
+WATCHLIST_FETCH_WORKERS = 8
+
+def get_watchlist(config):
+    watchlist = config.get("watchlist") or {}
+    return {market: watchlist.get(market) or [config.get(f"{key}_settings", {}).get("symbol", "BTCUSDT")] for market, key in MARKET_KEYS.items()}
+
+def fetch_bulk_tickers(client, market_type):
+    if market_type == "USD-M": tickers = client.futures_ticker()
+    elif market_type == "COIN-M": tickers = client.futures_coin_ticker()
+    else: tickers = client.get_ticker()
+    return {t['symbol']: t for t in tickers}
+
+def build_watchlist_rows(client, mode, market_type, symbols, timeframe, settings):
+    tickers = fetch_bulk_tickers(client, market_type)
+    symbols = [s for s in symbols if s in tickers]
+    def load(symbol):
+        try: return symbol, get_cached_candles(client, mode, market_type, symbol, timeframe, closed_only=True)
+        except Exception: return symbol, None
+    with ThreadPoolExecutor(max_workers=WATCHLIST_FETCH_WORKERS) as pool:
+        candles = dict(pool.map(load, symbols))
+    panel = signal_batch.stack_candles(candles)
+    checks = signal_batch.evaluate_entry_checks(signal_batch.compute_indicators(panel), settings, allow_short=market_type != "Spot") if len(panel['close']) >= 3 else None
+    rows = []
+    for symbol in symbols:
+        ticker = tickers[symbol]
+        last_price = float(ticker['lastPrice'])
+        closes = candles[symbol]['close'].tail(WATCHLIST_SPARKLINE_BARS).tolist() if candles.get(symbol) is not None else []
+        has_checks = checks is not None and symbol in checks.index
+        rows.append({'시장': market_type, '심볼': symbol, '현재가': last_price, '24h 변동률(%)': float(ticker['priceChangePercent']),
+                     '추세': closes + [last_price],
+                     '롱 조건': int(checks.at[symbol, 'long_count']) if has_checks else None,
+                     '숏 조건': int(checks.at[symbol, 'short_count']) if has_checks and market_type != "Spot" else None})
+    return rows
+
+# --- [★신규] 장기 히스토리 차트 (로컬 캔들 저장소 + 화면 폭 다운샘플링) ---
+def display_history_chart(client, market_type, symbol, timeframe, mode):
+    st.subheader(f"🕰️ {market_type} 장기 히스토리 차트 ({symbol}) - [ {mode} 모드 ]")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    history_range = col1.date_input("조회 기간", value=(date.today() - timedelta(days=30), date.today()), key="history_chart_range")
+    history_timeframes = list(candle_store.INTERVAL_MS.keys()) # 기본값은 봇 타임프레임 (1m x 30일은 조회가 너무 큼)
+    history_timeframe = col2.selectbox("타임프레임", history_timeframes, index=history_timeframes.index(timeframe) if timeframe in history_timeframes else 0, key="history_chart_timeframe")
+    max_bars = col3.number_input("차트 폭 (막대 수)", min_value=200, max_value=4000, value=chart_downsample.DEFAULT_MAX_BARS, step=100, key="history_chart_width")
+    if not (isinstance(history_range, (tuple, list)) and len(history_range) == 2):
+        st.info("조회 종료 날짜를 선택해 주세요."); return
+    start_ms, end_ms = report_engine.get_range_ms(*history_range)
+    try:
+        # 저장소에 없는 앞/뒤 구간만 받는다 (한 번 받은 확정 캔들은 다시 요청하지 않음)
+        with st.spinner("캔들 저장소 동기화 중..."):
+            candle_store.sync_candles(client, mode, market_type, symbol, history_timeframe, start_ms, end_ms)
+    except Exception as e: st.warning(f"캔들 동기화 실패: {e} - 저장된 캔들로만 표시합니다.")
+    candles = candle_store.query_candles(mode, market_type, symbol, history_timeframe, start_ms, end_ms)
+    if candles.empty: st.warning("표시할 캔들이 없습니다."); return
+    try:
+        if not trade_ledger.is_range_synced(mode, market_type, symbol, end_ms): trade_ledger.sync_trades(client, mode, market_type, symbol)
+    except Exception as e: st.warning(f"거래 내역 동기화 실패: {e} - 로컬 원장의 체결만 표시합니다.")
+    trades = trade_ledger.query_trades(mode, market_type, symbol, start_ms, end_ms)
+    bar_count, fig = chart_downsample.build_history_figure(candles, trades, symbol, history_timeframe, int(max_bars))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"원본 캔들 {len(candles):,}개 -> 막대 {bar_count:,}개로 묶어서 표시 | 체결 {len(trades):,}건")
+
 # --- 로그 파일 읽기 ---
 def read_log_file(log_path):
     try:
@@ -160,183 +414,254 @@ def read_log_file(log_path):
     except Exception: return "로그 파일 없음."
 
 # --- 거래 내역 조회 ---
-def fetch_trade_history(client, market_type, symbol, selected_date):
-    st.info(f"{market_type} '{symbol}' ({selected_date.strftime('%Y-%m-%d')}) 거래 내역 조회 (UTC 기준)...")
+def fetch_trade_history(client, market_type, symbol, start_date, end_date=None):
+    # [★수정] 로컬 거래 원장에서 조회. 원장이 조회 구간 끝까지 동기화되지 않은 경우에만 API로 증분 동기화
+    end_date = end_date or start_date
+    start_ts = int(datetime.combine(start_date, datetime.min.time()).timestamp() * 1000)
+    end_ts = int(datetime.combine(end_date, datetime.max.time()).timestamp() * 1000)
+    if client and not trade_ledger.is_range_synced(mode, market_type, symbol, end_ts):
+        try:
+            trade_ledger.sync_trades(client, mode, market_type, symbol)
+        except BinanceAPIException as e: st.error(f"거래 내역 동기화 오류 (API): {e} - 로컬 원장 데이터만 표시합니다.")
+        except Exception as e: st.error(f"거래 내역 동기화 중 오류: {e} - 로컬 원장 데이터만 표시합니다.")
     try:
-        start_ts = int(datetime.combine(selected_date, datetime.min.time()).timestamp() * 1000)
-        end_ts = int(datetime.combine(selected_date, datetime.max.time()).timestamp() * 1000)
-        
-        if market_type == "USD-M":
-            trades = client.futures_account_trades(symbol=symbol, startTime=start_ts, endTime=end_ts)
-        elif market_type == "COIN-M":
-            trades = client.futures_coin_account_trades(symbol=symbol, startTime=start_ts, endTime=end_ts)
-        else: # Spot
-            trades = client.get_my_trades(symbol=symbol, startTime=start_ts, endTime=end_ts) 
-            
-        if not trades: st.warning("해당 기간 거래 내역 없음."); return pd.DataFrame()
-        
-        df = pd.DataFrame(trades)
-        df['time'] = pd.to_datetime(df['time'], unit='ms')
-        
+        # 현물은 선입선출 원가 계산을 위해 원장 처음부터 읽어 체결별 실현 손익을 구한 뒤 조회 구간만 남긴다
         if market_type == "Spot":
-            df['realizedPnl'] = 0.0 
-            df['qty'] = pd.to_numeric(df['qty'])
-            df['quoteQty'] = pd.to_numeric(df['quoteQty'])
-            df['commission'] = pd.to_numeric(df['commission'])
-            df['side'] = df['isBuyer'].apply(lambda x: 'BUY' if x else 'SELL')
-            df['price'] = pd.to_numeric(df['price'])
-            df['time_kst'] = df['time'] + timedelta(hours=9)
-            return df[['time_kst', 'symbol', 'side', 'price', 'qty', 'quoteQty', 'commission', 'commissionAsset']]
-        else:
-            for col in ['price', 'qty', 'realizedPnl', 'commission']:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[^\d.-]', '', regex=True), errors='coerce').fillna(0)
-                else: df[col] = 0
-            df['time_kst'] = df['time'] + timedelta(hours=9)
-            return df[['time_kst', 'symbol', 'side', 'price', 'qty', 'commission', 'realizedPnl']]
+            df = report_engine.prepare_fills(trade_ledger.query_trades(mode, market_type, symbol, 0, end_ts), market_type, symbol)
+            df = df[df['time'] >= start_ts].reset_index(drop=True)
+        else: df = trade_ledger.query_trades(mode, market_type, symbol, start_ts, end_ts)
+    except Exception as e: st.error(f"거래 원장 조회 중 오류: {e}"); return pd.DataFrame()
+    if df.empty: return df
 
-    except BinanceAPIException as e:
-         st.error(f"거래 내역 조회 오류 (API): {e}"); return pd.DataFrame()
-    except Exception as e: st.error(f"거래 내역 처리 중 오류: {e}"); return pd.DataFrame()
+    df = df.rename(columns={'realized_pnl': 'realizedPnl', 'quote_qty': 'quoteQty', 'commission_asset': 'commissionAsset'})
+    df['time_kst'] = pd.to_datetime(df['time'], unit='ms') + timedelta(hours=9)
+    if market_type == "Spot":
+        return df[['time_kst', 'symbol', 'side', 'price', 'qty', 'quoteQty', 'commission', 'commissionAsset', 'realizedPnl']]
+    return df[['time_kst', 'symbol', 'side', 'price', 'qty', 'commission', 'realizedPnl']]
 
 # --- 투자 보고서 생성 ---
-def generate_report(futures_client, spot_client, config, selected_date, usd_m_trades_df, coin_m_trades_df, spot_trades_df):
-    date_str = selected_date.strftime('%Y-%m-%d'); report_lines = [f"# {date_str} 통합 투자 보고서\n"]
+REPORT_FOLDER = "reports"
+REPORT_PREVIEW_LINES = 200
+LOG_SEARCH_LIMIT = 500 # 로그 검색 결과 최대 표시 줄 수
+
+def summarize_bot_logs(market_key, day):
+    # [★수정] 하루치 로그 파일의 신호/주문 횟수 (지난 날짜는 보고서 캐시에 함께 저장되므로 날짜 단위로 집계)
+    counts = {'days': 0, 'entries': 0, 'exits': 0, 'orders_succeeded': 0, 'orders_failed': 0, 'first_error': None}
+    log_file = f"logs/{market_key}_log_{day.strftime('%Y-%m-%d')}.txt"
+    if not os.path.exists(log_file): return counts
+    log_content = read_log_file(log_file)
+    counts['days'] = 1
+    counts['entries'] = len(re.findall(r">>> \[.+? 진입 신호\]", log_content))
+    counts['exits'] = len(re.findall(r">>> \[.+? 종료 신호\]", log_content))
+    counts['orders_succeeded'] = log_content.count("--- 주문 성공 ---")
+    counts['orders_failed'] = log_content.count("*** 주문 실패:")
+    errors = re.findall(r"\*\*\* 주문 실패: (.*?) \*\*\*", log_content)
+    if errors: counts['first_error'] = errors[0]
+    return counts
+
+def sync_usdt_conversion_candles(client, markets, start_date, end_date):
+    # [★신규] COIN-M 손익 환산용 USDT 가격 캔들을 보고서 기간만큼 로컬 저장소에 증분 동기화 (이미 있는 구간은 요청 안 함)
+    start_ms, end_ms = report_engine.get_range_ms(start_date, end_date)
+    first_trade_ms = [trade_ledger.get_first_trade_time(mode, market, symbol) for market, symbol in markets.items() if report_engine.get_usdt_pair(market, symbol)]
+    first_trade_ms = [t for t in first_trade_ms if t is not None]
+    if not first_trade_ms: return
+    interval_ms = candle_store.INTERVAL_MS[report_engine.USDT_CONVERSION_INTERVAL]
+    # 라운드트립이 기간 이전에 열렸을 수 있으므로 원장의 첫 거래부터 환산 가격을 갖춘다
+    sync_start = min(min(first_trade_ms), start_ms) - 2 * interval_ms
+    for pair in {report_engine.get_usdt_pair(market, symbol) for market, symbol in markets.items()} - {None}:
+        candle_store.sync_candles(client, mode, "Spot", pair, report_engine.USDT_CONVERSION_INTERVAL, sync_start, end_ms)
+
+def get_report_markets(config):
+    return {"USD-M": config.get("usd_m_settings", {}).get("symbol", "BTCUSDT").upper(),
+            "COIN-M": config.get("coin_m_settings", {}).get("symbol", "BTCUSD_PERP").upper(),
+            "Spot": config.get("spot_settings", {}).get("symbol", "BTCUSDT").upper()}
+
+def generate_report(futures_client, config, start_date, end_date):
+    # [★수정] 기간 보고서: 지표는 report_engine이 거래 원장에서 벡터화 집계, 거래 상세는 파일로만 스트리밍
+    period = start_date.strftime('%Y-%m-%d') if start_date == end_date else f"{start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}"
+    report_lines = [f"# {period} 통합 투자 보고서\n"]
+    markets = get_report_markets(config)
+    def summarize_logs(day): return {market_key: summarize_bot_logs(market_key, day) for market_key in ["usd_m", "coin_m", "spot"]}
+    report = report_engine.build_range_report(mode, markets, start_date, end_date, summarize_logs)
+
     report_lines.append("## 🤖 봇 활동 요약 (로그 기반)\n")
-    for market_type in ["usd_m", "coin_m", "spot"]: 
-        log_file = f"logs/{market_type}_log_{date_str}.txt"; log_content = read_log_file(log_file)
+    for market_type, logs in report['logs'].items():
         report_lines.append(f"### {market_type.upper()} 봇\n")
-        if "로그 파일 없음" in log_content: 
+        if logs['days'] == 0: 
             report_lines.append("- 로그 파일 없음")
             continue
-        
-        entries = len(re.findall(r">>> \[.+? 진입 신호\]", log_content))
-        exits = len(re.findall(r">>> \[.+? 종료 신호\]", log_content))
-        orders_succeeded = log_content.count("--- 주문 성공 ---")
-        orders_failed = log_content.count("*** 주문 실패:")
-        has_trades = "주문 성공" in log_content or "진입 신호" in log_content or "종료 신호" in log_content
-        
-        report_lines.append(f"- 진입/종료 신호: {entries}회 / {exits}회")
-        report_lines.append(f"- 주문 성공/실패: {orders_succeeded}회 / {orders_failed}회")
-        
-        if not has_trades:
-            report_lines.append("- **봇 활동 없음**: 해당 날짜에 거래 신호나 주문이 발생하지 않았습니다.")
-        
-        if orders_failed > 0:
-            errors = re.findall(r"\*\*\* 주문 실패: (.*?) \*\*\*", log_content)
-            if errors: report_lines.append(f"  - 주요 실패 원인: `{errors[0]}`")
+        report_lines.append(f"- 로그가 있는 날: {logs['days']}일")
+        report_lines.append(f"- 진입/종료 신호: {logs['entries']}회 / {logs['exits']}회")
+        report_lines.append(f"- 주문 성공/실패: {logs['orders_succeeded']}회 / {logs['orders_failed']}회")
+        if logs['entries'] + logs['exits'] + logs['orders_succeeded'] == 0:
+            report_lines.append("- **봇 활동 없음**: 해당 기간에 거래 신호나 주문이 발생하지 않았습니다.")
+        if logs['first_error']: report_lines.append(f"  - 주요 실패 원인: `{logs['first_error']}`")
 
-    report_lines.append("\n## 📈 실제 거래 성과 (API 기반)\n")
-    total_usd_pnl = 0.0 
-    
-    report_lines.append("### 🔍 거래 데이터 확인\n")
-    report_lines.append(f"- USD-M 거래 데이터: {'있음' if usd_m_trades_df is not None and not usd_m_trades_df.empty else '없음'}")
-    report_lines.append(f"- COIN-M 거래 데이터: {'있음' if coin_m_trades_df is not None and not coin_m_trades_df.empty else '없음'}")
-    report_lines.append(f"- Spot 거래 데이터: {'있음' if spot_trades_df is not None and not spot_trades_df.empty else '없음'}")
-    
-    if usd_m_trades_df is not None and not usd_m_trades_df.empty: report_lines.append(f"- USD-M 거래 건수: {len(usd_m_trades_df)}건")
-    if coin_m_trades_df is not None and not coin_m_trades_df.empty: report_lines.append(f"- COIN-M 거래 건수: {len(coin_m_trades_df)}건")
-    if spot_trades_df is not None and not spot_trades_df.empty: report_lines.append(f"- Spot 거래 건수: {len(spot_trades_df)}건")
-    
-    report_lines.append("### USD-M 거래\n")
-    if usd_m_trades_df is None or usd_m_trades_df.empty: 
-        report_lines.append("- 조회된 실제 거래 없음")
-    else:
-        pnl = usd_m_trades_df['realizedPnl'].sum()
-        commission = usd_m_trades_df['commission'].sum()
-        total_trades = len(usd_m_trades_df)
-        wins = len(usd_m_trades_df[usd_m_trades_df['realizedPnl'] > 0])
-        losses = len(usd_m_trades_df[usd_m_trades_df['realizedPnl'] < 0])
-        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
-        total_usd_pnl += pnl
-        
-        report_lines.append(f"- **실현 손익: {pnl:.8f} USDT**")
-        report_lines.append(f"- 총 수수료: {commission:.8f} USDT")
-        report_lines.append(f"- 총 거래: {total_trades}회 (Win: {wins}, Loss: {losses})")
-        report_lines.append(f"- **승률: {win_rate:.2f}%**")
-        
-        if total_trades > 0:
-            report_lines.append(f"- 거래 상세:")
-            for idx, trade in usd_m_trades_df.iterrows():
-                side_emoji = "📈" if trade['side'] == 'BUY' else "📉"
-                pnl_emoji = "💰" if trade['realizedPnl'] > 0 else "💸"
-                report_lines.append(f"  {side_emoji} {trade['time_kst']} | {trade['side']} {trade['qty']} @ {trade['price']:.2f} | {pnl_emoji} PnL: {trade['realizedPnl']:.4f}")
-        
-    report_lines.append("\n### COIN-M 거래\n")
-    coin_m_pnl_usdt = 0.0
-    if coin_m_trades_df is None or coin_m_trades_df.empty: 
-        report_lines.append("- 조회된 실제 거래 없음")
-    else:
-        pnl = coin_m_trades_df['realizedPnl'].sum()
-        commission = coin_m_trades_df['commission'].sum()
-        total_trades = len(coin_m_trades_df)
-        wins = len(coin_m_trades_df[coin_m_trades_df['realizedPnl'] > 0])
-        losses = len(coin_m_trades_df[coin_m_trades_df['realizedPnl'] < 0])
-        win_rate = (wins / (wins + losses) * 100) if (wins + losses) > 0 else 0
-        
-        report_lines.append(f"- **실현 손익 (코인 기준): {pnl:.8f}**")
-        report_lines.append(f"- 총 수수료 (코인 기준): {commission:.8f}")
-        report_lines.append(f"- 총 거래: {total_trades}회 (Win: {wins}, Loss: {losses})")
-        report_lines.append(f"- **승률: {win_rate:.2f}%**")
-        
-        if total_trades > 0:
-            report_lines.append(f"- 거래 상세:")
-            for idx, trade in coin_m_trades_df.iterrows():
-                side_emoji = "📈" if trade['side'] == 'BUY' else "📉"
-                pnl_emoji = "💰" if trade['realizedPnl'] > 0 else "💸"
-                report_lines.append(f"  {side_emoji} {trade['time_kst']} | {trade['side']} {trade['qty']} @ {trade['price']:.2f} | {pnl_emoji} PnL: {trade['realizedPnl']:.4f}")
-        
-        try:
-            if futures_client and pnl != 0: 
-                coin_m_symbol = config.get("coin_m_settings", {}).get("symbol", "BTCUSD_PERP")
-                ticker_symbol = coin_m_symbol.split('_')[0].replace("USD", "") + "USDT"
-                ticker = futures_client.get_symbol_ticker(symbol=ticker_symbol) 
-                current_price = float(ticker['price'])
-                coin_m_pnl_usdt = pnl * current_price
-                total_usd_pnl += coin_m_pnl_usdt
-                report_lines.append(f"- **실현 손익 (USDT 환산): {coin_m_pnl_usdt:.4f} USDT** (현재가 {current_price} 기준)")
-        except BinanceAPIException as e:
-            report_lines.append(f"- USDT 환산 실패 (API 오류): `{e}`")
-        except Exception as e:
-            report_lines.append(f"- USDT 환산 실패: `{e}`")
+    report_lines.append("\n## 📈 실제 거래 성과 (거래 원장 기반)\n")
+    for market_type, r in report['markets'].items():
+        report_lines.append(f"### {market_type} 거래 ({r['symbol']})\n")
+        if r['fills'] == 0 and not r['open_position']:
+            report_lines.append("- 조회된 실제 거래 없음"); continue
+        unit = "" if market_type == "COIN-M" else " USDT"
+        if market_type == "Spot":
+            report_lines.append(f"- 총 매수 금액: {r['buy_volume']:.4f} USDT / 총 매도 금액: {r['sell_volume']:.4f} USDT")
+        report_lines.append(f"- **실현 손익{' (코인 기준)' if market_type == 'COIN-M' else ''}: {r['realized_pnl']:.8f}{unit}**")
+        report_lines.append(f"- 총 수수료: " + ", ".join(f"{v:.8f} {k}" for k, v in r['fees_by_asset'].items()) if r['fees_by_asset'] else "- 총 수수료: 0")
+        report_lines.append(f"- 순손익 (수수료 차감): {r['net_pnl']:.8f}{unit}")
+        if r['unmatched_qty'] > 0: report_lines.append(f"  - 매수 기록 없이 매도한 수량 {r['unmatched_qty']:.8f}은 원가를 알 수 없어 손익에서 제외되었습니다.")
+        if r['usdt_pair'] and r['net_pnl'] != 0:
+            report_lines.append(f"- **순손익 (USDT 환산): {r['net_pnl_usdt']:.4f} USDT** (체결 시점 {r['usdt_pair']} 가격 기준)")
+        if r['unconverted_fills']: report_lines.append(f"  - 환산 가격이 없는 체결 {r['unconverted_fills']}건은 USDT 환산 없이 합산되었습니다.")
+        report_lines.append(f"- 총 체결: {r['fills']}회 (Buy: {r['buys']}, Sell: {r['sells']})")
+        report_lines.append(f"- 라운드트립(진입~청산): {r['round_trips']}회 (Win: {r['wins']}, Loss: {r['losses']}) | **승률: {r['win_rate']:.2f}%** | 평균 손익: {r['avg_trip_pnl']:.4f}")
+        report_lines.append(f"- 포지션 보유 시간: 기간의 {r['exposure_pct']:.1f}%" + (" (현재 포지션 보유 중)" if r['open_position'] else ""))
 
-    report_lines.append("\n### Spot (현물) 거래\n")
-    if spot_trades_df is None or spot_trades_df.empty: 
-        report_lines.append("- 조회된 실제 거래 없음")
-    else:
-        total_buy_usdt = spot_trades_df[spot_trades_df['side'] == 'BUY']['quoteQty'].sum()
-        total_sell_usdt = spot_trades_df[spot_trades_df['side'] == 'SELL']['quoteQty'].sum()
-        total_trades = len(spot_trades_df)
-        buy_count = len(spot_trades_df[spot_trades_df['side'] == 'BUY'])
-        sell_count = len(spot_trades_df[spot_trades_df['side'] == 'SELL'])
-        
-        report_lines.append(f"- 총 매수 금액: {total_buy_usdt:.4f} USDT")
-        report_lines.append(f"- 총 매도 금액: {total_sell_usdt:.4f} USDT")
-        report_lines.append(f"- 총 거래: {total_trades}회 (Buy: {buy_count}, Sell: {sell_count})")
-        
-        if total_trades > 0:
-            report_lines.append(f"- 거래 상세:")
-            for idx, trade in spot_trades_df.iterrows():
-                side_emoji = "📈" if trade['side'] == 'BUY' else "📉"
-                report_lines.append(f"  {side_emoji} {trade['time_kst']} | {trade['side']} {trade['qty']} @ {trade['price']:.2f} | 금액: {trade['quoteQty']:.2f}")
-        
-        commissions = spot_trades_df.groupby('commissionAsset')['commission'].sum()
-        if not commissions.empty:
-            report_lines.append("- 총 수수료:")
-            for asset, total_comm in commissions.items():
-                report_lines.append(f"  - {total_comm:.8f} {asset}")
-        else:
-            report_lines.append("- 총 수수료: 0")
+    daily_total = report['daily']['total']
+    report_lines.append(f"\n## 💰 전체 요약 (USDT 기준)\n")
+    report_lines.append(f"### **📈 기간 순손익 (수수료 차감): {report['total_net_usdt']:.4f} USDT**")
+    report_lines.append(f"- 최대 낙폭 (누적 손익 기준): {report['max_drawdown']:.4f} USDT")
+    if len(daily_total) > 1:
+        report_lines.append(f"- 최고의 날: {daily_total.idxmax():%Y-%m-%d} ({daily_total.max():.4f} USDT) / 최악의 날: {daily_total.idxmin():%Y-%m-%d} ({daily_total.min():.4f} USDT)")
+    report_lines.append("\n**참고:** 현물 손익은 매수 로트를 선입선출(FIFO)로 매도에 대응시켜 매도 체결 시점에 확정됩니다 (매수 수수료는 원가에 포함).")
+    return "\n".join(report_lines), report
 
-    report_lines.append(f"\n## 💰 전체 요약 (선물 기준)\n")
-    report_lines.append(f"- **USD-M 총 실현 손익: {total_usd_pnl - coin_m_pnl_usdt:.8f} USDT**")
-    if coin_m_pnl_usdt != 0:
-        report_lines.append(f"- **COIN-M 총 실현 손익 (USDT 환산): {coin_m_pnl_usdt:.4f} USDT**")
-    report_lines.append(f"### **📈 통합 총 실현 손익 (선물): {total_usd_pnl:.4f} USDT**")
-    report_lines.append("\n**참고:** 현물 거래는 PNL이 아닌 매수/매도 총액으로 집계됩니다.")
-    return "\n".join(report_lines)
+def write_report_file(report_content, config, start_date, end_date):
+    # 요약 + 거래 상세를 파일로 흘려 쓴다 (거래 상세 전체를 메모리에 모으지 않음)
+    if not os.path.exists(REPORT_FOLDER): os.makedirs(REPORT_FOLDER)
+    path = os.path.join(REPORT_FOLDER, f"investment_report_{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}.md")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(report_content + "\n\n## 🧾 거래 상세\n")
+        for market_type, symbol in get_report_markets(config).items():
+            f.write(f"\n### {market_type} ({symbol})\n")
+            for line in report_engine.iter_trade_detail_lines(mode, market_type, symbol, start_date, end_date): f.write(line + "\n")
+    return path
 
 
+# --- [★신규] 실행 중인 봇의 스냅샷으로 분석 탭 표시 (API 호출/지표 재계산 없음) ---
+def render_bot_snapshot(market_type, snapshot):
+    indicators = snapshot.get('indicators', {}); columns = snapshot.get('columns', {}); params = snapshot.get('params', {})
+    settings = snapshot.get('settings', {}); checks = snapshot.get('checks', {})
+    def value(name, default=0.0):
+        val = indicators.get(columns.get(name) or '', default)
+        return default if val is None else val
+
+    st.markdown(f"### 🤖 {market_type} 봇 실시간 판단 - {snapshot.get('symbol')} ({snapshot.get('timeframe')})")
+    st.caption(f"봇이 마지막 주기에 계산한 값입니다. 갱신: {datetime.fromtimestamp(snapshot['updated_at']).strftime('%Y-%m-%d %H:%M:%S')} | 확정 캔들: {snapshot.get('candle_time')} | PID: {snapshot.get('pid')}")
+    st.markdown(f"**현재 가격**: {snapshot.get('current_price', 0):,.2f}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### 📈 기본 지표")
+        st.metric(f"SMA {params.get('short_sma_len', '')}", f"{value('sma_short'):,.2f}")
+        st.metric(f"SMA {params.get('long_sma_len', '')}", f"{value('sma_long'):,.2f}")
+        st.metric("RSI", f"{value('rsi', 50):.2f}")
+        st.metric("MACD", f"{value('macd'):.6f}")
+        st.metric("MACD Signal", f"{value('macd_signal'):.6f}")
+        st.metric(f"ATR {params.get('atr_length', '')}", f"{value('atr'):,.4f}")
+    with col2:
+        st.markdown("#### 📊 추가 지표")
+        st.metric("BB 상단", f"{value('bbu'):,.2f}")
+        st.metric("BB 하단", f"{value('bbl'):,.2f}")
+        st.metric("스토캐스틱 K", f"{value('stoch_k', 50):.2f}")
+        st.metric("스토캐스틱 D", f"{value('stoch_d', 50):.2f}")
+        st.metric("거래량", f"{indicators.get('volume', 0):,.0f}")
+        st.metric("거래량 SMA20", f"{value('volume_sma'):,.0f}")
+
+    st.markdown("---")
+    st.markdown("### 🎯 봇 조건 판정")
+    group_titles = {'long_entry': "📈 롱 진입 조건", 'short_entry': "📉 숏 진입 조건", 'long_exit': "📉 롱 종료 조건 (매도)", 'short_exit': "📈 숏 종료 조건 (매수)"}
+    for group, group_checks in checks.items():
+        st.markdown(f"#### {group_titles.get(group, group)}")
+        if not group_checks:
+            st.info("이번 주기에는 조건 검사가 없었습니다 (익절/손절 가격 우선 판정).")
+            continue
+        for key, ok in group_checks.items():
+            st.write(f"{'✅' if ok else '❌'} {CONDITION_LABELS[group].get(key, key)}")
+        required = settings.get('min_exit_conditions') if group.endswith('_exit') else settings.get('min_conditions')
+        st.markdown(f"**만족**: {sum(bool(v) for v in group_checks.values())}/{len(group_checks)} (최소 {required}개 필요)")
+
+    st.markdown("---")
+    st.markdown("### 🎯 봇 판단")
+    if snapshot.get('htf_trend'): st.write(f"상위 추세 ({settings.get('htf_timeframe')}): **{snapshot['htf_trend']}**")
+    if snapshot.get('mtf'): # [★신규] 타임프레임 합류 규칙 결과
+        mtf = snapshot['mtf']
+        detail = ", ".join(f"{tf} 롱 {d['long']}/숏 {d['short']} (최소 {d['min']})" if d else f"{tf} 데이터 부족" for tf, d in mtf['detail'].items())
+        st.write(f"타임프레임 합류: 롱 {'✅' if mtf['long'] else '❌'} / 숏 {'✅' if mtf['short'] else '❌'} | {detail}")
+    position = snapshot.get('position')
+    if position:
+        st.write(f"보유: {position.get('amount')} @ {position.get('entry_price')} | SL: {position.get('sl_target')} | TP: {position.get('tp_target')}")
+    decision = snapshot.get('decision', '')
+    if decision in ("LONG_ENTRY", "SHORT_ENTRY"): st.success(f"🚀 **{decision}**")
+    elif decision in ("WAIT", "HOLD"): st.info(f"⏳ **{decision}**")
+    else: st.warning(f"⚠️ **{decision}**")
+
+    if snapshot.get('profiles'): # [★신규] 같은 캔들/지표로 평가한 전략 프로필별 판단
+        st.markdown("#### 🧪 전략 프로필")
+        profile_rows = []
+        for p in snapshot['profiles']:
+            if 'long_count' in p: conditions = f"롱 {p['long_count']} / 숏 {p['short_count']} (최소 {p['min_conditions']})"
+            elif 'exit_count' in p: conditions = f"종료 {p['exit_count']} (최소 {p['min_exit_conditions']})"
+            else: conditions = p.get('error', "-")
+            pos = p.get('position')
+            profile_rows.append({'프로필': p['name'], '실행': p['execution'], '판단': p['decision'], '조건': conditions, 'HTF': p.get('htf_trend') or "-",
+                                 '보유': f"{pos['quantity']} @ {pos['entry_price']} (SL {pos['sl_target']} / TP {pos['tp_target']})" if pos else "-"})
+        st.dataframe(pd.DataFrame(profile_rows), use_container_width=True, hide_index=True)
+
+# --- [★신규] What-if / 멀티 타임프레임 합류 (봇 실행 여부와 관계없이 표시, 조건 설정은 사이드바/config 값) ---
+def get_whatif_settings(config):
+    """분석 탭 조건 설정 (사이드바에서 바꾼 값 우선, 없으면 config) -> (signal_batch 조건 설정, 최소 진입 조건 수)."""
+    defaults = config.get("indicator_settings", {})
+    keys = {'use_sma': True, 'use_rsi': True, 'use_macd': True, 'use_bb': True, 'use_stoch': True, 'use_stoch_cross': True, 'use_volume': True,
+            'rsi_oversold': 30, 'rsi_overbought': 70, 'stoch_oversold': 20, 'stoch_overbought': 80, 'volume_multiplier': 1.2}
+    settings = {key: st.session_state.get(key, defaults.get(key, default)) for key, default in keys.items()}
+    return settings, st.session_state.get("min_conditions", defaults.get("min_conditions", 7))
+
+def render_whatif_section(client, mode, market_type, symbol, timeframe, whatif_settings, min_conditions):
+    st.markdown("---")
+    st.markdown("### 🧪 What-if: 현재 설정이었다면 과거에 진입했을 캔들")
+    history = get_condition_history(client, mode, market_type, symbol, timeframe, whatif_settings)
+    if history is not None:
+        mask = signal_batch.get_condition_mask(whatif_settings)
+        long_fired = signal_batch.count_conditions(history['long'], mask) >= min_conditions
+        short_fired = (signal_batch.count_conditions(history['short'], mask) >= min_conditions) & ~long_fired # 봇은 롱 조건을 먼저 본다
+        col1, col2, col3 = st.columns(3)
+        col1.metric("분석 캔들 수", f"{len(history['close']) - 1}")
+        col2.metric("롱 진입 신호", f"{int(long_fired.sum())}회")
+        col3.metric("숏 진입 신호", f"{int(short_fired.sum())}회" if market_type != "Spot" else "-")
+        whatif_fig = go.Figure(go.Scattergl(x=history['timestamp'], y=history['close'], mode='lines', name='종가', line=dict(color='gray', width=1)))
+        whatif_fig.add_trace(go.Scattergl(x=history['timestamp'][long_fired], y=history['close'][long_fired], mode='markers', name='롱 진입', marker=dict(symbol='triangle-up', color='green', size=9)))
+        if market_type != "Spot":
+            whatif_fig.add_trace(go.Scattergl(x=history['timestamp'][short_fired], y=history['close'][short_fired], mode='markers', name='숏 진입', marker=dict(symbol='triangle-down', color='red', size=9)))
+        whatif_fig.update_layout(height=350, margin=dict(t=20, b=20))
+        st.plotly_chart(whatif_fig, use_container_width=True)
+        st.caption("봇과 같은 진입 조건(확정 캔들 기준)으로 계산. HTF 필터와 보유 중 진입 제외는 반영하지 않습니다.")
+
+def render_mtf_section(client, mode, config, market_type, symbol, timeframe, whatif_settings, params):
+    # 기준 캔들에서 이어 만든 상위 타임프레임별 추세/조건 수
+    st.markdown("---")
+    st.markdown("### 🧭 멀티 타임프레임 합류")
+    mtf_settings = mtf_engine.load_mtf_settings(config)
+    mtf_rules = mtf_settings['min_conditions']
+    engine = get_mtf_engine(client, mode, market_type, symbol, timeframe,
+                            [*mtf_settings['timeframes'], *mtf_rules], params, mtf_settings['history'])
+    if engine is None: st.info("기준 캔들이 부족합니다.")
+    else:
+        entry_settings = mtf_settings['entry_settings']
+        mtf_rows = []
+        for interval in engine.timeframes:
+            checks = engine.entry_checks(interval, whatif_settings)
+            row = {'타임프레임': interval, f"추세 (SMA {entry_settings['htf_sma_short']}/{entry_settings['htf_sma_long']})": engine.trend(interval, entry_settings['htf_sma_short'], entry_settings['htf_sma_long']),
+                   '롱 조건': f"{sum(checks[0].values())}/{len(checks[0])}" if checks else "-"}
+            if market_type != "Spot": row['숏 조건'] = f"{sum(checks[1].values())}/{len(checks[1])}" if checks else "-"
+            row['합류 규칙 (최소)'] = str(mtf_rules.get(interval, "-"))
+            mtf_rows.append(row)
+        st.dataframe(pd.DataFrame(mtf_rows), use_container_width=True, hide_index=True)
+        if mtf_rules:
+            confluence = engine.confluence(whatif_settings, mtf_rules)
+            st.write(f"합류 규칙 충족 - 롱: {'✅' if confluence['long'] else '❌'}" + (f", 숏: {'✅' if confluence['short'] else '❌'}" if market_type != "Spot" else ""))
+        if engine.skipped: st.caption(f"{timeframe} 캔들로 만들 수 없어 제외된 타임프레임: {', '.join(engine.skipped)}")
+        st.caption("상위 타임프레임은 확정 캔들 기준이며, 기준 캔들에서 이어 만들어 처음과 누락 시에만 따로 조회합니다.")
+
 def render_log_tab(title, is_running, log_file_base, auto_refresh_key, refresh_btn_key, log_area_key):
     st.subheader(title)
     log_file = f"logs/{log_file_base}_{datetime.now().strftime('%Y-%m-%d')}.txt"
@@ -355,7 +680,9 @@ def render_log_tab(title, is_running, log_file_base, auto_refresh_key, refresh_b
 with st.sidebar:
     st.header("⚙️ 통합 봇 설정")
     config = load_config()
-    mode = st.radio("거래 환경 선택", ("Test", "Live"), index=0 if config.get("mode", "Test") == "Test" else 1, key="mode_radio")
+    mode_options = ("Test", "Live", "Paper") # [★신규] Paper: 실시간 시세 + 로컬 모의 체결
+    mode = st.radio("거래 환경 선택", mode_options, index=mode_options.index(config.get("mode", "Test")) if config.get("mode", "Test") in mode_options else 0, key="mode_radio",
+                    help="Paper: 실거래소 시세로 주문은 로컬에서 모의 체결 (수수료/슬리피지/스톱/격리 청산 반영, API 키 불필요)")
     st.markdown("---"); st.subheader("🔑 API 키")
     with st.expander("API 키 설정 (Test/Live 공용)"):
         testnet_api_key = st.text_input("Testnet API Key", value=config.get("testnet_api_key", ""), type="password", key="tn_api")
@@ -461,6 +788,7 @@ with st.sidebar:
             "live_api_key": live_api_key, "live_secret_key": live_secret_key,
             "usd_m_settings": {"symbol": usd_m_symbol.upper(), "margin_type": usd_m_margin_type, "leverage": usd_m_leverage, "stop_loss_pct": usd_m_stop_loss, "take_profit_pct": usd_m_take_profit, "quantity": usd_m_quantity, "timeframe": usd_m_timeframe},
             "coin_m_settings": {"symbol": coin_m_symbol.upper(), "margin_type": coin_m_margin_type, "leverage": coin_m_leverage, "stop_loss_pct": coin_m_stop_loss, "take_profit_pct": coin_m_take_profit, "quantity": coin_m_quantity, "timeframe": coin_m_timeframe},
+            "control_settings": config.get("control_settings", {}), # [★신규] 봇 제어 엔드포인트 포트 (수동 설정 유지)
             "spot_settings": {"symbol": spot_symbol.upper(), "quantity_usdt": spot_quantity_usdt, "stop_loss_pct": spot_stop_loss, "take_profit_pct": spot_take_profit, "timeframe": spot_timeframe},
             "indicator_settings": {
                 "use_sma": use_sma, "use_rsi": use_rsi, "use_macd": use_macd, "use_bb": use_bb,
@@ -482,56 +810,71 @@ config = load_config(); mode = config.get('mode', 'Test')
 st.title(f"📈 통합 자동매매 대시보드 - [ {mode} 모드 ]"); st.markdown("---")
 IS_WINDOWS = os.name == 'nt'
 
-def start_process(script_path):
-    creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if IS_WINDOWS else 0
-    return subprocess.Popen(["python", script_path], creationflags=creationflags)
-def stop_process(process):
-    if process is None: return
-    try:
-        if IS_WINDOWS: os.kill(process.pid, signal.CTRL_C_EVENT)
-        else: process.send_signal(signal.SIGINT)
-        process.wait(timeout=10); st.toast(f"✔️ PID {process.pid} 봇 안전 종료.")
-    except (subprocess.TimeoutExpired, ProcessLookupError):
-        process.kill(); st.warning(f"PID {process.pid} 강제 종료.")
-
-bot_scripts = {
-    "USD-M": USD_M_BOT_SCRIPT,
-    "COIN-M": COIN_M_BOT_SCRIPT,
-    "Spot (현물)": SPOT_BOT_SCRIPT
-}
-
-for market, script in bot_scripts.items():
+# [★수정] 봇 프로세스는 감독 프로세스(supervisor.py)가 관리 -> 대시보드는 시작/중지 요청과 상태 조회만 한다
+def ensure_supervisor():
+    if request_control("supervisor", "status", config): return True
+    if IS_WINDOWS: subprocess.Popen(["python", SUPERVISOR_SCRIPT], creationflags=subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS)
+    else: subprocess.Popen(["python", SUPERVISOR_SCRIPT], start_new_session=True)
+    for _ in range(20): # 감독 프로세스 엔드포인트가 열릴 때까지 최대 10초 대기
+        time.sleep(0.5)
+        if request_control("supervisor", "status", config): return True
+    return False
+
+# 봇 상태는 각 봇의 로컬 엔드포인트로 확인 -> 새로고침/다른 세션에서도 실행 중인 봇에 다시 연결된다
+def get_bot_status(market_key):
+    return request_control(market_key, "status", config)
+
+supervisor_status = request_control("supervisor", "status", config)
+for market in ["USD-M", "COIN-M", "Spot (현물)"]:
     st.header(f"💵 {market} Bot Controller") 
     col1, col2 = st.columns(2) 
-    process_key = f"{market.lower().split(' ')[0]}_process" 
+    market_key = MARKET_KEYS[market.split(' ')[0]]
     status_placeholder = st.empty() 
     
-    process = st.session_state.get(process_key)
-    is_running = process is not None and process.poll() is None
-
-    if col1.button(f"🚀 {market} 봇 시작", use_container_width=True, key=f"start_{process_key}", disabled=is_running):
-        st.toast(f"[ {mode} ] {market} 봇 시작..."); st.session_state[process_key] = start_process(script); st.rerun()
-    if col2.button(f"🛑 {market} 봇 중지", use_container_width=True, key=f"stop_{process_key}", disabled=not is_running):
-        current_process = st.session_state.get(process_key)
-        if current_process:
-            st.toast(f"{market} 봇 종료 시도..."); 
-            stop_process(current_process)
-            st.session_state[process_key] = None
-            st.rerun()
-        else:
-            st.warning(f"{market} 봇이 실행 중이지 않습니다.")
+    supervised = (supervisor_status or {}).get('bots', {}).get(market_key) or {}
+    bot_status = get_bot_status(market_key)
+    is_running = bot_status is not None or supervised.get('desired', False)
+
+    if col1.button(f"🚀 {market} 봇 시작", use_container_width=True, key=f"start_{market_key}", disabled=is_running):
+        st.toast(f"[ {mode} ] {market} 봇 시작...")
+        if ensure_supervisor(): request_control("supervisor", f"start/{market_key}", config)
+        else: st.error("감독 프로세스(supervisor.py)를 시작할 수 없습니다.")
+        st.rerun()
+    if col2.button(f"🛑 {market} 봇 중지", use_container_width=True, key=f"stop_{market_key}", disabled=not is_running):
+        st.toast(f"{market} 봇 종료 시도... 진행 중인 주기를 마치고 종료합니다.")
+        if supervised.get('desired'): request_control("supervisor", f"stop/{market_key}", config)
+        else: request_control(market_key, "stop", config) # 감독 프로세스 밖에서 실행된 봇
+        st.rerun()
             
-    if is_running:
-        status_placeholder.info(f"✅ **{market} 상태:** 실행 중 (PID: {st.session_state[process_key].pid})")
+    if bot_status:
+        last_cycle = datetime.fromtimestamp(bot_status['last_cycle_at']).strftime('%H:%M:%S') if bot_status.get('last_cycle_at') else "-"
+        latency = f"{bot_status['cycle_latency_sec']:.2f}초" if bot_status.get('cycle_latency_sec') is not None else "-"
+        status_placeholder.info(f"✅ **{market} 상태:** {bot_status.get('health')} (PID: {bot_status.get('pid')}) | 마지막 주기: {last_cycle} ({latency}) | 대기 주문: {len(bot_status.get('pending_orders') or [])}건")
+        position = bot_status.get('position')
+        if position: st.caption(f"포지션: {position.get('quantity')} @ {position.get('entry_price')} | SL: {position.get('sl_target')} | TP: {position.get('tp_target')}")
+        if bot_status.get('last_error'): st.caption(f"최근 에러: {bot_status['last_error']}")
+        if st.button(f"⟳ {market} 설정 다시 읽기", key=f"reload_{market_key}"):
+            if request_control(market_key, "reload", config): st.toast(f"{market} 봇에 설정 다시 읽기 요청.")
+            else: st.warning(f"{market} 봇 엔드포인트에 연결할 수 없습니다.")
+    elif supervised.get('state') == 'failed': # [★신규] 설정 오류로 시작 실패 -> 감독 프로세스가 재시작하지 않음
+        status_placeholder.error(f"❌ **{market} 상태:** 설정 오류로 시작 실패 (코드: {supervised.get('last_exit_code')}) - API 키/config.json 확인 후 다시 시작하세요")
+    elif supervised.get('state') == 'backoff':
+        status_placeholder.warning(f"🔁 **{market} 상태:** 비정상 종료 (코드: {supervised.get('last_exit_code')}) - {max(supervised['next_start_at'] - time.time(), 0):.0f}초 후 재시작")
+    elif is_running:
+        status_placeholder.info(f"✅ **{market} 상태:** 시작 중 (PID: {supervised.get('pid')})")
     else:
         status_placeholder.info(f"⚠️ **{market} 상태:** 중지됨")
-
+    if supervised.get('restarts') or supervised.get('ttfd_sec') is not None:
+        ttfd = f"{supervised['ttfd_sec']}초" if supervised.get('ttfd_sec') is not None else "-"
+        st.caption(f"감독: 자동 재시작 {supervised.get('restarts', 0)}회 | 첫 판단까지 {ttfd} ({'워밍업' if supervised.get('warm_start') else '콜드'} 시작)")
 
 st.markdown("---")
-tab_list = ["📊 차트", "🔍 실시간 분석", "📝 USD-M 로그", "📝 COIN-M 로그", "📝 Spot 로그", "📜 거래 내역", "📄 보고서"]
-tab_chart, tab_analysis, tab_usd_log, tab_coin_log, tab_spot_log, tab_trade_history, tab_report = st.tabs(tab_list)
+tab_list = ["📊 차트", "🔍 실시간 분석", "📝 USD-M 로그", "📝 COIN-M 로그", "📝 Spot 로그", "📜 거래 내역", "📄 보고서", "🔎 로그 검색", "👀 워치리스트", "📡 신호 스캐너"]
+tab_chart, tab_analysis, tab_usd_log, tab_coin_log, tab_spot_log, tab_trade_history, tab_report, tab_log_search, tab_watchlist, tab_scanner = tab_list
+# [★수정] st.tabs는 보이지 않는 탭까지 매번 실행(API 호출/지표 계산)하므로, 선택된 화면만 실행한다.
+selected_tab = st.radio("화면 선택", tab_list, horizontal=True, key="selected_tab", label_visibility="collapsed")
 
-with tab_chart:
+if selected_tab == tab_chart:
     chart_market_type = st.radio("표시할 차트 선택", ("USD-M", "COIN-M", "Spot"), horizontal=True, key="chart_radio")
     
     client = None
@@ -548,14 +891,17 @@ with tab_chart:
         current_symbol = config.get("spot_settings", {}).get("symbol", "BTCUSDT")
         current_timeframe = config.get("spot_settings", {}).get("timeframe", "1h")
 
+    chart_view = st.radio("표시 방식", ("실시간 (최근 100개)", "장기 히스토리"), horizontal=True, key="chart_view_radio")
     if client: 
-        if current_symbol and current_timeframe:
+        if chart_view == "장기 히스토리" and current_symbol:
+             display_history_chart(client, chart_market_type, current_symbol.upper(), current_timeframe, mode)
+        elif current_symbol and current_timeframe:
              display_chart(client, chart_market_type, current_symbol.upper(), current_timeframe, mode)
     else:
         st.warning(f"차트를 표시하려면 {chart_market_type} API 키를 설정하거나 네트워크를 확인하세요.")
 
 # --- 실시간 분석 탭 [수정됨] ---
-with tab_analysis:
+elif selected_tab == tab_analysis:
     st.header("🔍 실시간 시장 분석")
     st.markdown("**7개 지표 기반 포지션 진입/종료 안정성 분석**")
     
@@ -564,58 +910,43 @@ with tab_analysis:
     analysis_client = None; analysis_symbol = None; analysis_timeframe = None
     
     if analysis_market == "USD-M":
-        analysis_client = get_futures_client(config)
         analysis_symbol = config.get("usd_m_settings", {}).get("symbol", "BTCUSDT")
         analysis_timeframe = config.get("usd_m_settings", {}).get("timeframe", "1h")
     elif analysis_market == "COIN-M":
-        analysis_client = get_futures_client(config)
         analysis_symbol = config.get("coin_m_settings", {}).get("symbol", "BTCUSD_PERP")
         analysis_timeframe = config.get("coin_m_settings", {}).get("timeframe", "1h")
     else: # Spot
-        analysis_client = get_spot_client(config)
         analysis_symbol = config.get("spot_settings", {}).get("symbol", "BTCUSDT")
         analysis_timeframe = config.get("spot_settings", {}).get("timeframe", "1h")
+
+    # [★신규] 봇이 실행 중이면 봇이 방금 계산한 스냅샷을 그대로 표시, 중지 상태일 때만 직접 계산
+    analysis_snapshot = load_snapshot(MARKET_KEYS[analysis_market])
+    analysis_client = get_spot_client(config) if analysis_market == "Spot" else get_futures_client(config) # What-if/합류 표시는 실행 중에도 필요
+    last_snapshot = load_snapshot(MARKET_KEYS[analysis_market], fresh_only=False) or {}
+    indicator_params = last_snapshot.get('params') or DEFAULT_INDICATOR_PARAMS
     
-    if analysis_client and analysis_symbol and analysis_timeframe:
+    if analysis_snapshot:
+        render_bot_snapshot(analysis_market, analysis_snapshot)
+    elif analysis_client and analysis_symbol and analysis_timeframe:
+        st.caption("💡 봇이 중지 상태이므로 대시보드에서 직접 계산한 값입니다.")
         try:
-            if analysis_market == "USD-M":
-                klines = analysis_client.futures_klines(symbol=analysis_symbol, interval=analysis_timeframe, limit=200)
-            elif analysis_market == "COIN-M":
-                klines = analysis_client.futures_coin_klines(symbol=analysis_symbol, interval=analysis_timeframe, limit=200)
-            else: # Spot
-                klines = analysis_client.get_klines(symbol=analysis_symbol, interval=analysis_timeframe, limit=200)
-            
-            if klines:
-                df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-                numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-                for col in numeric_cols: df[col] = pd.to_numeric(df[col])
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                
-                try:
-                    import pandas_ta as ta
-                    df.ta.sma(length=10, append=True)
-                    df.ta.sma(length=50, append=True)
-                    df.ta.rsi(length=14, append=True)
-                    df.ta.bbands(length=20, append=True)
-                    df.ta.macd(fast=12, slow=26, signal=9, append=True)
-                    df.ta.stoch(high='high', low='low', close='close', k=14, d=3, append=True)
-                    df.ta.sma(length=20, close='volume', append=True)
-                except ImportError:
-                    st.error("pandas_ta 라이브러리가 필요합니다. pip install pandas_ta")
-                    st.stop() 
-                
+            # [★수정] 확정 캔들이 바뀔 때만 API 호출/지표 계산 (그 외에는 캐시 사용)
+            df = get_cached_candles(analysis_client, mode, analysis_market, analysis_symbol, analysis_timeframe, indicator_params=indicator_params)
+
+            if df is not None:
                 latest = df.iloc[-2]
                 current_price = df.iloc[-1]['close']
                 
-                sma_short = latest.get('SMA_10', current_price)
-                sma_long = latest.get('SMA_50', current_price)
-                rsi = latest.get('RSI_14', 50)
-                macd = latest.get('MACD_12_26_9', 0)
-                macd_signal = latest.get('MACDs_12_26_9', 0)
+                macd_suffix = f"{indicator_params['macd_fast']}_{indicator_params['macd_slow']}_{indicator_params['macd_signal']}"
+                sma_short = latest.get(f"SMA_{indicator_params['short_sma_len']}", current_price)
+                sma_long = latest.get(f"SMA_{indicator_params['long_sma_len']}", current_price)
+                rsi = latest.get(f"RSI_{indicator_params['rsi_len']}", 50)
+                macd = latest.get(f"MACD_{macd_suffix}", 0)
+                macd_signal = latest.get(f"MACDs_{macd_suffix}", 0)
                 stoch_k = latest.get('STOCHk_14_3_3', 50)
                 stoch_d = latest.get('STOCHd_14_3_3', 50)
                 current_volume = latest['volume']
-                volume_sma = latest.get('SMA_20_volume', current_volume)
+                volume_sma = latest.get(indicators.bot_column_names(indicator_params)[0], current_volume)
                 
                 bb_cols = [col for col in df.columns if col.startswith('BB')]
                 bbl_col = next((c for c in bb_cols if 'BBL' in c), None)
@@ -632,8 +963,8 @@ with tab_analysis:
                 col1, col2 = st.columns(2)
                 with col1:
                     st.markdown("#### 📈 기본 지표")
-                    st.metric("SMA 10", f"{sma_short:,.2f}")
-                    st.metric("SMA 50", f"{sma_long:,.2f}")
+                    st.metric(f"SMA {indicator_params['short_sma_len']}", f"{sma_short:,.2f}")
+                    st.metric(f"SMA {indicator_params['long_sma_len']}", f"{sma_long:,.2f}")
                     st.metric("RSI", f"{rsi:.2f}")
                     st.metric("MACD", f"{macd:.6f}")
                     st.metric("MACD Signal", f"{macd_signal:.6f}")
@@ -878,21 +1209,30 @@ with tab_analysis:
     else:
         st.warning(f"분석을 위해 {analysis_market} API 키를 설정해주세요.")
 
+    # [★수정] What-if / 멀티 타임프레임 합류는 봇이 실행 중이어도 표시
+    if analysis_client and analysis_symbol and analysis_timeframe:
+        whatif_settings, whatif_min_conditions = get_whatif_settings(config)
+        try:
+            render_whatif_section(analysis_client, mode, analysis_market, analysis_symbol, analysis_timeframe, whatif_settings, whatif_min_conditions)
+            render_mtf_section(analysis_client, mode, config, analysis_market, analysis_symbol, analysis_timeframe, whatif_settings, indicator_params)
+        except Exception as e:
+            st.error(f"What-if/합류 계산 중 오류 발생: {e}")
 
-with tab_usd_log:
-    is_usd_m_running = 'usd_m_process' in st.session_state and st.session_state.usd_m_process and st.session_state.usd_m_process.poll() is None
+
+elif selected_tab == tab_usd_log:
+    is_usd_m_running = get_bot_status("usd_m") is not None
     render_log_tab("📝 USD-M 실시간 로그", is_usd_m_running, "usd_m_log", 'usd_m_auto_refresh', 'usd_refresh_btn', 'usd_m_log_area')
 
-with tab_coin_log:
-    is_coin_m_running = 'coin_m_process' in st.session_state and st.session_state.coin_m_process and st.session_state.coin_m_process.poll() is None
+elif selected_tab == tab_coin_log:
+    is_coin_m_running = get_bot_status("coin_m") is not None
     render_log_tab("📝 COIN-M 실시간 로그", is_coin_m_running, "coin_m_log", 'coin_m_auto_refresh', 'coin_refresh_btn', 'coin_m_log_area')
 
-with tab_spot_log:
-    is_spot_running = 'spot_process' in st.session_state and st.session_state.spot_process and st.session_state.spot_process.poll() is None
+elif selected_tab == tab_spot_log:
+    is_spot_running = get_bot_status("spot") is not None
     render_log_tab("📝 Spot 실시간 로그", is_spot_running, "spot_log", 'spot_auto_refresh', 'spot_refresh_btn', 'spot_log_area')
 
-with tab_trade_history:
-    st.header("📜 거래 내역 조회 (API 기반)")
+elif selected_tab == tab_trade_history:
+    st.header("📜 거래 내역 조회 (로컬 원장 + API 증분 동기화)")
     if 'history_date' not in st.session_state: st.session_state.history_date = date.today()
     selected_hist_date = st.date_input("조회할 날짜 선택", value=st.session_state.history_date, key="history_date_input")
     st.session_state.history_date = selected_hist_date 
@@ -932,26 +1272,118 @@ with tab_trade_history:
             st.subheader(f"💵 {market} 거래 내역 ({date_str})"); st.dataframe(df)
         else: st.info(f"선택한 날짜의 {market} 거래 내역이 없습니다.")
 
-with tab_report:
+elif selected_tab == tab_report:
     st.header("📄 통합 투자 보고서")
-    report_date = st.date_input("보고서 생성 날짜 선택", value=st.session_state.history_date, key="report_gen_date")
+    # [★수정] 단일 날짜 대신 기간 선택 (같은 날짜를 고르면 하루 보고서)
+    report_range = st.date_input("보고서 기간 선택", value=(st.session_state.history_date, st.session_state.history_date), key="report_gen_range")
     st.markdown("---")
-    st.info("보고서를 생성하기 전에 [📜 거래 내역] 탭에서 해당 날짜의 데이터를 먼저 불러와 주세요.")
     
     futures_client = get_futures_client(config) 
     spot_client = get_spot_client(config)
     report_config = load_config() 
     
+    if isinstance(report_range, (tuple, list)) and len(report_range) == 2:
+        report_start, report_end = report_range
+    else:
+        st.info("보고서 종료 날짜를 선택해 주세요."); st.stop()
+
     if futures_client and spot_client:
-        report_content = generate_report(
-            futures_client, spot_client, report_config, report_date, 
-            st.session_state.usd_m_trades_df, 
-            st.session_state.coin_m_trades_df,
-            st.session_state.spot_trades_df 
-        )
+        # 조회 기간 끝까지 원장이 동기화되지 않은 시장만 API로 증분 동기화
+        _, report_end_ms = report_engine.get_range_ms(report_start, report_end)
+        for market_type, symbol in get_report_markets(report_config).items():
+            if trade_ledger.is_range_synced(mode, market_type, symbol, report_end_ms): continue
+            try: trade_ledger.sync_trades(futures_client if market_type != "Spot" else spot_client, mode, market_type, symbol)
+            except Exception as e: st.warning(f"{market_type} 거래 내역 동기화 실패: {e} - 로컬 원장 데이터로 보고서를 만듭니다.")
+        try: sync_usdt_conversion_candles(spot_client, get_report_markets(report_config), report_start, report_end)
+        except Exception as e: st.warning(f"USDT 환산용 가격 동기화 실패: {e} - 저장된 가격으로만 환산합니다.")
+        report_content, report = generate_report(futures_client, report_config, report_start, report_end)
         st.markdown("### 📝 생성된 보고서")
         st.markdown(report_content)
-        st.download_button(label="💾 보고서 다운로드 (.md)", data=report_content.encode('utf-8'),
-                           file_name=f"investment_report_{report_date.strftime('%Y-%m-%d')}.md", mime="text/markdown")
+        if len(report['daily']) > 1:
+            st.markdown("#### 📈 누적 손익 (USDT)"); st.line_chart(report['equity'])
+            st.markdown("#### 📊 일별 손익 (USDT)"); st.bar_chart(report['daily'].drop(columns='total'))
+        with st.expander(f"🧾 거래 상세 (시장별 최대 {REPORT_PREVIEW_LINES}건 미리보기)"):
+            for market_type, symbol in get_report_markets(report_config).items():
+                preview = list(itertools.islice(report_engine.iter_trade_detail_lines(mode, market_type, symbol, report_start, report_end), REPORT_PREVIEW_LINES))
+                st.markdown(f"**{market_type}**"); st.text("\n".join(preview) if preview else "거래 없음")
+        if st.button("📦 전체 보고서 파일 만들기 (거래 상세 포함)", key="write_report_btn"):
+            st.session_state.report_file = write_report_file(report_content, report_config, report_start, report_end)
+        report_file = st.session_state.get('report_file')
+        if report_file and os.path.exists(report_file):
+            with open(report_file, 'rb') as f:
+                st.download_button(label="💾 보고서 다운로드 (.md)", data=f, file_name=os.path.basename(report_file), mime="text/markdown")
     else:
         st.warning("보고서를 생성하려면 선물과 현물 API 키가 모두 필요합니다.")
+
+elif selected_tab == tab_log_search:
+    st.header("🔎 봇 로그 검색 (현재 + 압축 보관 로그)")
+    # 로그 파일은 백그라운드 색인기가 계속 색인 -> 검색은 파일을 다시 읽지 않고 색인에서 바로 답한다
+    log_index.start_background_indexer()
+    col1, col2, col3 = st.columns([3, 2, 2])
+    search_query = col1.text_input("검색어 (예: 주문 실패, 손절매(SL) 도달)", key="log_search_query")
+    search_markets = col2.multiselect("시장", list(MARKET_KEYS.keys()), default=list(MARKET_KEYS.keys()), key="log_search_markets")
+    search_range = col3.date_input("기간", value=(date.today() - timedelta(days=30), date.today()), key="log_search_range")
+    if isinstance(search_range, (tuple, list)) and len(search_range) == 2:
+        search_start_ms, search_end_ms = report_engine.get_range_ms(*search_range)
+    else:
+        st.info("검색 종료 날짜를 선택해 주세요."); st.stop()
+    if st.button("⟳ 지금 색인 갱신", key="log_index_update_btn"):
+        with st.spinner("로그 색인 갱신 중..."): st.toast(f"새로 색인한 줄: {log_index.update_index()}줄")
+    started = time.time()
+    results = log_index.search(search_query, [MARKET_KEYS[m] for m in search_markets], search_start_ms, search_end_ms, limit=LOG_SEARCH_LIMIT)
+    st.caption(f"{len(results)}건{' (최신순 최대 ' + str(LOG_SEARCH_LIMIT) + '건)' if len(results) >= LOG_SEARCH_LIMIT else ''} | {(time.time() - started) * 1000:.0f}ms")
+    if results.empty: st.info("검색 결과가 없습니다.")
+    else: st.dataframe(results, use_container_width=True, hide_index=True)
+
+elif selected_tab == tab_watchlist:
+    st.header("👀 워치리스트")
+    watchlist = get_watchlist(config)
+    with st.expander("✏️ 워치리스트 편집 (쉼표로 구분)"):
+        edited = {market: st.text_input(market, ", ".join(symbols), key=f"watchlist_{MARKET_KEYS[market]}") for market, symbols in watchlist.items()}
+        if st.button("💾 워치리스트 저장", key="watchlist_save_btn"):
+            config["watchlist"] = {market: [s.strip().upper() for s in text.split(",") if s.strip()] for market, text in edited.items()}
+            save_config(config); st.rerun()
+    entry_settings = signal_batch.load_entry_settings(config)
+    st.caption(f"봇 진입 조건 수 (최소 {entry_settings['min_conditions']}개) - 확정 캔들 기준 | 가격은 24시간 티커 일괄 조회")
+    watchlist_rows = []
+    for market, symbols in watchlist.items():
+        client = get_spot_client(config) if market == "Spot" else get_futures_client(config)
+        if not client: st.warning(f"{market} API 키를 설정하거나 네트워크를 확인하세요."); continue
+        timeframe = config.get(f"{MARKET_KEYS[market]}_settings", {}).get("timeframe", "1h")
+        try: watchlist_rows.extend(build_watchlist_rows(client, mode, market, symbols, timeframe, entry_settings))
+        except Exception as e: st.error(f"{market} 워치리스트 조회 오류: {e}")
+    if watchlist_rows:
+        st.dataframe(pd.DataFrame(watchlist_rows), use_container_width=True, hide_index=True,
+                     column_config={'추세': st.column_config.LineChartColumn("추세", width="medium"),
+                                    '24h 변동률(%)': st.column_config.NumberColumn(format="%.2f"),
+                                    '롱 조건': st.column_config.NumberColumn(format="%d"), '숏 조건': st.column_config.NumberColumn(format="%d")})
+    else: st.info("표시할 심볼이 없습니다.")
+    if st.button("🔄 새로고침", key="watchlist_refresh_btn"): st.rerun()
+
+elif selected_tab == tab_scanner:
+    st.header("📡 전체 심볼 신호 스캐너")
+    st.caption("봇과 같은 진입 조건(최소 조건 수 + HTF 필터)을 시장의 모든 거래 심볼에 적용해 조건 충족 수 순으로 정렬합니다.")
+    col1, col2, col3 = st.columns([2, 1, 1])
+    scan_market = col1.radio("시장", list(MARKET_KEYS.keys()), horizontal=True, key="scanner_market")
+    scan_quote = col2.text_input("견적 자산 (비우면 전체)", "USDT" if scan_market != "COIN-M" else "", key="scanner_quote").strip().upper()
+    scan_timeframes = list(candle_store.INTERVAL_MS.keys())
+    bot_timeframe = config.get(f"{MARKET_KEYS[scan_market]}_settings", {}).get("timeframe", "1h")
+    scan_timeframe = col3.selectbox("타임프레임", scan_timeframes, index=scan_timeframes.index(bot_timeframe) if bot_timeframe in scan_timeframes else 0, key="scanner_timeframe")
+    if st.button("🔍 스캔 실행", key="scanner_run_btn"):
+        scan_client = get_spot_client(config) if scan_market == "Spot" else get_futures_client(config)
+        if not scan_client: st.warning(f"{scan_market} API 키를 설정하거나 네트워크를 확인하세요.")
+        else:
+            started = time.time()
+            with st.spinner("전체 심볼 캔들 수집/조건 평가 중..."):
+                try:
+                    ranked, failed = signal_scanner.scan_market(scan_client, scan_market, scan_timeframe, config, quote_asset=scan_quote or None)
+                    st.session_state.scanner_result = (scan_market, scan_timeframe, ranked, failed, time.time() - started)
+                except Exception as e: st.error(f"스캔 중 오류 발생: {e}")
+    scanner_result = st.session_state.get('scanner_result')
+    if scanner_result:
+        result_market, result_timeframe, ranked, failed, elapsed = scanner_result
+        st.markdown(f"**{result_market} ({result_timeframe})** - {len(ranked)}개 심볼, {elapsed:.1f}초" + (f" | 조회 실패 {len(failed)}개" if failed else ""))
+        if ranked.empty: st.info("스캔 결과가 없습니다.")
+        else:
+            st.dataframe(ranked[['decision', 'long_count', 'short_count', 'htf_trend']].reset_index(), use_container_width=True, hide_index=True)
+            with st.expander("조건별 상세"): st.dataframe(ranked)
@@ -0,0 +1,209 @@
+# backtest.py (봇 규칙 백테스트: 로컬 캔들 저장소의 캔들로 run_bot 과 같은 진입/종료/SL/TP 규칙을 재현)
+#  - 진입/종료 조건과 HTF 추세는 signal_batch 로 전 구간을 한 번에 계산 -> 포지션 구간만 순서대로 따라간다
+#  - 확정 캔들 종가에서 판단, 다음 캔들 시가에 체결 (봇의 iloc[-2] 판단 + 주기 시작 시점 주문)
+#  - SL/TP 는 캔들 고가/저가로 판정. 한 캔들이 SL 과 TP 를 모두 건드린 모호한 봉만 하위 타임프레임(기본 1분봉)을 읽어 먼저 닿은 쪽을 찾는다
+#  실행: python backtest.py [USD-M|COIN-M|Spot] 시작일 종료일
+
+import os, sys, json
+from datetime import date
+import numpy as np
+import pandas as pd
+import signal_batch
+import candle_store
+import report_engine
+from candle_store import INTERVAL_MS
+from exchange_sim import DEFAULT_SIM_SETTINGS, SETTINGS_KEYS, get_contract_size
+
+WARMUP_BARS = 200 # 지표 계산용으로 시작 시각 앞에 더 읽는 캔들 수 (봇의 get_market_data limit)
+DEFAULT_BACKTEST_SETTINGS = {'slippage_bps': 0.0, 'sub_interval': "1m"} # taker_fee 기본값은 exchange_sim 과 같음
+
+def load_backtest_settings(config, market):
+    """봇의 load_strategy_settings 와 같은 기본값 + 수량/수수료/슬리피지 (config 의 "backtest_settings" 로 변경)."""
+    settings = signal_batch.load_entry_settings(config)
+    market_settings = config.get(SETTINGS_KEYS[market], {})
+    indicator_settings = config.get("indicator_settings", {})
+    atr_settings = config.get("atr_settings", {})
+    backtest_settings = dict(DEFAULT_BACKTEST_SETTINGS, **config.get("backtest_settings", {}))
+    settings.update({
+        'min_exit_conditions': indicator_settings.get("min_exit_conditions", 3),
+        'stop_loss_pct': float(market_settings.get("stop_loss_pct", 2.0)), 'take_profit_pct': float(market_settings.get("take_profit_pct", 5.0)),
+        'use_atr_sl_tp': atr_settings.get("use_atr_sl_tp", True), 'atr_length': atr_settings.get("atr_length", 14),
+        'atr_sl_multiplier': atr_settings.get("atr_sl_multiplier", 2.0), 'atr_tp_multiplier': atr_settings.get("atr_tp_multiplier", 3.0),
+        'taker_fee': float(backtest_settings.get("taker_fee", DEFAULT_SIM_SETTINGS['taker_fee'][market])),
+        'slippage_bps': float(backtest_settings['slippage_bps']), 'sub_interval': backtest_settings['sub_interval'],
+    })
+    if market == "Spot": settings['quantity'] = float(market_settings.get("quantity_usdt", 11.0)) # 매수 USDT 금액
+    elif market == "COIN-M": settings['quantity'] = int(market_settings.get("quantity", 1)) # 계약 수
+    else: settings['quantity'] = float(market_settings.get("quantity", 0.001)) # 코인 수량
+    settings['leverage'] = int(market_settings.get("leverage", 1 if market == "Spot" else 3))
+    return settings
+
+def compute_htf_trend_history(candles, htf_candles, interval, settings):
+    """각 캔들 종가 시점에 확정돼 있던 마지막 HTF 캔들의 SMA 비교 (봇의 get_htf_trend). 1=UP, -1=DOWN, 0=NEUTRAL."""
+    close = htf_candles['close']
+    sma_short = close.rolling(settings['htf_sma_short']).mean().to_numpy()
+    sma_long = close.rolling(settings['htf_sma_long']).mean().to_numpy()
+    with np.errstate(invalid='ignore'): trend = np.sign(sma_short - sma_long)
+    trend = np.nan_to_num(trend)
+    htf_close_times = htf_candles['open_time'].to_numpy() + INTERVAL_MS[settings['htf_timeframe']]
+    decided_at = candles['open_time'].to_numpy() + INTERVAL_MS[interval]
+    last_closed = np.searchsorted(htf_close_times, decided_at, side='right') - 1
+    return np.where(last_closed >= 0, trend[np.maximum(last_closed, 0)], 0)
+
+def compute_signals(candles, settings, interval, allow_short=True, htf_candles=None):
+    """전 구간 진입/종료 신호 배열 (캔들 i 종가에서 판단). long_entry/short_entry/long_exit/short_exit/atr."""
+    indicators = signal_batch.compute_indicators(signal_batch.stack_candles({'_': candles}), settings['atr_length'])
+    mask = signal_batch.get_condition_mask(settings)
+    entry_bits = signal_batch.compute_condition_bitsets(indicators, settings)
+    exit_bits = signal_batch.compute_exit_bitsets(indicators)
+    long_entry = signal_batch.count_conditions(entry_bits['long'][:, 0], mask) >= settings['min_conditions']
+    short_entry = signal_batch.count_conditions(entry_bits['short'][:, 0], mask) >= settings['min_conditions']
+    if settings['use_htf_filter']:
+        trend = compute_htf_trend_history(candles, htf_candles, interval, settings) if htf_candles is not None and len(htf_candles) else np.zeros(len(candles))
+        long_entry &= trend > 0
+        short_entry &= trend < 0
+    short_entry &= allow_short & ~long_entry # 봇도 롱 조건을 먼저 본다
+    return {'long_entry': long_entry, 'short_entry': short_entry,
+            'long_exit': signal_batch.count_conditions(exit_bits['long'][:, 0], mask) >= settings['min_exit_conditions'],
+            'short_exit': signal_batch.count_conditions(exit_bits['short'][:, 0], mask) >= settings['min_exit_conditions'],
+            'atr': indicators['atr'].to_numpy()[:, 0]}
+
+class SubCandleResolver:
+    """SL/TP 를 한 봉에서 모두 건드린 모호한 봉만 하위 캔들로 먼저 닿은 쪽을 판정. 하위 캔들은 처음 필요할 때 한 번만 읽는다."""
+    def __init__(self, loader, interval="1m"):
+        self.loader, self.interval = loader, interval
+        self.arrays = None
+
+    def first_touch(self, bar_open_ms, bar_ms, direction, sl, tp):
+        """('SL' 또는 'TP', 닿은 하위 캔들 마감 시각). 하위 캔들이 없거나 한 하위 캔들에서도 둘 다 닿으면 (None, None)."""
+        if self.arrays is None:
+            candles = self.loader()
+            self.arrays = {col: candles[col].to_numpy() for col in ('open_time', 'open', 'high', 'low')}
+        times = self.arrays['open_time']
+        lo, hi = np.searchsorted(times, [bar_open_ms, bar_open_ms + bar_ms])
+        if lo == hi: return None, None
+        opens, highs, lows = self.arrays['open'][lo:hi], self.arrays['high'][lo:hi], self.arrays['low'][lo:hi]
+        sl_hit = lows <= sl if direction > 0 else highs >= sl
+        tp_hit = highs >= tp if direction > 0 else lows <= tp
+        j_sl = int(np.argmax(sl_hit)) if sl_hit.any() else hi - lo
+        j_tp = int(np.argmax(tp_hit)) if tp_hit.any() else hi - lo
+        close_time = lambda j: int(times[lo + j]) + INTERVAL_MS[self.interval] - 1
+        if j_sl < j_tp: return 'SL', close_time(j_sl)
+        if j_tp < j_sl: return 'TP', close_time(j_tp)
+        if j_sl == hi - lo: return None, None # 하위 캔들로는 어느 쪽도 닿지 않음 (데이터 불일치)
+        open_price = opens[j_sl] # 같은 하위 캔들: 시가가 이미 넘어가 있으면 그쪽
+        if (direction > 0 and open_price <= sl) or (direction < 0 and open_price >= sl): return 'SL', close_time(j_sl)
+        if (direction > 0 and open_price >= tp) or (direction < 0 and open_price <= tp): return 'TP', close_time(j_tp)
+        return None, None
+
+def _trade_pnl(market, symbol, direction, entry, exit_price, settings):
+    fee = settings['taker_fee']
+    if market == "COIN-M":
+        value = settings['quantity'] * get_contract_size(symbol) # 계약 USD 가치, 손익은 기초 코인
+        return value, direction * value * (1 / entry - 1 / exit_price) - fee * (value / entry + value / exit_price)
+    qty = settings['quantity'] / entry if market == "Spot" else settings['quantity']
+    return qty, direction * qty * (exit_price - entry) - fee * qty * (entry + exit_price)
+
+def run_backtest(candles, signals, settings, market, symbol, interval, resolver=None, start_index=0):
+    """신호 배열로 포지션을 따라가며 체결 목록 DataFrame 을 만든다. start_index 이전 캔들은 지표 워밍업용 (진입 안 함)."""
+    open_time = candles['open_time'].to_numpy().astype(np.int64)
+    opens, highs, lows, closes = (candles[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close'))
+    n, interval_ms = len(closes), INTERVAL_MS[interval]
+    slip = settings['slippage_bps'] / 10_000
+    entries = np.flatnonzero((signals['long_entry'] | signals['short_entry'])[:n - 1]) # 마지막 캔들 신호는 체결할 다음 캔들이 없음
+    exits = {1: np.flatnonzero(signals['long_exit']), -1: np.flatnonzero(signals['short_exit'])}
+    trades, i = [], start_index
+    while True:
+        k = np.searchsorted(entries, i)
+        if k == len(entries): break
+        signal_bar = entries[k]; entry_bar = signal_bar + 1
+        direction = 1 if signals['long_entry'][signal_bar] else -1
+        entry = opens[entry_bar] * (1 + slip * direction)
+        atr = signals['atr'][signal_bar]
+        if settings['use_atr_sl_tp'] and atr > 0:
+            sl, tp = entry - direction * atr * settings['atr_sl_multiplier'], entry + direction * atr * settings['atr_tp_multiplier']
+        else:
+            sl, tp = entry * (1 - direction * settings['stop_loss_pct'] / 100), entry * (1 + direction * settings['take_profit_pct'] / 100)
+        # 종료 신호 캔들까지만 SL/TP 를 찾는다 (그 안에 닿지 않으면 신호로 종료)
+        side_exits = exits[direction]
+        kx = np.searchsorted(side_exits, entry_bar)
+        last = side_exits[kx] if kx < len(side_exits) else n - 1
+        window_highs, window_lows = highs[entry_bar:last + 1], lows[entry_bar:last + 1]
+        sl_hits = np.flatnonzero(window_lows <= sl if direction > 0 else window_highs >= sl)
+        tp_hits = np.flatnonzero(window_highs >= tp if direction > 0 else window_lows <= tp)
+        j_sl = entry_bar + sl_hits[0] if len(sl_hits) else None
+        j_tp = entry_bar + tp_hits[0] if len(tp_hits) else None
+        ambiguous, resolution = False, ""
+        if j_sl is None and j_tp is None:
+            if kx < len(side_exits) and last + 1 < n:
+                reason, exit_bar, exit_price, exit_time = "SIGNAL", last + 1, opens[last + 1] * (1 - slip * direction), int(open_time[last + 1])
+            else:
+                reason, exit_bar, exit_price, exit_time = "END", n - 1, closes[n - 1], int(open_time[n - 1]) + interval_ms - 1
+            next_i = held_end = exit_bar if reason == "SIGNAL" else n
+        else:
+            j = min(x for x in (j_sl, j_tp) if x is not None)
+            exit_time = int(open_time[j]) + interval_ms - 1
+            if j_sl != j_tp: reason = "SL" if j == j_sl else "TP"
+            elif (direction > 0 and opens[j] <= sl) or (direction < 0 and opens[j] >= sl): reason = "SL" # 시가가 이미 SL 너머
+            elif (direction > 0 and opens[j] >= tp) or (direction < 0 and opens[j] <= tp): reason = "TP"
+            else:
+                ambiguous = True
+                reason, touched_at = resolver.first_touch(int(open_time[j]), interval_ms, direction, sl, tp) if resolver else (None, None)
+                if reason: resolution, exit_time = resolver.interval, touched_at
+                else: reason, resolution = "SL", "assumed_sl" # 판정 불가 -> 보수적으로 손절
+            level = sl if reason == "SL" else tp
+            gap_price = min(level, opens[j]) if (direction > 0) == (reason == "SL") else max(level, opens[j]) # 갭이면 시가 체결
+            exit_bar, exit_price = j, gap_price * (1 - slip * direction)
+            next_i = held_end = j # SL/TP 로 닫힌 봉의 종가 신호로 다시 진입할 수 있다
+        qty, pnl = _trade_pnl(market, symbol, direction, entry, exit_price, settings)
+        # 보유 중 가장 불리했던 가격 (청산 봉 안에서는 체결가까지만 반영)
+        worst = lows[entry_bar:held_end].min(initial=exit_price) if direction > 0 else highs[entry_bar:held_end].max(initial=exit_price)
+        trades.append({'entry_time': int(open_time[entry_bar]), 'exit_time': exit_time, 'side': "LONG" if direction > 0 else "SHORT",
+                       'entry_price': entry, 'exit_price': exit_price, 'sl_target': sl, 'tp_target': tp, 'qty': qty, 'pnl': pnl,
+                       'return_pct': direction * (exit_price / entry - 1) * 100, 'reason': reason, 'bars': exit_bar - entry_bar + 1,
+                       'mae_pct': max(direction * (entry - worst) / entry * 100, 0.0),
+                       'ambiguous': ambiguous, 'resolution': resolution})
+        i = next_i
+    return pd.DataFrame(trades, columns=['entry_time', 'exit_time', 'side', 'entry_price', 'exit_price', 'sl_target', 'tp_target', 'qty', 'pnl',
+                                         'return_pct', 'reason', 'bars', 'mae_pct', 'ambiguous', 'resolution'])
+
+def summarize_trades(trades):
+    if trades.empty: return {'trades': 0}
+    equity = trades['pnl'].cumsum()
+    gross_loss = -trades.loc[trades['pnl'] < 0, 'pnl'].sum()
+    return {'trades': len(trades), 'win_rate': float((trades['pnl'] > 0).mean() * 100), 'total_pnl': float(trades['pnl'].sum()),
+            'avg_return_pct': float(trades['return_pct'].mean()), 'max_drawdown': float((equity.cummax().clip(lower=0) - equity).max()),
+            'profit_factor': float(trades.loc[trades['pnl'] > 0, 'pnl'].sum() / gross_loss) if gross_loss else float('inf'),
+            'ambiguous_bars': int(trades['ambiguous'].sum()), 'resolved_by_sub_candles': int((trades['ambiguous'] & (trades['resolution'] != "assumed_sl")).sum())}
+
+def backtest_symbol(config, market, symbol, timeframe, start_ms, end_ms, data_mode=None, settings=None, load_candles=None):
+    """로컬 캔들 저장소에서 읽어 한 심볼을 백테스트. (체결 DataFrame, 요약 dict) 반환.
+    load_candles(interval, start_ms, end_ms) 를 주면 캔들 저장소 대신 그 함수로 읽는다 (universe_backtest 의 공유 메모리 배열)."""
+    data_mode = data_mode or config.get("mode", "Test")
+    settings = settings or load_backtest_settings(config, market)
+    load_candles = load_candles or (lambda interval, lo, hi: candle_store.query_candles(data_mode, market, symbol, interval, lo, hi))
+    candles = load_candles(timeframe, start_ms - WARMUP_BARS * INTERVAL_MS[timeframe], end_ms)
+    if len(candles) < 3: return pd.DataFrame(), {'trades': 0}
+    htf_candles = None
+    if settings['use_htf_filter']:
+        htf_ms = INTERVAL_MS[settings['htf_timeframe']]
+        htf_candles = load_candles(settings['htf_timeframe'], start_ms - (settings['htf_sma_long'] + 2) * htf_ms, end_ms)
+    signals = compute_signals(candles, settings, timeframe, allow_short=market != "Spot", htf_candles=htf_candles)
+    sub_interval = settings['sub_interval']
+    resolver = SubCandleResolver(lambda: load_candles(sub_interval, start_ms, end_ms + INTERVAL_MS[timeframe]), sub_interval) \
+        if INTERVAL_MS[sub_interval] < INTERVAL_MS[timeframe] else None
+    start_index = int(np.searchsorted(candles['open_time'].to_numpy(), start_ms))
+    trades = run_backtest(candles, signals, settings, market, symbol, timeframe, resolver, start_index)
+    return trades, summarize_trades(trades)
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with open('config.json', 'r') as f: config = json.load(f)
+    market = sys.argv[1] if len(sys.argv) > 1 else "USD-M"
+    start = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else date.today().replace(day=1)
+    end = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+    market_settings = config.get(SETTINGS_KEYS[market], {})
+    symbol = market_settings.get("symbol", "BTCUSD_PERP" if market == "COIN-M" else "BTCUSDT")
+    trades, summary = backtest_symbol(config, market, symbol, market_settings.get("timeframe", "1h"), *report_engine.get_range_ms(start, end))
+    if not trades.empty: print(trades.assign(entry_time=pd.to_datetime(trades['entry_time'], unit='ms')).drop(columns=['exit_time']).to_string())
+    print(summary)
@@ -0,0 +1,148 @@
+# bot_control.py (봇 상태 조회/제어용 로컬 HTTP 엔드포인트)
+#  GET  /status  -> 상태 JSON (health, 마지막 주기 시각, 주기 소요 시간, 포지션/타겟, 대기 주문)
+#  POST /stop    -> 안전 종료 요청 (현재 주기를 마치고 종료 처리)
+#  POST /reload  -> config.json 다시 읽기 요청
+#  모든 요청은 실행마다 새로 만드는 토큰(snapshots/.<봇>_control.token)을 X-Bot-Control-Token 헤더로 보내야 한다
+#  (브라우저가 보낸 교차 출처 요청은 Origin 헤더가 있으면 거부) -> 다른 웹 페이지가 127.0.0.1 로 /stop 을 보낼 수 없다
+
+import os, json, time, threading, logging, secrets, hmac, ipaddress
+import urllib.request, urllib.error, http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bot_snapshot import SNAPSHOT_FOLDER
+
+CONTROL_HOST = "127.0.0.1"
+DEFAULT_CONTROL_PORTS = {'supervisor': 8760, 'usd_m': 8761, 'coin_m': 8762, 'spot': 8763}
+TOKEN_HEADER = "X-Bot-Control-Token"
+
+stop_event = threading.Event()
+reload_event = threading.Event()
+wake_event = threading.Event() # 대기 중인 주기를 즉시 깨우기 위한 이벤트
+status = {'health': 'starting', 'pid': os.getpid(), 'started_at': time.time(),
+          'last_cycle_at': None, 'cycle_latency_sec': None, 'cycle_count': 0,
+          'position': None, 'pending_orders': [], 'last_error': None}
+status_lock = threading.Lock()
+
+def get_control_address(market_key, config=None):
+    control_settings = (config or {}).get("control_settings", {})
+    host = control_settings.get("host", CONTROL_HOST)
+    if not _is_loopback(host): # 토큰이 있어도 LAN 에 제어 포트를 열지 않는다
+        logging.warning(f"[제어] control_settings.host={host} 는 루프백 주소가 아니므로 {CONTROL_HOST} 를 사용합니다.")
+        host = CONTROL_HOST
+    port = int(control_settings.get(f"{market_key}_port", DEFAULT_CONTROL_PORTS[market_key]))
+    return host, port
+
+def _is_loopback(host):
+    if host == "localhost": return True
+    try: return ipaddress.ip_address(host).is_loopback
+    except ValueError: return False
+
+def get_token_path(market_key):
+    return os.path.join(SNAPSHOT_FOLDER, f".{market_key}_control.token")
+
+def create_token(market_key):
+    # 실행마다 새 토큰을 만들어 소유자만 읽을 수 있는 파일로 교체 (서버 시작 전에 호출)
+    token = secrets.token_urlsafe(32)
+    os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    tmp_path = f"{get_token_path(market_key)}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f: f.write(token)
+    os.replace(tmp_path, get_token_path(market_key))
+    return token
+
+def read_token(market_key):
+    try:
+        with open(get_token_path(market_key), 'r') as f: return f.read().strip()
+    except OSError: return None
+
+def is_authorized(handler, token):
+    """요청 헤더 검사: Origin 헤더가 없고(브라우저 교차 출처 요청 아님) 토큰이 이번 실행의 토큰과 같아야 한다."""
+    if handler.headers.get('Origin') is not None or not token: return False
+    return hmac.compare_digest(handler.headers.get(TOKEN_HEADER, ''), token)
+
+def get_tracked_orders(position):
+    """상태 엔드포인트용 대기 주문: 거래소를 조회하지 않고 봇이 포지션 파일에 기록한 손절(거래소 STOP_MARKET)/익절(봇이 가격으로 판정) 목표."""
+    if not position: return []
+    entry, orders = position.get('entry_price') or 0, []
+    if position.get('sl_target'):
+        orders.append({'type': 'STOP_MARKET', 'side': 'SELL' if position['sl_target'] < entry else 'BUY', 'stopPrice': position['sl_target']})
+    if position.get('tp_target'):
+        orders.append({'type': 'TAKE_PROFIT', 'side': 'SELL' if position['tp_target'] > entry else 'BUY', 'stopPrice': position['tp_target'], 'managed_by': 'bot'})
+    return orders
+
+def update_status(**values):
+    with status_lock: status.update(values)
+
+def get_status():
+    with status_lock: return json.loads(json.dumps(status, default=str))
+
+class _ControlHandler(BaseHTTPRequestHandler):
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not is_authorized(self, self.server.token): self._reply(403, {'error': 'forbidden'})
+        elif self.path == '/status': self._reply(200, get_status())
+        else: self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        # 응답을 먼저 보낸 뒤 이벤트 설정 (봇이 바로 종료되면 응답 스레드도 함께 끝나므로)
+        if not is_authorized(self, self.server.token): self._reply(403, {'error': 'forbidden'})
+        elif self.path == '/stop':
+            update_status(health='stopping'); self._reply(200, {'result': 'stopping'})
+            stop_event.set(); wake_event.set()
+        elif self.path == '/reload':
+            self._reply(200, {'result': 'reload requested'})
+            reload_event.set(); wake_event.set()
+        else: self._reply(404, {'error': 'not found'})
+
+    def log_message(self, format, *args): pass # 폴링 요청마다 로그가 쌓이지 않도록
+
+def start_control_server(market_key, config=None):
+    host, port = get_control_address(market_key, config)
+    try:
+        server = ThreadingHTTPServer((host, port), _ControlHandler)
+    except OSError as e:
+        logging.warning(f"[제어] {host}:{port} 포트를 열 수 없습니다 ({e}). 같은 봇이 이미 실행 중인지 확인하세요.")
+        return None
+    server.daemon_threads = True
+    server.token = create_token(market_key)
+    update_status(market=market_key, control_port=port)
+    threading.Thread(target=server.serve_forever, name=f"{market_key}_control", daemon=True).start()
+    logging.info(f"[제어] 상태/제어 엔드포인트 시작: http://{host}:{port}/status")
+    return server
+
+def wait_for_next_cycle(seconds):
+    # time.sleep 대신 사용. 종료/재로딩 요청이 오면 즉시 반환
+    wake_event.wait(seconds)
+    wake_event.clear()
+    return stop_event.is_set()
+
+def stop_requested():
+    return stop_event.is_set()
+
+def consume_reload_request():
+    if reload_event.is_set():
+        reload_event.clear(); return True
+    return False
+
+def report_cycle(cycle_started, **values):
+    now = time.time()
+    with status_lock:
+        status.update(values)
+        status.update(health='stopping' if stop_event.is_set() else 'running', last_cycle_at=now,
+                      cycle_latency_sec=round(now - cycle_started, 3), cycle_count=status['cycle_count'] + 1)
+
+# --- 대시보드(클라이언트) 쪽 함수 ---
+def request_control(market_key, command="status", config=None, timeout=0.5):
+    host, port = get_control_address(market_key, config)
+    method = 'GET' if command == "status" else 'POST'
+    req = urllib.request.Request(f"http://{host}:{port}/{command}", method=method, data=b'' if method == 'POST' else None,
+                                 headers={TOKEN_HEADER: read_token(market_key) or ''})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp: return json.loads(resp.read().decode('utf-8'))
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError): return None
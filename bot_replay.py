@@ -0,0 +1,179 @@
+# bot_replay.py (가속 리플레이: 실제 봇 모듈의 run_bot 을 수정 없이 가상 시각 + 기록된 시세 위에서 돌린다)
+#  - 거래소는 exchange_sim 의 SimExchange 를 프로세스 안에서 연결 (python-binance Client 는 그대로, 소켓만 없음)
+#  - 봇의 time.time()/time.sleep()/datetime.now()/주기 대기는 가상 시각으로 바뀌어 대기 없이 즉시 다음 주기로 넘어간다
+#  - 봇이 공유하는 스냅샷(판단/조건/포지션)을 주기마다 모두 기록 -> 백테스트 결과와 캔들 단위로 비교
+#  - 포지션 파일/로그는 replays/<시장>_<시각>/ 작업 폴더에 따로 생긴다 (실행 중인 실제 봇과 섞이지 않음)
+#  실행: python bot_replay.py [USD-M|COIN-M|Spot] 시작일 종료일   (예: python bot_replay.py USD-M 2024-05-01 2024-05-31)
+
+import os, sys, time, json, logging, importlib.util
+from datetime import datetime, date
+import pandas as pd
+from binance.client import Client
+import bot_control
+import bot_snapshot
+import exchange_sim
+import mtf_engine
+import report_engine
+from candle_store import INTERVAL_MS
+
+REPLAY_FOLDER = "replays"
+REPLAY_ENDPOINT = "http://exchange-sim.replay"
+BOT_MODULES = {"USD-M": ("usd_m", "usd_m_bot_logic.py", "usd_m_settings"),
+               "COIN-M": ("coin_m", "coin_m_bot_logic.py", "coin_m_settings"),
+               "Spot": ("spot", "spot_bot_logic.py", "spot_settings")}
+API_KEY_FIELDS = ("testnet_api_key", "testnet_secret_key", "live_api_key", "live_secret_key")
+
+class VirtualClock:
+    """sleep 하면 그만큼 시각이 바로 앞으로 가는 시계 (SimExchange 의 clock 으로도 사용)."""
+    def __init__(self, start_ms):
+        self.current_ms = int(start_ms)
+
+    def now_ms(self):
+        return self.current_ms
+
+    def sleep(self, seconds):
+        self.current_ms += int(round(max(seconds, 0) * 1000))
+
+class VirtualTime:
+    # 봇 모듈의 time 모듈 자리에 넣는 객체: time()/sleep() 만 가상 시각, 나머지는 실제 time 모듈
+    def __init__(self, clock): self.clock = clock
+    def time(self): return self.clock.now_ms() / 1000
+    def sleep(self, seconds): self.clock.sleep(seconds)
+    def __getattr__(self, name): return getattr(time, name)
+
+def make_virtual_datetime(clock):
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None): return datetime.fromtimestamp(clock.now_ms() / 1000, tz)
+    return VirtualDatetime
+
+def _load_bot_module(market_key, file_name):
+    # 매번 새 모듈 객체로 읽는다 (모듈 수준 코드가 작업 폴더의 config.json 으로 Client 를 만든다)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(f"replay_{market_key}_bot_logic", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _make_replay_config(config):
+    # API 키는 작업 폴더에 남기지 않는다 (봇의 키 확인만 통과하도록 더미 값)
+    replay_config = dict(config, exchange_endpoint=REPLAY_ENDPOINT)
+    for field in API_KEY_FIELDS: replay_config[field] = "replay"
+    return replay_config
+
+def run_replay(market, start_date, end_date, config=None, run_dir=None):
+    """start_date 00:00 부터 end_date 23:59 까지 봇을 가상 시각으로 돌린다.
+    반환: {'run_dir', 'decisions': 주기별 판단 DataFrame, 'fills': 체결 DataFrame, 'cycles', 'elapsed_sec'}."""
+    if market not in BOT_MODULES: raise ValueError(f"알 수 없는 시장: {market}")
+    market_key, file_name, settings_key = BOT_MODULES[market]
+    if config is None:
+        with open('config.json', 'r') as f: config = json.load(f)
+    start_ms, end_ms = report_engine.get_range_ms(start_date, end_date)
+    settings = config.get(settings_key, {})
+    symbol = settings.get("symbol", "BTCUSD_PERP" if market == "COIN-M" else "BTCUSDT")
+    timeframe = settings.get("timeframe", "1h")
+    htf_timeframe = config.get("htf_settings", {}).get("htf_timeframe", "4h")
+
+    clock = VirtualClock(start_ms)
+    exchange = exchange_sim.SimExchange(config, clock=clock)
+    base_interval = exchange.settings['base_interval']
+    intervals = {timeframe, htf_timeframe, base_interval}
+    mtf_settings = mtf_engine.load_mtf_settings(config)
+    if mtf_settings['enabled']: intervals |= {tf for tf in [*mtf_settings['timeframes'], *mtf_settings['min_conditions']] if tf in INTERVAL_MS} # 엔진 씨앗 조회용
+    intervals |= {profile.get('htf_settings', {}).get('htf_timeframe', htf_timeframe) for profile in config.get('strategy_profiles', [])} # 전략 프로필 상위 추세용
+    loaded = exchange.feed.preload(market, symbol, intervals) # 작업 폴더로 옮기기 전에 읽어 둔다
+    count, first_ms, last_ms = loaded[base_interval]
+    if not count or first_ms > start_ms or last_ms < end_ms - INTERVAL_MS[base_interval]:
+        raise ValueError(f"{market} {symbol} {base_interval} 캔들이 리플레이 구간을 덮지 않습니다. 먼저 candle_store 로 동기화하세요.")
+
+    repo_dir = os.getcwd()
+    run_dir = os.path.abspath(run_dir or os.path.join(REPLAY_FOLDER, f"{market_key}_{datetime.now():%Y%m%d-%H%M%S}"))
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, 'config.json'), 'w') as f: json.dump(_make_replay_config(config), f, ensure_ascii=False, indent=4)
+
+    decisions = []
+    def record_snapshot(key, snapshot):
+        decisions.append({'time': datetime.fromtimestamp(clock.now_ms() / 1000), 'candle_time': snapshot.get('candle_time'),
+                          'current_price': snapshot.get('current_price'), 'decision': snapshot.get('decision'),
+                          'htf_trend': snapshot.get('htf_trend'), 'position': snapshot.get('position'), 'checks': snapshot.get('checks'),
+                          'profiles': snapshot.get('profiles')})
+
+    def wait_for_next_cycle(seconds):
+        clock.sleep(seconds)
+        if clock.now_ms() > end_ms: bot_control.stop_event.set()
+        return bot_control.stop_event.is_set()
+
+    def make_record(*args, **kwargs):
+        record = original_factory(*args, **kwargs)
+        record.created = clock.now_ms() / 1000
+        record.msecs = clock.now_ms() % 1000
+        return record
+
+    virtual_time = VirtualTime(clock)
+    original_init_session = Client._init_session
+    def init_session(client_self):
+        session = original_init_session(client_self)
+        session.mount(REPLAY_ENDPOINT, exchange_sim.SimTransport(exchange))
+        return session
+
+    original_factory = logging.getLogRecordFactory()
+    saved = {'start_control_server': bot_control.start_control_server, 'wait_for_next_cycle': bot_control.wait_for_next_cycle,
+             'control_time': bot_control.time, 'snapshot_time': bot_snapshot.time,
+             'client_urls': {attr: getattr(Client, attr) for attr in ('API_URL', 'API_TESTNET_URL', 'FUTURES_URL', 'FUTURES_TESTNET_URL', 'FUTURES_COIN_URL', 'FUTURES_COIN_TESTNET_URL')}}
+    started = time.time()
+    try:
+        os.chdir(run_dir)
+        Client._init_session = init_session
+        logging.setLogRecordFactory(make_record)
+        bot_control.start_control_server = lambda *args, **kwargs: None # 실제 봇의 제어 포트와 충돌하지 않도록
+        bot_control.wait_for_next_cycle = wait_for_next_cycle
+        bot_control.time = bot_snapshot.time = virtual_time
+        bot_control.stop_event.clear(); bot_control.reload_event.clear(); bot_control.wake_event.clear()
+        bot_control.update_status(cycle_count=0)
+
+        bot = _load_bot_module(market_key, file_name)
+        bot.time, bot.datetime = virtual_time, make_virtual_datetime(clock)
+        bot.publish_snapshot = record_snapshot
+        bot.run_bot()
+    finally:
+        os.chdir(repo_dir)
+        Client._init_session = original_init_session
+        for attr, url in saved['client_urls'].items(): setattr(Client, attr, url)
+        logging.setLogRecordFactory(original_factory)
+        bot_control.start_control_server, bot_control.wait_for_next_cycle = saved['start_control_server'], saved['wait_for_next_cycle']
+        bot_control.time, bot_snapshot.time = saved['control_time'], saved['snapshot_time']
+        bot_control.stop_event.clear()
+        for handler in [h for h in logging.getLogger().handlers if isinstance(h, logging.FileHandler) and h.baseFilename.startswith(run_dir)]:
+            handler.close(); logging.getLogger().removeHandler(handler)
+
+    fills = pd.DataFrame(exchange.engine.trades[market])
+    decision_frame = pd.DataFrame(decisions)
+    with open(os.path.join(run_dir, 'decisions.jsonl'), 'w', encoding='utf-8') as f:
+        for row in decisions: f.write(json.dumps(row, ensure_ascii=False, default=bot_snapshot._json_default) + "\n")
+    fills.to_csv(os.path.join(run_dir, 'fills.csv'), index=False)
+    return {'run_dir': run_dir, 'decisions': decision_frame, 'fills': fills,
+            'cycles': bot_control.get_status()['cycle_count'], 'elapsed_sec': time.time() - started}
+
+def load_decisions(run_dir):
+    return pd.read_json(os.path.join(run_dir, 'decisions.jsonl'), lines=True)
+
+def diff_decisions(left, right, labels=("replay", "backtest")):
+    """두 판단 기록(candle_time, decision 열)을 캔들 단위로 맞춰 판단이 다른 캔들만 반환 (한쪽에만 있으면 MISSING)."""
+    a, b = (frame[['candle_time', 'decision']].assign(candle_time=lambda d: pd.to_datetime(d['candle_time'])).drop_duplicates('candle_time', keep='last')
+            for frame in (left, right))
+    merged = a.merge(b, on='candle_time', how='outer', suffixes=tuple(f"_{label}" for label in labels)).fillna("MISSING")
+    columns = [f"decision_{label}" for label in labels]
+    return merged[merged[columns[0]] != merged[columns[1]]].sort_values('candle_time').reset_index(drop=True)
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    logging.getLogger().setLevel(logging.INFO) # 콘솔은 경고 이상만, 봇의 일자별 로그 파일에는 전부
+    logging.getLogger().handlers[0].setLevel(logging.WARNING)
+    market = sys.argv[1] if len(sys.argv) > 1 else "USD-M"
+    start = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else date.today().replace(day=1)
+    end = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+    result = run_replay(market, start, end)
+    decisions = result['decisions']
+    print(decisions['decision'].value_counts().to_string() if not decisions.empty else "기록된 판단 없음")
+    print(f"{result['cycles']}개 주기, 체결 {len(result['fills'])}건 ({result['elapsed_sec']:.1f}초) -> {result['run_dir']}")
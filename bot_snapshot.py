@@ -0,0 +1,65 @@
+# bot_snapshot.py (봇 최신 지표/조건/판단 스냅샷 공유)
+
+import os, json, time, tempfile
+
+SNAPSHOT_FOLDER = "snapshots"
+
+# 조건 키 -> 표시 이름 (봇 로그의 진입/종료 사유, 대시보드 분석 탭에서 공통 사용)
+CONDITION_LABELS = {
+    'long_entry': {'sma': "SMA 상승", 'rsi': "RSI 상승", 'macd': "MACD 상승", 'bb': "BB하단 위",
+                   'stoch': "스토캐스틱 과매도 탈출", 'stoch_cross': "스토캐스틱 상승교차", 'volume': "거래량 증가"},
+    'short_entry': {'sma': "SMA 하락", 'rsi': "RSI 하락", 'macd': "MACD 하락", 'bb': "BB상단 아래",
+                    'stoch': "스토캐스틱 과매수 탈출", 'stoch_cross': "스토캐스틱 하락교차", 'volume': "거래량 증가"},
+    'long_exit': {'sma': "데드 크로스", 'rsi': "RSI 45 하회", 'macd': "MACD<Signal", 'bb': "종가<BB하단", 'stoch_cross': "스토캐스틱 하락"},
+    'short_exit': {'sma': "골든 크로스", 'rsi': "RSI 55 상회", 'macd': "MACD>Signal", 'bb': "종가>BB상단", 'stoch_cross': "스토캐스틱 상승"},
+}
+
+def get_met_labels(group, checks, details=None):
+    # details: {조건: 라벨 뒤에 붙일 값 문자열} (예: 스토캐스틱 K 값)
+    labels, details = CONDITION_LABELS[group], details or {}
+    return [labels[key] + details.get(key, "") for key, ok in checks.items() if ok]
+
+def get_snapshot_path(market_key):
+    return os.path.join(SNAPSHOT_FOLDER, f"{market_key}_snapshot.json")
+
+def _json_default(value):
+    # numpy 스칼라(bool_, float64 등)와 Timestamp 처리
+    if hasattr(value, 'item'): return value.item()
+    return str(value)
+
+def publish_snapshot(market_key, snapshot):
+    # 임시 파일에 완전히 쓴 뒤 os.replace로 교체 -> 읽는 쪽은 항상 완성된 파일만 본다
+    if not os.path.exists(SNAPSHOT_FOLDER): os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+    data = dict(snapshot, market=market_key, pid=os.getpid(), updated_at=time.time())
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_FOLDER, prefix=f".{market_key}_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, default=_json_default)
+        for attempt in range(5):
+            try:
+                os.replace(tmp_path, get_snapshot_path(market_key)); break
+            except PermissionError: # Windows: 대시보드가 파일을 읽는 중이면 잠시 후 재시도
+                if attempt == 4: raise
+                time.sleep(0.05)
+    finally:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+def load_snapshot(market_key, fresh_only=True):
+    try:
+        with open(get_snapshot_path(market_key), 'r', encoding='utf-8') as f: snapshot = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return None
+    if fresh_only and not is_snapshot_fresh(snapshot): return None
+    return snapshot
+
+def mark_snapshot_stopped(market_key):
+    # 봇 정상 종료 시 호출 -> 대시보드가 바로 직접 계산 모드로 전환
+    snapshot = load_snapshot(market_key, fresh_only=False)
+    if snapshot:
+        snapshot['stopped'] = True
+        publish_snapshot(market_key, snapshot)
+
+def is_snapshot_fresh(snapshot):
+    # 봇은 check_interval 마다 갱신하므로 두 주기 이상 갱신이 없으면 중지된 것으로 본다
+    if snapshot.get('stopped'): return False
+    max_age = snapshot.get('check_interval', 3600) * 2 + 60
+    return time.time() - snapshot.get('updated_at', 0) <= max_age
@@ -0,0 +1,91 @@
+# candle_series.py (봇용 캔들 묶음: klines 응답을 필요한 필드만 연속 float64/int64 배열로 보관)
+#  - DataFrame(12개 object 열) + pd.to_numeric 대신 응답 리스트에서 바로 배열로 변환 (quote_asset_volume/ignore 등은 버린다)
+#  - 지표 열도 이름 -> 배열로 함께 보관, 확정 캔들/이전 캔들은 CandleRow 로 접근 (Series 를 만들지 않고 배열에서 값 하나씩)
+#  - CandleRow 는 Series 처럼 row['close'], row.get(열, 기본값), row.items() 를 지원 -> 봇의 판단 코드는 그대로
+#  - DataFrame 이 필요하면 to_dataframe() 으로 그때 만든다
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+class CandleRow:
+    """CandleSeries 의 캔들 하나 (값 복사 없이 위치만 기억)."""
+    __slots__ = ('series', 'index')
+
+    def __init__(self, series, index):
+        self.series, self.index = series, index
+
+    def __getitem__(self, name):
+        if name == 'timestamp': return pd.Timestamp(int(self.series.open_time[self.index]), unit='ms')
+        return self.series[name][self.index].item()
+
+    def get(self, name, default=None):
+        # Series.get 과 같이 열이 없을 때만 기본값 (값이 NaN 이면 NaN)
+        return self[name] if name == 'timestamp' or name in self.series else default
+
+    def items(self):
+        yield 'timestamp', self['timestamp']
+        for name in self.series.columns: yield name, self[name]
+
+class CandleSeries:
+    """캔들 필드(open_time/open/high/low/close/volume/close_time) + 지표 열(이름 -> 배열)."""
+    __slots__ = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'derived')
+
+    def __init__(self, open_time, open, high, low, close, volume, close_time):
+        self.open_time, self.close_time = open_time, close_time
+        self.open, self.high, self.low, self.close, self.volume = open, high, low, close, volume
+        self.derived = {}
+
+    @classmethod
+    def from_klines(cls, klines):
+        """python-binance klines 응답(문자열 가격 포함 리스트)에서 바로 만든다."""
+        count = len(klines)
+        prices = np.array([k[1:6] for k in klines], dtype=np.float64).reshape(count, len(PRICE_FIELDS)).T.copy() # 필드별 연속 배열
+        return cls(np.fromiter((k[0] for k in klines), np.int64, count), *prices, np.fromiter((k[6] for k in klines), np.int64, count))
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """대시보드 캔들 DataFrame(timestamp/open/high/low/close/volume/close_time)에서 만든다."""
+        open_time = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        return cls(open_time, *(df[field].to_numpy(dtype=np.float64) for field in PRICE_FIELDS), df['close_time'].to_numpy(dtype=np.int64))
+
+    def __len__(self):
+        return len(self.open_time)
+
+    def __contains__(self, name):
+        return name in PRICE_FIELDS or name in ('open_time', 'close_time') or name in self.derived
+
+    def __getitem__(self, name):
+        if name in self.derived: return self.derived[name]
+        if name in self: return getattr(self, name)
+        raise KeyError(name)
+
+    def __setitem__(self, name, values):
+        self.derived[name] = values
+
+    def add_columns(self, columns):
+        self.derived.update(columns)
+        return self
+
+    @property
+    def columns(self):
+        return [*PRICE_FIELDS, 'close_time', *self.derived]
+
+    def row(self, index):
+        return CandleRow(self, index if index >= 0 else len(self) + index)
+
+    def confirmed(self):
+        """마지막 확정 캔들 (봇의 iloc[-2])."""
+        return self.row(-2)
+
+    def previous(self):
+        """확정 캔들 직전 캔들 (iloc[-3])."""
+        return self.row(-3)
+
+    def latest(self):
+        """진행 중 캔들 (iloc[-1])."""
+        return self.row(-1)
+
+    def to_dataframe(self):
+        return pd.DataFrame({'timestamp': pd.to_datetime(self.open_time, unit='ms'), **{name: self[name] for name in self.columns}})
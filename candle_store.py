@@ -0,0 +1,82 @@
+# candle_store.py (로컬 캔들 저장소: 시장/심볼/타임프레임별 확정 캔들을 SQLite에 증분 저장)
+#  - 확정된 캔들은 바뀌지 않으므로 한 번 받은 구간은 다시 요청하지 않는다 (진행 중 캔들은 저장하지 않음)
+#  - 보고서의 COIN-M 손익 USDT 환산처럼 과거 시점 가격이 필요할 때 API 호출 없이 원장에서 읽는다
+
+import os, time, sqlite3, threading
+from contextlib import closing
+import pandas as pd
+
+CANDLE_FOLDER = "candles"
+PAGE_LIMIT = 1000 # klines 한 번에 받을 수 있는 최대 개수
+INTERVAL_MS = {'1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+               '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '1d': 86_400_000}
+CANDLE_COLUMNS = ['market', 'symbol', 'interval', 'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time']
+
+_sync_locks = {}
+_sync_locks_guard = threading.Lock()
+
+def get_store_path(mode):
+    return os.path.join(CANDLE_FOLDER, f"candles_{mode.lower()}.db")
+
+def _connect(mode):
+    if not os.path.exists(CANDLE_FOLDER): os.makedirs(CANDLE_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(get_store_path(mode), timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS candles (
+        market TEXT NOT NULL, symbol TEXT NOT NULL, interval TEXT NOT NULL, open_time INTEGER NOT NULL,
+        open REAL, high REAL, low REAL, close REAL, volume REAL, close_time INTEGER,
+        PRIMARY KEY (market, symbol, interval, open_time))""")
+    return conn
+
+def _fetch_page(client, market, symbol, interval, start_ms, end_ms):
+    if market == "USD-M": return client.futures_klines(symbol=symbol, interval=interval, startTime=start_ms, endTime=end_ms, limit=PAGE_LIMIT)
+    if market == "COIN-M": return client.futures_coin_klines(symbol=symbol, interval=interval, startTime=start_ms, endTime=end_ms, limit=PAGE_LIMIT)
+    return client.get_klines(symbol=symbol, interval=interval, startTime=start_ms, endTime=end_ms, limit=PAGE_LIMIT)
+
+def get_stored_range(mode, market, symbol, interval):
+    with closing(_connect(mode)) as conn, conn:
+        row = conn.execute("SELECT MIN(open_time), MAX(open_time) FROM candles WHERE market=? AND symbol=? AND interval=?",
+                           (market, symbol, interval)).fetchone()
+    return row if row and row[0] is not None else None
+
+def list_stored_series(mode, market):
+    """저장된 (symbol, interval) 별 캔들 수와 구간. 컬럼: symbol, interval, count, first_open_time, last_open_time."""
+    with closing(_connect(mode)) as conn, conn:
+        return pd.read_sql_query("SELECT symbol, interval, COUNT(*) AS count, MIN(open_time) AS first_open_time, MAX(open_time) AS last_open_time "
+                                 "FROM candles WHERE market=? GROUP BY symbol, interval ORDER BY symbol, interval", conn, params=(market,))
+
+def _download(conn, client, market, symbol, interval, start_ms, end_ms):
+    # start_ms ~ end_ms 구간의 확정 캔들을 페이지 단위로 받아 저장 (중간에 실패하면 구간 전체를 롤백 -> 저장소 안에 빈 구간이 생기지 않음)
+    inserted = 0
+    closed_before = int(time.time() * 1000) // INTERVAL_MS[interval] * INTERVAL_MS[interval] # 진행 중 캔들의 시작 시각
+    while start_ms <= end_ms:
+        page = _fetch_page(client, market, symbol, interval, start_ms, end_ms)
+        rows = [(market, symbol, interval, int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]), int(k[6]))
+                for k in page if int(k[0]) < closed_before]
+        if rows: inserted += conn.executemany(f"INSERT OR IGNORE INTO candles VALUES ({', '.join('?' * len(CANDLE_COLUMNS))})", rows).rowcount
+        if len(page) < PAGE_LIMIT: break
+        start_ms = int(page[-1][0]) + INTERVAL_MS[interval]
+    return inserted
+
+def sync_candles(client, mode, market, symbol, interval, start_ms, end_ms=None):
+    """start_ms ~ end_ms(기본: 현재) 구간 중 저장소에 없는 앞/뒤 구간만 받아 저장. 새로 저장된 개수를 반환."""
+    interval_ms = INTERVAL_MS[interval]
+    last_closed_open = int(time.time() * 1000) // interval_ms * interval_ms - interval_ms
+    start_ms = int(start_ms) // interval_ms * interval_ms
+    end_ms = min(int(end_ms) if end_ms is not None else last_closed_open, last_closed_open)
+    if start_ms > end_ms: return 0
+    key = (mode, market, symbol, interval)
+    with _sync_locks_guard: lock = _sync_locks.setdefault(key, threading.Lock())
+    with lock:
+        stored = get_stored_range(mode, market, symbol, interval)
+        with closing(_connect(mode)) as conn, conn:
+            if stored is None: return _download(conn, client, market, symbol, interval, start_ms, end_ms)
+            inserted = 0
+            if start_ms < stored[0]: inserted += _download(conn, client, market, symbol, interval, start_ms, stored[0] - interval_ms)
+            if end_ms > stored[1]: inserted += _download(conn, client, market, symbol, interval, stored[1] + interval_ms, end_ms)
+            return inserted
+
+def query_candles(mode, market, symbol, interval, start_ms, end_ms):
+    with closing(_connect(mode)) as conn, conn:
+        return pd.read_sql_query("SELECT open_time, open, high, low, close, volume, close_time FROM candles "
+                                 "WHERE market=? AND symbol=? AND interval=? AND open_time BETWEEN ? AND ? ORDER BY open_time",
+                                 conn, params=(market, symbol, interval, int(start_ms), int(end_ms)))
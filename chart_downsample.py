@@ -0,0 +1,73 @@
+# chart_downsample.py (장기 차트용 다운샘플링: 로컬 캔들 저장소의 긴 구간을 화면 폭에 맞게 줄여서 그린다)
+#  - 캔들은 화면 폭(막대 수)에 맞춰 연속 구간을 OHLC로 다시 묶는다 (시가=첫 시가, 고가=최고, 저가=최저, 종가=마지막 종가)
+#  - 이동평균 같은 선 지표는 원본 해상도에서 계산한 뒤 LTTB로 모양을 유지하며 점 수만 줄인다
+#  - 원장 체결은 매수/매도 마커로 겹쳐 그린다 (선/마커는 WebGL Scattergl)
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+DEFAULT_MAX_BARS = 1200 # 차트 폭(px)에 해당하는 최대 막대 수
+SMA_LENGTHS = {'SMA 10': (10, 'orange'), 'SMA 50': (50, 'purple')}
+
+def aggregate_ohlc(candles, max_bars=DEFAULT_MAX_BARS):
+    """open_time 순 캔들을 max_bars 개 이하가 되도록 연속 구간 단위로 OHLCV 재집계."""
+    n = len(candles)
+    if n <= max_bars: return candles.reset_index(drop=True)
+    step = -(-n // max_bars) # 올림
+    starts = np.arange(0, n, step)
+    ends = np.r_[starts[1:] - 1, n - 1]
+    return pd.DataFrame({
+        'open_time': candles['open_time'].to_numpy()[starts],
+        'open': candles['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(candles['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(candles['low'].to_numpy(), starts),
+        'close': candles['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(candles['volume'].to_numpy(), starts),
+    })
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: 선의 모양을 최대한 유지하는 threshold 개 점의 인덱스를 반환."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3: return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int) # 첫/마지막 점 사이를 threshold-2 개 구간으로 나눔
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges): next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else: next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def downsample_line(times_ms, values, threshold):
+    # 지표 앞부분의 NaN(계산 구간 부족)은 빼고 줄인다
+    times_ms, values = np.asarray(times_ms), np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    times_ms, values = times_ms[valid], values[valid]
+    idx = lttb(times_ms, values, threshold)
+    return times_ms[idx], values[idx]
+
+def build_history_figure(candles, trades, symbol, timeframe, max_bars=DEFAULT_MAX_BARS):
+    """로컬 저장소 캔들 전체 구간 + 원장 체결로 다운샘플된 차트를 만든다. (그린 막대 수, Figure) 반환."""
+    bars = aggregate_ohlc(candles, max_bars)
+    bar_times = pd.to_datetime(bars['open_time'], unit='ms')
+    fig = go.Figure(data=[go.Candlestick(x=bar_times, open=bars['open'], high=bars['high'], low=bars['low'], close=bars['close'], name=symbol)])
+    for name, (length, color) in SMA_LENGTHS.items():
+        sma = candles['close'].rolling(window=length).mean()
+        line_times, line_values = downsample_line(candles['open_time'].to_numpy(), sma.to_numpy(), max_bars)
+        fig.add_trace(go.Scattergl(x=pd.to_datetime(line_times, unit='ms'), y=line_values, mode='lines', name=name, line=dict(color=color, width=1)))
+    if trades is not None and not trades.empty:
+        for side, symbol_name, color in (("BUY", "triangle-up", "green"), ("SELL", "triangle-down", "red")):
+            fills = trades[trades['side'] == side]
+            if fills.empty: continue
+            hover = [f"{side} {qty} @ {price} | 실현손익: {pnl:.4f}" for qty, price, pnl in zip(fills['qty'], fills['price'], fills['realized_pnl'])]
+            fig.add_trace(go.Scattergl(x=pd.to_datetime(fills['time'], unit='ms'), y=fills['price'], mode='markers', name=f"체결 {side}",
+                                       marker=dict(symbol=symbol_name, color=color, size=9), hovertext=hover, hoverinfo='text+x'))
+    bar_label = f"{timeframe} x{-(-len(candles) // len(bars))}" if len(bars) < len(candles) else timeframe
+    fig.update_layout(title=f'{symbol} History ({bar_label}, {len(candles):,}개 캔들)', yaxis_title='Price', xaxis_rangeslider_visible=False, height=600)
+    return len(bars), fig
@@ -1,34 +1,30 @@
 # coin_m_bot_logic.py (★로그 날짜 자동 변경, ★HTF 필터, ★ATR SL/TP 적용됨)
 
 import os, sys, time, json, logging
-import pandas as pd
-import pandas_ta as ta
+import indicators # [★수정] pandas_ta 대신 자체 지표 모듈
+from candle_series import CandleSeries # [★신규] 배열 기반 캔들 묶음
+import mtf_engine # [★신규] 멀티 타임프레임 엔진
+import strategy_profiles # [★신규] 전략 프로필 (공유 캔들로 여러 설정 평가/실행)
 from binance.client import Client
 from binance.enums import *
 from datetime import datetime
+from bot_snapshot import publish_snapshot, mark_snapshot_stopped, get_met_labels # [★신규] 지표 스냅샷 공유
+import bot_control # [★신규] 상태/제어 엔드포인트
+import exchange_sim # [★신규] 로컬 대역 거래소 주소 전환
+import paper_trading # [★신규] 모의 거래 실행
 import math # [★신규]
 
 # --- 1. 설정 ---
 COIN_M_POSITION_FILE = "coin_m_position.json" # [★신규] 포지션 상태 파일
 
-try:
-    with open('config.json', 'r') as f: config = json.load(f)
-    mode = config.get("mode", "Test")
-    if mode == "Test":
-        api_key = config.get("testnet_api_key"); secret_key = config.get("testnet_secret_key"); is_testnet = True
-    else:
-        api_key = config.get("live_api_key"); secret_key = config.get("live_secret_key"); is_testnet = False
-    
-    # COIN-M 설정 로드
+# [★신규] 전략 설정 로드 (시작 시 + 제어 엔드포인트의 /reload 요청 시)
+def load_strategy_settings(config):
+    global stop_loss_pct, take_profit_pct, quantity, use_sma, use_rsi, use_macd, use_bb, use_stoch, use_stoch_cross, use_volume, min_conditions, min_exit_conditions, rsi_oversold, rsi_overbought, stoch_oversold, stoch_overbought, volume_multiplier, use_volume_atr_columns, use_htf_filter, htf_timeframe, htf_sma_short_len, htf_sma_long_len, use_atr_sl_tp, atr_length, atr_sl_multiplier, atr_tp_multiplier, mtf_settings, profile_settings
     settings = config.get("coin_m_settings", {})
-    leverage = int(settings.get("leverage", 3))
     stop_loss_pct = float(settings.get("stop_loss_pct", 2.0))
     take_profit_pct = float(settings.get("take_profit_pct", 5.0))
     quantity = int(settings.get("quantity", 1))
-    timeframe = settings.get("timeframe", "1h")
-    symbol = settings.get("symbol", "BTCUSD_PERP")
-    margin_type = settings.get("margin_type", "ISOLATED") 
-    
+
     # 지표 설정 로드
     indicator_settings = config.get("indicator_settings", {})
     use_sma = indicator_settings.get("use_sma", True)
@@ -38,15 +34,17 @@ try:
     use_stoch = indicator_settings.get("use_stoch", True)
     use_stoch_cross = indicator_settings.get("use_stoch_cross", True)
     use_volume = indicator_settings.get("use_volume", True)
-    
+
     min_conditions = indicator_settings.get("min_conditions", 7)
     min_exit_conditions = indicator_settings.get("min_exit_conditions", 3) 
-    
+
     rsi_oversold = indicator_settings.get("rsi_oversold", 30)
     rsi_overbought = indicator_settings.get("rsi_overbought", 70)
     stoch_oversold = indicator_settings.get("stoch_oversold", 20)
     stoch_overbought = indicator_settings.get("stoch_overbought", 80)
     volume_multiplier = indicator_settings.get("volume_multiplier", 1.2)
+    # [★신규] 거래량 SMA / ATR 을 지표 모듈이 만든 열에서 읽기 (기본 꺼짐: 예전처럼 현재 거래량 / 0 으로 대체 -> 거래량 조건 미충족, 고정 % SL/TP)
+    use_volume_atr_columns = indicator_settings.get("use_volume_atr_columns", False)
 
     # [★신규] HTF (상위 타임프레임) 필터 설정
     htf_settings = config.get("htf_settings", {})
@@ -62,11 +60,38 @@ try:
     atr_sl_multiplier = atr_settings.get("atr_sl_multiplier", 2.0)
     atr_tp_multiplier = atr_settings.get("atr_tp_multiplier", 3.0)
 
+    # [★신규] 멀티 타임프레임 엔진 (기준 캔들에서 상위 타임프레임을 이어 만듦, 타임프레임 합류 규칙)
+    mtf_settings = mtf_engine.load_mtf_settings(config)
+
+    # [★신규] 전략 프로필 (적지 않은 값은 위 봇 설정 그대로)
+    profile_settings = strategy_profiles.load_profiles(config, "COIN-M", {'stop_loss_pct': stop_loss_pct, 'take_profit_pct': take_profit_pct, 'quantity': quantity})
+
+try:
+    with open('config.json', 'r') as f: config = json.load(f)
+    mode = config.get("mode", "Test")
+    if mode == "Test":
+        api_key = config.get("testnet_api_key"); secret_key = config.get("testnet_secret_key"); is_testnet = True
+    elif mode == "Paper": # [★신규] 모의 거래: 시세는 실거래소 공개 API, 주문/잔고는 로컬 매칭 엔진 (API 키 불필요)
+        api_key = secret_key = "paper"; is_testnet = False
+    else:
+        api_key = config.get("live_api_key"); secret_key = config.get("live_secret_key"); is_testnet = False
+    
+    # COIN-M 설정 로드
+    settings = config.get("coin_m_settings", {})
+    leverage = int(settings.get("leverage", 3))
+    timeframe = settings.get("timeframe", "1h")
+    symbol = settings.get("symbol", "BTCUSD_PERP")
+    margin_type = settings.get("margin_type", "ISOLATED") 
+    
+    load_strategy_settings(config)
+
     if not api_key or not secret_key:
         print(f"오류: [ {mode} ] API 키 필요."); exit()
 except FileNotFoundError: print("오류: config.json 파일 없음."); exit()
 
+exchange_sim.apply_exchange_endpoint(config) # [★신규] exchange_endpoint 설정 시 로컬 대역 거래소로 접속
 client = Client(api_key, secret_key, testnet=is_testnet)
+if mode == "Paper": paper_trading.enable_paper_trading(client, config) # [★신규]
 short_sma_len, long_sma_len, rsi_len, bbands_len = 10, 50, 14, 20
 macd_fast, macd_slow, macd_signal = 12, 26, 9
 
@@ -106,23 +131,19 @@ def get_market_data(symbol, timeframe, limit=200):
     # logging.info(f"[COIN-M] {symbol} {timeframe} 데이터 가져옵니다...")
     try:
         klines = client.futures_coin_klines(symbol=symbol, interval=timeframe, limit=limit)
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in numeric_cols: df[col] = pd.to_numeric(df[col])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        return CandleSeries.from_klines(klines) # [★수정] DataFrame 대신 필요한 필드만 배열로
     except Exception as e:
         logging.error(f"[COIN-M] *** {timeframe} 데이터 가져오기 실패: {e} ***")
         return None
 
-def calculate_indicators(df):
-    df.ta.sma(length=short_sma_len, append=True); df.ta.sma(length=long_sma_len, append=True)
-    df.ta.rsi(length=rsi_len, append=True); df.ta.bbands(length=bbands_len, append=True)
-    df.ta.macd(fast=macd_fast, slow=macd_slow, signal=macd_signal, append=True)
-    df.ta.stoch(high='high', low='low', close='close', k=14, d=3, append=True)
-    df.ta.sma(length=20, close='volume', append=True)
-    df.ta.atr(length=atr_length, append=True) # [★신규] ATR 계산
-    return df
+def get_indicator_params():
+    return {'short_sma_len': short_sma_len, 'long_sma_len': long_sma_len, 'rsi_len': rsi_len, 'bbands_len': bbands_len,
+            'macd_fast': macd_fast, 'macd_slow': macd_slow, 'macd_signal': macd_signal, 'atr_length': atr_length,
+            'use_volume_atr_columns': use_volume_atr_columns}
+
+def calculate_indicators(candles):
+    # [★수정] pandas_ta 대신 indicators 모듈 (배열에서 계산해 지표 열로 보관)
+    return candles.add_columns(indicators.compute_indicator_columns(candles.high, candles.low, candles.close, candles.volume, get_indicator_params()))
 
 def place_order(symbol, side, quantity, order_type=ORDER_TYPE_MARKET, stop_price=None):
     try:
@@ -181,15 +202,15 @@ def clear_position():
 # [★신규] 상위 타임프레임(HTF) 추세 확인 함수
 def get_htf_trend(symbol, htf_timeframe, htf_short, htf_long):
     logging.info(f"[COIN-M] {htf_timeframe} 상위 추세 확인 중...")
-    df_htf = get_market_data(symbol, htf_timeframe, limit=100) # HTF 데이터 가져오기
-    if df_htf is None or len(df_htf) < htf_long:
+    candles_htf = get_market_data(symbol, htf_timeframe, limit=100) # HTF 데이터 가져오기
+    if candles_htf is None or len(candles_htf) < htf_long:
         logging.warning(f"[COIN-M] {htf_timeframe} 데이터 부족. 추세 필터 비활성.")
         return "NEUTRAL"
         
-    df_htf.ta.sma(length=htf_short, append=True)
-    df_htf.ta.sma(length=htf_long, append=True)
+    candles_htf[f'SMA_{htf_short}'] = indicators.sma(candles_htf.close, htf_short)
+    candles_htf[f'SMA_{htf_long}'] = indicators.sma(candles_htf.close, htf_long)
     
-    htf_latest = df_htf.iloc[-2] # 확정 캔들
+    htf_latest = candles_htf.confirmed() # 확정 캔들
     htf_sma_short_val = htf_latest.get(f'SMA_{htf_short}', 0)
     htf_sma_long_val = htf_latest.get(f'SMA_{htf_long}', 0)
 
@@ -200,6 +221,77 @@ def get_htf_trend(symbol, htf_timeframe, htf_short, htf_long):
     else:
         return "NEUTRAL"
 
+# [★신규] 멀티 타임프레임 엔진 갱신: 방금 받은 기준 캔들로 상위 타임프레임을 이어 만들고, 씨앗이 필요한 타임프레임만 따로 조회
+mtf = None
+def update_mtf_engine(symbol, candles):
+    global mtf
+    timeframes = [*mtf_settings['timeframes'], *mtf_settings['min_conditions'], *([htf_timeframe] if use_htf_filter else [])]
+    if mtf is None or not mtf.matches(timeframe, timeframes, get_indicator_params(), mtf_settings['history']):
+        mtf = mtf_engine.MultiTimeframeEngine(timeframe, timeframes, get_indicator_params(), mtf_settings['history'])
+        if mtf.skipped: logging.warning(f"[COIN-M] {timeframe} 캔들로 만들 수 없는 타임프레임 제외: {', '.join(mtf.skipped)}")
+    mtf.update(candles)
+    for interval in mtf.needs_seed():
+        logging.info(f"[COIN-M] {interval} 캔들 초기화 (멀티 타임프레임 엔진)")
+        mtf.seed(interval, get_market_data(symbol, interval, limit=mtf.history))
+    return mtf
+
+# [★신규] 전략 프로필: 이번 주기 캔들/지표를 그대로 넘겨 프로필마다 판단/실행 (결과는 스냅샷에 포함)
+profile_host = None
+def run_strategy_profiles(candles, current_price, price_decimals, engine=None, htf_trend=None):
+    global profile_host
+    if not profile_settings: return None
+    if profile_host is None or not profile_host.matches(profile_settings, get_indicator_params()):
+        profile_host = strategy_profiles.ProfileHost(config, "COIN-M", symbol, get_indicator_params(), profile_settings, client, price_decimals, leverage=leverage, margin_type=margin_type)
+    if engine is None and mtf_settings['enabled']: engine = update_mtf_engine(symbol, candles)
+    def get_trend(interval, short_len, long_len):
+        if engine and interval in engine.timeframes: return engine.trend(interval, short_len, long_len)
+        return get_htf_trend(symbol, interval, short_len, long_len)
+    known = {(htf_timeframe, htf_sma_short_len, htf_sma_long_len): htf_trend} if htf_trend else None # 봇이 이미 확인한 추세는 다시 조회하지 않음
+    return profile_host.run_cycle(candles, current_price, int(time.time() * 1000), get_trend, known)
+
+# [★신규] 최근 사이클의 지표/조건/판단을 대시보드와 공유
+SNAPSHOT_KEY = "coin_m"
+def publish_cycle_snapshot(candles, latest, current_price, checks, decision, check_interval, htf_trend=None, position=None, mtf=None, profiles=None):
+    try:
+        bb_cols = [col for col in candles.columns if col.startswith('BB')]
+        volume_sma_col, atr_col = indicators.bot_column_names(get_indicator_params())
+        publish_snapshot(SNAPSHOT_KEY, {
+            'symbol': symbol, 'timeframe': timeframe, 'mode': mode,
+            'check_interval': check_interval,
+            'candle_time': str(latest['timestamp']), 'current_price': current_price,
+            'indicators': {col: val for col, val in latest.items() if col not in ('timestamp', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore')},
+            'columns': {'sma_short': f'SMA_{short_sma_len}', 'sma_long': f'SMA_{long_sma_len}', 'rsi': f'RSI_{rsi_len}',
+                        'macd': f'MACD_{macd_fast}_{macd_slow}_{macd_signal}', 'macd_signal': f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}',
+                        'bbl': next((c for c in bb_cols if 'BBL' in c), None), 'bbu': next((c for c in bb_cols if 'BBU' in c), None),
+                        'stoch_k': 'STOCHk_14_3_3', 'stoch_d': 'STOCHd_14_3_3', 'volume_sma': volume_sma_col, 'atr': atr_col},
+            'params': get_indicator_params(),
+            'settings': {'min_conditions': min_conditions, 'min_exit_conditions': min_exit_conditions,
+                         'rsi_oversold': rsi_oversold, 'rsi_overbought': rsi_overbought, 'stoch_oversold': stoch_oversold,
+                         'stoch_overbought': stoch_overbought, 'volume_multiplier': volume_multiplier,
+                         'use_htf_filter': use_htf_filter, 'htf_timeframe': htf_timeframe},
+            'checks': checks, 'decision': decision, 'htf_trend': htf_trend, 'mtf': mtf, 'profiles': profiles, 'position': position,
+        })
+    except Exception as e:
+        logging.error(f"[COIN-M] 스냅샷 저장 실패: {e}")
+
+# [★신규] 제어 엔드포인트 /reload: config.json을 다시 읽어 전략 설정만 교체
+def reload_settings():
+    try:
+        with open('config.json', 'r') as f: new_config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logging.error(f"[COIN-M] 설정 다시 읽기 실패: {e}"); return
+    new_settings = new_config.get("coin_m_settings", {})
+    if new_config.get("mode", "Test") != mode or any(new_settings.get(k, v) != v for k, v in {'symbol': symbol, 'timeframe': timeframe, 'margin_type': margin_type}.items()) or int(new_settings.get("leverage", leverage)) != leverage:
+        logging.warning("[COIN-M] 모드/심볼/타임프레임/레버리지/마진 변경은 봇을 재시작해야 적용됩니다.")
+    load_strategy_settings(new_config)
+    logging.info(f"[COIN-M] 설정 다시 읽기 완료 - 최소 조건: {min_conditions}, HTF: {use_htf_filter}({htf_timeframe}), ATR SL/TP: {use_atr_sl_tp}")
+
+# [★신규] 주기 종료: 상태 엔드포인트 갱신 후 다음 주기까지 대기 (중지/재로딩 요청 시 즉시 깨어남)
+def finish_cycle(cycle_started, wait_seconds):
+    position = load_position()
+    bot_control.report_cycle(cycle_started, position=position, pending_orders=bot_control.get_tracked_orders(position)) # [★수정] 주기마다 대기 주문 조회 안 함
+    bot_control.wait_for_next_cycle(wait_seconds)
+
 # [★신규] 가격 정밀도(소수점) 계산
 def get_price_precision(symbol):
     try:
@@ -214,6 +306,7 @@ def get_price_precision(symbol):
 # --- 4. 메인 로직 (★HTF/ATR 적용으로 전면 수정됨) ---
 def run_bot():
     ensure_correct_log_file(LOG_FILE_BASE)
+    bot_control.start_control_server(SNAPSHOT_KEY, config) # [★신규]
     
     logging.info(f"COIN-M 봇을 [ {mode} ] 모드로 시작합니다...")
     logging.info(f"설정 - 심볼: {symbol}, 마진:{margin_type}, 레버리지:{leverage}, 수량:{quantity}(계약), 타임프레임: {timeframe}")
@@ -244,9 +337,12 @@ def run_bot():
     logging.info(f"[COIN-M] {symbol} 가격 정밀도: {price_decimals} 소수점")
 
     check_interval = {'15m': 900, '1h': 3600, '4h': 14400}.get(timeframe, 3600)
+    bot_control.update_status(health='running', symbol=symbol, timeframe=timeframe, mode=mode, check_interval=check_interval)
 
     try:
-        while True:
+        while not bot_control.stop_requested(): # [★수정] 대시보드의 /stop 요청 시 현재 주기를 마치고 종료
+            cycle_started = time.time()
+            if bot_control.consume_reload_request(): reload_settings()
             try:
                 ensure_correct_log_file(LOG_FILE_BASE)
                 
@@ -290,46 +386,47 @@ def run_bot():
                     logging.info(f"포지션: {current_position_amt} {symbol} @ {entry_price:.{price_decimals}f}")
                     logging.info(f"타겟: SL={sl_target:.{price_decimals}f}, TP={tp_target:.{price_decimals}f}, 현재가={current_price:.{price_decimals}f}")
 
-                    df = get_market_data(symbol, timeframe); 
-                    if df is None: time.sleep(check_interval); continue
-                    df = calculate_indicators(df); 
-                    if len(df) < 4: time.sleep(check_interval); continue
+                    candles = get_market_data(symbol, timeframe); 
+                    if candles is None: finish_cycle(cycle_started, check_interval); continue
+                    candles = calculate_indicators(candles); 
+                    if len(candles) < 4: finish_cycle(cycle_started, check_interval); continue
                     
-                    latest = df.iloc[-2]; prev = df.iloc[-3]
+                    latest = candles.confirmed(); prev = candles.previous()
                     
                     # --- 지표 값 로드 ---
-                    sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in df.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'
+                    sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in candles.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'
                     latest_sma_short = latest.get(sma_short_col, 0); latest_sma_long = latest.get(sma_long_col, 0); latest_rsi = latest.get(rsi_col, 50); latest_macd = latest.get(macd_col, 0); latest_macd_signal_val = latest.get(macd_signal_col, 0); latest_bbl = latest.get(bbl_col, 0); latest_bbu = latest.get(bbu_col, 0); latest_stoch_k = latest.get(stoch_k_col, 50); latest_stoch_d = latest.get(stoch_d_col, 50); latest_close = latest['close']
                     prev_sma_short = prev.get(sma_short_col, 0); prev_sma_long = prev.get(sma_long_col, 0); prev_rsi = prev.get(rsi_col, 50); prev_macd = prev.get(macd_col, 0); prev_macd_signal_val = prev.get(macd_signal_col, 0); prev_bbl = prev.get(bbl_col, 0); prev_bbu = prev.get(bbu_col, 0); prev_stoch_k = prev.get(stoch_k_col, 50); prev_stoch_d = prev.get(stoch_d_col, 50); prev_close = prev['close']
                     
                     sell_reason = None
+                    exit_checks = {} # [★신규] 조건별 결과 (스냅샷 공유용)
                     
                     if current_position_amt > 0: # 롱 포지션 종료 검사
                         if current_price >= tp_target: sell_reason = f"익절(TP) 도달"
                         elif current_price <= sl_target: sell_reason = f"손절(SL) 도달"
                         else:
-                            long_exit_conditions_met = []; long_exit_reasons = []
-                            if use_sma and (prev_sma_short >= prev_sma_long) and (latest_sma_short < latest_sma_long): long_exit_conditions_met.append(True); long_exit_reasons.append(f"데드 크로스")
-                            if use_rsi and (prev_rsi >= 45) and (latest_rsi < 45): long_exit_conditions_met.append(True); long_exit_reasons.append(f"RSI 45 하회")
-                            if use_macd and (prev_macd >= prev_macd_signal_val) and (latest_macd < latest_macd_signal_val): long_exit_conditions_met.append(True); long_exit_reasons.append("MACD<Signal")
-                            if use_bb and (prev_close >= prev_bbl) and (latest_close < prev_bbl): long_exit_conditions_met.append(True); long_exit_reasons.append("종가<BB하단")
-                            if use_stoch_cross and (prev_stoch_k >= prev_stoch_d) and (latest_stoch_k < latest_stoch_d): long_exit_conditions_met.append(True); long_exit_reasons.append("스토캐스틱 하락")
+                            if use_sma: exit_checks['sma'] = (prev_sma_short >= prev_sma_long) and (latest_sma_short < latest_sma_long)
+                            if use_rsi: exit_checks['rsi'] = (prev_rsi >= 45) and (latest_rsi < 45)
+                            if use_macd: exit_checks['macd'] = (prev_macd >= prev_macd_signal_val) and (latest_macd < latest_macd_signal_val)
+                            if use_bb: exit_checks['bb'] = (prev_close >= prev_bbl) and (latest_close < prev_bbl)
+                            if use_stoch_cross: exit_checks['stoch_cross'] = (prev_stoch_k >= prev_stoch_d) and (latest_stoch_k < latest_stoch_d)
+                            long_exit_reasons = get_met_labels('long_exit', exit_checks)
                             
-                            if len(long_exit_conditions_met) >= min_exit_conditions:
+                            if len(long_exit_reasons) >= min_exit_conditions:
                                 sell_reason = f"전략 종료 신호 ({', '.join(long_exit_reasons)})"
                                 
                     elif current_position_amt < 0: # 숏 포지션 종료 검사
                         if current_price <= tp_target: sell_reason = f"익절(TP) 도달"
                         elif current_price >= sl_target: sell_reason = f"손절(SL) 도달"
                         else:
-                            short_exit_conditions_met = []; short_exit_reasons = []
-                            if use_sma and (prev_sma_short <= prev_sma_long) and (latest_sma_short > latest_sma_long): short_exit_conditions_met.append(True); short_exit_reasons.append(f"골든 크로스")
-                            if use_rsi and (prev_rsi <= 55) and (latest_rsi > 55): short_exit_conditions_met.append(True); short_exit_reasons.append(f"RSI 55 상회")
-                            if use_macd and (prev_macd <= prev_macd_signal_val) and (latest_macd > latest_macd_signal_val): short_exit_conditions_met.append(True); short_exit_reasons.append("MACD>Signal")
-                            if use_bb and (prev_close <= prev_bbu) and (latest_close > prev_bbu): short_exit_conditions_met.append(True); short_exit_reasons.append("종가>BB상단")
-                            if use_stoch_cross and (prev_stoch_k <= prev_stoch_d) and (latest_stoch_k > latest_stoch_d): short_exit_conditions_met.append(True); short_exit_reasons.append("스토캐스틱 상승")
+                            if use_sma: exit_checks['sma'] = (prev_sma_short <= prev_sma_long) and (latest_sma_short > latest_sma_long)
+                            if use_rsi: exit_checks['rsi'] = (prev_rsi <= 55) and (latest_rsi > 55)
+                            if use_macd: exit_checks['macd'] = (prev_macd <= prev_macd_signal_val) and (latest_macd > latest_macd_signal_val)
+                            if use_bb: exit_checks['bb'] = (prev_close <= prev_bbu) and (latest_close > prev_bbu)
+                            if use_stoch_cross: exit_checks['stoch_cross'] = (prev_stoch_k <= prev_stoch_d) and (latest_stoch_k > latest_stoch_d)
+                            short_exit_reasons = get_met_labels('short_exit', exit_checks)
                             
-                            if len(short_exit_conditions_met) >= min_exit_conditions:
+                            if len(short_exit_reasons) >= min_exit_conditions:
                                 sell_reason = f"전략 종료 신호 ({', '.join(short_exit_reasons)})"
                     
                     if sell_reason:
@@ -339,26 +436,36 @@ def run_bot():
                         place_order(symbol, side, abs(current_position_amt))
                         clear_position()
 
+                    profiles = run_strategy_profiles(candles, current_price, price_decimals) # [★신규] 전략 프로필 (봇 판단 후 같은 캔들로)
+                    publish_cycle_snapshot(candles, latest, current_price, {'long_exit' if current_position_amt > 0 else 'short_exit': exit_checks}, sell_reason or "HOLD", check_interval,
+                                           position={'amount': current_position_amt, 'entry_price': entry_price, 'sl_target': sl_target, 'tp_target': tp_target}, profiles=profiles)
+
                 # --- [B] 포지션 미보유 (진입 검사) ---
                 elif position_data is None and current_position_amt == 0:
                     logging.info(f"포지션 없음. 진입 신호 확인 중...")
                     
                     # [★신규] HTF 추세 확인
                     htf_trend = "NEUTRAL"
-                    if use_htf_filter:
+                    if use_htf_filter and not mtf_settings['enabled']:
                         htf_trend = get_htf_trend(symbol, htf_timeframe, htf_sma_short_len, htf_sma_long_len)
                         logging.info(f"[COIN-M] {htf_timeframe} 상위 추세: {htf_trend}")
 
-                    df = get_market_data(symbol, timeframe); 
-                    if df is None: time.sleep(check_interval); continue
-                    df = calculate_indicators(df); 
-                    if len(df) < 4: time.sleep(check_interval); continue
+                    candles = get_market_data(symbol, timeframe); 
+                    if candles is None: finish_cycle(cycle_started, check_interval); continue
+                    candles = calculate_indicators(candles); 
+                    if len(candles) < 4: finish_cycle(cycle_started, check_interval); continue
+                    # [★신규] 멀티 타임프레임 엔진: 상위 추세를 따로 조회하지 않고 기준 캔들에서 이어 만든 캔들로 판정
+                    engine = update_mtf_engine(symbol, candles) if mtf_settings['enabled'] else None
+                    if engine and use_htf_filter:
+                        htf_trend = engine.trend(htf_timeframe, htf_sma_short_len, htf_sma_long_len)
+                        logging.info(f"[COIN-M] {htf_timeframe} 상위 추세: {htf_trend}")
                     
-                    latest = df.iloc[-2]; prev = df.iloc[-3]
-                    latest_atr = latest.get(f'ATR_{atr_length}', 0.0)
+                    latest = candles.confirmed(); prev = candles.previous()
+                    volume_sma_col, atr_col = indicators.bot_column_names(get_indicator_params()) # [★수정] 기본은 예전 열 이름 (대체값)
+                    latest_atr = latest.get(atr_col, 0.0)
                     
                     # --- 지표 값 로드 ---
-                    sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in df.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'; volume_sma_col = 'SMA_20_volume'
+                    sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in candles.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'
                     latest_close = latest['close']; latest_sma_short = latest.get(sma_short_col, latest_close); latest_sma_long = latest.get(sma_long_col, latest_close); latest_rsi = latest.get(rsi_col, 50); latest_macd = latest.get(macd_col, 0); latest_macd_signal_val = latest.get(macd_signal_col, 0); latest_bbl = latest.get(bbl_col, latest_close) if bbl_col else latest_close; latest_bbu = latest.get(bbu_col, latest_close) if bbu_col else latest_close; latest_stoch_k = latest.get(stoch_k_col, 50); latest_stoch_d = latest.get(stoch_d_col, 50); latest_current_volume = latest['volume']; latest_volume_sma = latest.get(volume_sma_col, latest_current_volume)
                     prev_close = prev['close']; prev_sma_short = prev.get(sma_short_col, latest_close); prev_sma_long = prev.get(sma_long_col, latest_close); prev_rsi = prev.get(rsi_col, 50); prev_macd = prev.get(macd_col, 0); prev_macd_signal_val = prev.get(macd_signal_col, 0); prev_stoch_k = prev.get(stoch_k_col, 50); prev_stoch_d = prev.get(stoch_d_col, 50); prev_bbl = prev.get(bbl_col, prev_close) if bbl_col else prev_close; prev_bbu = prev.get(bbu_col, prev_close) if bbu_col else prev_close
 
@@ -366,65 +473,77 @@ def run_bot():
                     logging.info(f"스토캐스틱 K: {latest_stoch_k:.2f}, D: {latest_stoch_d:.2f}")
 
                     # --- 롱 포지션 진입 조건 검사 ---
-                    long_conditions_met = []; long_entry_reasons = []
+                    long_checks = {}
                     if use_sma:
                         is_gc_event = (prev_sma_short <= prev_sma_long) and (latest_sma_short > latest_sma_long)
                         is_gc_state = latest_sma_short > latest_sma_long
-                        if is_gc_event or is_gc_state: long_conditions_met.append(True); long_entry_reasons.append(f"SMA 상승")
+                        long_checks['sma'] = is_gc_event or is_gc_state
                     if use_rsi:
                         is_rsi_rising = latest_rsi > prev_rsi
                         is_rsi_ok_long = latest_rsi < rsi_overbought and is_rsi_rising
-                        if is_rsi_ok_long: long_conditions_met.append(True); long_entry_reasons.append(f"RSI 상승")
+                        long_checks['rsi'] = is_rsi_ok_long
                     if use_macd:
                         is_macd_event = (prev_macd <= prev_macd_signal_val) and (latest_macd > latest_macd_signal_val)
                         is_macd_state = latest_macd > latest_macd_signal_val
-                        if is_macd_event or is_macd_state: long_conditions_met.append(True); long_entry_reasons.append(f"MACD 상승")
+                        long_checks['macd'] = is_macd_event or is_macd_state
                     if use_bb:
                         is_bb_cross = (prev_close <= prev_bbl) and (latest_close > latest_bbl)
                         is_bb_ok_long = latest_close > latest_bbl
-                        if is_bb_cross or is_bb_ok_long: long_conditions_met.append(True); long_entry_reasons.append(f"BB하단 위")
+                        long_checks['bb'] = is_bb_cross or is_bb_ok_long
                     if use_stoch:
                         is_stoch_exit_oversold = (prev_stoch_k < stoch_oversold) and (latest_stoch_k > stoch_oversold)
-                        if is_stoch_exit_oversold: long_conditions_met.append(True); long_entry_reasons.append(f"스토캐스틱 과매도 탈출")
+                        long_checks['stoch'] = is_stoch_exit_oversold
                     if use_stoch_cross:
                         is_stoch_bullish_event = (prev_stoch_k <= prev_stoch_d) and (latest_stoch_k > latest_stoch_d)
-                        if is_stoch_bullish_event: long_conditions_met.append(True); long_entry_reasons.append("스토캐스틱 상승교차")
+                        long_checks['stoch_cross'] = is_stoch_bullish_event
                     if use_volume:
                         is_volume_high = latest_current_volume > latest_volume_sma * volume_multiplier
-                        if is_volume_high: long_conditions_met.append(True); long_entry_reasons.append(f"거래량 증가")
-                    long_entry = len(long_conditions_met) >= min_conditions
+                        long_checks['volume'] = is_volume_high
+                    long_entry_reasons = get_met_labels('long_entry', long_checks)
+                    long_entry = len(long_entry_reasons) >= min_conditions
                     
                     # --- 숏 포지션 진입 조건 검사 ---
-                    short_conditions_met = []; short_entry_reasons = []
+                    short_checks = {}
                     if use_sma:
                         is_dc_event = (prev_sma_short >= prev_sma_long) and (latest_sma_short < latest_sma_long)
                         is_dc_state = latest_sma_short < latest_sma_long
-                        if is_dc_event or is_dc_state: short_conditions_met.append(True); short_entry_reasons.append(f"SMA 하락")
+                        short_checks['sma'] = is_dc_event or is_dc_state
                     if use_rsi:
                         is_rsi_falling = latest_rsi < prev_rsi
                         is_rsi_ok_short = latest_rsi > rsi_oversold and is_rsi_falling
-                        if is_rsi_ok_short: short_conditions_met.append(True); short_entry_reasons.append(f"RSI 하락")
+                        short_checks['rsi'] = is_rsi_ok_short
                     if use_macd:
                         is_macd_event = (prev_macd >= prev_macd_signal_val) and (latest_macd < latest_macd_signal_val)
                         is_macd_state = latest_macd < latest_macd_signal_val
-                        if is_macd_event or is_macd_state: short_conditions_met.append(True); short_entry_reasons.append(f"MACD 하락")
+                        short_checks['macd'] = is_macd_event or is_macd_state
                     if use_bb:
                         is_bb_cross = (prev_close >= prev_bbu) and (latest_close < latest_bbu)
                         is_bb_ok_short = latest_close < latest_bbu
-                        if is_bb_cross or is_bb_ok_short: short_conditions_met.append(True); short_entry_reasons.append(f"BB상단 아래")
+                        short_checks['bb'] = is_bb_cross or is_bb_ok_short
                     if use_stoch:
                         is_stoch_exit_overbought = (prev_stoch_k > stoch_overbought) and (latest_stoch_k < stoch_overbought)
-                        if is_stoch_exit_overbought: short_conditions_met.append(True); short_entry_reasons.append(f"스토캐스틱 과매수 탈출")
+                        short_checks['stoch'] = is_stoch_exit_overbought
                     if use_stoch_cross:
                         is_stoch_bearish_event = (prev_stoch_k >= prev_stoch_d) and (latest_stoch_k < latest_stoch_d)
-                        if is_stoch_bearish_event: short_conditions_met.append(True); short_entry_reasons.append("스토캐스틱 하락교차")
+                        short_checks['stoch_cross'] = is_stoch_bearish_event
                     if use_volume:
                         is_volume_high_short = latest_current_volume > latest_volume_sma * volume_multiplier
-                        if is_volume_high_short: short_conditions_met.append(True); short_entry_reasons.append(f"거래량 증가")
-                    short_entry = len(short_conditions_met) >= min_conditions
+                        short_checks['volume'] = is_volume_high_short
+                    short_entry_reasons = get_met_labels('short_entry', short_checks)
+                    short_entry = len(short_entry_reasons) >= min_conditions
+
+                    # [★신규] 타임프레임 합류 규칙 (mtf_settings.min_conditions: {타임프레임: 최소 충족 조건 수})
+                    confluence, mtf_blocked = None, False
+                    if engine and mtf_settings['min_conditions']:
+                        confluence = engine.confluence(mtf_settings['entry_settings'], mtf_settings['min_conditions'])
+                        logging.info(f"[COIN-M] 타임프레임 합류 - 롱: {confluence['long']}, 숏: {confluence['short']} {confluence['detail']}")
+                        mtf_blocked = (long_entry and not confluence['long']) or (short_entry and not confluence['short'])
+                        long_entry, short_entry = long_entry and confluence['long'], short_entry and confluence['short']
 
                     # --- 주문 로직 ---
+                    decision = "WAIT"
                     if long_entry and (not use_htf_filter or (use_htf_filter and htf_trend == "UP")):
+                        decision = "LONG_ENTRY"
                         logging.info("[COIN-M] >>> [롱 포지션 진입 신호] <<<")
                         logging.info(f"진입 사유: {', '.join(long_entry_reasons)}")
                         order = place_order(symbol, SIDE_BUY, quantity)
@@ -444,6 +563,7 @@ def run_bot():
                             place_order(symbol, SIDE_SELL, quantity, 'STOP_MARKET', stop_price=sl_target)
 
                     elif short_entry and (not use_htf_filter or (use_htf_filter and htf_trend == "DOWN")):
+                        decision = "SHORT_ENTRY"
                         logging.info("[COIN-M] >>> [숏 포지션 진입 신호] <<<")
                         logging.info(f"진입 사유: {', '.join(short_entry_reasons)}")
                         order = place_order(symbol, SIDE_SELL, quantity)
@@ -462,11 +582,30 @@ def run_bot():
                             save_position(entry, quantity, sl_target, tp_target)
                             place_order(symbol, SIDE_BUY, quantity, 'STOP_MARKET', stop_price=sl_target)
 
+                    elif long_entry or short_entry:
+                        decision = "BLOCKED_BY_HTF"
+                    elif mtf_blocked:
+                        decision = "BLOCKED_BY_MTF"
+
+                    profiles = run_strategy_profiles(candles, current_price, price_decimals, engine, htf_trend if use_htf_filter else None) # [★신규]
+                    publish_cycle_snapshot(candles, latest, current_price, {'long_entry': long_checks, 'short_entry': short_checks}, decision, check_interval, htf_trend=htf_trend, mtf=confluence, profiles=profiles)
+
+                # --- [C] 포지션 정보 불일치 (파일 저장 실패 등): 봇 판단은 건너뛰고 전략 프로필만 실행 ---
+                else:
+                    logging.warning("[COIN-M] 포지션 파일과 브로커 포지션이 맞지 않아 이번 주기 봇 판단을 건너뜁니다.")
+                    if profile_settings:
+                        candles = get_market_data(symbol, timeframe)
+                        if candles is not None: candles = calculate_indicators(candles)
+                        if candles is not None and len(candles) >= 4:
+                            run_strategy_profiles(candles, current_price, price_decimals)
+                        else: logging.warning("[COIN-M] 캔들 데이터가 없어 전략 프로필도 건너뜁니다.")
+
             except Exception as e:
                 logging.error(f"[COIN-M] *** 메인 루프 내에서 에러 발생: {e} ***")
+                bot_control.update_status(last_error=f"{datetime.now():%Y-%m-%d %H:%M:%S} {e}")
             
             logging.info(f"다음 확인까지 {check_interval}초 대기합니다...")
-            time.sleep(check_interval)
+            finish_cycle(cycle_started, check_interval)
             
     except KeyboardInterrupt: logging.info("\n[COIN-M] 종료 신호 감지.")
     finally:
@@ -475,6 +614,8 @@ def run_bot():
         current_pos, _, _ = get_position_with_pnl(symbol) 
         if current_pos != 0:
              cancel_all_open_orders(symbol)
+        try: mark_snapshot_stopped(SNAPSHOT_KEY)
+        except Exception as e: logging.error(f"[COIN-M] 스냅샷 종료 표시 실패: {e}")
         logging.info("[COIN-M] 안전 종료 완료.")
 
 if __name__ == '__main__':
@@ -0,0 +1,595 @@
+# exchange_sim.py (로컬 바이낸스 대역 거래소: 네트워크 없이 봇/대시보드 전체를 돌리고 부하/성능을 측정하기 위한 Spot/USD-M/COIN-M REST 서버)
+#  - 시세: 로컬 캔들 저장소(candle_store)에 기록된 캔들을 가상 시각에 맞춰 재생
+#          (진행 중 캔들은 기본 타임프레임(base_interval)의 확정 캔들로 합성 -> 미래 가격이 새지 않음)
+#  - 주문: MARKET 은 현재가로 즉시 체결, STOP_MARKET 은 기본 타임프레임 캔들이 스톱가에 닿는 순간 체결 (같은 입력이면 항상 같은 결과)
+#  - 지연/에러/가중치 한도/시작 시각/재생 속도는 config.json 의 "exchange_sim" 설정으로 조절
+#  실행: python exchange_sim.py
+#        -> config.json 에 "exchange_endpoint": "http://127.0.0.1:8780" 를 넣으면 봇/대시보드가 이 서버로 접속
+
+import os, json, time, random, threading, logging
+from datetime import datetime
+from urllib.parse import urlparse, parse_qsl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+import candle_store
+
+DEFAULT_SIM_SETTINGS = {
+    'host': "127.0.0.1", 'port': 8780,
+    'data_mode': "Live",          # 재생할 캔들 저장소 (candles/candles_<data_mode>.db)
+    'start': None,                # 가상 시각 시작 (YYYY-MM-DD HH:MM, 없으면 현재 시각)
+    'speed': 1.0,                 # 가상 시각 배속
+    'base_interval': "1m",        # 진행 중 캔들 합성/스톱 주문 판정에 쓰는 타임프레임
+    'latency_ms': 0, 'latency_jitter_ms': 0,
+    'error_rate': 0.0,            # 요청 중 이 비율만큼 -1001 (503) 응답
+    'rate_limit_per_min': {"Spot": 6000, "USD-M": 2400, "COIN-M": 2400},
+    'seed': 0,
+    'taker_fee': {"Spot": 0.001, "USD-M": 0.0004, "COIN-M": 0.0005},
+    'slippage_bps': 0.0,          # 시장가/스톱 체결가를 불리한 방향으로 밀어내는 폭 (1bp = 0.01%)
+    'maintenance_margin_rate': 0.004, # 격리 마진 청산가 계산용 유지 증거금률
+    'balances': {"Spot": {"USDT": 10000.0}, "USD-M": {"USDT": 10000.0}, "COIN-M": {"BTC": 1.0, "ETH": 10.0}},
+    'symbols': {},                # 시장 -> 심볼 목록 (없으면 각 봇 설정의 심볼)
+    'filters': {},                # 심볼 -> {'tickSize', 'stepSize', 'minQty'} (기본: 0.01 / 0.00001 / 0.00001)
+}
+MARKET_PREFIXES = {'api': "Spot", 'fapi': "USD-M", 'dapi': "COIN-M"}
+SETTINGS_KEYS = {"Spot": "spot_settings", "USD-M": "usd_m_settings", "COIN-M": "coin_m_settings"}
+QUOTE_ASSETS = ("USDT", "USDC", "FDUSD", "BUSD", "BTC", "ETH", "BNB")
+ENDPOINT_WEIGHTS = {'klines': 2, 'exchangeInfo': 20, 'ticker/24hr': 40, 'account': 20, 'myTrades': 20, 'userTrades': 5, 'positionRisk': 5}
+
+class SimError(Exception):
+    """바이낸스 형식 에러 응답 ({"code": ..., "msg": ...})."""
+    def __init__(self, code, msg, status=400):
+        super().__init__(msg)
+        self.code, self.msg, self.status = code, msg, status
+
+def get_sim_settings(config, settings_key="exchange_sim", defaults=None):
+    settings = dict(DEFAULT_SIM_SETTINGS, **(defaults or {}), **(config.get(settings_key) or {}))
+    if not settings['symbols']:
+        settings['symbols'] = {market: [config.get(key, {}).get("symbol", "BTCUSD_PERP" if market == "COIN-M" else "BTCUSDT")] for market, key in SETTINGS_KEYS.items()}
+    return settings
+
+def apply_exchange_endpoint(config):
+    """config 에 exchange_endpoint 가 있으면 python-binance Client 의 모든 REST 주소를 그쪽으로 돌린다 (Client 생성 전에 호출)."""
+    endpoint = (config or {}).get("exchange_endpoint")
+    if not endpoint: return False
+    from binance.client import Client
+    base = endpoint.rstrip('/')
+    for attr, prefix in (('API_URL', 'api'), ('API_TESTNET_URL', 'api'), ('FUTURES_URL', 'fapi'), ('FUTURES_TESTNET_URL', 'fapi'),
+                         ('FUTURES_COIN_URL', 'dapi'), ('FUTURES_COIN_TESTNET_URL', 'dapi')):
+        setattr(Client, attr, f"{base}/{prefix}")
+    return True
+
+def split_symbol(market, symbol):
+    # (기초 자산, 견적 자산)
+    if market == "COIN-M": return symbol.split('USD')[0], "USD"
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote): return symbol[:-len(quote)], quote
+    return symbol[:-4], symbol[-4:]
+
+def get_contract_size(symbol):
+    # COIN-M 계약 1개의 USD 가치 (BTC 100, 그 외 10)
+    return 100 if symbol.startswith("BTC") else 10
+
+class SimClock:
+    """start_ms 부터 speed 배속으로 흐르는 가상 시각."""
+    def __init__(self, start_ms=None, speed=1.0):
+        self.origin = time.time()
+        self.start_ms = int(start_ms) if start_ms is not None else int(self.origin * 1000)
+        self.speed = float(speed)
+
+    def now_ms(self):
+        return int(self.start_ms + (time.time() - self.origin) * 1000 * self.speed)
+
+class RecordedFeed:
+    """캔들 저장소의 확정 캔들을 가상 시각 기준으로 잘라서 돌려주는 시세 원천."""
+    def __init__(self, data_mode, base_interval="1m"):
+        self.data_mode, self.base_interval = data_mode, base_interval
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def _get_series(self, market, symbol, interval):
+        key = (market, symbol, interval)
+        with self.lock:
+            if key not in self.series:
+                df = candle_store.query_candles(self.data_mode, market, symbol, interval, 0, 2 ** 62)
+                self.series[key] = {col: df[col].to_numpy() for col in ('open_time', 'open', 'high', 'low', 'close', 'volume')}
+            return self.series[key]
+
+    def preload(self, market, symbol, intervals):
+        """재생에 쓸 캔들을 미리 읽어 둔다. 타임프레임 -> (캔들 수, 첫 open_time, 마지막 open_time)."""
+        loaded = {}
+        for interval in intervals:
+            times = self._get_series(market, symbol, interval)['open_time']
+            loaded[interval] = (len(times), int(times[0]) if len(times) else None, int(times[-1]) if len(times) else None)
+        return loaded
+
+    def _closed_count(self, series, interval, now_ms):
+        # now_ms 시점까지 확정된 캔들 수 (open_time + 간격 <= now)
+        return int(np.searchsorted(series['open_time'], now_ms - candle_store.INTERVAL_MS[interval], side='right'))
+
+    def price(self, market, symbol, now_ms):
+        base = self._get_series(market, symbol, self.base_interval)
+        count = self._closed_count(base, self.base_interval, now_ms)
+        if count == 0: raise SimError(-1121, f"Invalid symbol. (기록된 {self.base_interval} 캔들 없음: {market} {symbol})")
+        return float(base['close'][count - 1])
+
+    def path(self, market, symbol, from_ms, to_ms):
+        """from_ms 이후 ~ to_ms 까지 새로 확정된 기본 타임프레임 캔들 (open_time, open, high, low) 배열."""
+        base = self._get_series(market, symbol, self.base_interval)
+        lo, hi = self._closed_count(base, self.base_interval, from_ms), self._closed_count(base, self.base_interval, to_ms)
+        return base['open_time'][lo:hi], base['open'][lo:hi], base['high'][lo:hi], base['low'][lo:hi]
+
+    def _live_candle(self, market, symbol, interval, now_ms):
+        interval_ms = candle_store.INTERVAL_MS[interval]
+        period_start = now_ms // interval_ms * interval_ms
+        base = self._get_series(market, symbol, self.base_interval)
+        lo = int(np.searchsorted(base['open_time'], period_start))
+        hi = self._closed_count(base, self.base_interval, now_ms)
+        if hi > lo:
+            return [period_start, base['open'][lo], base['high'][lo:hi].max(), base['low'][lo:hi].min(), base['close'][hi - 1], base['volume'][lo:hi].sum()]
+        if lo == 0: return None
+        last_close = base['close'][lo - 1] # 아직 확정된 하위 캔들이 없으면 직전 종가로 시작
+        return [period_start, last_close, last_close, last_close, last_close, 0.0]
+
+    def klines(self, market, symbol, interval, now_ms, limit=500, start_ms=None, end_ms=None):
+        if interval not in candle_store.INTERVAL_MS: raise SimError(-1120, "Invalid interval.")
+        interval_ms = candle_store.INTERVAL_MS[interval]
+        series = self._get_series(market, symbol, interval)
+        end = self._closed_count(series, interval, now_ms)
+        start = max(end - limit, 0) if start_ms is None else int(np.searchsorted(series['open_time'], int(start_ms)))
+        rows = [[int(series['open_time'][i]), series['open'][i], series['high'][i], series['low'][i], series['close'][i], series['volume'][i]] for i in range(start, min(end, start + limit) if start_ms is not None else end)]
+        live = self._live_candle(market, symbol, interval, now_ms)
+        if live: rows.append(live)
+        if start_ms is not None: rows = [r for r in rows if r[0] >= int(start_ms)]
+        if end_ms is not None: rows = [r for r in rows if r[0] <= int(end_ms)]
+        rows = rows[:limit] if start_ms is not None else rows[-limit:]
+        return [[r[0], *(str(float(v)) for v in r[1:6]), r[0] + interval_ms - 1, "0", 0, "0", "0", "0"] for r in rows]
+
+def format_open_order(order):
+    # 일반 주문(openOrders) / 조건부 주문(openAlgoOrders) 응답 형식
+    if not order['algo']: return {k: v for k, v in order.items() if k != 'algo'}
+    return {'algoId': order['orderId'], 'algoType': "CONDITIONAL", 'orderType': order['type'], 'symbol': order['symbol'], 'side': order['side'],
+            'triggerPrice': order['stopPrice'], 'quantity': order['origQty'], 'algoStatus': order['status'], 'closePosition': order['closePosition'],
+            'reduceOnly': order['reduceOnly'], 'createTime': order['time'], 'updateTime': order['updateTime']}
+
+class MatchingEngine:
+    """시장별 잔고/포지션/대기 주문/체결 기록. MARKET 은 현재가(호가가 있으면 매수=매도호가, 매도=매수호가), STOP_MARKET 은 스톱가(갭이면 시가)로 체결.
+    체결가에는 슬리피지를 더하고, 격리 마진 포지션은 청산가에 닿으면 증거금 전액 손실로 강제 청산."""
+    def __init__(self, feed, settings):
+        self.feed = feed
+        self.taker_fee = dict(settings['taker_fee'])
+        self.slippage = float(settings.get('slippage_bps', 0.0)) / 10_000
+        self.maintenance_margin_rate = float(settings.get('maintenance_margin_rate', 0.004))
+        self.filters = settings['filters']
+        self.balances = {market: dict(assets) for market, assets in settings['balances'].items()}
+        self.positions = {"USD-M": {}, "COIN-M": {}}
+        self.open_orders = {"Spot": [], "USD-M": [], "COIN-M": []}
+        self.trades = {"Spot": [], "USD-M": [], "COIN-M": []}
+        self.processed_until = {}
+        self.next_order_id, self.next_trade_id = 1, 1
+        self.lock = threading.RLock()
+
+    def get_filter(self, symbol):
+        return dict({'tickSize': 0.01, 'stepSize': 0.00001, 'minQty': 0.00001}, **self.filters.get(symbol, {}))
+
+    def get_position(self, market, symbol):
+        return self.positions[market].setdefault(symbol, {'amt': 0.0, 'entry': 0.0, 'leverage': 20, 'margin_type': "CROSSED", 'isolated_margin': 0.0})
+
+    def _new_order_id(self):
+        self.next_order_id += 1
+        return self.next_order_id - 1
+
+    # --- 체결 ---
+    def _apply_position_fill(self, market, symbol, signed_qty, price):
+        # 한 방향(one-way) 포지션에 체결 반영, 실현 손익 반환 (USD-M: USDT, COIN-M: 기초 코인)
+        pos = self.get_position(market, symbol)
+        amt, entry = pos['amt'], pos['entry']
+        inverse = market == "COIN-M"
+        size = get_contract_size(symbol) if inverse else 1.0
+        realized = 0.0
+        if amt == 0 or (amt > 0) == (signed_qty > 0):
+            new_amt = amt + signed_qty
+            if inverse: pos['entry'] = abs(new_amt) / (abs(amt) / entry + abs(signed_qty) / price) if amt else price
+            else: pos['entry'] = (abs(amt) * entry + abs(signed_qty) * price) / abs(new_amt)
+            pos['amt'] = new_amt
+        else:
+            closing = min(abs(signed_qty), abs(amt))
+            direction = 1 if amt > 0 else -1
+            realized = closing * size * (1 / entry - 1 / price) * direction if inverse else closing * (price - entry) * direction
+            pos['amt'] = amt + signed_qty
+            if pos['amt'] == 0 or abs(pos['amt']) < 1e-12: pos['amt'], pos['entry'] = 0.0, 0.0
+            elif (pos['amt'] > 0) != (amt > 0): pos['entry'] = price # 반대 방향으로 넘어간 잔량은 새 진입
+        return realized
+
+    def fill(self, market, symbol, side, qty, price, now_ms, order_id):
+        fee_rate = self.taker_fee.get(market, 0.0)
+        base, quote = split_symbol(market, symbol)
+        trade = {'symbol': symbol, 'id': self.next_trade_id, 'orderId': order_id, 'price': str(price), 'qty': str(qty), 'time': now_ms}
+        self.next_trade_id += 1
+        if market == "Spot":
+            assets = self.balances.setdefault("Spot", {})
+            if side == "BUY":
+                commission, commission_asset = qty * fee_rate, base
+                assets[quote] = assets.get(quote, 0.0) - qty * price
+                assets[base] = assets.get(base, 0.0) + qty - commission
+            else:
+                commission, commission_asset = qty * price * fee_rate, quote
+                assets[base] = assets.get(base, 0.0) - qty
+                assets[quote] = assets.get(quote, 0.0) + qty * price - commission
+            trade.update(quoteQty=str(qty * price), commission=str(commission), commissionAsset=commission_asset, isBuyer=side == "BUY", isMaker=False, isBestMatch=True)
+        else:
+            pos = self.get_position(market, symbol)
+            before = pos['amt']
+            realized = self._apply_position_fill(market, symbol, qty if side == "BUY" else -qty, price)
+            if market == "USD-M":
+                margin_asset, notional = "USDT", qty * price
+                trade['quoteQty'] = str(notional)
+            else:
+                margin_asset, notional = base, qty * get_contract_size(symbol) / price
+                trade['baseQty'] = str(notional)
+            if pos['margin_type'] == "ISOLATED": self._update_isolated_margin(pos, before, notional / qty, price)
+            commission = notional * fee_rate
+            wallet = self.balances.setdefault(market, {})
+            wallet[margin_asset] = wallet.get(margin_asset, 0.0) + realized - commission
+            trade.update(side=side, realizedPnl=str(realized), marginAsset=margin_asset, commission=str(commission), commissionAsset=margin_asset,
+                         positionSide="BOTH", buyer=side == "BUY", maker=False)
+        self.trades[market].append(trade)
+        return trade
+
+    # --- 증거금/청산 ---
+    def _update_isolated_margin(self, pos, before, notional_per_qty, price):
+        # 늘어난 수량만큼 초기 증거금(명목/레버리지) 추가, 줄어든 만큼 비례 반환, 방향이 바뀌면 남은 수량 기준으로 새로 잡음
+        after = pos['amt']
+        if after == 0: pos['isolated_margin'] = 0.0
+        elif before == 0 or (before > 0) != (after > 0): pos['isolated_margin'] = abs(after) * notional_per_qty / pos['leverage']
+        elif abs(after) > abs(before): pos['isolated_margin'] += (abs(after) - abs(before)) * notional_per_qty / pos['leverage']
+        else: pos['isolated_margin'] *= abs(after) / abs(before)
+
+    def liquidation_price(self, market, symbol):
+        """격리 마진 포지션의 청산가 (증거금 + 미실현 손익 = 유지 증거금). 교차 마진/무포지션은 0."""
+        pos = self.get_position(market, symbol)
+        amt, entry, margin, mmr = pos['amt'], pos['entry'], pos['isolated_margin'], self.maintenance_margin_rate
+        if amt == 0 or pos['margin_type'] != "ISOLATED" or entry <= 0: return 0.0
+        if market == "COIN-M":
+            value = abs(amt) * get_contract_size(symbol) # 계약 USD 가치
+            denominator = value / entry + margin if amt > 0 else value / entry - margin
+            if denominator <= 0: return 0.0 # 숏인데 증거금이 명목보다 커서 청산되지 않음
+            return value * (1 + mmr if amt > 0 else 1 - mmr) / denominator
+        qty = abs(amt)
+        if amt > 0: return max((qty * entry - margin) / (qty * (1 - mmr)), 0.0)
+        return (qty * entry + margin) / (qty * (1 + mmr))
+
+    def available_balance(self, market, asset):
+        # 지갑 잔고 - 포지션 초기 증거금 (격리: 잡아 둔 증거금, 교차: 명목/레버리지)
+        used = 0.0
+        for symbol, pos in self.positions.get(market, {}).items():
+            if not pos['amt'] or (split_symbol(market, symbol)[0] if market == "COIN-M" else "USDT") != asset: continue
+            if pos['margin_type'] == "ISOLATED": used += pos['isolated_margin']
+            elif market == "COIN-M": used += abs(pos['amt']) * get_contract_size(symbol) / pos['entry'] / pos['leverage']
+            else: used += abs(pos['amt']) * pos['entry'] / pos['leverage']
+        return self.balances.get(market, {}).get(asset, 0.0) - used
+
+    def liquidate(self, market, symbol, price, time_ms):
+        # 청산가로 전량 정리 후 남은 증거금은 보험 기금으로, 갭으로 증거금보다 더 잃은 만큼은 보험 기금이 메움
+        # -> 이 포지션으로 잃는 금액 = 잡아 둔 증거금 전액
+        pos = self.get_position(market, symbol)
+        margin = pos['isolated_margin']
+        trade = self.fill(market, symbol, "SELL" if pos['amt'] > 0 else "BUY", abs(pos['amt']), price, time_ms, self._new_order_id())
+        remainder = margin + float(trade['realizedPnl']) - float(trade['commission'])
+        self.balances[market][trade['marginAsset']] -= remainder
+        trade['realizedPnl'] = str(float(trade['realizedPnl']) - remainder)
+        trade['liquidation'] = True
+        self.open_orders[market] = [o for o in self.open_orders[market] if o['symbol'] != symbol or not o['closePosition']]
+        return trade
+
+    def _slipped(self, side, price):
+        return price * (1 + self.slippage) if side == "BUY" else price * (1 - self.slippage)
+
+    def market_price(self, market, symbol, side, now_ms):
+        # 시세 원천이 호가를 주면(실시간) 매수는 매도 1호가, 매도는 매수 1호가 / 기록 캔들은 현재가
+        book = getattr(self.feed, 'book', None)
+        if book:
+            bid, ask = book(market, symbol, now_ms)
+            return self._slipped(side, ask if side == "BUY" else bid)
+        return self._slipped(side, self.feed.price(market, symbol, now_ms))
+
+    # --- 주문 ---
+    def create_order(self, market, params, now_ms, algo=False):
+        # algo=True: 최신 python-binance 가 조건부 주문(STOP_MARKET 등)을 보내는 algoOrder 경로 (stopPrice 대신 triggerPrice)
+        symbol, side, order_type = params.get('symbol'), params.get('side'), params.get('type') or params.get('orderType')
+        if side not in ("BUY", "SELL"): raise SimError(-1102, "Mandatory parameter 'side' was not sent, was empty/null, or malformed.")
+        order_id = self._new_order_id()
+        if order_type == "STOP_MARKET" and market != "Spot":
+            stop_price = params.get('triggerPrice' if algo else 'stopPrice')
+            if stop_price is None: raise SimError(-1102, "Mandatory parameter 'stopPrice' was not sent, was empty/null, or malformed.")
+            order = {'orderId': order_id, 'symbol': symbol, 'side': side, 'type': "STOP_MARKET", 'status': "NEW", 'stopPrice': str(float(stop_price)), 'algo': algo,
+                     'origQty': str(params.get('quantity', 0)), 'executedQty': "0", 'avgPrice': "0", 'closePosition': str(params.get('closePosition', '')).lower() == 'true',
+                     'reduceOnly': str(params.get('reduceOnly', '')).lower() == 'true', 'time': now_ms, 'updateTime': now_ms}
+            self.open_orders[market].append(order)
+            self.processed_until.setdefault((market, symbol), now_ms)
+            return format_open_order(order)
+        if order_type != "MARKET": raise SimError(-1116, "Invalid orderType.")
+        price = self.market_price(market, symbol, side, now_ms)
+        step = self.get_filter(symbol)['stepSize'] if market != "COIN-M" else 1
+        if params.get('quoteOrderQty') is not None: qty = float(params['quoteOrderQty']) / price // step * step
+        else: qty = float(params.get('quantity', 0))
+        if qty <= 0: raise SimError(-1013, "Invalid quantity.")
+        if market == "Spot":
+            base, quote = split_symbol(market, symbol)
+            assets = self.balances.setdefault("Spot", {})
+            if (side == "BUY" and assets.get(quote, 0.0) < qty * price) or (side == "SELL" and assets.get(base, 0.0) < qty - 1e-12):
+                raise SimError(-2010, "Account has insufficient balance for requested action.")
+        else:
+            pos = self.get_position(market, symbol)
+            opening = min(qty, abs(pos['amt'])) if pos['amt'] and (pos['amt'] > 0) != (side == "BUY") else 0.0
+            extra = qty - opening # 기존 포지션을 줄이는 수량을 뺀 신규 노출
+            if extra > 0:
+                margin_asset = split_symbol(market, symbol)[0] if market == "COIN-M" else "USDT"
+                required = extra * (get_contract_size(symbol) / price if market == "COIN-M" else price) / pos['leverage']
+                if self.available_balance(market, margin_asset) < required: raise SimError(-2019, "Margin is insufficient.")
+        trade = self.fill(market, symbol, side, qty, price, now_ms, order_id)
+        self.processed_until.setdefault((market, symbol), now_ms)
+        if market == "Spot":
+            return {'symbol': symbol, 'orderId': order_id, 'transactTime': now_ms, 'price': "0", 'origQty': str(qty), 'executedQty': str(qty),
+                    'cummulativeQuoteQty': str(qty * price), 'status': "FILLED", 'type': "MARKET", 'side': side,
+                    'fills': [{'price': str(price), 'qty': str(qty), 'commission': trade['commission'], 'commissionAsset': trade['commissionAsset'], 'tradeId': trade['id']}]}
+        return {'orderId': order_id, 'symbol': symbol, 'status': "FILLED", 'avgPrice': str(price), 'origQty': str(qty), 'executedQty': str(qty),
+                'side': side, 'type': "MARKET", 'updateTime': now_ms}
+
+    def cancel_all(self, market, symbol, algo=False):
+        self.open_orders[market] = [o for o in self.open_orders[market] if o['symbol'] != symbol or o['algo'] != algo]
+
+    def cancel(self, market, order_id):
+        self.open_orders[market] = [o for o in self.open_orders[market] if o['orderId'] != order_id]
+
+    def process(self, market, now_ms):
+        """지난 처리 시각 이후 확정된 기본 타임프레임 캔들로 스톱 주문 발동/격리 포지션 청산을 판정 (먼저 닿은 것부터)."""
+        symbols = {o['symbol'] for o in self.open_orders[market]}
+        symbols.update(s for s, p in self.positions.get(market, {}).items() if p['amt'] and p['margin_type'] == "ISOLATED")
+        interval_ms = candle_store.INTERVAL_MS[self.feed.base_interval]
+        for symbol in symbols:
+            times, opens, highs, lows = self.feed.path(market, symbol, self.processed_until.get((market, symbol), now_ms), now_ms)
+            start = 0
+            while len(times):
+                events = [] # (캔들 위치, 순서, 체결가, 주문 또는 None=청산)
+                for order in (o for o in self.open_orders[market] if o['symbol'] == symbol):
+                    stop = float(order['stopPrice'])
+                    hit = np.flatnonzero(lows[start:] <= stop) if order['side'] == "SELL" else np.flatnonzero(highs[start:] >= stop)
+                    if len(hit):
+                        i = start + hit[0]
+                        # 캔들이 스톱가를 건너뛰어 열렸으면(갭) 시가로 체결
+                        price = min(stop, float(opens[i])) if order['side'] == "SELL" else max(stop, float(opens[i]))
+                        events.append((i, 0, self._slipped(order['side'], price), order))
+                liq = self.liquidation_price(market, symbol)
+                if liq:
+                    long = self.get_position(market, symbol)['amt'] > 0
+                    hit = np.flatnonzero(lows[start:] <= liq) if long else np.flatnonzero(highs[start:] >= liq)
+                    if len(hit):
+                        i = start + hit[0]
+                        events.append((i, 1, min(liq, float(opens[i])) if long else max(liq, float(opens[i])), None)) # 같은 캔들이면 스톱(청산가보다 안쪽)이 먼저
+                if not events: break
+                i, _, price, order = min(events, key=lambda e: e[:2])
+                start, fill_time = i, int(times[i]) + interval_ms - 1
+                if order is None:
+                    self.liquidate(market, symbol, price, fill_time); continue
+                self.open_orders[market].remove(order)
+                pos_amt = self.get_position(market, symbol)['amt']
+                qty = abs(pos_amt) if order['closePosition'] else float(order['origQty'])
+                if order['closePosition'] and (pos_amt == 0 or (pos_amt > 0) == (order['side'] == "BUY")): continue # 닫을 포지션 없음 -> 만료
+                self.fill(market, symbol, order['side'], qty, price, fill_time, order['orderId'])
+        for key in list(self.processed_until):
+            if key[0] == market: self.processed_until[key] = now_ms
+        for symbol in symbols: self.processed_until[(market, symbol)] = now_ms
+
+    # --- 상태 저장/복원 (모의 거래를 여러 프로세스가 파일로 공유) ---
+    def get_state(self, market):
+        return {'balances': self.balances.get(market, {}), 'positions': self.positions.get(market, {}), 'open_orders': self.open_orders[market],
+                'trades': self.trades[market], 'processed_until': {symbol: t for (m, symbol), t in self.processed_until.items() if m == market},
+                'next_order_id': self.next_order_id, 'next_trade_id': self.next_trade_id}
+
+    def set_state(self, market, state):
+        self.balances[market] = state['balances']
+        if market in self.positions: self.positions[market] = state['positions']
+        self.open_orders[market], self.trades[market] = state['open_orders'], state['trades']
+        self.processed_until.update({(market, symbol): t for symbol, t in state['processed_until'].items()})
+        self.next_order_id = max(self.next_order_id, state['next_order_id'])
+        self.next_trade_id = max(self.next_trade_id, state['next_trade_id'])
+
+class SimExchange:
+    """REST 경로 -> 응답. HTTP 서버와 프로세스 안 클라이언트가 같이 쓴다."""
+    def __init__(self, config, clock=None, feed=None, settings=None):
+        self.settings = settings or get_sim_settings(config)
+        start = self.settings['start']
+        start_ms = int(datetime.strptime(start, '%Y-%m-%d %H:%M' if ' ' in start else '%Y-%m-%d').timestamp() * 1000) if start else None
+        self.clock = clock or SimClock(start_ms, self.settings['speed'])
+        self.feed = feed or RecordedFeed(self.settings['data_mode'], self.settings['base_interval'])
+        self.engine = MatchingEngine(self.feed, self.settings)
+        self.random = random.Random(self.settings['seed'])
+        self.used_weight = {market: [] for market in MARKET_PREFIXES.values()}
+        self.listen_keys = set()
+
+    def _use_weight(self, market, name, now):
+        used = self.used_weight[market] = [(t, w) for t, w in self.used_weight[market] if now - t < 60]
+        total = sum(w for _, w in used) + ENDPOINT_WEIGHTS.get(name, 1)
+        if total > self.settings['rate_limit_per_min'].get(market, 2400):
+            raise SimError(-1003, "Too many requests; current limit is exceeded. Please use the websocket for live updates to avoid polling the API.", status=429)
+        used.append((now, ENDPOINT_WEIGHTS.get(name, 1)))
+        return total
+
+    def handle(self, method, path, params):
+        """(HTTP 상태, 응답 JSON, 사용 가중치) 반환."""
+        parts = urlparse(path).path.strip('/').split('/')
+        market = MARKET_PREFIXES.get(parts[0])
+        if market is None or len(parts) < 3: return 404, {'code': -1, 'msg': "Unknown path."}, 0
+        name = '/'.join(parts[2:])
+        delay = self.settings['latency_ms'] + self.random.uniform(0, self.settings['latency_jitter_ms'])
+        if delay: getattr(self.clock, 'sleep', time.sleep)(delay / 1000) # 가상 시각(리플레이)이면 시각만 앞당긴다
+        try:
+            with self.engine.lock:
+                used = self._use_weight(market, name, self.clock.now_ms() / 1000)
+                if self.settings['error_rate'] and self.random.random() < self.settings['error_rate']:
+                    raise SimError(-1001, "Internal error; unable to process your request. Please try your request again.", status=503)
+                now_ms = self.clock.now_ms()
+                self.engine.process(market, now_ms)
+                return 200, self.route(market, method, name, params, now_ms), used
+        except SimError as e:
+            return e.status, {'code': e.code, 'msg': e.msg}, 0
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'code': -1102, 'msg': f"Mandatory parameter was not sent, was empty/null, or malformed. ({e})"}, 0
+
+    def route(self, market, method, name, params, now_ms):
+        engine = self.engine
+        symbol = params.get('symbol')
+        if name == 'ping': return {}
+        if name == 'time': return {'serverTime': now_ms}
+        if name == 'exchangeInfo': return self.exchange_info(market, now_ms)
+        if name == 'klines':
+            return self.feed.klines(market, symbol, params.get('interval'), now_ms, int(params.get('limit', 500)), params.get('startTime'), params.get('endTime'))
+        if name in ('ticker/24hr', 'ticker/price'):
+            symbols = [symbol] if symbol else self.settings['symbols'].get(market, [])
+            tickers = [self.ticker(market, s, now_ms, name == 'ticker/price') for s in symbols]
+            return tickers[0] if symbol else tickers
+        if name in ('userDataStream', 'listenKey'):
+            if method == 'POST':
+                key = f"sim{self.random.getrandbits(64):016x}"
+                self.listen_keys.add(key)
+                return {'listenKey': key}
+            if method == 'DELETE': self.listen_keys.discard(params.get('listenKey'))
+            return {}
+        if name in ('order', 'algoOrder') and method == 'POST': return engine.create_order(market, params, now_ms, algo=name == 'algoOrder')
+        if name in ('order', 'algoOrder') and method == 'DELETE':
+            engine.cancel(market, int(params.get('algoId') or params['orderId']))
+            return {'code': 200, 'msg': "success"}
+        if name in ('openOrders', 'openAlgoOrders'):
+            return [format_open_order(o) for o in engine.open_orders[market] if (not symbol or o['symbol'] == symbol) and o['algo'] == (name == 'openAlgoOrders')]
+        if name in ('allOpenOrders', 'algoOpenOrders') and method == 'DELETE':
+            engine.cancel_all(market, symbol, algo=name == 'algoOpenOrders')
+            return {'code': 200, 'msg': "The operation of cancel all open order is done."}
+        if name == 'leverage' and method == 'POST':
+            engine.get_position(market, symbol)['leverage'] = int(params['leverage'])
+            return {'symbol': symbol, 'leverage': int(params['leverage']), 'maxNotionalValue': "1000000"}
+        if name == 'marginType' and method == 'POST':
+            pos = engine.get_position(market, symbol)
+            margin_type = "CROSSED" if params['marginType'].upper().startswith("CROSS") else "ISOLATED"
+            if pos['margin_type'] == margin_type: raise SimError(-4046, "No need to change margin type.")
+            if pos['amt']: raise SimError(-4048, "Margin type cannot be changed if there exists position.")
+            pos['margin_type'] = margin_type
+            return {'code': 200, 'msg': "success"}
+        if name == 'positionRisk': return [self.position_info(market, s, now_ms) for s in engine.positions[market] if not symbol or s == symbol]
+        if name in ('myTrades', 'userTrades'):
+            trades = [t for t in engine.trades[market] if t['symbol'] == symbol]
+            if params.get('fromId') is not None: trades = [t for t in trades if t['id'] >= int(params['fromId'])]
+            if params.get('startTime') is not None: trades = [t for t in trades if t['time'] >= int(params['startTime'])]
+            if params.get('endTime') is not None: trades = [t for t in trades if t['time'] <= int(params['endTime'])]
+            return trades[:int(params.get('limit', 500))]
+        if name == 'account' and market == "Spot":
+            return {'canTrade': True, 'updateTime': now_ms, 'accountType': "SPOT",
+                    'balances': [{'asset': a, 'free': str(v), 'locked': "0"} for a, v in engine.balances.get("Spot", {}).items()]}
+        if name in ('account', 'balance'):
+            assets = [{'asset': a, 'balance': str(v), 'walletBalance': str(v), 'availableBalance': str(engine.available_balance(market, a)), 'crossWalletBalance': str(v)}
+                      for a, v in engine.balances.get(market, {}).items()]
+            if name == 'balance': return assets
+            return {'assets': assets, 'positions': [self.position_info(market, s, now_ms) for s in engine.positions[market]], 'canTrade': True}
+        raise SimError(-1, f"Endpoint not supported by exchange_sim: {method} {name}", status=404)
+
+    def exchange_info(self, market, now_ms):
+        symbols = []
+        for symbol in self.settings['symbols'].get(market, []):
+            base, quote = split_symbol(market, symbol)
+            f = self.engine.get_filter(symbol)
+            price_precision = max(int(round(-np.log10(f['tickSize']))), 0)
+            info = {'symbol': symbol, 'status': "TRADING", 'baseAsset': base, 'quoteAsset': quote, 'pricePrecision': price_precision,
+                    'quantityPrecision': max(int(round(-np.log10(f['stepSize']))), 0),
+                    'filters': [{'filterType': "PRICE_FILTER", 'tickSize': str(f['tickSize']), 'minPrice': str(f['tickSize']), 'maxPrice': "10000000"},
+                                {'filterType': "LOT_SIZE", 'stepSize': str(f['stepSize']), 'minQty': str(f['minQty']), 'maxQty': "100000"},
+                                {'filterType': "MIN_NOTIONAL", 'minNotional': "5", 'notional': "5"}]}
+            if market != "Spot": info.update(contractType="PERPETUAL", marginAsset=base if market == "COIN-M" else quote)
+            if market == "COIN-M": info.update(contractStatus="TRADING", contractSize=get_contract_size(symbol), pair=f"{base}USD")
+            symbols.append(info)
+        limit = self.settings['rate_limit_per_min'].get(market, 2400)
+        return {'timezone': "UTC", 'serverTime': now_ms, 'symbols': symbols,
+                'rateLimits': [{'rateLimitType': "REQUEST_WEIGHT", 'interval': "MINUTE", 'intervalNum': 1, 'limit': limit}]}
+
+    def ticker(self, market, symbol, now_ms, price_only=False):
+        price = self.feed.price(market, symbol, now_ms)
+        if price_only: return {'symbol': symbol, 'price': str(price)}
+        times, opens, highs, lows = self.feed.path(market, symbol, now_ms - 86_400_000, now_ms)
+        open_price = float(opens[0]) if len(opens) else price
+        return {'symbol': symbol, 'lastPrice': str(price), 'openPrice': str(open_price), 'priceChange': str(price - open_price),
+                'priceChangePercent': str((price / open_price - 1) * 100 if open_price else 0.0),
+                'highPrice': str(float(highs.max()) if len(highs) else price), 'lowPrice': str(float(lows.min()) if len(lows) else price),
+                'openTime': now_ms - 86_400_000, 'closeTime': now_ms}
+
+    def position_info(self, market, symbol, now_ms):
+        pos = self.engine.get_position(market, symbol)
+        mark = self.feed.price(market, symbol, now_ms) if pos['amt'] else 0.0
+        if market == "COIN-M": unrealized = pos['amt'] * get_contract_size(symbol) * (1 / pos['entry'] - 1 / mark) if pos['amt'] else 0.0
+        else: unrealized = pos['amt'] * (mark - pos['entry'])
+        return {'symbol': symbol, 'positionAmt': str(pos['amt']), 'entryPrice': str(pos['entry']), 'markPrice': str(mark),
+                'unRealizedProfit': str(unrealized), 'liquidationPrice': str(self.engine.liquidation_price(market, symbol)), 'leverage': str(pos['leverage']),
+                'marginType': pos['margin_type'].lower(), 'isolatedMargin': str(pos['isolated_margin']), 'positionSide': "BOTH", 'updateTime': now_ms}
+
+# --- HTTP 서버 ---
+class _SimHandler(BaseHTTPRequestHandler):
+    exchange = None
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ""
+        params = dict(parse_qsl(urlparse(self.path).query))
+        params.update(parse_qsl(body))
+        status, payload, used = self.exchange.handle(method, self.path, params)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('X-MBX-USED-WEIGHT-1M', str(used))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self): self._handle('GET')
+    def do_POST(self): self._handle('POST')
+    def do_PUT(self): self._handle('PUT')
+    def do_DELETE(self): self._handle('DELETE')
+    def log_message(self, format, *args): pass
+
+# --- 프로세스 안 연결 (HTTP 서버 없이 python-binance Client 요청을 바로 SimExchange 로) ---
+class SimTransport(requests.adapters.BaseAdapter):
+    """requests 세션에 mount 하는 어댑터. Client 의 서명/파라미터 처리는 그대로 거치고 소켓만 건너뛴다."""
+    def __init__(self, exchange):
+        super().__init__()
+        self.exchange = exchange
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        body = request.body.decode('utf-8') if isinstance(request.body, bytes) else (request.body or "")
+        params = dict(parse_qsl(url.query))
+        params.update(parse_qsl(body))
+        status, payload, used = self.exchange.handle(request.method, url.path, params)
+        response = requests.Response()
+        response.status_code, response._content = status, json.dumps(payload).encode('utf-8')
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['X-MBX-USED-WEIGHT-1M'] = str(used)
+        response.url, response.request, response.encoding = request.url, request, 'utf-8'
+        return response
+
+    def close(self): pass
+
+def start_sim_server(config, exchange=None):
+    """스레드에서 서버를 띄우고 (서버, SimExchange) 반환."""
+    exchange = exchange or SimExchange(config)
+    handler = type('SimHandler', (_SimHandler,), {'exchange': exchange})
+    server = ThreadingHTTPServer((exchange.settings['host'], int(exchange.settings['port'])), handler)
+    threading.Thread(target=server.serve_forever, name="exchange_sim", daemon=True).start()
+    return server, exchange
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    with open('config.json', 'r') as f: config = json.load(f)
+    server, exchange = start_sim_server(config)
+    logging.info(f"[exchange_sim] http://{exchange.settings['host']}:{exchange.settings['port']} 시작 "
+                 f"(가상 시각 {datetime.fromtimestamp(exchange.clock.now_ms() / 1000):%Y-%m-%d %H:%M}, {exchange.settings['speed']}배속)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt: server.shutdown()
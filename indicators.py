@@ -0,0 +1,222 @@
+# indicators.py (봇/분석 탭/백테스트 공용 지표: pandas_ta 없이 float64 배열로 계산)
+#  - 봇이 쓰는 SMA/RSI/BBANDS/MACD/STOCH/ATR 만 pandas_ta 와 같은 정의로 구현 (EMA presma 시드, RMA = ewm(alpha=1/길이),
+#    BB ddof=0, 0 범위 보정(non_zero_range), 첫 캔들 true range NaN 까지 동일)
+#  - ewm 은 pandas 의 계산 순서를 그대로 따라 결과가 같고, 이동 평균/표준편차는 반올림 오차(상대 1e-10 수준) 범위에서 같다
+#  - 입력은 1차원(캔들) 또는 2차원(캔들 x 심볼) 배열, 시간 축은 0. out 을 주면 그 배열에 결과를 쓴다
+#  - add_indicator_columns: pandas_ta 와 같은 열 이름으로 DataFrame 에 한 번에 붙인다 (열마다 추가하며 생기는 복사 없음)
+#    (거래량 SMA 는 pandas_ta 처럼 SMA_20, ATR 은 ATRr_<길이>. 봇이 어느 이름을 읽는지는 bot_column_names, 기본은 기존처럼 대체값 사용)
+#  실행: python indicators.py  (pandas_ta 대비 import 시간/호출 시간/최대 오차 벤치마크)
+
+import sys
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+EPSILON = sys.float_info.epsilon # pandas_ta non_zero_range 보정값
+
+def _prepare(values, out):
+    values = np.asarray(values, dtype=np.float64)
+    if out is None: out = np.empty(values.shape)
+    out[...] = np.nan
+    return values, out
+
+def _rolling(values, length, reducer, out=None, **kwargs):
+    values, out = _prepare(values, out)
+    if len(values) >= length: reducer(sliding_window_view(values, length, axis=0), axis=-1, out=out[length - 1:], **kwargs)
+    return out
+
+def sma(values, length, out=None):
+    """rolling(length).mean() (창 안에 NaN 이 있으면 NaN)."""
+    return _rolling(values, length, np.mean, out)
+
+def rolling_std(values, length, ddof=0, out=None):
+    return _rolling(values, length, np.std, out, ddof=ddof)
+
+def rolling_min(values, length, out=None):
+    return _rolling(values, length, np.min, out)
+
+def rolling_max(values, length, out=None):
+    return _rolling(values, length, np.max, out)
+
+def _ewm_1d(values, alpha, adjust, min_periods, out):
+    # pandas ewm(...).mean() (ignore_na=False) 의 계산 순서 그대로: 파이썬 float 루프가 캔들 200개에서는 numpy 호출보다 빠르다
+    old_wt_factor, new_wt = 1.0 - alpha, 1.0 if adjust else alpha
+    weighted, old_wt, nobs = np.nan, 1.0, 0
+    result = []
+    for cur in values.tolist():
+        is_observation = cur == cur
+        nobs += is_observation
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur: weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if adjust else 1.0
+        elif is_observation:
+            weighted = cur
+        result.append(weighted if nobs >= min_periods else np.nan)
+    out[:] = result
+    return out
+
+def _ewm_2d(values, alpha, adjust, min_periods, out):
+    # 같은 계산을 열(심볼) 방향으로 한 번에
+    old_wt_factor, new_wt = 1.0 - alpha, 1.0 if adjust else alpha
+    weighted = np.full(values.shape[1], np.nan)
+    old_wt, nobs = np.ones(values.shape[1]), np.zeros(values.shape[1], dtype=np.int64)
+    with np.errstate(invalid='ignore'):
+        for t in range(values.shape[0]):
+            cur = values[t]
+            is_observation = cur == cur
+            nobs += is_observation
+            has_value = weighted == weighted
+            old_wt = np.where(has_value, old_wt * old_wt_factor, old_wt)
+            update = has_value & is_observation
+            blended = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+            weighted = np.where(update & (weighted != cur), blended, np.where(~has_value & is_observation, cur, weighted))
+            old_wt = np.where(update, old_wt + new_wt if adjust else 1.0, old_wt)
+            out[t] = np.where(nobs >= min_periods, weighted, np.nan)
+    return out
+
+def _ewm(values, alpha, adjust=True, min_periods=0, out=None):
+    values, out = _prepare(values, out)
+    alpha = 1.0 / (1.0 + (1.0 / alpha - 1.0)) # pandas 가 alpha/span 을 com 으로 바꿨다가 다시 구하는 값과 같게
+    if values.ndim == 1: return _ewm_1d(values, alpha, adjust, min_periods, out)
+    _ewm_2d(values.reshape(len(values), -1), alpha, adjust, min_periods, out.reshape(len(values), -1))
+    return out
+
+def rma(values, length, out=None):
+    """pandas_ta rma: ewm(alpha=1/length, min_periods=length).mean()."""
+    return _ewm(values, 1.0 / length, adjust=True, min_periods=length, out=out)
+
+def ema(values, length, out=None):
+    """pandas_ta ema(presma=True): 첫 유효값부터 length개 평균을 시드로 ewm(span=length, adjust=False)."""
+    values, out = _prepare(values, out)
+    alpha = 1.0 / (1.0 + (length - 1) / 2) # span -> com -> alpha
+    columns, out_columns = values.reshape(len(values), -1), out.reshape(len(values), -1)
+    for j in range(columns.shape[1]):
+        column = columns[:, j]
+        first = int(np.argmax(column == column)) if (column == column).any() else len(column)
+        if len(column) - first < length: continue
+        seeded = column[first + length - 1:].copy()
+        seeded[0] = column[first:first + length].mean()
+        _ewm_1d(seeded, alpha, False, 0, out_columns[first + length - 1:, j])
+    return out
+
+def rsi(close, length=14, out=None):
+    close = np.asarray(close, dtype=np.float64)
+    change = np.full(close.shape, np.nan)
+    change[1:] = close[1:] - close[:-1]
+    with np.errstate(invalid='ignore'):
+        gain_avg, loss_avg = rma(np.where(change < 0, 0.0, change), length), rma(np.where(change > 0, 0.0, change), length)
+    if out is None: out = np.empty(close.shape)
+    with np.errstate(divide='ignore', invalid='ignore'): # 가격 변화가 없는 구간 (0/0) -> pandas 와 같이 NaN
+        np.divide(100 * gain_avg, gain_avg + np.abs(loss_avg), out=out)
+    return out
+
+def _non_zero_range(high, low):
+    # pandas_ta non_zero_range: 0 인 값이 하나라도 있으면 (열 전체에) epsilon 을 더한다
+    diff = high - low
+    has_zero = (diff == 0).any(axis=0)
+    return diff + EPSILON * has_zero if np.any(has_zero) else diff
+
+def bbands(close, length=20, std=2.0, ddof=0):
+    """(lower, mid, upper, bandwidth, percent) = pandas_ta BBL/BBM/BBU/BBB/BBP."""
+    close = np.asarray(close, dtype=np.float64)
+    mid, deviations = sma(close, length), std * rolling_std(close, length, ddof)
+    lower, upper = mid - deviations, mid + deviations
+    width = _non_zero_range(upper, lower)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return lower, mid, upper, 100 * width / mid, _non_zero_range(close, lower) / width
+
+def macd(close, fast=12, slow=26, signal=9):
+    """(macd, histogram, signal) = pandas_ta MACD/MACDh/MACDs. 시그널 EMA 는 MACD 첫 유효값부터."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, line - signal_line, signal_line
+
+def stoch(high, low, close, k=14, d=3, smooth_k=3):
+    """(%K, %D) = pandas_ta STOCHk_k_d_smooth / STOCHd_k_d_smooth."""
+    lowest, highest = rolling_min(low, k), rolling_max(high, k)
+    with np.errstate(invalid='ignore'):
+        raw = 100 * (np.asarray(close, dtype=np.float64) - lowest) / _non_zero_range(highest, lowest)
+    stoch_k = sma(raw, smooth_k)
+    return stoch_k, sma(stoch_k, d)
+
+def true_range(high, low, close):
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[1:] = close[:-1]
+    result = np.fmax(np.fmax(np.abs(_non_zero_range(high, low)), np.abs(high - prev_close)), np.abs(prev_close - low))
+    result[np.isnan(prev_close)] = np.nan # 이전 종가가 없는 첫 캔들 (2차원이면 심볼마다)
+    return result
+
+def atr(high, low, close, length=14, out=None):
+    """pandas_ta atr(mamode='rma')."""
+    return rma(true_range(high, low, close), length, out)
+
+def compute_indicator_columns(high, low, close, volume, params):
+    """pandas_ta 열 이름 -> 배열. params: short_sma_len, long_sma_len, rsi_len, bbands_len, macd_fast/slow/signal, (atr_length)."""
+    macd_suffix = f"{params['macd_fast']}_{params['macd_slow']}_{params['macd_signal']}"
+    bb_suffix = f"{params['bbands_len']}_2.0"
+    columns = {f"SMA_{params['short_sma_len']}": sma(close, params['short_sma_len']), f"SMA_{params['long_sma_len']}": sma(close, params['long_sma_len']),
+               f"RSI_{params['rsi_len']}": rsi(close, params['rsi_len'])}
+    columns.update(zip([f"BBL_{bb_suffix}", f"BBM_{bb_suffix}", f"BBU_{bb_suffix}", f"BBB_{bb_suffix}", f"BBP_{bb_suffix}"], bbands(close, params['bbands_len'])))
+    columns.update(zip([f"MACD_{macd_suffix}", f"MACDh_{macd_suffix}", f"MACDs_{macd_suffix}"], macd(close, params['macd_fast'], params['macd_slow'], params['macd_signal'])))
+    columns.update(zip(["STOCHk_14_3_3", "STOCHd_14_3_3"], stoch(high, low, close, 14, 3, 3)))
+    columns["SMA_20"] = sma(volume, 20) # df.ta.sma(length=20, close='volume') 와 같은 이름 (종가 SMA_20 이 있으면 덮어씀)
+    if params.get('atr_length'): columns[f"ATRr_{params['atr_length']}"] = atr(high, low, close, params['atr_length'])
+    return columns
+
+def bot_column_names(params):
+    """봇이 읽는 (거래량 SMA, ATR) 열 이름. indicator_settings.use_volume_atr_columns 를 켜야 실제 열 SMA_20 / ATRr_<길이>,
+    꺼져 있으면(기본) 예전 봇 그대로 없는 열 SMA_20_volume / ATR_<길이> -> 현재 거래량 / 0 으로 대체 (거래량 조건 미충족, 고정 % SL/TP)."""
+    if params.get('use_volume_atr_columns'): return "SMA_20", f"ATRr_{params.get('atr_length')}"
+    return "SMA_20_volume", f"ATR_{params.get('atr_length')}"
+
+def condition_column_names(params):
+    """signal_batch 조건 식의 키(sma_short, rsi, ...) -> compute_indicator_columns 열 이름.
+    거래량 SMA 는 봇과 같게 bot_column_names 를 따른다 (꺼져 있으면 현재 거래량 -> 거래량 조건 미충족)."""
+    macd_suffix, bb_suffix = f"{params['macd_fast']}_{params['macd_slow']}_{params['macd_signal']}", f"{params['bbands_len']}_2.0"
+    return {'close': 'close', 'volume': 'volume', 'sma_short': f"SMA_{params['short_sma_len']}", 'sma_long': f"SMA_{params['long_sma_len']}",
+            'rsi': f"RSI_{params['rsi_len']}", 'macd': f"MACD_{macd_suffix}", 'macd_signal': f"MACDs_{macd_suffix}",
+            'bbl': f"BBL_{bb_suffix}", 'bbu': f"BBU_{bb_suffix}", 'stoch_k': 'STOCHk_14_3_3', 'stoch_d': 'STOCHd_14_3_3', 'volume_sma': bot_column_names(params)[0] if params.get('use_volume_atr_columns') else 'volume'}
+
+def add_indicator_columns(df, params):
+    """df(open/high/low/close/volume)에 지표 열을 한 번에 붙인 새 DataFrame."""
+    arrays = [df[col].to_numpy(dtype=np.float64) for col in ('high', 'low', 'close', 'volume')]
+    return pd.concat([df, pd.DataFrame(compute_indicator_columns(*arrays, params), index=df.index)], axis=1)
+
+def _benchmark(candle_count=200, repeat=200):
+    # pandas_ta 가 설치돼 있으면 import 시간, 호출 시간, 최대 오차를 비교
+    import subprocess, time
+    def import_time(module):
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        return float(result.stdout) if result.returncode == 0 else None
+    params = {'short_sma_len': 10, 'long_sma_len': 50, 'rsi_len': 14, 'bbands_len': 20, 'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9, 'atr_length': 14}
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, candle_count)))
+    df = pd.DataFrame({'open': close, 'high': close * (1 + rng.uniform(0, 0.01, candle_count)), 'low': close * (1 - rng.uniform(0, 0.01, candle_count)),
+                       'close': close, 'volume': rng.uniform(1, 100, candle_count)})
+    t = time.perf_counter()
+    for _ in range(repeat): ours = add_indicator_columns(df, params)
+    ours_ms = (time.perf_counter() - t) / repeat * 1000
+    print(f"import indicators: {import_time('indicators'):.3f}s, 호출: {ours_ms:.3f}ms ({candle_count}캔들)")
+    try: import pandas_ta # noqa: F401
+    except ImportError: print("pandas_ta 없음 -> 비교 생략"); return
+    def with_pandas_ta():
+        frame = df.copy()
+        frame.ta.sma(length=10, append=True); frame.ta.sma(length=50, append=True)
+        frame.ta.rsi(length=14, append=True); frame.ta.bbands(length=20, append=True)
+        frame.ta.macd(fast=12, slow=26, signal=9, append=True)
+        frame.ta.stoch(high='high', low='low', close='close', k=14, d=3, append=True)
+        frame.ta.atr(length=14, append=True)
+        return frame
+    t = time.perf_counter()
+    for _ in range(repeat): theirs = with_pandas_ta()
+    theirs_ms = (time.perf_counter() - t) / repeat * 1000
+    print(f"import pandas_ta: {import_time('pandas_ta'):.3f}s, 호출: {theirs_ms:.3f}ms -> {theirs_ms / ours_ms:.1f}배")
+    for col in theirs.columns.difference(df.columns):
+        if col in ours: print(f"  {col}: 최대 오차 {np.nanmax(np.abs(ours[col].to_numpy() - theirs[col].to_numpy())):.2e}")
+
+if __name__ == '__main__':
+    _benchmark()
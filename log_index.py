@@ -0,0 +1,132 @@
+# log_index.py (봇 로그 검색 색인: 현재/압축 보관된 로그 전체를 SQLite FTS5로 색인)
+#  - logs/ 아래 {usd_m,coin_m,spot}_log_YYYY-MM-DD.txt 와 .txt.gz (하위 폴더 포함)를 색인
+#  - 오늘 로그처럼 계속 늘어나는 파일은 마지막으로 색인한 위치 다음부터 추가분만 색인
+#  - 검색은 단어(3글자 이상은 trigram 색인) + 시장 + 기간 조건으로 파일을 다시 읽지 않고 바로 답한다
+#  실행: python log_index.py  (전체 색인 갱신)
+
+import os, re, gzip, time, sqlite3, threading, logging
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+LOG_FOLDER = "logs"
+INDEX_PATH = os.path.join(LOG_FOLDER, "log_index.db")
+INDEX_INTERVAL_SEC = 10 # 백그라운드 색인 주기
+LOG_FILE_PATTERN = re.compile(r"(usd_m|coin_m|spot)_log_(\d{4}-\d{2}-\d{2})\.txt(\.gz)?$")
+LINE_TIME_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - ")
+MIN_TRIGRAM_LEN = 3 # trigram 색인은 3글자 이상 검색어에만 쓰인다
+
+_index_lock = threading.Lock()
+_indexer_thread = None
+
+def _connect():
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS files (
+        file_id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, market TEXT, day TEXT, indexed_bytes INTEGER, mtime REAL)""")
+    conn.execute("CREATE TABLE IF NOT EXISTS lines (line_id INTEGER PRIMARY KEY, file_id INTEGER, market TEXT, time INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lines_time ON lines (market, time)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lines_file ON lines (file_id)")
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS line_text USING fts5(text, tokenize='trigram')") # rowid = lines.line_id
+    return conn
+
+def _find_log_files():
+    for root, _, names in os.walk(LOG_FOLDER):
+        for name in names:
+            match = LOG_FILE_PATTERN.match(name)
+            if match: yield os.path.join(root, name), match.group(1), match.group(2), bool(match.group(3))
+
+def _delete_file_rows(conn, file_id):
+    conn.execute("DELETE FROM line_text WHERE rowid IN (SELECT line_id FROM lines WHERE file_id=?)", (file_id,))
+    conn.execute("DELETE FROM lines WHERE file_id=?", (file_id,))
+    conn.execute("DELETE FROM files WHERE file_id=?", (file_id,))
+
+def _parse_lines(text, day, last_time):
+    # 타임스탬프가 없는 줄(트레이스백 등)은 바로 앞 줄의 시각을 이어받는다
+    rows = []
+    for line in text.splitlines():
+        if not line.strip(): continue
+        match = LINE_TIME_PATTERN.match(line)
+        if match: last_time = int(datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S').timestamp() * 1000)
+        elif last_time is None: last_time = int(datetime.strptime(day, '%Y-%m-%d').timestamp() * 1000)
+        rows.append((last_time, line))
+    return rows
+
+def _index_file(conn, path, market, day, compressed, known):
+    stat = os.stat(path)
+    file_id, indexed_bytes, mtime = known if known else (None, 0, None)
+    if compressed:
+        if file_id is not None and mtime == stat.st_mtime: return 0 # 압축 보관 파일은 바뀌지 않음
+        if file_id is not None: _delete_file_rows(conn, file_id); file_id = None
+        with gzip.open(path, 'rb') as f: data = f.read()
+        start, end = 0, len(data)
+    else:
+        if file_id is not None and stat.st_size < indexed_bytes: # 파일이 새로 쓰였으면 처음부터 다시 색인
+            _delete_file_rows(conn, file_id); file_id, indexed_bytes = None, 0
+        if stat.st_size == indexed_bytes: return 0
+        with open(path, 'rb') as f:
+            f.seek(indexed_bytes); data = f.read()
+        end = data.rfind(b"\n") + 1 # 아직 쓰는 중인 마지막 줄은 다음 색인 때 처리
+        if end == 0: return 0
+        start, data = indexed_bytes, data[:end]
+        end = indexed_bytes + end
+    if file_id is None:
+        file_id = conn.execute("INSERT INTO files (path, market, day, indexed_bytes, mtime) VALUES (?, ?, ?, 0, ?)", (path, market, day, stat.st_mtime)).lastrowid
+    last_time = conn.execute("SELECT MAX(time) FROM lines WHERE file_id=?", (file_id,)).fetchone()[0]
+    rows = _parse_lines(data.decode('utf-8', errors='replace'), day, last_time)
+    if rows:
+        first_id = (conn.execute("SELECT COALESCE(MAX(line_id), 0) FROM lines").fetchone()[0]) + 1
+        conn.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", [(first_id + i, file_id, market, t) for i, (t, _) in enumerate(rows)])
+        conn.executemany("INSERT INTO line_text (rowid, text) VALUES (?, ?)", [(first_id + i, line) for i, (_, line) in enumerate(rows)])
+    conn.execute("UPDATE files SET indexed_bytes=?, mtime=? WHERE file_id=?", (end if not compressed else stat.st_size, stat.st_mtime, file_id))
+    return len(rows)
+
+def update_index():
+    """새 로그 파일과 기존 파일의 추가분을 색인하고, 사라진 파일(압축 보관 등으로 이동)의 색인은 지운다. 새로 색인한 줄 수를 반환."""
+    with _index_lock, closing(_connect()) as conn, conn:
+        known = {path: (file_id, indexed_bytes, mtime) for file_id, path, indexed_bytes, mtime in conn.execute("SELECT file_id, path, indexed_bytes, mtime FROM files")}
+        found = set()
+        added = 0
+        for path, market, day, compressed in _find_log_files():
+            found.add(path)
+            added += _index_file(conn, path, market, day, compressed, known.get(path))
+        for path in set(known) - found: _delete_file_rows(conn, known[path][0])
+        return added
+
+def _indexer_loop():
+    while True:
+        try: update_index()
+        except Exception as e: logging.warning(f"[로그 색인] 색인 갱신 실패: {e}")
+        time.sleep(INDEX_INTERVAL_SEC)
+
+def start_background_indexer():
+    # 프로세스당 한 번만 시작 (대시보드에서 여러 번 호출해도 안전)
+    global _indexer_thread
+    if _indexer_thread is None or not _indexer_thread.is_alive():
+        _indexer_thread = threading.Thread(target=_indexer_loop, name="log_indexer", daemon=True)
+        _indexer_thread.start()
+    return _indexer_thread
+
+def search(query="", markets=None, start_ms=None, end_ms=None, limit=500):
+    """검색어(빈 문자열이면 조건만) + 시장 목록 + 기간으로 로그 줄 검색. 최신순 DataFrame(time, market, text, path)."""
+    conditions, params = [], []
+    query = query.strip()
+    if len(query) >= MIN_TRIGRAM_LEN:
+        conditions.append("t.line_text MATCH ?"); params.append('"' + query.replace('"', '""') + '"') # 구문 검색
+    elif query:
+        conditions.append("t.text LIKE ?"); params.append(f"%{query}%")
+    if markets:
+        conditions.append(f"l.market IN ({', '.join('?' * len(markets))})"); params.extend(markets)
+    if start_ms is not None: conditions.append("l.time >= ?"); params.append(int(start_ms))
+    if end_ms is not None: conditions.append("l.time <= ?"); params.append(int(end_ms))
+    sql = ("SELECT l.time, l.market, t.text, f.path FROM line_text t JOIN lines l ON l.line_id = t.rowid JOIN files f ON f.file_id = l.file_id"
+           + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY l.time DESC, l.line_id DESC LIMIT ?")
+    with closing(_connect()) as conn, conn:
+        df = pd.read_sql_query(sql, conn, params=params + [int(limit)])
+    df['time'] = pd.to_datetime(df['time'], unit='ms', utc=True).dt.tz_convert(datetime.now().astimezone().tzinfo).dt.tz_localize(None)
+    return df
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    started = time.time()
+    print(f"색인 완료: {update_index()}줄 ({time.time() - started:.2f}초)")
@@ -0,0 +1,115 @@
+# monte_carlo.py (백테스트 체결 목록의 몬테카를로 강건성 분석: 체결 순서/표본/비용이 달라져도 전략이 버티는지)
+#  - bootstrap: 체결을 복원 추출해 같은 개수의 가상 체결 순서를 만든다 (손익 분포 자체의 불확실성)
+#  - shuffle: 같은 체결을 순서만 섞는다 (최종 손익은 그대로, 낙폭 분포만 달라짐)
+#  - 비용 교란: 시뮬레이션마다 수수료 배율, 체결마다 추가 슬리피지를 무작위로 적용
+#  - 설정한 leverage/quantity 로 손익을 다시 계산 -> 보유 중 최대 역행폭(mae_pct)이 격리 마진 청산 거리를 넘은 체결은 증거금 전액 손실
+#  - (시뮬레이션 x 체결) 배열로 한 번에 계산, 묶음으로 나눠 모든 코어에서 실행
+#  실행: python monte_carlo.py [USD-M|COIN-M|Spot] 시작일 종료일
+
+import os, sys, json, time
+from datetime import date
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import backtest
+import report_engine
+from exchange_sim import DEFAULT_SIM_SETTINGS, SETTINGS_KEYS, split_symbol
+
+MC_DEFAULTS = {
+    'simulations': 20000,
+    'method': "bootstrap",       # bootstrap | shuffle
+    'fee_jitter_pct': 0.0,       # 시뮬레이션마다 수수료를 +-이 비율(%)만큼 흔든다
+    'extra_slippage_bps': 0.0,   # 체결마다 0 ~ 이 값(bp) 사이의 추가 슬리피지
+    'ruin_drawdown_pct': 50.0,   # 자본이 이만큼 줄거나 포지션 하나의 증거금보다 적어지면 파산
+    'initial_capital': None,     # 없으면 exchange_sim 기본 잔고 (USDT 10000 / COIN-M 기초 코인)
+    'seed': 0,
+    'workers': None,             # 없으면 CPU 코어 수
+}
+CHUNK_CELLS = 2_000_000 # 묶음 하나의 (시뮬레이션 x 체결) 크기 상한 -> 작업 프로세스 메모리 제한
+PERCENTILES = [5, 25, 50, 75, 95]
+
+def load_mc_settings(config):
+    return dict(MC_DEFAULTS, **config.get("monte_carlo_settings", {}))
+
+def get_initial_capital(market, symbol, mc_settings):
+    if mc_settings['initial_capital'] is not None: return float(mc_settings['initial_capital'])
+    balances = DEFAULT_SIM_SETTINGS['balances'][market]
+    asset = split_symbol(market, symbol)[0] if market == "COIN-M" else "USDT"
+    return float(balances.get(asset, next(iter(balances.values()))))
+
+def prepare_trade_arrays(trades, market, settings, leverage=None, quantity=None):
+    """체결 목록 -> 시뮬레이션용 체결별 배열. leverage/quantity 를 주면 그 값으로 손익/증거금/청산 여부를 다시 계산."""
+    leverage = leverage or settings['leverage']
+    scale = quantity / settings['quantity'] if quantity else 1.0
+    direction = np.where(trades['side'].to_numpy() == "LONG", 1.0, -1.0)
+    entry, exit_price = trades['entry_price'].to_numpy(dtype=float), trades['exit_price'].to_numpy(dtype=float)
+    qty = trades['qty'].to_numpy(dtype=float) * scale # COIN-M 은 계약 USD 가치
+    if market == "COIN-M":
+        gross = direction * qty * (1 / entry - 1 / exit_price)
+        entry_cost, cost_base, margin = qty / entry, qty / entry + qty / exit_price, qty / entry / leverage
+    else:
+        gross = direction * qty * (exit_price - entry)
+        entry_cost, cost_base, margin = qty * entry, qty * (entry + exit_price), qty * entry / leverage
+    if market == "Spot": liquidated = np.zeros(len(trades), dtype=bool)
+    else: liquidated = trades['mae_pct'].to_numpy(dtype=float) >= (1 / leverage - DEFAULT_SIM_SETTINGS['maintenance_margin_rate']) * 100
+    return {'gross': gross, 'entry_cost': entry_cost, 'cost_base': cost_base, 'margin': margin, 'liquidated': liquidated,
+            'fee': settings['taker_fee'], 'leverage': leverage, 'quantity': settings['quantity'] * scale}
+
+def _simulate_chunk(arrays, mc_settings, count, seed, capital, ruin_equity):
+    # 작업 프로세스에서 실행: 시뮬레이션 count 개의 (최종 손익, 최대 낙폭, 최대 낙폭 %, 파산 여부)
+    rng = np.random.default_rng(seed)
+    n = len(arrays['gross'])
+    if mc_settings['method'] == "shuffle": index = rng.permuted(np.tile(np.arange(n), (count, 1)), axis=1)
+    else: index = rng.integers(0, n, size=(count, n))
+    fee = arrays['fee']
+    if mc_settings['fee_jitter_pct']:
+        jitter = mc_settings['fee_jitter_pct'] / 100
+        fee = fee * rng.uniform(1 - jitter, 1 + jitter, size=(count, 1))
+    cost_base = arrays['cost_base'][index]
+    pnl = arrays['gross'][index] - fee * cost_base
+    if mc_settings['extra_slippage_bps']: # 진입/청산 체결가가 모두 불리하게 밀린 만큼
+        pnl -= rng.uniform(0, mc_settings['extra_slippage_bps'] / 10_000, size=(count, n)) * cost_base
+    pnl = np.where(arrays['liquidated'][index], -arrays['margin'][index] - fee * arrays['entry_cost'][index], pnl)
+    equity = capital + np.cumsum(pnl, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), capital)
+    drawdown = peak - equity
+    return equity[:, -1] - capital, drawdown.max(axis=1), (drawdown / peak).max(axis=1) * 100, (equity <= ruin_equity).any(axis=1)
+
+def run_monte_carlo(trades, market, symbol, settings, mc_settings=None, leverage=None, quantity=None):
+    """체결 목록으로 몬테카를로 시뮬레이션. (요약 dict, 시뮬레이션별 배열 dict) 반환."""
+    mc_settings = dict(MC_DEFAULTS, **(mc_settings or {}))
+    if trades.empty: return {'simulations': 0, 'trades': 0}, {}
+    started = time.time()
+    arrays = prepare_trade_arrays(trades, market, settings, leverage, quantity)
+    capital = get_initial_capital(market, symbol, mc_settings)
+    ruin_equity = max(capital * (1 - mc_settings['ruin_drawdown_pct'] / 100), float(np.median(arrays['margin'])))
+    total, per_chunk = int(mc_settings['simulations']), max(1, CHUNK_CELLS // len(trades))
+    counts = [min(per_chunk, total - done) for done in range(0, total, per_chunk)]
+    seeds = np.random.SeedSequence(mc_settings['seed']).spawn(len(counts))
+    workers = min(mc_settings['workers'] or os.cpu_count() or 1, len(counts))
+    args = (repeat(arrays), repeat(mc_settings), counts, seeds, repeat(capital), repeat(ruin_equity))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool: results = list(pool.map(_simulate_chunk, *args))
+    else: results = list(map(_simulate_chunk, *args))
+    terminal, max_dd, max_dd_pct, ruined = (np.concatenate(parts) for parts in zip(*results))
+    samples = {'terminal_pnl': terminal, 'max_drawdown': max_dd, 'max_drawdown_pct': max_dd_pct, 'ruined': ruined}
+    percentiles = lambda values: {p: float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary = {'simulations': total, 'trades': len(trades), 'method': mc_settings['method'], 'initial_capital': capital,
+               'leverage': arrays['leverage'], 'quantity': arrays['quantity'], 'liquidated_trades': int(arrays['liquidated'].sum()),
+               'terminal_pnl': percentiles(terminal), 'max_drawdown': percentiles(max_dd), 'max_drawdown_pct': percentiles(max_dd_pct),
+               'prob_loss_pct': float((terminal < 0).mean() * 100), 'ruin_equity': ruin_equity, 'risk_of_ruin_pct': float(ruined.mean() * 100),
+               'elapsed_sec': time.time() - started}
+    return summary, samples
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with open('config.json', 'r') as f: config = json.load(f)
+    market = sys.argv[1] if len(sys.argv) > 1 else "USD-M"
+    start = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else date.today().replace(day=1)
+    end = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+    market_settings = config.get(SETTINGS_KEYS[market], {})
+    symbol = market_settings.get("symbol", "BTCUSD_PERP" if market == "COIN-M" else "BTCUSDT")
+    settings = backtest.load_backtest_settings(config, market)
+    trades, _ = backtest.backtest_symbol(config, market, symbol, market_settings.get("timeframe", "1h"), *report_engine.get_range_ms(start, end), settings=settings)
+    summary, _ = run_monte_carlo(trades, market, symbol, settings, load_mc_settings(config))
+    for key, value in summary.items(): print(f"{key}: {value}")
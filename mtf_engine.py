@@ -0,0 +1,163 @@
+# mtf_engine.py (멀티 타임프레임 엔진: 기준 타임프레임 캔들 하나의 흐름에서 상위 타임프레임 캔들/지표를 이어서 만든다)
+#  - 상위 타임프레임(1h/4h/1d 등)은 처음 한 번(또는 기준 캔들이 빠졌을 때)만 받아 씨앗으로 쓰고, 이후에는 기준 캔들이 확정될 때마다
+#    구간이 다 찬 상위 캔들을 기준 캔들에서 합쳐 붙인다 -> 매 주기 API 호출은 봇이 원래 받던 기준 캔들 조회 1회
+#  - 지표는 상위 캔들이 확정될 때만 그 타임프레임에서 다시 계산 (indicators 모듈, 봇과 같은 열 이름)
+#  - series(타임프레임) 은 확정 캔들 + 진행 중 캔들의 CandleSeries -> confirmed()/previous() 가 봇의 iloc[-2]/[-3] 과 같다
+#    (진행 중 캔들은 지금까지의 기준 캔들을 합친 참고값, 지표는 NaN)
+#  - 진입 조건은 signal_batch 와 같은 식을 타임프레임별로 평가, mtf_settings.min_conditions 로 "1h 3개 이상 + 4h 2개 이상" 같은 합류 규칙
+
+import numpy as np
+import indicators
+import signal_batch
+from candle_series import CandleSeries
+from candle_store import INTERVAL_MS
+
+FIELDS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+MTF_DEFAULTS = {
+    'enabled': False,
+    'timeframes': ['15m', '1h', '4h', '1d'], # 기준 타임프레임(봇 timeframe)의 배수인 것만 사용
+    'min_conditions': {},                   # {타임프레임: 최소 충족 진입 조건 수}, 비어 있으면 합류 규칙 없이 HTF 추세만 엔진에서
+    'history': 200,                         # 타임프레임별로 보관하는 확정 캔들 수 (씨앗 조회 limit)
+}
+
+def load_mtf_settings(config):
+    settings = dict(MTF_DEFAULTS, **config.get("mtf_settings", {}))
+    settings['entry_settings'] = signal_batch.load_entry_settings(config) # 타임프레임별 조건 평가용 (use_*/임계값)
+    return settings
+
+def _empty():
+    return {field: np.empty(0, np.int64 if field.endswith('_time') else np.float64) for field in FIELDS}
+
+def _select(columns, index):
+    return {field: columns[field][index] for field in FIELDS}
+
+def _concat(columns, other, keep):
+    return {field: np.concatenate([columns[field], other[field]])[-keep:] for field in FIELDS}
+
+def _aggregate(rows, open_time, interval_ms):
+    # 기준 캔들 여러 개 -> 상위 캔들 하나 (필드별 길이 1 배열)
+    return {'open_time': np.array([open_time], np.int64), 'open': rows['open'][:1], 'high': np.array([rows['high'].max()]),
+            'low': np.array([rows['low'].min()]), 'close': rows['close'][-1:], 'volume': np.array([rows['volume'].sum()]),
+            'close_time': np.array([open_time + interval_ms - 1], np.int64)}
+
+class MultiTimeframeEngine:
+    """기준 타임프레임 캔들로 상위 타임프레임 캔들/지표를 동기화. update() -> needs_seed() 의 타임프레임만 seed() -> series()/trend()/confluence()."""
+
+    def __init__(self, base_interval, timeframes, params, history=MTF_DEFAULTS['history']):
+        base_ms = INTERVAL_MS[base_interval]
+        usable = {tf for tf in timeframes if tf in INTERVAL_MS and INTERVAL_MS[tf] >= base_ms and INTERVAL_MS[tf] % base_ms == 0}
+        self.base_interval, self.params, self.history = base_interval, dict(params), history
+        self.requested = tuple(timeframes)
+        self.timeframes = sorted(usable | {base_interval}, key=INTERVAL_MS.get)
+        self.skipped = sorted(set(timeframes) - usable - {base_interval}) # 기준 타임프레임에서 만들 수 없는 것 (더 짧거나 배수가 아님)
+        # 가장 긴 상위 캔들 두 개를 채울 만큼은 기준 캔들을 보관 (진행 중 구간 + 방금 끝난 구간)
+        self.base_keep = max(history, 2 * max(INTERVAL_MS[tf] // base_ms for tf in self.timeframes))
+        self.base, self.live = _empty(), None
+        self.completed = {tf: None for tf in self.timeframes if tf != base_interval}
+        self.stale = set(self.completed) # 씨앗이 필요한 타임프레임
+        self._columns = {} # 타임프레임 -> 확정 캔들 지표 열 (확정 캔들이 늘어날 때만 다시 계산)
+
+    def matches(self, base_interval, timeframes, params, history=MTF_DEFAULTS['history']):
+        # 봇 설정이 바뀌었는지 (/reload 후 다시 만들지 판단)
+        return (self.base_interval, self.requested, self.params, self.history) == (base_interval, tuple(timeframes), dict(params), history)
+
+    def update(self, candles):
+        """봇이 받은 기준 타임프레임 CandleSeries (마지막 행은 진행 중 캔들)를 반영."""
+        if len(candles) < 2: return self
+        columns = {field: np.asarray(candles[field]) for field in FIELDS}
+        confirmed = _select(columns, slice(0, len(candles) - 1))
+        # 새로 받은 구간이 우선 (겹치는 앞부분만 보관분에서), 사이에 빠진 캔들이 있으면 상위 구간 개수 검사에서 걸러진다
+        older = _select(self.base, self.base['open_time'] < confirmed['open_time'][0])
+        self.base = _concat(older, confirmed, self.base_keep)
+        self.live = _select(columns, slice(len(candles) - 1, None))
+        self._columns.pop(self.base_interval, None)
+        for interval in self.completed: self._advance(interval)
+        return self
+
+    def needs_seed(self):
+        return sorted(self.stale, key=INTERVAL_MS.get)
+
+    def seed(self, interval, candles):
+        """상위 타임프레임 캔들을 직접 받아 씨앗으로 (진행 중 캔들은 기준 캔들 기준으로 잘라낸다)."""
+        if interval not in self.completed or candles is None or len(candles) == 0: return self
+        self.completed[interval] = {field: np.asarray(candles[field])[-self.history:] for field in FIELDS}
+        self.stale.discard(interval)
+        self._columns.pop(interval, None)
+        self._advance(interval)
+        return self
+
+    def _advance(self, interval):
+        # 기준 캔들로 다 채워진 상위 구간을 확정 캔들로 붙인다
+        completed = self.completed[interval]
+        if completed is None or interval in self.stale or not len(self.base['open_time']): return
+        interval_ms, ratio = INTERVAL_MS[interval], INTERVAL_MS[interval] // INTERVAL_MS[self.base_interval]
+        base_close = self.base['close_time'][-1]
+        changed = False
+        if len(completed['open_time']) and completed['close_time'][-1] > base_close: # 씨앗에 섞인 진행 중 캔들
+            completed = _select(completed, completed['close_time'] <= base_close); changed = True
+        if not len(completed['open_time']):
+            self.stale.add(interval); return
+        next_open = int(completed['open_time'][-1]) + interval_ms
+        while next_open + interval_ms - 1 <= base_close:
+            lo, hi = np.searchsorted(self.base['open_time'], [next_open, next_open + interval_ms])
+            if hi - lo != ratio: # 기준 캔들이 빠졌거나 보관 구간 밖 -> 다시 씨앗부터
+                self.stale.add(interval); break
+            completed = _concat(completed, _aggregate(_select(self.base, slice(lo, hi)), next_open, interval_ms), self.history)
+            next_open += interval_ms; changed = True
+        self.completed[interval] = completed
+        if changed: self._columns.pop(interval, None)
+
+    def _confirmed(self, interval):
+        if interval == self.base_interval: return self.base if len(self.base['open_time']) else None
+        return None if interval in self.stale else self.completed.get(interval)
+
+    def series(self, interval):
+        """확정 캔들 + 진행 중 캔들 CandleSeries (지표 열 포함). 아직 만들 수 없으면 None."""
+        completed = self._confirmed(interval)
+        if completed is None or self.live is None: return None
+        if interval == self.base_interval: partial = self.live
+        else:
+            interval_ms = INTERVAL_MS[interval]
+            next_open = int(completed['open_time'][-1]) + interval_ms
+            lo = np.searchsorted(self.base['open_time'], next_open)
+            partial = _aggregate(_concat(_select(self.base, slice(lo, None)), self.live, self.base_keep), next_open, interval_ms)
+        if interval not in self._columns:
+            self._columns[interval] = indicators.compute_indicator_columns(completed['high'], completed['low'], completed['close'], completed['volume'], self.params)
+        rows = _concat(completed, partial, len(completed['open_time']) + 1)
+        series = CandleSeries(*(rows[field] for field in FIELDS))
+        return series.add_columns({name: np.append(values, np.nan) for name, values in self._columns[interval].items()})
+
+    def trend(self, interval, short_len, long_len):
+        """봇 get_htf_trend 와 같은 판정 (확정 캔들 SMA 단기/장기): UP / DOWN / NEUTRAL."""
+        completed = self._confirmed(interval)
+        if completed is None or len(completed['close']) < long_len: return "NEUTRAL"
+        short_val, long_val = indicators.sma(completed['close'], short_len)[-1], indicators.sma(completed['close'], long_len)[-1]
+        if short_val > long_val: return "UP"
+        if short_val < long_val: return "DOWN"
+        return "NEUTRAL"
+
+    def entry_checks(self, interval, settings):
+        """확정 캔들 기준 봇 진입 조건 (켜진 조건만): ({조건: bool} 롱, {조건: bool} 숏). 캔들이 부족하면 None."""
+        series = self.series(interval)
+        if series is None or len(series) < 3: return None
+        names = indicators.condition_column_names(self.params)
+        latest = {key: series[name][-2] for key, name in names.items()}
+        prev = {key: series[name][-3] for key, name in names.items()}
+        long_checks, short_checks = signal_batch.entry_conditions(latest, prev, settings)
+        enabled = [key for key in signal_batch.CONDITION_KEYS if settings.get(f"use_{key}", True)]
+        return {key: bool(long_checks[key]) for key in enabled}, {key: bool(short_checks[key]) for key in enabled}
+
+    def confluence(self, settings, rules):
+        """rules: {타임프레임: 최소 충족 조건 수}. 모든 타임프레임이 기준 이상인 방향만 True.
+        반환: {'long': bool, 'short': bool, 'detail': {타임프레임: {'long': 개수, 'short': 개수, 'min': 최소} 또는 None}}"""
+        long_ok = short_ok = bool(rules)
+        detail = {}
+        for interval, minimum in rules.items():
+            checks = self.entry_checks(interval, settings)
+            if checks is None:
+                detail[interval] = None; long_ok = short_ok = False; continue
+            long_count, short_count = sum(checks[0].values()), sum(checks[1].values())
+            detail[interval] = {'long': long_count, 'short': short_count, 'min': minimum}
+            long_ok = long_ok and long_count >= minimum
+            short_ok = short_ok and short_count >= minimum
+        return {'long': long_ok, 'short': short_ok, 'detail': detail}
@@ -0,0 +1,151 @@
+# paper_trading.py (모의 거래 실행: config.json 의 "mode": "Paper" 로 선택)
+#  - 시세/캔들/거래소 정보 같은 공개 요청은 실제 거래소(메인넷)로, 주문/잔고/포지션 요청은 프로세스 안의 매칭 엔진(exchange_sim.MatchingEngine)으로
+#  - 체결: 시장가는 실시간 호가(매수=매도 1호가, 매도=매수 1호가) + 슬리피지 + 테이커 수수료,
+#          STOP_MARKET 은 1분봉이 스톱가에 닿으면, 격리 마진 포지션은 청산가에 닿으면 강제 청산
+#  - 시세 원천(LiveFeed)은 짧은 캐시를 두고 여러 매칭 엔진이 나눠 쓴다 (모의 전략 수백 개 -> 공개 요청은 심볼당 한 번)
+#  - 잔고/포지션/대기 주문/체결은 시장별로 paper/paper_<시장>.json 에 저장 -> 봇 재시작, 대시보드와 상태 공유
+#    (읽기 -> 처리 -> 저장 전체를 파일 잠금(paper_<시장>.json.lock)으로 감싸 여러 프로세스가 써도 주문/체결이 사라지지 않음)
+
+import os, json, time, tempfile, threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import numpy as np
+import requests
+import exchange_sim
+from candle_store import INTERVAL_MS
+if os.name == 'nt': import msvcrt
+else: import fcntl
+
+PAPER_FOLDER = "paper"
+PAPER_DEFAULTS = {'slippage_bps': 2.0} # 나머지(수수료/초기 잔고/유지 증거금률)는 exchange_sim 기본값, config 의 "paper_settings" 로 변경
+PAPER_FILE_KEYS = {"Spot": "spot", "USD-M": "usd_m", "COIN-M": "coin_m"}
+# 실제 거래소로 그대로 보내는 공개 요청 (나머지는 모두 로컬 매칭 엔진이 처리)
+PUBLIC_ENDPOINTS = {'ping', 'time', 'exchangeInfo', 'klines', 'continuousKlines', 'markPriceKlines', 'depth', 'trades', 'aggTrades', 'avgPrice',
+                    'ticker/24hr', 'ticker/price', 'ticker/bookTicker', 'premiumIndex', 'fundingRate'}
+FEED_TTL_SEC = 2.0
+FEED_KLINE_LIMIT = 240 # 최근 4시간 1분봉 (가중치 2)
+
+class LiveFeed:
+    """실시간 공개 시세를 매칭 엔진에 주는 시세 원천 (RecordedFeed 와 같은 price/path + 호가 book). 같은 요청은 TTL 동안 한 번만."""
+    def __init__(self, client, base_interval="1m", ttl_sec=FEED_TTL_SEC):
+        self.client, self.base_interval, self.ttl = client, base_interval, ttl_sec
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    def _cached(self, key, loader):
+        # 심볼별 잠금 -> 여러 엔진/스레드가 동시에 요청해도 거래소에는 한 번만
+        with self.lock: key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self.cache.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                entry = self.cache[key] = (time.time(), loader())
+            return entry[1]
+
+    def price(self, market, symbol, now_ms):
+        def load():
+            if market == "USD-M": ticker = self.client.futures_symbol_ticker(symbol=symbol)
+            elif market == "COIN-M": ticker = self.client.futures_coin_symbol_ticker(symbol=symbol)
+            else: ticker = self.client.get_symbol_ticker(symbol=symbol)
+            return float((ticker[0] if isinstance(ticker, list) else ticker)['price'])
+        return self._cached(('price', market, symbol), load)
+
+    def book(self, market, symbol, now_ms):
+        def load():
+            if market == "USD-M": ticker = self.client.futures_orderbook_ticker(symbol=symbol)
+            elif market == "COIN-M": ticker = self.client.futures_coin_orderbook_ticker(symbol=symbol)
+            else: ticker = self.client.get_orderbook_ticker(symbol=symbol)
+            ticker = ticker[0] if isinstance(ticker, list) else ticker
+            return float(ticker['bidPrice']), float(ticker['askPrice'])
+        return self._cached(('book', market, symbol), load)
+
+    def _fetch_klines(self, market, symbol, **params):
+        if market == "USD-M": klines = self.client.futures_klines(symbol=symbol, interval=self.base_interval, **params)
+        elif market == "COIN-M": klines = self.client.futures_coin_klines(symbol=symbol, interval=self.base_interval, **params)
+        else: klines = self.client.get_klines(symbol=symbol, interval=self.base_interval, **params)
+        return {field: np.array([float(k[i]) for k in klines]) for i, field in enumerate(('open_time', 'open', 'high', 'low'))}
+
+    def path(self, market, symbol, from_ms, to_ms):
+        """from_ms 이후 ~ to_ms 까지 새로 확정된 기본 타임프레임 캔들 (open_time, open, high, low) 배열."""
+        interval_ms = INTERVAL_MS[self.base_interval]
+        candles = self._cached(('klines', market, symbol), lambda: self._fetch_klines(market, symbol, limit=FEED_KLINE_LIMIT))
+        if not len(candles['open_time']) or candles['open_time'][0] > from_ms - interval_ms: # 캐시보다 오래된 구간 (오래 멈춰 있던 봇)
+            candles = self._fetch_klines(market, symbol, startTime=int(from_ms - interval_ms + 1), limit=1000)
+        close_times = candles['open_time'] + interval_ms
+        mask = (close_times > from_ms) & (close_times <= to_ms)
+        return candles['open_time'][mask], candles['open'][mask], candles['high'][mask], candles['low'][mask]
+
+def get_paper_settings(config):
+    return exchange_sim.get_sim_settings(config, "paper_settings", PAPER_DEFAULTS)
+
+def create_paper_engine(config, feed):
+    """같은 시세 원천을 쓰는 독립 계좌 하나 (여러 모의 전략을 한 프로세스에서 돌릴 때 전략마다 하나씩)."""
+    return exchange_sim.MatchingEngine(feed, get_paper_settings(config))
+
+def get_state_path(market, state_folder=PAPER_FOLDER):
+    return os.path.join(state_folder, f"paper_{PAPER_FILE_KEYS[market]}.json")
+
+@contextmanager
+def lock_state_file(market, state_folder=PAPER_FOLDER):
+    """상태 파일의 프로세스 간 배타 잠금 (봇, 대시보드, 대시보드 세션별 엔진이 같은 파일을 읽고 쓴다)."""
+    if not os.path.exists(state_folder): os.makedirs(state_folder, exist_ok=True)
+    with open(get_state_path(market, state_folder) + ".lock", 'a+b') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try: msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1); break
+                except OSError: pass # LK_LOCK 은 10초 동안 재시도한 뒤 실패 -> 잠금이 풀릴 때까지 계속 대기
+        else: fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally:
+            if os.name == 'nt': f.seek(0); msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class PaperTransport(requests.adapters.HTTPAdapter):
+    """Client 세션에 mount: 공개 요청은 실제 거래소로 보내고, 주문/계정 요청은 SimExchange 가 처리한 뒤 상태 파일에 저장."""
+    def __init__(self, exchange, state_folder=PAPER_FOLDER):
+        super().__init__()
+        self.exchange, self.state_folder = exchange, state_folder
+        self.local = exchange_sim.SimTransport(exchange)
+        self.loaded_mtime = {}
+
+    def _load_state(self, market):
+        # 다른 프로세스(봇/대시보드)가 저장한 상태가 있으면 다시 읽는다
+        path = get_state_path(market, self.state_folder)
+        try: stat = os.stat(path)
+        except FileNotFoundError: return
+        mtime = (stat.st_mtime_ns, stat.st_size) # 시각 해상도가 낮은 파일 시스템 대비 크기도 비교
+        if self.loaded_mtime.get(market) == mtime: return
+        with open(path, 'r', encoding='utf-8') as f: self.exchange.engine.set_state(market, json.load(f))
+        self.loaded_mtime[market] = mtime
+
+    def _save_state(self, market):
+        # bot_snapshot 과 같이 임시 파일에 쓴 뒤 교체 -> 읽는 쪽은 항상 완성된 파일만 본다
+        if not os.path.exists(self.state_folder): os.makedirs(self.state_folder, exist_ok=True)
+        path = get_state_path(market, self.state_folder)
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_folder, prefix=f".paper_{PAPER_FILE_KEYS[market]}_", suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump(self.exchange.engine.get_state(market), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self.loaded_mtime[market] = (stat.st_mtime_ns, stat.st_size)
+
+    def send(self, request, **kwargs):
+        parts = urlparse(request.url).path.strip('/').split('/')
+        market = exchange_sim.MARKET_PREFIXES.get(parts[0])
+        if market is None or '/'.join(parts[2:]) in PUBLIC_ENDPOINTS: return super().send(request, **kwargs)
+        engine = self.exchange.engine
+        with engine.lock, lock_state_file(market, self.state_folder):
+            self._load_state(market)
+            before = (len(engine.trades[market]), len(engine.open_orders[market]))
+            response = self.local.send(request)
+            # 주문/설정 변경, 또는 조회 중에 스톱/청산이 체결됐으면 저장
+            if request.method != 'GET' or before != (len(engine.trades[market]), len(engine.open_orders[market])): self._save_state(market)
+        return response
+
+def enable_paper_trading(client, config, feed=None, state_folder=PAPER_FOLDER):
+    """메인넷 공개 API 로 만든 Client 에 모의 거래를 연결한다. 봇 코드는 그대로 Client 메서드를 호출하면 된다. SimExchange 반환."""
+    settings = get_paper_settings(config)
+    feed = feed or LiveFeed(client, settings['base_interval'])
+    exchange = exchange_sim.SimExchange(config, feed=feed, settings=settings)
+    client.session.mount("https://", PaperTransport(exchange, state_folder))
+    return exchange
@@ -0,0 +1,280 @@
+# report_engine.py (기간 보고서: 거래 원장 기반 벡터화 집계 + 지난 날짜 일별 집계 캐시)
+#  일별 손익, 누적 자산 곡선, 최대 낙폭, 수수료 합계, 라운드트립(진입~청산) 승률, 포지션 보유 시간 비율
+#  지난 날짜의 일별 집계는 (날짜, 설정 해시)별 파일로 한 번만 저장하고, 오늘과 캐시에 없는 날짜만 원장에서 계산한다
+#  현물 실현 손익은 매수 로트를 선입선출(FIFO)로 매도에 대응시켜 체결마다 계산한다 (선물과 같은 지표로 집계)
+#  COIN-M(코인 기준) 손익은 체결 시점의 USDT 가격(로컬 캔들 저장소)으로 체결마다 환산한다
+#  거래 상세는 원장에서 청크 단위로 읽어 한 줄씩 흘려보낸다 (전체를 메모리에 올리지 않음)
+
+import os, json, hashlib, tempfile
+import numpy as np
+import pandas as pd
+from datetime import datetime, date
+import trade_ledger, candle_store
+
+KST_OFFSET = pd.Timedelta(hours=9)
+QUOTE_ASSETS = ('USDT', 'FDUSD', 'USDC', 'BUSD', 'BTC', 'ETH', 'BNB')
+FUTURES_FLAT_EPS = 1e-9       # 선물 수량은 정확한 소수라 거의 0이면 청산으로 본다
+SPOT_DUST_RATIO = 0.01        # 현물은 수수료/수량 단위 때문에 먼지 잔고가 남으므로 평균 체결 수량의 1% 이하를 청산으로 본다
+DETAIL_CHUNK_SIZE = 5000
+REPORT_CACHE_FOLDER = os.path.join("reports", "cache")
+REPORT_CACHE_VERSION = 3      # 일별 집계 형식이 바뀌면 올린다 (이전 캐시는 설정 해시가 달라져 자동으로 무시됨)
+USDT_CONVERSION_INTERVAL = '1h'
+USDT_STABLE_ASSETS = ('USDT', 'FDUSD', 'USDC', 'BUSD')
+DAY_COLUMNS = ['pnl', 'pnl_usdt', 'unconverted_fills', 'unmatched_qty', 'realized', 'fees', 'fills', 'buys', 'sells', 'buy_volume', 'sell_volume',
+               'trips', 'wins', 'losses', 'trip_pnl', 'held_ms', 'open_at_end']
+LOG_COUNT_KEYS = ('days', 'entries', 'exits', 'orders_succeeded', 'orders_failed')
+
+def get_range_ms(start_date, end_date):
+    start_ms = int(datetime.combine(start_date, datetime.min.time()).timestamp() * 1000)
+    end_ms = int(datetime.combine(end_date, datetime.max.time()).timestamp() * 1000)
+    return start_ms, end_ms
+
+def split_spot_symbol(symbol):
+    quote = next((q for q in QUOTE_ASSETS if symbol.endswith(q) and len(symbol) > len(q)), symbol[-4:])
+    return symbol[:-len(quote)], quote
+
+def get_usdt_pair(market, symbol):
+    # 손익 단위를 USDT로 바꿀 때 쓰는 현물 가격 심볼 (USD-M, USDT 계열 현물은 환산 불필요)
+    if market == "USD-M": return None
+    asset = symbol.split('_')[0].replace("USD", "") if market == "COIN-M" else split_spot_symbol(symbol)[1]
+    return None if asset in USDT_STABLE_ASSETS else asset + "USDT"
+
+def attach_usdt_rates(mode, fills, pair):
+    """체결마다 직전 확정 캔들의 종가를 USDT 환산 가격으로 붙인다 (시간 기준 as-of 조인, 체결 수와 관계없이 한 번에 계산).
+    캔들이 없는 체결은 usdt_rate가 NaN."""
+    if pair is None or fills.empty: return fills.assign(usdt_rate=1.0 if pair is None else np.nan)
+    interval_ms = candle_store.INTERVAL_MS[USDT_CONVERSION_INTERVAL]
+    candles = candle_store.query_candles(mode, "Spot", pair, USDT_CONVERSION_INTERVAL, fills['time'].iloc[0] - 2 * interval_ms, fills['time'].iloc[-1])
+    if candles.empty: return fills.assign(usdt_rate=np.nan)
+    rates = candles[['close_time', 'close']].rename(columns={'close_time': 'time', 'close': 'usdt_rate'}).astype({'time': 'int64'})
+    merged = pd.merge_asof(fills[['time']].astype('int64').reset_index(), rates, on='time', direction='backward',
+                           tolerance=2 * interval_ms) # 저장소에 빈 구간이 있으면 오래된 가격을 쓰지 않고 환산 실패로 둔다
+    return fills.assign(usdt_rate=merged.set_index('index')['usdt_rate'])
+
+def _local_dates(time_ms):
+    # 보고서 기간(get_range_ms)과 같은 로컬 시간 기준 날짜
+    local_tz = datetime.now().astimezone().tzinfo
+    return pd.to_datetime(time_ms.astype('int64'), unit='ms', utc=True).dt.tz_convert(local_tz).dt.tz_localize(None).dt.normalize()
+
+def label_round_trips(df, flat_eps):
+    """체결마다 라운드트립 번호를 붙인다. 직전 포지션이 0인 체결에서 새 라운드트립이 시작된다."""
+    signed_qty = np.where(df['side'].to_numpy() == 'BUY', 1.0, -1.0) * df['effective_qty'].to_numpy()
+    position = np.cumsum(signed_qty)
+    prev_position = np.concatenate(([0.0], position))[:-1]
+    trip_id = np.cumsum(np.abs(prev_position) <= flat_eps)
+    return trip_id, np.abs(position) <= flat_eps
+
+def match_spot_fifo(is_buy, qty, effective_qty, quote_qty, buy_fee, sell_fee):
+    """현물 매수 로트를 선입선출로 매도에 대응시켜 체결별 실현 손익(수수료 차감 전/후)과 대응되지 않은 매도 수량을 계산.
+    누적 매수 수량 축 위의 누적 매입 원가를 선형 보간(np.interp)하면 매도가 소비한 로트 구간의 원가가 반복문 없이 나온다.
+    원장 이전부터 보유하던 코인을 판 수량(매수 기록보다 많이 판 수량)은 원가를 알 수 없으므로 손익에서 제외한다."""
+    buy_qty = np.where(is_buy, effective_qty, 0.0)
+    cum_buy = np.cumsum(buy_qty)
+    cum_sell = np.cumsum(np.where(is_buy, 0.0, qty))
+    uncovered = np.maximum.accumulate(np.maximum(cum_sell - cum_buy, 0.0)) # 매수 기록 없이 판 누적 수량
+    consumed = cum_sell - uncovered                                         # FIFO 큐에서 소비한 누적 수량
+    consumed_before = np.concatenate(([0.0], consumed))[:-1]
+    queue_qty = np.concatenate(([0.0], cum_buy[is_buy]))
+    queue_cost = np.concatenate(([0.0], np.cumsum(quote_qty[is_buy] + buy_fee[is_buy])))
+    queue_gross = np.concatenate(([0.0], np.cumsum(quote_qty[is_buy])))
+    matched = np.where(is_buy, 0.0, consumed - consumed_before)
+    matched_ratio = np.divide(matched, qty, out=np.zeros(len(qty)), where=qty > 0)
+    cost = np.interp(consumed, queue_qty, queue_cost) - np.interp(consumed_before, queue_qty, queue_cost)
+    gross_cost = np.interp(consumed, queue_qty, queue_gross) - np.interp(consumed_before, queue_qty, queue_gross)
+    realized_gross = np.where(is_buy, 0.0, quote_qty * matched_ratio - gross_cost)
+    realized_net = np.where(is_buy, 0.0, (quote_qty - sell_fee) * matched_ratio - cost)
+    return realized_gross, realized_net, np.where(is_buy, 0.0, qty - matched)
+
+def prepare_fills(df, market, symbol):
+    """원장 거래에 수수료 환산(마진/견적 자산 기준)과 체결별 손익 흐름(수수료 차감 후 실현 손익)을 추가."""
+    df = df.copy()
+    df['commission'] = df['commission'].fillna(0.0); df['realized_pnl'] = df['realized_pnl'].fillna(0.0)
+    if market == "Spot":
+        base, quote = split_spot_symbol(symbol)
+        quote_qty = df['quote_qty'].fillna(df['price'] * df['qty'])
+        # 수수료를 견적 자산(USDT)으로 환산: 견적 자산 수수료는 그대로, 기초 자산 수수료는 체결가로 환산, 그 외(BNB 등)는 환산하지 않음
+        df['fee_quote'] = np.select([df['commission_asset'] == quote, df['commission_asset'] == base], [df['commission'], df['commission'] * df['price']], 0.0)
+        base_fee = np.where(df['commission_asset'] == base, df['commission'], 0.0)
+        df['effective_qty'] = np.where(df['side'] == 'BUY', df['qty'] - base_fee, df['qty'])
+        # 매수: 견적 자산 수수료는 로트 원가에 포함 (기초 자산 수수료는 이미 받은 수량에서 빠짐), 매도: 환산 수수료를 매도 대금에서 차감
+        is_buy = (df['side'] == 'BUY').to_numpy()
+        buy_fee = np.where(df['commission_asset'] == quote, df['commission'], 0.0)
+        df['realized_pnl'], df['cash_flow'], df['unmatched_qty'] = match_spot_fifo(
+            is_buy, df['qty'].to_numpy(dtype='float64'), df['effective_qty'].to_numpy(dtype='float64'),
+            quote_qty.to_numpy(dtype='float64'), buy_fee, df['fee_quote'].to_numpy(dtype='float64'))
+        flat_eps = max(df['qty'].mean() * SPOT_DUST_RATIO, 1e-12) if len(df) else 1e-12
+    else:
+        df['fee_quote'] = df['commission']
+        df['effective_qty'] = df['qty']
+        df['cash_flow'] = df['realized_pnl'] - df['commission'] # 선물: 체결별 실현 손익 - 수수료
+        df['unmatched_qty'] = 0.0
+        flat_eps = FUTURES_FLAT_EPS
+    df['trip_id'], df['flat_after'] = label_round_trips(df, flat_eps)
+    return df
+
+def summarize_round_trips(fills):
+    if fills.empty: return pd.DataFrame(columns=['open_time', 'close_time', 'pnl', 'fees', 'closed', 'fills'])
+    trips = fills.groupby('trip_id').agg(open_time=('time', 'min'), close_time=('time', 'max'),
+                                         pnl=('cash_flow', 'sum'), fees=('fee_quote', 'sum'),
+                                         closed=('flat_after', 'last'), fills=('id', 'size'))
+    return trips
+
+def _held_until(trips, boundaries_ms):
+    """각 경계 시각까지 포지션을 보유한 누적 시간(ms). 라운드트립 구간은 겹치지 않고 시간순이므로 searchsorted로 계산."""
+    if trips.empty: return np.zeros(len(boundaries_ms))
+    opens = trips['open_time'].to_numpy(dtype='float64')
+    ends = np.where(trips['closed'].astype(bool), trips['close_time'], np.inf).astype('float64') # 미청산은 계속 보유 중
+    durations_before = np.concatenate(([0.0], np.cumsum(ends - opens)[:-1])) # 마지막 라운드트립만 미청산일 수 있음
+    k = np.searchsorted(opens, boundaries_ms, side='left') - 1 # 경계 이전에 시작한 마지막 라운드트립
+    last = np.maximum(k, 0)
+    held = durations_before[last] + np.clip(np.minimum(ends[last], boundaries_ms) - opens[last], 0.0, None)
+    return np.where(k >= 0, held, 0.0)
+
+def compute_daily_aggregates(mode, market, symbol, start_date, end_date):
+    """한 시장/심볼의 날짜별 집계 (DAY_COLUMNS + 자산별 수수료).
+    라운드트립은 기간 이전부터 이어진 포지션까지 정확히 잡기 위해 원장 처음부터 계산한다."""
+    start_ms, end_ms = get_range_ms(start_date, end_date)
+    fills = prepare_fills(trade_ledger.query_trades(mode, market, symbol, 0, end_ms), market, symbol)
+    fills = attach_usdt_rates(mode, fills, get_usdt_pair(market, symbol)) if len(fills) else fills.assign(usdt_rate=1.0)
+    # 환산 가격이 없는 체결은 기존처럼 환산 없이(1배) 합산하고 건수를 남긴다
+    fills = fills.assign(unconverted=fills['usdt_rate'].isna(), cash_usdt=fills['cash_flow'] * fills['usdt_rate'].fillna(1.0))
+    trips = summarize_round_trips(fills)
+    dates = pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D')
+
+    in_range = fills[fills['time'] >= start_ms]
+    in_range = in_range.assign(date=_local_dates(in_range['time']), is_buy=in_range['side'] == 'BUY',
+                               buy_volume=in_range['quote_qty'].where(in_range['side'] == 'BUY', 0.0).fillna(0.0),
+                               sell_volume=in_range['quote_qty'].where(in_range['side'] == 'SELL', 0.0).fillna(0.0))
+    daily = in_range.groupby('date').agg(realized=('realized_pnl', 'sum'), fees=('fee_quote', 'sum'), cash=('cash_flow', 'sum'),
+                                         cash_usdt=('cash_usdt', 'sum'), unconverted_fills=('unconverted', 'sum'), unmatched_qty=('unmatched_qty', 'sum'),
+                                         fills=('id', 'size'), buys=('is_buy', 'sum'), buy_volume=('buy_volume', 'sum'),
+                                         sell_volume=('sell_volume', 'sum')).reindex(dates, fill_value=0)
+    daily['sells'] = daily['fills'] - daily['buys']
+
+    # 기간 안에 청산된 라운드트립은 청산일 기준으로 집계
+    closed = trips[trips['closed'].astype(bool) & (trips['close_time'] >= start_ms)]
+    closed = closed.assign(date=_local_dates(closed['close_time']), win=closed['pnl'] > 0, loss=closed['pnl'] < 0)
+    by_close = closed.groupby('date').agg(trips=('pnl', 'size'), wins=('win', 'sum'), losses=('loss', 'sum'),
+                                          trip_pnl=('pnl', 'sum')).reindex(dates, fill_value=0)
+    daily = daily.join(by_close)
+
+    # 일별 손익: 체결 시점의 실현 손익 - 수수료 (현물은 FIFO로 매도 체결마다 확정)
+    daily['pnl'], daily['pnl_usdt'] = daily['cash'], daily['cash_usdt']
+
+    # 포지션 보유 시간: 날짜 경계까지의 누적 보유 시간 차이 (현재 시각 이후는 보유로 치지 않음)
+    now_ms = datetime.now().timestamp() * 1000
+    day_starts = np.array([get_range_ms(d.date(), d.date())[0] for d in dates], dtype='float64')
+    day_ends = np.append(day_starts[1:], get_range_ms(end_date, end_date)[1] + 1.0)
+    daily['held_ms'] = _held_until(trips, np.minimum(day_ends, now_ms)) - _held_until(trips, np.minimum(day_starts, now_ms))
+    last_fill = np.searchsorted(fills['time'].to_numpy(dtype='float64'), day_ends, side='left') - 1
+    flat_after = fills['flat_after'].to_numpy(dtype=bool) if len(fills) else np.array([True])
+    daily['open_at_end'] = (last_fill >= 0) & ~flat_after[np.maximum(last_fill, 0)]
+
+    fees_by_asset = in_range.groupby(['date', 'commission_asset'])['commission'].sum().unstack(fill_value=0.0).reindex(dates)
+    daily['fees_by_asset'] = [{asset: float(v) for asset, v in row.items() if pd.notna(v) and v != 0} for _, row in fees_by_asset.iterrows()] if not fees_by_asset.columns.empty else [{} for _ in dates]
+    return daily[DAY_COLUMNS + ['fees_by_asset']]
+
+# --- 지난 날짜 일별 집계 캐시 ---
+def get_config_hash(mode, markets):
+    # 결과에 영향을 주는 설정(모드, 시장별 심볼)만 해시 (API 키 등 다른 설정 변경에는 캐시 유지)
+    return hashlib.sha1(json.dumps({'mode': mode, 'markets': markets, 'version': REPORT_CACHE_VERSION}, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def get_artefact_path(config_hash, day):
+    return os.path.join(REPORT_CACHE_FOLDER, config_hash, f"{day.strftime('%Y-%m-%d')}.json")
+
+def load_day_artefact(config_hash, day):
+    try:
+        with open(get_artefact_path(config_hash, day), 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return None
+
+def save_day_artefact(config_hash, day, artefact):
+    # 지난 날짜는 바뀌지 않으므로 한 번 저장한 파일은 덮어쓰지 않는다 (임시 파일에 쓴 뒤 교체 -> 중간에 끊겨도 깨진 파일 없음)
+    path = get_artefact_path(config_hash, day)
+    if os.path.exists(path): return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(artefact, f, ensure_ascii=False, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+    os.replace(tmp_path, path)
+
+def is_day_final(mode, markets, day):
+    # 오늘 이전 날짜이고 모든 시장의 원장이 그 날짜 이후까지 동기화되었을 때만 확정 (캐시 가능)
+    if day >= date.today(): return False
+    _, day_end_ms = get_range_ms(day, day)
+    return all(trade_ledger.is_range_synced(mode, market, symbol, day_end_ms) for market, symbol in markets.items())
+
+def get_day_artefacts(mode, markets, start_date, end_date, summarize_logs=None):
+    """날짜별 집계 목록. 캐시에 없는 날짜(오늘 포함)만 원장에서 한 번에 계산하고, 확정된 날짜는 캐시에 저장한다.
+    summarize_logs(day): {봇: 로그 집계} - 계산할 날짜에만 호출."""
+    config_hash = get_config_hash(mode, markets)
+    days = [d.date() for d in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D')]
+    artefacts = {day: load_day_artefact(config_hash, day) for day in days}
+    missing = [day for day in days if artefacts[day] is None]
+    if missing:
+        per_market = {market: compute_daily_aggregates(mode, market, symbol, missing[0], missing[-1]) for market, symbol in markets.items()}
+        for day in missing:
+            artefact = {'date': day.strftime('%Y-%m-%d'), 'config_hash': config_hash, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                        'markets': {market: dict(daily.loc[pd.Timestamp(day)].to_dict(), symbol=markets[market]) for market, daily in per_market.items()},
+                        'logs': summarize_logs(day) if summarize_logs else {}}
+            artefacts[day] = artefact
+            # 환산 가격(캔들)이 아직 없는 체결이 있으면 캔들 동기화 후 다시 계산하도록 저장하지 않는다
+            if is_day_final(mode, markets, day) and not any(m['unconverted_fills'] for m in artefact['markets'].values()):
+                save_day_artefact(config_hash, day, artefact)
+    return [artefacts[day] for day in days]
+
+def build_range_report(mode, markets, start_date, end_date, summarize_logs=None):
+    """markets: {시장: 심볼}. 일별 집계를 합쳐 시장별 지표와 USDT 기준 일별 손익/누적 자산/최대 낙폭을 계산."""
+    artefacts = get_day_artefacts(mode, markets, start_date, end_date, summarize_logs)
+    dates = pd.DatetimeIndex([pd.Timestamp(a['date']) for a in artefacts], name='date')
+    start_ms, end_ms = get_range_ms(start_date, end_date)
+    range_ms = max(min(end_ms, datetime.now().timestamp() * 1000) - start_ms, 1)
+    results, daily_usdt = {}, {}
+    for market, symbol in markets.items():
+        days = pd.DataFrame([a['markets'][market] for a in artefacts], index=dates)
+        totals = days[DAY_COLUMNS].sum()
+        fees_by_asset = {}
+        for fees in days['fees_by_asset']:
+            for asset, value in fees.items(): fees_by_asset[asset] = fees_by_asset.get(asset, 0.0) + value
+        wins, losses, trips = int(totals['wins']), int(totals['losses']), int(totals['trips'])
+        results[market] = {
+            'market': market, 'symbol': symbol, 'usdt_pair': get_usdt_pair(market, symbol),
+            'unconverted_fills': int(totals['unconverted_fills']), 'net_pnl_usdt': float(totals['pnl_usdt']),
+            'unmatched_qty': float(totals['unmatched_qty']),
+            'fills': int(totals['fills']), 'buys': int(totals['buys']), 'sells': int(totals['sells']),
+            'realized_pnl': float(totals['realized']), 'fees': float(totals['fees']), 'fees_by_asset': fees_by_asset,
+            'net_pnl': float(totals['pnl']), 'buy_volume': float(totals['buy_volume']), 'sell_volume': float(totals['sell_volume']),
+            'round_trips': trips, 'wins': wins, 'losses': losses,
+            'win_rate': wins / (wins + losses) * 100 if (wins + losses) else 0.0,
+            'avg_trip_pnl': float(totals['trip_pnl']) / trips if trips else 0.0,
+            'open_position': bool(days['open_at_end'].iloc[-1]),
+            'exposure_pct': float(totals['held_ms']) / range_ms * 100,
+            'daily_pnl': days['pnl'].rename('pnl'), 'daily_fees': days['fees'].rename('fees'),
+        }
+        daily_usdt[market] = days['pnl_usdt']
+    daily = pd.DataFrame(daily_usdt, index=dates)
+    daily['total'] = daily.sum(axis=1)
+    equity = daily['total'].cumsum()
+    drawdown = equity - np.maximum(equity.cummax(), 0.0) # 시작 자산(0) 대비 고점에서의 하락폭
+
+    logs = {}
+    for artefact in artefacts:
+        for bot_key, counts in artefact['logs'].items():
+            total = logs.setdefault(bot_key, dict.fromkeys(LOG_COUNT_KEYS, 0) | {'first_error': None})
+            for key in LOG_COUNT_KEYS: total[key] += counts.get(key, 0)
+            total['first_error'] = total['first_error'] or counts.get('first_error')
+    return {'start_date': start_date, 'end_date': end_date, 'markets': results, 'daily': daily, 'logs': logs,
+            'equity': equity.rename('equity'), 'drawdown': drawdown.rename('drawdown'),
+            'max_drawdown': float(drawdown.min()) if len(drawdown) else 0.0,
+            'total_net_usdt': float(daily['total'].sum())}
+
+def iter_trade_detail_lines(mode, market, symbol, start_date, end_date):
+    """거래 상세를 청크 단위로 읽어 보고서 줄로 변환 (iterrows 없이 청크마다 벡터화된 문자열 연산)."""
+    start_ms, end_ms = get_range_ms(start_date, end_date)
+    for chunk in trade_ledger.iter_trades(mode, market, symbol, start_ms, end_ms, DETAIL_CHUNK_SIZE):
+        time_kst = (pd.to_datetime(chunk['time'], unit='ms') + KST_OFFSET).dt.strftime('%Y-%m-%d %H:%M:%S')
+        head = np.where(chunk['side'] == 'BUY', "  📈 ", "  📉 ") + time_kst + " | " + chunk['side'] + " " + chunk['qty'].astype(str) + " @ " + chunk['price'].map('{:.2f}'.format)
+        if market == "Spot":
+            tail = " | 금액: " + chunk['quote_qty'].fillna(chunk['price'] * chunk['qty']).map('{:.2f}'.format)
+        else:
+            tail = np.where(chunk['realized_pnl'] > 0, " | 💰 PnL: ", " | 💸 PnL: ") + chunk['realized_pnl'].map('{:.4f}'.format)
+        yield from (head + tail).tolist()
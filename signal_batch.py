@@ -0,0 +1,179 @@
+# signal_batch.py (여러 심볼 일괄 지표/조건 계산: 심볼을 열로 쌓은 표에서 봇과 같은 진입 조건을 한 번에 평가)
+#  - 지표는 봇과 같은 indicators 모듈(pandas_ta 와 같은 정의)로 계산
+#  - 입력은 심볼별 확정 캔들 -> 마지막 확정 캔들(봇의 iloc[-2])과 그 이전 캔들(iloc[-3])로 조건을 판단
+#  - 워치리스트/전체 심볼 스캐너에서 공통 사용
+
+import numpy as np
+import pandas as pd
+import indicators
+
+# 봇과 같은 지표 길이 (각 *_bot_logic.py 의 고정값)
+SHORT_SMA_LEN, LONG_SMA_LEN, RSI_LEN, BBANDS_LEN = 10, 50, 14, 20
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+STOCH_K, STOCH_D, STOCH_SMOOTH_K = 14, 3, 3
+VOLUME_SMA_LEN = 20
+ATR_LEN = 14 # atr_settings.atr_length 기본값
+CONDITION_KEYS = ['sma', 'rsi', 'macd', 'bb', 'stoch', 'stoch_cross', 'volume']
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+def load_entry_settings(config):
+    """봇의 load_strategy_settings 와 같은 기본값으로 진입 조건/HTF 필터 설정을 읽는다."""
+    indicator_settings = config.get("indicator_settings", {})
+    htf_settings = config.get("htf_settings", {})
+    settings = {f"use_{key}": indicator_settings.get(f"use_{key}", True) for key in CONDITION_KEYS}
+    settings.update({
+        'min_conditions': indicator_settings.get("min_conditions", 7),
+        'rsi_oversold': indicator_settings.get("rsi_oversold", 30), 'rsi_overbought': indicator_settings.get("rsi_overbought", 70),
+        'stoch_oversold': indicator_settings.get("stoch_oversold", 20), 'stoch_overbought': indicator_settings.get("stoch_overbought", 80),
+        'volume_multiplier': indicator_settings.get("volume_multiplier", 1.2),
+        'use_htf_filter': htf_settings.get("use_htf_filter", True), 'htf_timeframe': htf_settings.get("htf_timeframe", "4h"),
+        'htf_sma_short': htf_settings.get("htf_sma_short", 10), 'htf_sma_long': htf_settings.get("htf_sma_long", 50),
+    })
+    return settings
+
+def stack_candles(candles_by_symbol, fields=PANEL_FIELDS):
+    """심볼별 캔들 DataFrame을 마지막 캔들 기준으로 오른쪽 정렬해 필드별 (캔들 x 심볼) 표로 쌓는다. 짧은 심볼은 앞쪽이 NaN."""
+    symbols = [s for s, df in candles_by_symbol.items() if df is not None and len(df)]
+    length = max((len(candles_by_symbol[s]) for s in symbols), default=0)
+    panel = {}
+    for field in fields:
+        values = np.full((length, len(symbols)), np.nan)
+        for i, symbol in enumerate(symbols):
+            column = candles_by_symbol[symbol][field].to_numpy(dtype=float)
+            values[length - len(column):, i] = column
+        panel[field] = pd.DataFrame(values, columns=symbols)
+    return panel
+
+def compute_indicators(panel, atr_length=ATR_LEN):
+    """stack_candles 결과로 봇과 같은 지표를 모든 심볼에 대해 한 번에 계산 (indicators 모듈, 열 방향). 지표 이름 -> (캔들 x 심볼) 표."""
+    close, high, low, volume = (panel[field].to_numpy() for field in ('close', 'high', 'low', 'volume'))
+    bbl, _, bbu, _, _ = indicators.bbands(close, BBANDS_LEN)
+    macd, _, macd_signal = indicators.macd(close, MACD_FAST, MACD_SLOW, MACD_SIGNAL)
+    stoch_k, stoch_d = indicators.stoch(high, low, close, STOCH_K, STOCH_D, STOCH_SMOOTH_K)
+    frame = lambda values: pd.DataFrame(values, index=panel['close'].index, columns=panel['close'].columns)
+    return {
+        'close': panel['close'], 'volume': panel['volume'],
+        'sma_short': frame(indicators.sma(close, SHORT_SMA_LEN)), 'sma_long': frame(indicators.sma(close, LONG_SMA_LEN)),
+        'rsi': frame(indicators.rsi(close, RSI_LEN)),
+        'macd': frame(macd), 'macd_signal': frame(macd_signal),
+        'bbl': frame(bbl), 'bbu': frame(bbu),
+        'stoch_k': frame(stoch_k), 'stoch_d': frame(stoch_d),
+        'volume_sma': frame(indicators.sma(volume, VOLUME_SMA_LEN)),
+        'atr': frame(indicators.atr(high, low, close, atr_length)),
+    }
+
+def entry_conditions(L, P, s):
+    # 봇의 롱/숏 진입 조건. L/P 는 지표 이름 -> 같은 모양의 배열 (현재 캔들 / 이전 캔들)
+    with np.errstate(invalid='ignore'):
+        long_checks = {
+            'sma': L['sma_short'] > L['sma_long'], # 골든 크로스 이벤트는 상태 조건에 포함됨
+            'rsi': (L['rsi'] < s['rsi_overbought']) & (L['rsi'] > P['rsi']),
+            'macd': L['macd'] > L['macd_signal'],
+            'bb': L['close'] > L['bbl'],
+            'stoch': (P['stoch_k'] < s['stoch_oversold']) & (L['stoch_k'] > s['stoch_oversold']),
+            'stoch_cross': (P['stoch_k'] <= P['stoch_d']) & (L['stoch_k'] > L['stoch_d']),
+            'volume': L['volume'] > L['volume_sma'] * s['volume_multiplier'],
+        }
+        short_checks = {
+            'sma': L['sma_short'] < L['sma_long'],
+            'rsi': (L['rsi'] > s['rsi_oversold']) & (L['rsi'] < P['rsi']),
+            'macd': L['macd'] < L['macd_signal'],
+            'bb': L['close'] < L['bbu'],
+            'stoch': (P['stoch_k'] > s['stoch_overbought']) & (L['stoch_k'] < s['stoch_overbought']),
+            'stoch_cross': (P['stoch_k'] >= P['stoch_d']) & (L['stoch_k'] < L['stoch_d']),
+            'volume': L['volume'] > L['volume_sma'] * s['volume_multiplier'],
+        }
+    return long_checks, short_checks
+
+def evaluate_entry_checks(indicators, settings, allow_short=True):
+    """마지막 행(확정 캔들)과 그 이전 행으로 봇의 롱/숏 진입 조건을 심볼별로 평가.
+    반환: 심볼 인덱스 DataFrame (long_<조건>, short_<조건>, long_count, short_count)."""
+    latest = {name: frame.iloc[-1].to_numpy() for name, frame in indicators.items()}
+    prev = {name: frame.iloc[-2].to_numpy() for name, frame in indicators.items()}
+    long_checks, short_checks = entry_conditions(latest, prev, settings)
+    enabled = [key for key in CONDITION_KEYS if settings.get(f"use_{key}", True)]
+    checks = {}
+    for key in enabled:
+        checks[f"long_{key}"] = long_checks[key]
+        if allow_short: checks[f"short_{key}"] = short_checks[key]
+    result = pd.DataFrame(checks, index=indicators['close'].columns)
+    result['long_count'] = result[[f"long_{key}" for key in enabled]].sum(axis=1)
+    result['short_count'] = result[[f"short_{key}" for key in enabled]].sum(axis=1) if allow_short else 0
+    return result
+
+# --- 조건 비트셋 히스토리 (캔들마다 조건 하나당 1비트: CONDITION_KEYS 순서대로 bit 0..6) ---
+THRESHOLD_KEYS = ['rsi_oversold', 'rsi_overbought', 'stoch_oversold', 'stoch_overbought', 'volume_multiplier']
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def compute_condition_bitsets(indicators, settings):
+    """모든 캔들의 조건 충족 여부를 (캔들 x 심볼) uint8 비트셋으로 계산 (토글과 무관, 임계값에만 의존).
+    첫 캔들은 이전 캔들이 없으므로 0. 반환: {'long': 배열, 'short': 배열}."""
+    current = {name: frame.to_numpy()[1:] for name, frame in indicators.items()}
+    prev = {name: frame.to_numpy()[:-1] for name, frame in indicators.items()}
+    bitsets = {}
+    for side, side_checks in zip(('long', 'short'), entry_conditions(current, prev, settings)):
+        bits = np.zeros(indicators['close'].shape, dtype=np.uint8)
+        for bit, key in enumerate(CONDITION_KEYS):
+            bits[1:] |= side_checks[key].astype(np.uint8) << bit
+        bitsets[side] = bits
+    return bitsets
+
+def exit_conditions(L, P, s):
+    # 봇의 포지션 종료 조건 (RSI 45/55 고정, BB 는 이전 캔들 밴드 기준, 스토캐스틱 과매수/과매도 조건 없음)
+    with np.errstate(invalid='ignore'):
+        long_checks = {
+            'sma': (P['sma_short'] >= P['sma_long']) & (L['sma_short'] < L['sma_long']),
+            'rsi': (P['rsi'] >= 45) & (L['rsi'] < 45),
+            'macd': (P['macd'] >= P['macd_signal']) & (L['macd'] < L['macd_signal']),
+            'bb': (P['close'] >= P['bbl']) & (L['close'] < P['bbl']),
+            'stoch_cross': (P['stoch_k'] >= P['stoch_d']) & (L['stoch_k'] < L['stoch_d']),
+        }
+        short_checks = {
+            'sma': (P['sma_short'] <= P['sma_long']) & (L['sma_short'] > L['sma_long']),
+            'rsi': (P['rsi'] <= 55) & (L['rsi'] > 55),
+            'macd': (P['macd'] <= P['macd_signal']) & (L['macd'] > L['macd_signal']),
+            'bb': (P['close'] <= P['bbu']) & (L['close'] > P['bbu']),
+            'stoch_cross': (P['stoch_k'] <= P['stoch_d']) & (L['stoch_k'] > L['stoch_d']),
+        }
+    return long_checks, short_checks
+
+def compute_exit_bitsets(indicators):
+    """종료 조건 비트셋 (비트 위치는 진입과 같은 CONDITION_KEYS 순서, stoch 비트는 항상 0) -> get_condition_mask 를 그대로 쓴다."""
+    current = {name: frame.to_numpy()[1:] for name, frame in indicators.items()}
+    prev = {name: frame.to_numpy()[:-1] for name, frame in indicators.items()}
+    bitsets = {}
+    for side, side_checks in zip(('long', 'short'), exit_conditions(current, prev, None)):
+        bits = np.zeros(indicators['close'].shape, dtype=np.uint8)
+        for key, met in side_checks.items():
+            bits[1:] |= met.astype(np.uint8) << CONDITION_KEYS.index(key)
+        bitsets[side] = bits
+    return bitsets
+
+def get_condition_mask(settings):
+    return sum(1 << bit for bit, key in enumerate(CONDITION_KEYS) if settings.get(f"use_{key}", True))
+
+def count_conditions(bits, mask):
+    """비트셋에서 켜진 조건만 남겨 캔들별 충족 조건 수 (popcount)."""
+    return POPCOUNT[bits & mask]
+
+def compute_htf_trends(htf_close, short_len, long_len):
+    """상위 타임프레임 확정 종가 표(캔들 x 심볼)의 마지막 행 SMA 비교로 UP/DOWN/NEUTRAL (봇의 get_htf_trend 와 동일)."""
+    sma_short = htf_close.rolling(short_len).mean().iloc[-1]
+    sma_long = htf_close.rolling(long_len).mean().iloc[-1]
+    trend = pd.Series("NEUTRAL", index=htf_close.columns)
+    trend[sma_short > sma_long] = "UP"
+    trend[sma_short < sma_long] = "DOWN"
+    return trend
+
+def decide_entries(checks, settings, htf_trend=None):
+    """조건 수 + HTF 필터로 봇과 같은 판단(LONG_ENTRY/SHORT_ENTRY/WAIT)을 심볼별로 계산."""
+    long_ok = checks['long_count'] >= settings['min_conditions']
+    short_ok = checks['short_count'] >= settings['min_conditions']
+    if settings['use_htf_filter'] and htf_trend is not None:
+        trend = htf_trend.reindex(checks.index).fillna("NEUTRAL")
+        long_ok &= trend == "UP"
+        short_ok &= trend == "DOWN"
+    decision = pd.Series("WAIT", index=checks.index)
+    decision[short_ok] = "SHORT_ENTRY"
+    decision[long_ok] = "LONG_ENTRY" # 봇도 롱 조건을 먼저 본다
+    return decision
@@ -0,0 +1,115 @@
+# signal_scanner.py (전체 심볼 진입 신호 스캐너: 시장의 모든 거래 심볼에 봇과 같은 진입 조건 + HTF 필터를 적용해 순위 매김)
+#  - 캔들은 스레드 여러 개로 동시에 받되, 시장별 분당 가중치 예산 안에서만 요청한다
+#  - 지표/조건은 signal_batch 로 모든 심볼을 한 번에 계산 (심볼별 pandas_ta 호출 없음)
+#  실행: python signal_scanner.py [USD-M|COIN-M|Spot] [견적자산(예: USDT)]
+
+import os, sys, time, json, threading, logging
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import signal_batch
+from candle_store import INTERVAL_MS
+
+KLINE_LIMIT = 200       # 봇의 get_market_data 와 같은 개수 (마지막 진행 중 캔들은 버림)
+HTF_KLINE_LIMIT = 100   # 봇의 get_htf_trend 와 같은 개수
+FETCH_WORKERS = 16
+# 거래소 한도(선물 2400, 현물 6000/분)의 75%만 사용 -> 실행 중인 봇/대시보드 요청 여유분
+WEIGHT_BUDGET_PER_MIN = {"USD-M": 1800, "COIN-M": 1800, "Spot": 4500}
+
+class WeightLimiter:
+    """최근 60초 동안 사용한 가중치가 예산을 넘지 않도록 요청 전에 대기 (여러 스레드 공유)."""
+    def __init__(self, budget_per_min):
+        self.budget = budget_per_min
+        self.lock = threading.Lock()
+        self.used = [] # (시각, 가중치)
+
+    def acquire(self, weight):
+        if weight > self.budget: # 창이 비어도 들어갈 수 없는 요청 -> 영원히 대기하지 않도록 바로 알림
+            raise ValueError(f"요청 가중치({weight})가 분당 예산({self.budget})보다 큽니다.")
+        while True:
+            with self.lock:
+                now = time.time()
+                self.used = [(t, w) for t, w in self.used if now - t < 60]
+                in_window = sum(w for _, w in self.used)
+                if in_window + weight <= self.budget:
+                    self.used.append((now, weight)); return
+                wait = 60 - (now - self.used[0][0])
+            time.sleep(max(wait, 0.05))
+
+def get_kline_weight(market_type, limit):
+    if market_type == "Spot": return 2
+    return 1 if limit < 100 else 2 if limit < 500 else 5
+
+def get_universe(client, market_type, quote_asset=None):
+    """거래 중인 심볼 목록 (선물은 무기한 계약만). quote_asset 을 주면 그 견적 자산만."""
+    if market_type == "USD-M":
+        symbols = [s for s in client.futures_exchange_info()['symbols'] if s.get('status') == 'TRADING' and s.get('contractType') == 'PERPETUAL']
+    elif market_type == "COIN-M":
+        symbols = [s for s in client.futures_coin_exchange_info()['symbols'] if s.get('contractStatus') == 'TRADING' and s.get('contractType') == 'PERPETUAL']
+    else:
+        symbols = [s for s in client.get_exchange_info()['symbols'] if s.get('status') == 'TRADING']
+    if quote_asset: symbols = [s for s in symbols if s.get('quoteAsset') == quote_asset]
+    return [s['symbol'] for s in symbols]
+
+def _fetch_closed_candles(client, market_type, symbol, interval, limit):
+    if market_type == "USD-M": klines = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+    elif market_type == "COIN-M": klines = client.futures_coin_klines(symbol=symbol, interval=interval, limit=limit)
+    else: klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+    live_open = int(time.time() * 1000) // INTERVAL_MS[interval] * INTERVAL_MS[interval]
+    klines = [k for k in klines if int(k[0]) < live_open] # 진행 중 캔들 제외 (봇은 iloc[-2] 부터 사용)
+    return pd.DataFrame({field: [float(k[i]) for k in klines] for i, field in enumerate(signal_batch.PANEL_FIELDS, start=1)})
+
+def fetch_candles_concurrently(client, market_type, symbols, interval, limit, limiter=None):
+    """심볼별 확정 캔들을 가중치 예산 안에서 동시에 받는다. 실패한 심볼은 결과에서 빠지고 에러 목록으로 반환."""
+    limiter = limiter or WeightLimiter(WEIGHT_BUDGET_PER_MIN[market_type])
+    weight = get_kline_weight(market_type, limit)
+    def load(symbol):
+        limiter.acquire(weight)
+        try: return symbol, _fetch_closed_candles(client, market_type, symbol, interval, limit), None
+        except Exception as e: return symbol, None, str(e)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        results = list(pool.map(load, symbols))
+    return {s: df for s, df, _ in results if df is not None}, {s: err for s, _, err in results if err}
+
+def scan_market(client, market_type, timeframe, config, symbols=None, quote_asset=None):
+    """시장 전체(또는 주어진 심볼)에 봇 진입 조건을 평가. 조건 충족 수 순으로 정렬된 DataFrame 과 실패 심볼 dict 반환."""
+    settings = signal_batch.load_entry_settings(config)
+    allow_short = market_type != "Spot"
+    symbols = symbols or get_universe(client, market_type, quote_asset)
+    limiter = WeightLimiter(WEIGHT_BUDGET_PER_MIN[market_type])
+    candles, errors = fetch_candles_concurrently(client, market_type, symbols, timeframe, KLINE_LIMIT, limiter)
+    candles = {s: df for s, df in candles.items() if len(df) >= 3}
+    if not candles: return pd.DataFrame(), errors
+    checks = signal_batch.evaluate_entry_checks(signal_batch.compute_indicators(signal_batch.stack_candles(candles)), settings, allow_short)
+    htf_trend = None
+    if settings['use_htf_filter']:
+        htf_candles, htf_errors = fetch_candles_concurrently(client, market_type, list(checks.index), settings['htf_timeframe'], HTF_KLINE_LIMIT, limiter)
+        errors.update(htf_errors)
+        # 봇과 같이 HTF 캔들이 장기 SMA 길이보다 적으면 필터 중립
+        htf_candles = {s: df for s, df in htf_candles.items() if len(df) + 1 >= settings['htf_sma_long']}
+        if htf_candles:
+            htf_trend = signal_batch.compute_htf_trends(signal_batch.stack_candles(htf_candles, ['close'])['close'], settings['htf_sma_short'], settings['htf_sma_long'])
+        else: htf_trend = pd.Series(dtype=object)
+    result = checks.copy()
+    result['htf_trend'] = htf_trend.reindex(result.index).fillna("NEUTRAL") if htf_trend is not None else "NEUTRAL"
+    result['decision'] = signal_batch.decide_entries(checks, settings, htf_trend)
+    result['best_count'] = result[['long_count', 'short_count']].max(axis=1)
+    result['is_entry'] = result['decision'] != "WAIT"
+    result = result.sort_values(['is_entry', 'best_count'], ascending=False).drop(columns='is_entry')
+    result.index.name = 'symbol'
+    return result, errors
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    from binance.client import Client
+    with open('config.json', 'r') as f: config = json.load(f)
+    market = sys.argv[1] if len(sys.argv) > 1 else "USD-M"
+    quote = sys.argv[2] if len(sys.argv) > 2 else ("USDT" if market != "COIN-M" else None)
+    is_test = config.get("mode", "Test") == "Test"
+    import exchange_sim; exchange_sim.apply_exchange_endpoint(config)
+    client = Client(config.get("testnet_api_key" if is_test else "live_api_key"), config.get("testnet_secret_key" if is_test else "live_secret_key"), testnet=is_test)
+    settings_key = {"USD-M": "usd_m_settings", "COIN-M": "coin_m_settings", "Spot": "spot_settings"}[market]
+    started = time.time()
+    ranked, failed = scan_market(client, market, config.get(settings_key, {}).get("timeframe", "1h"), config, quote_asset=quote)
+    print(ranked.head(30).to_string())
+    print(f"{len(ranked)}개 심볼 스캔 완료 ({time.time() - started:.1f}초), 실패 {len(failed)}개")
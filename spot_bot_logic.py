@@ -1,31 +1,29 @@
 # spot_bot_logic.py (★로그 날짜 자동 변경, ★HTF 필터, ★ATR SL/TP 적용됨)
 
 import os, sys, time, json, logging
-import pandas as pd
-import pandas_ta as ta
+import indicators # [★수정] pandas_ta 대신 자체 지표 모듈
+from candle_series import CandleSeries # [★신규] 배열 기반 캔들 묶음
+import mtf_engine # [★신규] 멀티 타임프레임 엔진
+import strategy_profiles # [★신규] 전략 프로필 (공유 캔들로 여러 설정 평가/실행)
 from binance.client import Client, BinanceAPIException
 from binance.enums import *
 from datetime import datetime
+from bot_snapshot import publish_snapshot, mark_snapshot_stopped, get_met_labels # [★신규] 지표 스냅샷 공유
+import bot_control # [★신규] 상태/제어 엔드포인트
+import exchange_sim # [★신규] 로컬 대역 거래소 주소 전환
+import paper_trading # [★신규] 모의 거래 실행
 import math # [★신규]
 
 # --- 1. 설정 ---
 POSITION_FILE = "spot_position.json"
-try:
-    with open('config.json', 'r') as f: config = json.load(f)
-    mode = config.get("mode", "Test")
-    if mode == "Test":
-        api_key = config.get("testnet_api_key"); secret_key = config.get("testnet_secret_key"); is_testnet = True
-    else:
-        api_key = config.get("live_api_key"); secret_key = config.get("live_secret_key"); is_testnet = False
-    
-    # Spot 설정 로드
+# [★신규] 전략 설정 로드 (시작 시 + 제어 엔드포인트의 /reload 요청 시)
+def load_strategy_settings(config):
+    global stop_loss_pct, take_profit_pct, quantity_usdt, use_sma, use_rsi, use_macd, use_bb, use_stoch, use_stoch_cross, use_volume, min_conditions, min_exit_conditions, rsi_oversold, rsi_overbought, stoch_oversold, stoch_overbought, volume_multiplier, use_volume_atr_columns, use_htf_filter, htf_timeframe, htf_sma_short_len, htf_sma_long_len, use_atr_sl_tp, atr_length, atr_sl_multiplier, atr_tp_multiplier, mtf_settings, profile_settings
     settings = config.get("spot_settings", {})
     stop_loss_pct = float(settings.get("stop_loss_pct", 5.0))
     take_profit_pct = float(settings.get("take_profit_pct", 5.0))
     quantity_usdt = float(settings.get("quantity_usdt", 11.0)) # 매수할 USDT 금액
-    timeframe = settings.get("timeframe", "1h")
-    symbol = settings.get("symbol", "BTCUSDT")
-    
+
     # 지표 설정 로드
     indicator_settings = config.get("indicator_settings", {})
     use_sma = indicator_settings.get("use_sma", True)
@@ -35,15 +33,17 @@ try:
     use_stoch = indicator_settings.get("use_stoch", True)
     use_stoch_cross = indicator_settings.get("use_stoch_cross", True)
     use_volume = indicator_settings.get("use_volume", True)
-    
+
     min_conditions = indicator_settings.get("min_conditions", 7)
     min_exit_conditions = indicator_settings.get("min_exit_conditions", 3)
-    
+
     rsi_oversold = indicator_settings.get("rsi_oversold", 30)
     rsi_overbought = indicator_settings.get("rsi_overbought", 70)
     stoch_oversold = indicator_settings.get("stoch_oversold", 20)
     stoch_overbought = indicator_settings.get("stoch_overbought", 80)
     volume_multiplier = indicator_settings.get("volume_multiplier", 1.2)
+    # [★신규] 거래량 SMA / ATR 을 지표 모듈이 만든 열에서 읽기 (기본 꺼짐: 예전처럼 현재 거래량 / 0 으로 대체 -> 거래량 조건 미충족, 고정 % SL/TP)
+    use_volume_atr_columns = indicator_settings.get("use_volume_atr_columns", False)
 
     # [★신규] HTF (상위 타임프레임) 필터 설정
     htf_settings = config.get("htf_settings", {})
@@ -59,11 +59,35 @@ try:
     atr_sl_multiplier = atr_settings.get("atr_sl_multiplier", 2.0)
     atr_tp_multiplier = atr_settings.get("atr_tp_multiplier", 3.0)
 
+    # [★신규] 멀티 타임프레임 엔진 (기준 캔들에서 상위 타임프레임을 이어 만듦, 타임프레임 합류 규칙)
+    mtf_settings = mtf_engine.load_mtf_settings(config)
+
+    # [★신규] 전략 프로필 (적지 않은 값은 위 봇 설정 그대로)
+    profile_settings = strategy_profiles.load_profiles(config, "Spot", {'stop_loss_pct': stop_loss_pct, 'take_profit_pct': take_profit_pct, 'quantity': quantity_usdt})
+
+try:
+    with open('config.json', 'r') as f: config = json.load(f)
+    mode = config.get("mode", "Test")
+    if mode == "Test":
+        api_key = config.get("testnet_api_key"); secret_key = config.get("testnet_secret_key"); is_testnet = True
+    elif mode == "Paper": # [★신규] 모의 거래: 시세는 실거래소 공개 API, 주문/잔고는 로컬 매칭 엔진 (API 키 불필요)
+        api_key = secret_key = "paper"; is_testnet = False
+    else:
+        api_key = config.get("live_api_key"); secret_key = config.get("live_secret_key"); is_testnet = False
+    
+    # Spot 설정 로드
+    settings = config.get("spot_settings", {})
+    timeframe = settings.get("timeframe", "1h")
+    symbol = settings.get("symbol", "BTCUSDT")
+    
+    load_strategy_settings(config)
+
     if not api_key or not secret_key:
         print(f"오류: [ {mode} ] API 키 필요."); exit()
 except FileNotFoundError: print("오류: config.json 파일 없음."); exit()
 
 # 현물 클라이언트 생성 (변경 없음)
+exchange_sim.apply_exchange_endpoint(config) # [★신규] exchange_endpoint 설정 시 로컬 대역 거래소로 접속
 try:
     if is_testnet:
         print(f"[Spot] 현물 테스트넷에 연결 중...")
@@ -71,6 +95,7 @@ try:
     else:
         print(f"[Spot] 현물 라이브넷에 연결 중...")
         client = Client(api_key, secret_key)
+        if mode == "Paper": paper_trading.enable_paper_trading(client, config) # [★신규]
     server_time = client.get_server_time()
     if server_time and 'serverTime' in server_time: print(f"[Spot] ✅ 현물 {mode} 모드 연결 성공!")
     else: print(f"[Spot] ❌ 현물 서버 시간 조회 실패"); exit()
@@ -120,23 +145,19 @@ def get_market_data(symbol, timeframe, limit=200):
         klines = client.get_klines(symbol=symbol, interval=timeframe, limit=limit)
         if not klines:
             logging.error(f"[Spot] *** {symbol} 데이터를 가져올 수 없습니다 ***"); return None
-        df = pd.DataFrame(klines, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in numeric_cols: df[col] = pd.to_numeric(df[col])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        return CandleSeries.from_klines(klines) # [★수정] DataFrame 대신 필요한 필드만 배열로
     except Exception as e:
         logging.error(f"[Spot] *** {timeframe} 데이터 가져오기 실패: {e} ***")
         return None
 
-def calculate_indicators(df):
-    df.ta.sma(length=short_sma_len, append=True); df.ta.sma(length=long_sma_len, append=True)
-    df.ta.rsi(length=rsi_len, append=True); df.ta.bbands(length=bbands_len, append=True)
-    df.ta.macd(fast=macd_fast, slow=macd_slow, signal=macd_signal, append=True)
-    df.ta.stoch(high='high', low='low', close='close', k=14, d=3, append=True)
-    df.ta.sma(length=20, close='volume', append=True)
-    df.ta.atr(length=atr_length, append=True) # [★신규] ATR 계산
-    return df
+def get_indicator_params():
+    return {'short_sma_len': short_sma_len, 'long_sma_len': long_sma_len, 'rsi_len': rsi_len, 'bbands_len': bbands_len,
+            'macd_fast': macd_fast, 'macd_slow': macd_slow, 'macd_signal': macd_signal, 'atr_length': atr_length,
+            'use_volume_atr_columns': use_volume_atr_columns}
+
+def calculate_indicators(candles):
+    # [★수정] pandas_ta 대신 indicators 모듈 (배열에서 계산해 지표 열로 보관)
+    return candles.add_columns(indicators.compute_indicator_columns(candles.high, candles.low, candles.close, candles.volume, get_indicator_params()))
 
 # [★신규] 가격/수량 정밀도 계산 함수 추가
 def get_price_precision(symbol):
@@ -271,15 +292,15 @@ def get_avg_fill_price(order):
 # [★신규] 상위 타임프레임(HTF) 추세 확인 함수 (get_klines 사용)
 def get_htf_trend(symbol, htf_timeframe, htf_short, htf_long):
     logging.info(f"[Spot] {htf_timeframe} 상위 추세 확인 중...")
-    df_htf = get_market_data(symbol, htf_timeframe, limit=100) # HTF 데이터 가져오기
-    if df_htf is None or len(df_htf) < htf_long:
+    candles_htf = get_market_data(symbol, htf_timeframe, limit=100) # HTF 데이터 가져오기
+    if candles_htf is None or len(candles_htf) < htf_long:
         logging.warning(f"[Spot] {htf_timeframe} 데이터 부족. 추세 필터 비활성.")
         return "NEUTRAL"
         
-    df_htf.ta.sma(length=htf_short, append=True)
-    df_htf.ta.sma(length=htf_long, append=True)
+    candles_htf[f'SMA_{htf_short}'] = indicators.sma(candles_htf.close, htf_short)
+    candles_htf[f'SMA_{htf_long}'] = indicators.sma(candles_htf.close, htf_long)
     
-    htf_latest = df_htf.iloc[-2] # 확정 캔들
+    htf_latest = candles_htf.confirmed() # 확정 캔들
     htf_sma_short_val = htf_latest.get(f'SMA_{htf_short}', 0)
     htf_sma_long_val = htf_latest.get(f'SMA_{htf_long}', 0)
 
@@ -290,9 +311,80 @@ def get_htf_trend(symbol, htf_timeframe, htf_short, htf_long):
     else:
         return "NEUTRAL"
 
+# [★신규] 멀티 타임프레임 엔진 갱신: 방금 받은 기준 캔들로 상위 타임프레임을 이어 만들고, 씨앗이 필요한 타임프레임만 따로 조회
+mtf = None
+def update_mtf_engine(symbol, candles):
+    global mtf
+    timeframes = [*mtf_settings['timeframes'], *mtf_settings['min_conditions'], *([htf_timeframe] if use_htf_filter else [])]
+    if mtf is None or not mtf.matches(timeframe, timeframes, get_indicator_params(), mtf_settings['history']):
+        mtf = mtf_engine.MultiTimeframeEngine(timeframe, timeframes, get_indicator_params(), mtf_settings['history'])
+        if mtf.skipped: logging.warning(f"[Spot] {timeframe} 캔들로 만들 수 없는 타임프레임 제외: {', '.join(mtf.skipped)}")
+    mtf.update(candles)
+    for interval in mtf.needs_seed():
+        logging.info(f"[Spot] {interval} 캔들 초기화 (멀티 타임프레임 엔진)")
+        mtf.seed(interval, get_market_data(symbol, interval, limit=mtf.history))
+    return mtf
+
+# [★신규] 전략 프로필: 이번 주기 캔들/지표를 그대로 넘겨 프로필마다 판단/실행 (결과는 스냅샷에 포함)
+profile_host = None
+def run_strategy_profiles(candles, current_price, price_decimals, engine=None, htf_trend=None):
+    global profile_host
+    if not profile_settings: return None
+    if profile_host is None or not profile_host.matches(profile_settings, get_indicator_params()):
+        profile_host = strategy_profiles.ProfileHost(config, "Spot", symbol, get_indicator_params(), profile_settings, client, price_decimals, quantity_decimals=get_quantity_precision(symbol))
+    if engine is None and mtf_settings['enabled']: engine = update_mtf_engine(symbol, candles)
+    def get_trend(interval, short_len, long_len):
+        if engine and interval in engine.timeframes: return engine.trend(interval, short_len, long_len)
+        return get_htf_trend(symbol, interval, short_len, long_len)
+    known = {(htf_timeframe, htf_sma_short_len, htf_sma_long_len): htf_trend} if htf_trend else None # 봇이 이미 확인한 추세는 다시 조회하지 않음
+    return profile_host.run_cycle(candles, current_price, int(time.time() * 1000), get_trend, known)
+
+# [★신규] 최근 사이클의 지표/조건/판단을 대시보드와 공유
+SNAPSHOT_KEY = "spot"
+def publish_cycle_snapshot(candles, latest, current_price, checks, decision, check_interval, htf_trend=None, position=None, mtf=None, profiles=None):
+    try:
+        bb_cols = [col for col in candles.columns if col.startswith('BB')]
+        volume_sma_col, atr_col = indicators.bot_column_names(get_indicator_params())
+        publish_snapshot(SNAPSHOT_KEY, {
+            'symbol': symbol, 'timeframe': timeframe, 'mode': mode,
+            'check_interval': check_interval,
+            'candle_time': str(latest['timestamp']), 'current_price': current_price,
+            'indicators': {col: val for col, val in latest.items() if col not in ('timestamp', 'close_time', 'quote_asset_volume', 'number_of_trades', 'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore')},
+            'columns': {'sma_short': f'SMA_{short_sma_len}', 'sma_long': f'SMA_{long_sma_len}', 'rsi': f'RSI_{rsi_len}',
+                        'macd': f'MACD_{macd_fast}_{macd_slow}_{macd_signal}', 'macd_signal': f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}',
+                        'bbl': next((c for c in bb_cols if 'BBL' in c), None), 'bbu': next((c for c in bb_cols if 'BBU' in c), None),
+                        'stoch_k': 'STOCHk_14_3_3', 'stoch_d': 'STOCHd_14_3_3', 'volume_sma': volume_sma_col, 'atr': atr_col},
+            'params': get_indicator_params(),
+            'settings': {'min_conditions': min_conditions, 'min_exit_conditions': min_exit_conditions,
+                         'rsi_oversold': rsi_oversold, 'rsi_overbought': rsi_overbought, 'stoch_oversold': stoch_oversold,
+                         'stoch_overbought': stoch_overbought, 'volume_multiplier': volume_multiplier,
+                         'use_htf_filter': use_htf_filter, 'htf_timeframe': htf_timeframe},
+            'checks': checks, 'decision': decision, 'htf_trend': htf_trend, 'mtf': mtf, 'profiles': profiles, 'position': position,
+        })
+    except Exception as e:
+        logging.error(f"[Spot] 스냅샷 저장 실패: {e}")
+
+# [★신규] 제어 엔드포인트 /reload: config.json을 다시 읽어 전략 설정만 교체
+def reload_settings():
+    try:
+        with open('config.json', 'r') as f: new_config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logging.error(f"[Spot] 설정 다시 읽기 실패: {e}"); return
+    new_settings = new_config.get("spot_settings", {})
+    if new_config.get("mode", "Test") != mode or any(new_settings.get(k, v) != v for k, v in {'symbol': symbol, 'timeframe': timeframe}.items()):
+        logging.warning("[Spot] 모드/심볼/타임프레임 변경은 봇을 재시작해야 적용됩니다.")
+    load_strategy_settings(new_config)
+    logging.info(f"[Spot] 설정 다시 읽기 완료 - 최소 조건: {min_conditions}, HTF: {use_htf_filter}({htf_timeframe}), ATR SL/TP: {use_atr_sl_tp}")
+
+# [★신규] 주기 종료: 상태 엔드포인트 갱신 후 다음 주기까지 대기 (중지/재로딩 요청 시 즉시 깨어남)
+def finish_cycle(cycle_started, wait_seconds):
+    bot_control.report_cycle(cycle_started, position=load_position(), pending_orders=[]) # 현물 봇은 시장가 주문만 사용
+    bot_control.wait_for_next_cycle(wait_seconds)
+
 # --- 4. 메인 로직 (★HTF/ATR 적용으로 전면 수정됨) ---
 def run_bot():
     ensure_correct_log_file(LOG_FILE_BASE)
+    bot_control.start_control_server(SNAPSHOT_KEY, config) # [★신규]
 
     logging.info(f"Spot (현물) 봇을 [ {mode} ] 모드로 시작합니다...")
     logging.info(f"설정 - 심볼: {symbol}, 매수금액: {quantity_usdt} USDT, 타임프레임: {timeframe}")
@@ -307,14 +399,17 @@ def run_bot():
     logging.info(f"[Spot] {symbol} 가격 정밀도: {price_decimals} 소수점")
 
     check_interval = {'15m': 900, '1h': 3600, '4h': 14400}.get(timeframe, 3600)
+    bot_control.update_status(health='running', symbol=symbol, timeframe=timeframe, mode=mode, check_interval=check_interval)
 
     try:
-        while True:
+        while not bot_control.stop_requested(): # [★수정] 대시보드의 /stop 요청 시 현재 주기를 마치고 종료
+            cycle_started = time.time()
+            if bot_control.consume_reload_request(): reload_settings()
             try:
                 ensure_correct_log_file(LOG_FILE_BASE)
 
                 base_asset, current_balance, min_qty = get_base_asset_balance(symbol)
-                if base_asset is None: time.sleep(60); continue
+                if base_asset is None: finish_cycle(cycle_started, 60); continue
 
                 position = load_position()
 
@@ -329,26 +424,27 @@ def run_bot():
                     # 단, 이 경우 봇은 매도만 검사함 (기존 로직 유지)
                     pass
                 
-                df = get_market_data(symbol, timeframe)
-                if df is None:
+                candles = get_market_data(symbol, timeframe)
+                if candles is None:
                     logging.warning(f"[Spot] 데이터를 가져올 수 없어 {check_interval}초 후 재시도합니다...")
-                    time.sleep(check_interval); continue
+                    finish_cycle(cycle_started, check_interval); continue
                     
-                df = calculate_indicators(df); 
-                if len(df) < 4: 
-                    logging.warning(f"[Spot] 데이터 부족 (교차 확인 위해 {len(df)}/4 개). 대기합니다.")
-                    time.sleep(check_interval); continue
+                candles = calculate_indicators(candles); 
+                if len(candles) < 4: 
+                    logging.warning(f"[Spot] 데이터 부족 (교차 확인 위해 {len(candles)}/4 개). 대기합니다.")
+                    finish_cycle(cycle_started, check_interval); continue
                     
-                latest = df.iloc[-2] # 확정 캔들 (신호 발생)
-                prev = df.iloc[-3]   # 이전 캔들 (교차 확인용)
-                current_price = df.iloc[-1]['close'] # 현재가 (손절/익절 확인용)
-                latest_atr = latest.get(f'ATR_{atr_length}', 0.0)
+                latest = candles.confirmed() # 확정 캔들 (신호 발생)
+                prev = candles.previous()   # 이전 캔들 (교차 확인용)
+                current_price = candles.latest()['close'] # 현재가 (손절/익절 확인용)
+                volume_sma_col, atr_col = indicators.bot_column_names(get_indicator_params()) # [★수정] 기본은 예전 열 이름 (대체값)
+                latest_atr = latest.get(atr_col, 0.0)
 
                 logging.info(f"\n[Spot] ========== [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ==========")
                 logging.info(f"현재 보유량: {current_balance:.8f} {base_asset} (현재가: {current_price})")
 
                 # --- 지표 값 로드 ---
-                sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in df.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'; volume_sma_col = 'SMA_20_volume'
+                sma_short_col=f'SMA_{short_sma_len}'; sma_long_col=f'SMA_{long_sma_len}'; rsi_col=f'RSI_{rsi_len}'; macd_col=f'MACD_{macd_fast}_{macd_slow}_{macd_signal}'; macd_signal_col=f'MACDs_{macd_fast}_{macd_slow}_{macd_signal}'; bb_cols = [col for col in candles.columns if col.startswith('BB')]; bbl_col = next((c for c in bb_cols if 'BBL' in c), None); bbu_col = next((c for c in bb_cols if 'BBU' in c), None); stoch_k_col = 'STOCHk_14_3_3'; stoch_d_col = 'STOCHd_14_3_3'
                 latest_close = latest['close']; latest_sma_short = latest.get(sma_short_col, latest_close); latest_sma_long = latest.get(sma_long_col, latest_close); latest_rsi = latest.get(rsi_col, 50); latest_macd = latest.get(macd_col, 0); latest_macd_signal_val = latest.get(macd_signal_col, 0); latest_bbl = latest.get(bbl_col, latest_close) if bbl_col else latest_close; latest_bbu = latest.get(bbu_col, latest_close) if bbu_col else latest_close; latest_stoch_k = latest.get(stoch_k_col, 50); latest_stoch_d = latest.get(stoch_d_col, 50); latest_current_volume = latest['volume']; latest_volume_sma = latest.get(volume_sma_col, latest_current_volume)
                 prev_close = prev['close']; prev_sma_short = prev.get(sma_short_col, latest_close); prev_sma_long = prev.get(sma_long_col, latest_close); prev_rsi = prev.get(rsi_col, 50); prev_macd = prev.get(macd_col, 0); prev_macd_signal_val = prev.get(macd_signal_col, 0); prev_stoch_k = prev.get(stoch_k_col, 50); prev_stoch_d = prev.get(stoch_d_col, 50); prev_bbl = prev.get(bbl_col, prev_close) if bbl_col else prev_close; prev_bbu = prev.get(bbu_col, prev_close) if bbu_col else prev_close
                 
@@ -385,14 +481,15 @@ def run_bot():
                     logging.info(f"타겟: SL={sl_target:.{price_decimals}f}, TP={tp_target:.{price_decimals}f}")
 
                     # --- 동적 전략 종료 조건 ('이벤트' 기반) ---
-                    long_exit_conditions_met = []; long_exit_reasons = []
-                    if use_sma and (prev_sma_short >= prev_sma_long) and (latest_sma_short < latest_sma_long): long_exit_conditions_met.append(True); long_exit_reasons.append(f"데드 크로스")
-                    if use_rsi and (prev_rsi >= 45) and (latest_rsi < 45): long_exit_conditions_met.append(True); long_exit_reasons.append(f"RSI 45 하회")
-                    if use_macd and (prev_macd >= prev_macd_signal_val) and (latest_macd < latest_macd_signal_val): long_exit_conditions_met.append(True); long_exit_reasons.append("MACD<Signal")
-                    if use_bb and (prev_close >= prev_bbl) and (latest_close < prev_bbl): long_exit_conditions_met.append(True); long_exit_reasons.append("종가<BB하단")
-                    if use_stoch_cross and (prev_stoch_k >= prev_stoch_d) and (latest_stoch_k < latest_stoch_d): long_exit_conditions_met.append(True); long_exit_reasons.append("스토캐스틱 하락")
+                    exit_checks = {}
+                    if use_sma: exit_checks['sma'] = (prev_sma_short >= prev_sma_long) and (latest_sma_short < latest_sma_long)
+                    if use_rsi: exit_checks['rsi'] = (prev_rsi >= 45) and (latest_rsi < 45)
+                    if use_macd: exit_checks['macd'] = (prev_macd >= prev_macd_signal_val) and (latest_macd < latest_macd_signal_val)
+                    if use_bb: exit_checks['bb'] = (prev_close >= prev_bbl) and (latest_close < prev_bbl)
+                    if use_stoch_cross: exit_checks['stoch_cross'] = (prev_stoch_k >= prev_stoch_d) and (latest_stoch_k < latest_stoch_d)
+                    long_exit_reasons = get_met_labels('long_exit', exit_checks)
                     
-                    long_exit = len(long_exit_conditions_met) >= min_exit_conditions 
+                    long_exit = len(long_exit_reasons) >= min_exit_conditions 
                     
                     sell_reason = None
                     if current_price <= sl_target:
@@ -408,6 +505,10 @@ def run_bot():
                         order = place_order(symbol, SIDE_SELL, quantity=current_balance, current_price=current_price)
                         if order:
                             clear_position() # 포지션 파일 삭제
+
+                    profiles = run_strategy_profiles(candles, current_price, price_decimals) # [★신규] 전략 프로필 (봇 판단 후 같은 캔들로)
+                    publish_cycle_snapshot(candles, latest, current_price, {'long_exit': exit_checks}, sell_reason or "HOLD", check_interval,
+                                           position={'amount': current_balance, 'entry_price': entry_price, 'sl_target': sl_target, 'tp_target': tp_target}, profiles=profiles)
                 
                 # --- [B] 미보유 중 (매수 조건 확인) ---
                 elif position is None and current_balance < min_qty:
@@ -415,44 +516,54 @@ def run_bot():
                     
                     # [★신규] HTF 추세 확인
                     htf_trend = "NEUTRAL"
+                    engine = update_mtf_engine(symbol, candles) if mtf_settings['enabled'] else None # [★신규] 엔진이 켜져 있으면 상위 추세를 따로 조회하지 않음
                     if use_htf_filter:
-                        htf_trend = get_htf_trend(symbol, htf_timeframe, htf_sma_short_len, htf_sma_long_len)
+                        htf_trend = engine.trend(htf_timeframe, htf_sma_short_len, htf_sma_long_len) if engine else get_htf_trend(symbol, htf_timeframe, htf_sma_short_len, htf_sma_long_len)
                         logging.info(f"[Spot] {htf_timeframe} 상위 추세: {htf_trend}")
 
                     # --- 동적 매수(롱) 조건 ('이벤트' 기반) ---
-                    long_conditions_met = []; long_entry_reasons = []
+                    long_checks = {}
                     if use_sma:
                         is_gc_event = (prev_sma_short <= prev_sma_long) and (latest_sma_short > latest_sma_long)
                         is_gc_state = latest_sma_short > latest_sma_long
-                        if is_gc_event or is_gc_state: long_conditions_met.append(True); long_entry_reasons.append(f"SMA 상승")
+                        long_checks['sma'] = is_gc_event or is_gc_state
                     if use_rsi:
                         is_rsi_rising = latest_rsi > prev_rsi
                         is_rsi_ok_long = latest_rsi < rsi_overbought and is_rsi_rising
-                        if is_rsi_ok_long: long_conditions_met.append(True); long_entry_reasons.append(f"RSI 상승")
+                        long_checks['rsi'] = is_rsi_ok_long
                     if use_macd:
                         is_macd_event = (prev_macd <= prev_macd_signal_val) and (latest_macd > latest_macd_signal_val)
                         is_macd_state = latest_macd > latest_macd_signal_val
-                        if is_macd_event or is_macd_state: long_conditions_met.append(True); long_entry_reasons.append(f"MACD 상승")
+                        long_checks['macd'] = is_macd_event or is_macd_state
                     if use_bb:
                         is_bb_cross = (prev_close <= prev_bbl) and (latest_close > latest_bbl)
                         is_bb_ok_long = latest_close > latest_bbl
-                        if is_bb_cross or is_bb_ok_long: long_conditions_met.append(True); long_entry_reasons.append(f"BB하단 위")
+                        long_checks['bb'] = is_bb_cross or is_bb_ok_long
                     if use_stoch:
                         is_stoch_exit_oversold = (prev_stoch_k < stoch_oversold) and (latest_stoch_k > stoch_oversold) # 과매도 '탈출'
-                        # [★오류 수정] 'Example C' 텍스트 제거
-                        if is_stoch_exit_oversold: 
-                            long_conditions_met.append(True); long_entry_reasons.append(f"스토캐스틱 과매도 탈출(K:{latest_stoch_k:.1f})")
+                        long_checks['stoch'] = is_stoch_exit_oversold
                     if use_stoch_cross:
                         is_stoch_bullish_event = (prev_stoch_k <= prev_stoch_d) and (latest_stoch_k > latest_stoch_d)
-                        if is_stoch_bullish_event: long_conditions_met.append(True); long_entry_reasons.append("스토캐스틱 상승교차(K>D)")
+                        long_checks['stoch_cross'] = is_stoch_bullish_event
                     if use_volume:
                         is_volume_high = latest_current_volume > latest_volume_sma * volume_multiplier
-                        if is_volume_high: long_conditions_met.append(True); long_entry_reasons.append(f"거래량 증가")
+                        long_checks['volume'] = is_volume_high
+
+                    long_entry_reasons = get_met_labels('long_entry', long_checks, details={'stoch': f"(K:{latest_stoch_k:.1f})"})
+                    long_entry = len(long_entry_reasons) >= min_conditions
 
-                    long_entry = len(long_conditions_met) >= min_conditions
+                    # [★신규] 타임프레임 합류 규칙 (mtf_settings.min_conditions: {타임프레임: 최소 충족 조건 수})
+                    confluence, mtf_blocked = None, False
+                    if engine and mtf_settings['min_conditions']:
+                        confluence = engine.confluence(mtf_settings['entry_settings'], mtf_settings['min_conditions'])
+                        logging.info(f"[Spot] 타임프레임 합류 - 매수: {confluence['long']} {confluence['detail']}")
+                        mtf_blocked = long_entry and not confluence['long']
+                        long_entry = long_entry and confluence['long']
 
                     # [★수정] HTF 필터 적용
+                    decision = "WAIT"
                     if long_entry and (not use_htf_filter or (use_htf_filter and htf_trend == "UP")):
+                        decision = "LONG_ENTRY"
                         logging.info("[Spot] >>> [매수 신호] <<<")
                         logging.info(f"매수 사유: {', '.join(long_entry_reasons)}")
                         
@@ -474,16 +585,31 @@ def run_bot():
                                 logging.info(f"실제 진입 가격: {entry_price:.{price_decimals}f} / 수량: {filled_qty}")
                             else:
                                 logging.warning("[Spot] 체결 가격을 확인할 수 없어 포지션을 저장하지 못했습니다.")
+                    elif long_entry:
+                        decision = "BLOCKED_BY_HTF"
+                    elif mtf_blocked:
+                        decision = "BLOCKED_BY_MTF"
+
+                    profiles = run_strategy_profiles(candles, current_price, price_decimals, engine, htf_trend if use_htf_filter else None) # [★신규]
+                    publish_cycle_snapshot(candles, latest, current_price, {'long_entry': long_checks}, decision, check_interval, htf_trend=htf_trend, mtf=confluence, profiles=profiles)
+
+                # --- [C] 포지션 파일과 잔고가 맞지 않음 (잔고가 최소 수량과 같은 경우 등): 봇 판단은 건너뛰고 전략 프로필만 실행 ---
+                else:
+                    logging.warning("[Spot] 포지션 파일과 잔고가 맞지 않아 이번 주기 봇 판단을 건너뜁니다.")
+                    run_strategy_profiles(candles, current_price, price_decimals)
 
             except Exception as e:
                 logging.error(f"[Spot] *** 메인 루프 내에서 에러 발생: {e} ***")
+                bot_control.update_status(last_error=f"{datetime.now():%Y-%m-%d %H:%M:%S} {e}")
 
             logging.info(f"다음 확인까지 {check_interval}초 대기합니다...")
-            time.sleep(check_interval)
+            finish_cycle(cycle_started, check_interval)
             
     except KeyboardInterrupt: 
         logging.info("\n[Spot] 종료 신호 감지.")
     finally:
+        try: mark_snapshot_stopped(SNAPSHOT_KEY)
+        except Exception as e: logging.error(f"[Spot] 스냅샷 종료 표시 실패: {e}")
         logging.info("[Spot] 안전 종료 완료.")
 
 if __name__ == '__main__':
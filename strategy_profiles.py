@@ -0,0 +1,278 @@
+# strategy_profiles.py (전략 프로필: 봇 하나가 같은 심볼/타임프레임에서 여러 전략 설정을 함께 평가하고 프로필마다 따로 실행)
+#  - config.json 의 "strategy_profiles": [{"name": ..., "execution": "paper" | "live", "indicator_settings": {...}, "htf_settings": {...},
+#    "atr_settings": {...}, "stop_loss_pct", "take_profit_pct", "quantity"(현물은 "quantity_usdt"), "api_key"/"secret_key"(live 전용)}]
+#    -> 적지 않은 값은 봇 설정 그대로 (A/B 비교는 바꿀 값만 적으면 된다), "enabled": false 면 건너뜀
+#  - 캔들/지표는 봇이 이번 주기에 받아 계산한 CandleSeries 를 나눠 쓴다 -> 프로필이 몇 개든 캔들 조회/지표 계산은 봇 한 번
+#    (지표 길이(SMA/RSI/MACD/BB/ATR)는 봇과 같다. 길이를 바꿔 비교하려면 봇을 따로 띄운다)
+#  - 조건은 signal_batch 식에 프로필별 임계값 배열을 넣어 (프로필 x 조건) 표로 한 번에 평가
+#  - HTF 추세는 (타임프레임, 단기, 장기) 조합마다 주기당 한 번 (멀티 타임프레임 엔진이 켜져 있으면 엔진에서)
+#  - 실행: paper = 프로필마다 독립 모의 계좌 (paper_trading 매칭 엔진, 체결가는 봇이 받은 현재가, 스톱 판정 1분봉은 주기당 한 번 공유)
+#          live  = 프로필 전용 API 키(서브 계정)로 만든 Client -> 봇 계정의 포지션과 섞이지 않는다 (키가 없으면 실행하지 않음)
+#  - 상태: profiles/<시장>_<이름>/ 아래 position.json (진입가/수량/SL/TP), paper_<시장>.json (모의 계좌)
+
+import os, re, json, logging
+import numpy as np
+from binance.client import Client
+import indicators
+import signal_batch
+import exchange_sim
+import paper_trading
+from bot_snapshot import get_met_labels
+
+PROFILE_FOLDER = "profiles"
+PROFILE_SECTIONS = ('indicator_settings', 'htf_settings', 'atr_settings')
+QUANTITY_KEYS = {"Spot": "quantity_usdt", "USD-M": "quantity", "COIN-M": "quantity"}
+EXIT_KEYS = ['sma', 'rsi', 'macd', 'bb', 'stoch_cross'] # 봇의 포지션 종료 조건 (스토캐스틱 과매수/과매도, 거래량 없음)
+CONDITIONAL_ORDER_TYPES = ('STOP', 'STOP_MARKET', 'TAKE_PROFIT', 'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET')
+
+def load_profiles(config, market, defaults):
+    """strategy_profiles 를 봇 설정 위에 덮어 프로필 설정 목록으로.
+    defaults: 봇의 stop_loss_pct / take_profit_pct / quantity (프로필에 없을 때, 수량 자료형도 봇과 같게). 이름이 없거나 겹치면 제외."""
+    profiles, names = [], set()
+    for raw in config.get("strategy_profiles", []):
+        name = str(raw.get("name", "")).strip()
+        if not name or name in names or not raw.get("enabled", True): continue
+        names.add(name)
+        merged = {section: dict(config.get(section, {}), **raw.get(section, {})) for section in PROFILE_SECTIONS}
+        profile = signal_batch.load_entry_settings(merged)
+        indicator_settings, atr_settings = merged['indicator_settings'], merged['atr_settings']
+        profile.update({
+            'name': name, 'execution': raw.get("execution", "paper"),
+            'min_exit_conditions': indicator_settings.get("min_exit_conditions", 3),
+            'use_atr_sl_tp': atr_settings.get("use_atr_sl_tp", True),
+            'atr_sl_multiplier': atr_settings.get("atr_sl_multiplier", 2.0), 'atr_tp_multiplier': atr_settings.get("atr_tp_multiplier", 3.0),
+            'stop_loss_pct': float(raw.get("stop_loss_pct", defaults['stop_loss_pct'])),
+            'take_profit_pct': float(raw.get("take_profit_pct", defaults['take_profit_pct'])),
+            'quantity': type(defaults['quantity'])(raw.get(QUANTITY_KEYS[market], defaults['quantity'])),
+            'api_key': raw.get("api_key"), 'secret_key': raw.get("secret_key"),
+        })
+        profiles.append(profile)
+    return profiles
+
+def evaluate_profiles(candles, params, profiles):
+    """공유 캔들(지표 열 포함)의 확정/이전 캔들로 모든 프로필의 조건을 한 번에.
+    반환: {'long_entry'|'short_entry'|'long_exit'|'short_exit': (프로필 x CONDITION_KEYS) bool 배열}, (프로필 x 조건) 켜짐 마스크"""
+    names = indicators.condition_column_names(params)
+    latest = {key: candles[name][-2] for key, name in names.items()}
+    prev = {key: candles[name][-3] for key, name in names.items()}
+    thresholds = {key: np.array([p[key] for p in profiles], dtype=np.float64) for key in signal_batch.THRESHOLD_KEYS}
+    enabled = np.array([[p[f"use_{key}"] for key in signal_batch.CONDITION_KEYS] for p in profiles], dtype=bool)
+    def table(checks): # 임계값이 없는 조건은 스칼라 -> 프로필 수만큼 펼친다
+        return np.stack([np.broadcast_to(checks.get(key, False), len(profiles)) for key in signal_batch.CONDITION_KEYS], axis=1) & enabled
+    long_entry, short_entry = signal_batch.entry_conditions(latest, prev, thresholds)
+    long_exit, short_exit = signal_batch.exit_conditions(latest, prev, None)
+    return {'long_entry': table(long_entry), 'short_entry': table(short_entry), 'long_exit': table(long_exit), 'short_exit': table(short_exit)}, enabled
+
+class SharedFeed(paper_trading.LiveFeed):
+    """프로필 모의 계좌들이 나눠 쓰는 시세 원천 겸 시계: 현재가는 봇이 이번 주기에 받은 값, 1분봉은 봇 Client 로 주기당 한 번.
+    캐시는 실제 시각 TTL 대신 주기 단위 (리플레이의 가상 시각에서도 같은 동작)."""
+    book = None # 호가 조회 없이 현재가 + 슬리피지로 체결
+
+    def __init__(self, client, base_interval="1m"):
+        super().__init__(client, base_interval)
+        self.prices, self.now = {}, 0
+
+    def begin_cycle(self, market, symbol, price, now_ms):
+        self.cache.clear()
+        self.prices[(market, symbol)], self.now = price, now_ms
+
+    def _cached(self, key, loader):
+        if key not in self.cache: self.cache[key] = (self.now, loader())
+        return self.cache[key][1]
+
+    def price(self, market, symbol, now_ms):
+        return self.prices.get((market, symbol)) or super().price(market, symbol, now_ms)
+
+    def now_ms(self):
+        return self.now
+
+class ProfileExecutor:
+    """프로필 하나의 계좌 연결과 포지션 상태 (봇의 주문/포지션 함수와 같은 흐름)."""
+
+    def __init__(self, config, market, symbol, profile, feed):
+        self.market, self.symbol, self.profile = market, symbol, profile
+        self.tag = f"[{market}/{profile['name']}]"
+        folder_name = re.sub(r'[^\w.-]', '_', profile['name']) # 파일 이름에 쓸 수 없는 문자
+        self.folder = os.path.join(PROFILE_FOLDER, f"{paper_trading.PAPER_FILE_KEYS[market]}_{folder_name}")
+        self.position_path = os.path.join(self.folder, "position.json")
+        self.client = self._create_client(config, feed)
+        self.prepared = market == "Spot" # 선물은 첫 주기에 마진 타입/레버리지 설정
+
+    def _create_client(self, config, feed):
+        if self.profile['execution'] == "live":
+            if not (self.profile['api_key'] and self.profile['secret_key']):
+                raise ValueError("live 프로필은 전용 api_key/secret_key 가 필요합니다 (봇 계정과 포지션이 섞이지 않도록)")
+            return Client(self.profile['api_key'], self.profile['secret_key'], testnet=config.get("mode", "Test") == "Test", ping=False)
+        client = Client("paper", "paper", ping=False)
+        exchange = exchange_sim.SimExchange(config, clock=feed, feed=feed, settings=paper_trading.get_paper_settings(config))
+        transport = paper_trading.PaperTransport(exchange, self.folder)
+        client.session.adapters.clear() # 봇/리플레이 세션 설정과 무관하게 모든 요청을 이 프로필의 모의 계좌로
+        for prefix in ("https://", "http://"): client.session.mount(prefix, transport)
+        return client
+
+    def api(self, name):
+        return getattr(self.client, ("futures_" if self.market == "USD-M" else "futures_coin_") + name)
+
+    def prepare(self, leverage, margin_type):
+        try: self.api("change_margin_type")(symbol=self.symbol, marginType=margin_type)
+        except Exception as e:
+            if "No need to change" not in str(e): logging.warning(f"{self.tag} 마진 타입 설정 실패: {e}")
+        self.api("change_leverage")(symbol=self.symbol, leverage=leverage)
+        self.prepared = True
+
+    def get_position(self):
+        """선물: 포지션 수량(숏은 음수), 현물: 기초 자산 잔고."""
+        if self.market == "Spot":
+            balance = self.client.get_asset_balance(asset=exchange_sim.split_symbol("Spot", self.symbol)[0])
+            return float(balance['free']) if balance else 0.0
+        for p in self.api("position_information")():
+            if p['symbol'] == self.symbol: return float(p['positionAmt'])
+        return 0.0
+
+    def load_position(self):
+        try:
+            with open(self.position_path, 'r') as f: return json.load(f)
+        except FileNotFoundError: return None
+
+    def save_position(self, entry_price, quantity, sl_target, tp_target):
+        os.makedirs(self.folder, exist_ok=True)
+        position = {'entry_price': entry_price, 'quantity': quantity, 'sl_target': sl_target, 'tp_target': tp_target}
+        with open(self.position_path, 'w') as f: json.dump(position, f)
+        logging.info(f"{self.tag} 포지션 저장: 진입={entry_price}, SL={sl_target}, TP={tp_target}")
+        return position
+
+    def clear_position(self):
+        if os.path.exists(self.position_path): os.remove(self.position_path)
+
+    def targets(self, entry, is_long, atr, price_decimals):
+        # 봇과 같은 SL/TP: ATR 배수 (ATR 이 없으면 고정 %)
+        p = self.profile
+        if p['use_atr_sl_tp'] and atr > 0: sl_gap, tp_gap = atr * p['atr_sl_multiplier'], atr * p['atr_tp_multiplier']
+        else: sl_gap, tp_gap = entry * p['stop_loss_pct'] / 100, entry * p['take_profit_pct'] / 100
+        direction = 1 if is_long else -1
+        return round(entry - direction * sl_gap, price_decimals), round(entry + direction * tp_gap, price_decimals)
+
+    def enter(self, is_long, latest_close, atr, price_decimals):
+        p = self.profile
+        if self.market == "Spot":
+            order = self.client.create_order(symbol=self.symbol, side="BUY", type="MARKET", quoteOrderQty=p['quantity'])
+            fills = order.get('fills') or []
+            filled_qty = float(order.get('executedQty', 0.0))
+            entry = sum(float(f['price']) * float(f['qty']) for f in fills) / filled_qty if fills and filled_qty else latest_close
+            return self.save_position(entry, filled_qty, *self.targets(entry, True, atr, price_decimals))
+        side = "BUY" if is_long else "SELL"
+        order = self.api("create_order")(symbol=self.symbol, side=side, type="MARKET", quantity=p['quantity'])
+        entry = next((float(pos['entryPrice']) for pos in self.api("position_information")() if pos['symbol'] == self.symbol), 0.0)
+        entry = entry or float(order.get('avgPrice') or 0.0) or latest_close # 진입가 조회 실패시
+        position = self.save_position(entry, p['quantity'], *self.targets(entry, is_long, atr, price_decimals))
+        self.api("create_order")(symbol=self.symbol, side="SELL" if is_long else "BUY", type="STOP_MARKET", stopPrice=position['sl_target'], closePosition=True)
+        return position
+
+    def cancel_orders(self):
+        # 대기 주문 + 손절(STOP_MARKET) 취소. USD-M 손절은 python-binance 가 algoOrder 로 보내므로 조건부 주문을 따로 취소하고,
+        # COIN-M 손절은 일반 주문 경로라 allOpenOrders 에 포함되지만 남아 있는 조건부 주문이 있으면 하나씩 취소한다
+        self.api("cancel_all_open_orders")(symbol=self.symbol)
+        try:
+            if self.market == "USD-M": self.api("cancel_all_open_orders")(symbol=self.symbol, conditional=True)
+            for order in self.api("get_open_orders")(symbol=self.symbol):
+                if order.get('type') in CONDITIONAL_ORDER_TYPES: self.api("cancel_order")(symbol=self.symbol, orderId=order['orderId'])
+        except Exception as e: logging.warning(f"{self.tag} 조건부 주문 취소 실패: {e}")
+
+    def close(self, amount, quantity_decimals):
+        if self.market == "Spot":
+            qty = np.floor(amount * 10 ** quantity_decimals) / 10 ** quantity_decimals
+            self.client.create_order(symbol=self.symbol, side="SELL", type="MARKET", quantity=f"{qty:0.{quantity_decimals}f}")
+        else:
+            self.cancel_orders()
+            self.api("create_order")(symbol=self.symbol, side="SELL" if amount > 0 else "BUY", type="MARKET", quantity=abs(amount))
+        self.clear_position()
+
+class ProfileHost:
+    """봇 하나에 붙는 전략 프로필 묶음. 설정이 바뀌면(/reload) matches() 로 확인해 봇이 다시 만든다 (모의 계좌/포지션은 파일에 남는다)."""
+
+    def __init__(self, config, market, symbol, params, profiles, client, price_decimals, quantity_decimals=8, leverage=None, margin_type=None):
+        self.market, self.symbol, self.params, self.profiles = market, symbol, dict(params), profiles
+        self.price_decimals, self.quantity_decimals, self.leverage, self.margin_type = price_decimals, quantity_decimals, leverage, margin_type
+        self.feed = SharedFeed(client, paper_trading.get_paper_settings(config)['base_interval'])
+        self.executors = []
+        for profile in profiles:
+            try: self.executors.append(ProfileExecutor(config, market, symbol, profile, self.feed))
+            except Exception as e:
+                logging.error(f"[{market}/{profile['name']}] 프로필 실행 준비 실패: {e}")
+                self.executors.append(None)
+
+    def matches(self, profiles, params):
+        return (self.profiles, self.params) == (profiles, dict(params))
+
+    def run_cycle(self, candles, current_price, now_ms, get_trend, known_trends=None):
+        """이번 주기 공유 캔들로 모든 프로필을 판단/실행. get_trend(타임프레임, 단기, 장기) -> UP/DOWN/NEUTRAL.
+        반환: 프로필별 요약 목록 (봇 스냅샷에 포함)."""
+        price = current_price or float(candles.close[-1]) # 포지션이 없으면 선물 포지션 조회의 현재가가 0
+        self.feed.begin_cycle(self.market, self.symbol, price, now_ms)
+        tables, enabled = evaluate_profiles(candles, self.params, self.profiles)
+        latest_close = float(candles.close[-2])
+        atr_column = indicators.bot_column_names(self.params)[1] # 봇과 같은 ATR 열 (기본은 없는 열 -> 0, 고정 % SL/TP)
+        atr = float(candles[atr_column][-2]) if atr_column in candles else 0.0
+        atr = 0.0 if np.isnan(atr) else atr
+        trends = dict(known_trends or {})
+        def trend(profile): # 같은 (타임프레임, 단기, 장기) 는 주기당 한 번
+            key = (profile['htf_timeframe'], profile['htf_sma_short'], profile['htf_sma_long'])
+            if key not in trends: trends[key] = get_trend(*key)
+            return trends[key]
+
+        results = []
+        for i, (profile, executor) in enumerate(zip(self.profiles, self.executors)):
+            summary = {'name': profile['name'], 'execution': profile['execution'], 'decision': "DISABLED", 'position': None}
+            if executor is not None:
+                try: summary.update(self._run_profile(i, executor, tables, enabled[i], price, latest_close, atr, trend))
+                except Exception as e:
+                    logging.error(f"{executor.tag} *** 프로필 실행 실패: {e} ***")
+                    summary.update(decision="ERROR", error=str(e))
+            results.append(summary)
+        return results
+
+    def _run_profile(self, i, executor, tables, enabled, price, latest_close, atr, trend):
+        p, tag = executor.profile, executor.tag
+        if not executor.prepared: executor.prepare(self.leverage, self.margin_type)
+        amount, position = executor.get_position(), executor.load_position()
+        held = amount > 0 if self.market == "Spot" else amount != 0
+        if position and not held:
+            logging.info(f"{tag} 보유 수량 없음 (손절 체결 등). 포지션 파일 삭제.")
+            executor.clear_position(); position = None
+        elif not position and held and self.market != "Spot": # 현물 잔고는 수동 보유일 수 있어 그대로 둔다
+            logging.warning(f"{tag} 포지션 파일 불일치 감지. 브로커 정보로 파일 생성 (고정 % SL/TP)")
+            entry = next((float(pos['entryPrice']) for pos in executor.api("position_information")() if pos['symbol'] == self.symbol), price)
+            position = executor.save_position(entry, abs(amount), *executor.targets(entry, amount > 0, 0.0, self.price_decimals))
+
+        # --- [A] 보유 중: 익절/손절/전략 종료 ---
+        if position:
+            is_long = self.market == "Spot" or amount > 0
+            group = 'long_exit' if is_long else 'short_exit'
+            exit_checks = {key: bool(tables[group][i, signal_batch.CONDITION_KEYS.index(key)]) for key in EXIT_KEYS if p[f"use_{key}"]}
+            sl_target, tp_target = position['sl_target'], position['tp_target']
+            reason = None
+            if (price >= tp_target) if is_long else (price <= tp_target): reason = "익절(TP) 도달"
+            elif (price <= sl_target) if is_long else (price >= sl_target): reason = "손절(SL) 도달"
+            else:
+                exit_reasons = get_met_labels(group, exit_checks)
+                if len(exit_reasons) >= p['min_exit_conditions']: reason = f"전략 종료 신호 ({', '.join(exit_reasons)})"
+            if reason:
+                logging.info(f"{tag} >>> [포지션 종료 신호] {reason} <<<")
+                executor.close(min(amount, position['quantity']) if self.market == "Spot" else amount, self.quantity_decimals)
+            return {'decision': reason or "HOLD", 'exit_count': sum(exit_checks.values()), 'min_exit_conditions': p['min_exit_conditions'],
+                    'position': None if reason else dict(position, amount=amount)}
+
+        # --- [B] 미보유: 진입 ---
+        long_count, short_count = int(tables['long_entry'][i].sum()), int(tables['short_entry'][i].sum())
+        long_entry = long_count >= p['min_conditions']
+        short_entry = short_count >= p['min_conditions'] and self.market != "Spot"
+        htf_trend = trend(p) if p['use_htf_filter'] else None
+        decision, position = "WAIT", None
+        if long_entry and (not p['use_htf_filter'] or htf_trend == "UP"): decision = "LONG_ENTRY"
+        elif short_entry and (not p['use_htf_filter'] or htf_trend == "DOWN"): decision = "SHORT_ENTRY"
+        elif long_entry or short_entry: decision = "BLOCKED_BY_HTF"
+        if decision in ("LONG_ENTRY", "SHORT_ENTRY"):
+            logging.info(f"{tag} >>> [{decision}] 조건 {long_count if decision == 'LONG_ENTRY' else short_count}/{int(enabled.sum())} <<<")
+            position = executor.enter(decision == "LONG_ENTRY", latest_close, atr, self.price_decimals)
+        return {'decision': decision, 'long_count': long_count, 'short_count': short_count, 'min_conditions': p['min_conditions'],
+                'htf_trend': htf_trend, 'position': position}
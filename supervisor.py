@@ -0,0 +1,199 @@
+# supervisor.py (봇 감독 프로세스: 워밍업 워커, 크래시 자동 재시작(지수 백오프), 첫 판단까지 걸린 시간 기록)
+#  실행: python supervisor.py  (대시보드에서 봇 시작 시 자동 실행됨)
+#  GET  /status             -> 봇별 감독 상태
+#  POST /start/<market_key> -> 봇 시작 (미리 import 해둔 워커에 할당)
+#  POST /stop/<market_key>  -> 봇 안전 종료 (재시작 안 함)
+#  (요청마다 bot_control 과 같은 실행별 토큰 헤더 필요, 토큰 파일: snapshots/.supervisor_control.token)
+
+import os, sys, time, json, logging, threading, subprocess, importlib, signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import bot_control
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_MODULES = {'usd_m': 'usd_m_bot_logic', 'coin_m': 'coin_m_bot_logic', 'spot': 'spot_bot_logic'}
+WARM_POOL_SIZE = 1          # 할당 대기 중인 워커 수
+BACKOFF_BASE_SEC = 5        # 첫 재시작 대기 시간 (이후 2배씩 증가)
+BACKOFF_MAX_SEC = 600
+STABLE_RUN_SEC = 600        # 이 시간 이상 동작한 뒤 종료되면 백오프를 처음부터 다시 계산
+STOP_TIMEOUT_SEC = 30       # 안전 종료 요청 후 이 시간 안에 끝나지 않으면 강제 종료
+TTFD_HISTORY_LEN = 20
+CONFIG_ERROR_EXIT_CODE = 78 # 봇 모듈이 import 중 exit() (API 키/config.json 없음) -> 다시 시작해도 같으므로 재시작하지 않음
+IS_WINDOWS = os.name == 'nt'
+
+try:
+    with open(os.path.join(BASE_DIR, 'config.json'), 'r') as f: config = json.load(f)
+except (FileNotFoundError, json.JSONDecodeError): config = {}
+
+# --- 워커 (별도 프로세스) ---
+def run_worker():
+    # 무거운 라이브러리를 미리 import 해 두고, 표준 입력으로 봇 모듈 이름을 받으면 바로 실행
+    # (접속 확인/마진·레버리지 설정은 어느 봇에 할당될지와 할당 시점의 config 에 따라 달라지므로 미리 하지 않는다)
+    import pandas, indicators, binance.client, bot_snapshot
+    module_name = sys.stdin.readline().strip()
+    if not module_name: return
+    try: bot = importlib.import_module(module_name)
+    except SystemExit: sys.exit(CONFIG_ERROR_EXIT_CODE) # [★수정] 봇 모듈의 설정 오류 exit() 는 정상 종료(0)가 아니라 설정 오류로
+    bot.run_bot()
+    sys.exit(0 if bot_control.stop_requested() else 3) # 요청 없이 끝났으면 비정상 종료로 알림
+
+# --- 감독 프로세스 ---
+class Supervisor:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.warm_workers = []
+        self.bots = {key: {'desired': False, 'state': 'stopped', 'process': None, 'warm_start': None,
+                           'assigned_at': None, 'stop_requested_at': None, 'stop_delivered': False, 'next_start_at': None,
+                           'failures': 0, 'restarts': 0, 'last_exit_code': None,
+                           'ttfd_sec': None, 'ttfd_history': []} for key in BOT_MODULES}
+
+    def spawn_worker(self):
+        creationflags = subprocess.CREATE_NEW_PROCESS_GROUP if IS_WINDOWS else 0
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker"], cwd=BASE_DIR,
+                                stdin=subprocess.PIPE, text=True, creationflags=creationflags)
+
+    def refill_warm_pool(self):
+        self.warm_workers = [w for w in self.warm_workers if w.poll() is None]
+        while len(self.warm_workers) < WARM_POOL_SIZE: self.warm_workers.append(self.spawn_worker())
+
+    def assign(self, market_key):
+        bot = self.bots[market_key]
+        while True:
+            warm_start = bool(self.warm_workers)
+            worker = self.warm_workers.pop(0) if warm_start else self.spawn_worker()
+            try:
+                worker.stdin.write(BOT_MODULES[market_key] + "\n"); worker.stdin.close()
+                break
+            except (BrokenPipeError, OSError) as e:
+                # [★수정] 대기 중에 죽은 워커 -> 버리고 다음 워커(없으면 새 워커)로 다시 시도
+                logging.warning(f"[감독] 워커(PID: {worker.pid}) 할당 실패: {e}")
+                worker.kill()
+                if not warm_start: # 방금 만든 워커도 실패하면 다음 tick 에서 다시 시도
+                    bot.update(state='backoff', next_start_at=time.time() + BACKOFF_BASE_SEC); return
+        bot.update(process=worker, warm_start=warm_start, assigned_at=time.time(), stop_requested_at=None, stop_delivered=False,
+                   next_start_at=None, ttfd_sec=None, state='starting')
+        logging.info(f"[감독] {market_key} 봇 시작 (PID: {worker.pid}, 워밍업 워커: {warm_start})")
+
+    def start(self, market_key):
+        with self.lock:
+            bot = self.bots[market_key]
+            if bot['desired']: return 'already running'
+            bot.update(desired=True, failures=0, next_start_at=time.time())
+        return 'starting'
+
+    def stop(self, market_key):
+        with self.lock:
+            bot = self.bots[market_key]
+            bot.update(desired=False, next_start_at=None)
+            if bot['process'] is None: bot['state'] = 'stopped'; return 'stopped'
+            bot.update(state='stopping', stop_requested_at=time.time(), stop_delivered=False)
+        # [★수정] 제어 서버가 아직 응답하지 않으면(봇 초기화 중) check_bot 에서 다시 요청하고, STOP_TIMEOUT_SEC 가 지나야 강제 종료
+        bot['stop_delivered'] = bot_control.request_control(market_key, "stop", config) is not None
+        return 'stopping'
+
+    def check_bot(self, market_key, now):
+        bot = self.bots[market_key]
+        process = bot['process']
+        if process is not None and process.poll() is not None:
+            ran_sec = now - bot['assigned_at']
+            bot.update(process=None, last_exit_code=process.returncode)
+            if bot['desired'] and process.returncode == CONFIG_ERROR_EXIT_CODE:
+                bot.update(desired=False, state='failed') # [★수정] 설정을 고친 뒤 대시보드에서 다시 시작
+                logging.error(f"[감독] {market_key} 봇 설정 오류 (API 키/config.json 확인). 재시작하지 않습니다.")
+            elif bot['desired']:
+                bot['failures'] = 1 if ran_sec >= STABLE_RUN_SEC else bot['failures'] + 1
+                delay = min(BACKOFF_BASE_SEC * 2 ** (bot['failures'] - 1), BACKOFF_MAX_SEC)
+                bot.update(state='backoff', next_start_at=now + delay, restarts=bot['restarts'] + 1)
+                logging.warning(f"[감독] {market_key} 봇 비정상 종료 (코드: {process.returncode}, 동작 {ran_sec:.0f}초). {delay}초 후 재시작.")
+            else:
+                bot['state'] = 'stopped'
+                logging.info(f"[감독] {market_key} 봇 종료 (코드: {process.returncode})")
+        elif process is not None:
+            if not bot['desired'] and now - bot['stop_requested_at'] > STOP_TIMEOUT_SEC:
+                logging.warning(f"[감독] {market_key} 봇이 {STOP_TIMEOUT_SEC}초 안에 종료되지 않아 강제 종료합니다.")
+                process.kill()
+            elif not bot['desired'] and not bot['stop_delivered']:
+                bot['stop_delivered'] = bot_control.request_control(market_key, "stop", config) is not None
+            elif bot['ttfd_sec'] is None:
+                status = bot_control.request_control(market_key, "status", config)
+                if status and status.get('pid') == process.pid and status.get('cycle_count', 0) >= 1:
+                    ttfd = round(status['last_cycle_at'] - bot['assigned_at'], 2)
+                    bot.update(state='running', ttfd_sec=ttfd, ttfd_history=(bot['ttfd_history'] + [{'at': now, 'sec': ttfd, 'warm': bot['warm_start']}])[-TTFD_HISTORY_LEN:])
+                    logging.info(f"[감독] {market_key} 첫 판단까지 {ttfd}초 (워밍업 워커: {bot['warm_start']})")
+        if bot['desired'] and bot['process'] is None and now >= bot['next_start_at']:
+            self.assign(market_key)
+
+    def tick(self):
+        with self.lock:
+            now = time.time()
+            for market_key in self.bots: self.check_bot(market_key, now)
+            self.refill_warm_pool()
+
+    def get_status(self):
+        with self.lock:
+            return {'pid': os.getpid(), 'warm_workers': len(self.warm_workers),
+                    'bots': {key: {k: v for k, v in bot.items() if k != 'process'} | {'pid': bot['process'].pid if bot['process'] else None}
+                             for key, bot in self.bots.items()}}
+
+    def shutdown(self):
+        for market_key, bot in self.bots.items():
+            if bot['process'] is not None: self.stop(market_key)
+        deadline = time.time() + STOP_TIMEOUT_SEC
+        for bot in self.bots.values():
+            if bot['process'] is None: continue
+            try: bot['process'].wait(timeout=max(deadline - time.time(), 0.1))
+            except subprocess.TimeoutExpired: bot['process'].kill()
+        for worker in self.warm_workers: worker.kill()
+
+supervisor = Supervisor()
+
+class _SupervisorHandler(BaseHTTPRequestHandler):
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not bot_control.is_authorized(self, self.server.token): self._reply(403, {'error': 'forbidden'}) # [★수정] 봇 제어 엔드포인트와 같은 토큰 검사
+        elif self.path == '/status': self._reply(200, supervisor.get_status())
+        else: self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        command, _, market_key = self.path.strip('/').partition('/')
+        if not bot_control.is_authorized(self, self.server.token): self._reply(403, {'error': 'forbidden'})
+        elif market_key not in BOT_MODULES: self._reply(404, {'error': 'unknown bot'})
+        elif command == 'start': self._reply(200, {'result': supervisor.start(market_key)})
+        elif command == 'stop': self._reply(200, {'result': supervisor.stop(market_key)})
+        else: self._reply(404, {'error': 'not found'})
+
+    def log_message(self, format, *args): pass
+
+def _raise_keyboard_interrupt(signum, frame): raise KeyboardInterrupt
+
+def run_supervisor():
+    os.makedirs(os.path.join(BASE_DIR, "logs"), exist_ok=True)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S',
+                        handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler(os.path.join(BASE_DIR, "logs", "supervisor_log.txt"), encoding='utf-8')])
+    host, port = bot_control.get_control_address("supervisor", config)
+    server = ThreadingHTTPServer((host, port), _SupervisorHandler) # 포트 사용 중이면 이미 감독 프로세스가 실행 중
+    server.daemon_threads = True
+    server.token = bot_control.create_token("supervisor")
+    threading.Thread(target=server.serve_forever, name="supervisor_control", daemon=True).start()
+    logging.info(f"[감독] 감독 프로세스 시작: http://{host}:{port}/status")
+    signal.signal(signal.SIGINT, signal.default_int_handler) # 백그라운드 실행 시에도 Ctrl+C / 종료 신호로 안전 종료
+    if hasattr(signal, 'SIGTERM'): signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    try:
+        while True:
+            supervisor.tick()
+            time.sleep(1)
+    except KeyboardInterrupt: logging.info("[감독] 종료 신호 감지. 실행 중인 봇을 안전 종료합니다.")
+    finally:
+        supervisor.shutdown(); server.shutdown()
+        logging.info("[감독] 안전 종료 완료.")
+
+if __name__ == '__main__':
+    os.chdir(BASE_DIR)
+    if "--worker" in sys.argv: run_worker()
+    else: run_supervisor()
@@ -0,0 +1,4 @@
+# 테스트는 저장소 최상위의 모듈을 바로 import 한다 (패키지 구조 없음)
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+HOUR, MINUTE = 3_600_000, 60_000
+SETTINGS = {'slippage_bps': 0.0, 'use_atr_sl_tp': False, 'stop_loss_pct': 2.0, 'take_profit_pct': 5.0, 'taker_fee': 0.0, 'quantity': 1.0}
+
+
+def make_candles(bars, interval_ms, start=0):
+    opens, highs, lows, closes = zip(*bars) if bars else ((), (), (), ())
+    return pd.DataFrame({'open_time': start + interval_ms * np.arange(len(bars), dtype=np.int64), 'open': opens, 'high': highs, 'low': lows, 'close': closes})
+
+
+def long_signal(n):
+    # 첫 캔들 종가에서 롱 진입 -> 두 번째 캔들 시가 100 체결 (SL 98, TP 105), 종료 신호 없음
+    long_entry = np.zeros(n, bool)
+    long_entry[0] = True
+    return {'long_entry': long_entry, 'short_entry': np.zeros(n, bool), 'long_exit': np.zeros(n, bool), 'short_exit': np.zeros(n, bool), 'atr': np.zeros(n)}
+
+
+def run(bars, resolver=None):
+    trades = backtest.run_backtest(make_candles(bars, HOUR), long_signal(len(bars)), SETTINGS, "USD-M", "BTCUSDT", "1h", resolver)
+    return trades.iloc[0]
+
+
+AMBIGUOUS_BARS = [(100, 100, 100, 100), (100, 101, 99, 100), (100, 106, 97, 101), (101, 102, 100, 101)]
+
+
+class Loader:
+    def __init__(self, bars):
+        self.bars, self.calls = bars, 0
+
+    def __call__(self):
+        self.calls += 1
+        return make_candles(self.bars, MINUTE, start=2 * HOUR) # 모호한 세 번째 1시간봉 안의 1분봉
+
+
+def test_unambiguous_sl_and_gap_open():
+    trade = run([(100, 100, 100, 100), (100, 101, 99, 100), (97, 98, 96, 97)])
+    assert (trade['reason'], trade['exit_price'], trade['ambiguous']) == ("SL", 97.0, False) # SL 98 아래로 갭 -> 시가 체결
+
+
+def test_ambiguous_bar_resolved_by_sub_candles():
+    loader = Loader([(100, 101, 99, 100), (100, 103, 99, 102), (102, 105.5, 101, 105), (105, 105, 97, 98)])
+    resolver = backtest.SubCandleResolver(loader, "1m")
+    trade = run(AMBIGUOUS_BARS, resolver)
+    assert (trade['reason'], trade['exit_price'], trade['ambiguous'], trade['resolution']) == ("TP", 105.0, True, "1m")
+    assert trade['exit_time'] == 2 * HOUR + 3 * MINUTE - 1 # TP 에 닿은 1분봉 마감
+    assert loader.calls == 1
+
+
+def test_ambiguous_bar_sl_first_in_sub_candles():
+    resolver = backtest.SubCandleResolver(Loader([(100, 101, 97.5, 98), (98, 106, 98, 105)]), "1m")
+    trade = run(AMBIGUOUS_BARS, resolver)
+    assert (trade['reason'], trade['exit_price'], trade['resolution']) == ("SL", 98.0, "1m")
+
+
+@pytest.mark.parametrize("sub_bars", [None, [(100, 106, 97, 101)], []])
+def test_unresolvable_ambiguous_bar_assumes_sl(sub_bars):
+    # 하위 캔들 없음 / 한 하위 캔들에서 둘 다 닿음 / 하위 캔들 자체가 없음 -> 보수적으로 손절
+    resolver = None if sub_bars is None else backtest.SubCandleResolver(Loader(sub_bars), "1m")
+    trade = run(AMBIGUOUS_BARS, resolver)
+    assert (trade['reason'], trade['exit_price'], trade['ambiguous'], trade['resolution']) == ("SL", 98.0, True, "assumed_sl")
+
+
+def test_sub_candle_opening_past_a_level_decides_it():
+    resolver = backtest.SubCandleResolver(Loader([(100, 101, 99, 100), (106, 107, 97, 98)]), "1m")
+    assert resolver.first_touch(2 * HOUR, HOUR, 1, 98, 105) == ('TP', 2 * HOUR + 2 * MINUTE - 1)
+    assert resolver.first_touch(2 * HOUR, HOUR, -1, 102, 95) == ('SL', 2 * HOUR + 2 * MINUTE - 1)
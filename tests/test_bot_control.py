@@ -0,0 +1,64 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+import bot_control
+
+
+@pytest.fixture
+def control(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_control, "SNAPSHOT_FOLDER", str(tmp_path))
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = {'control_settings': {'usd_m_port': port}}
+    server = bot_control.start_control_server("usd_m", config)
+    yield config, port
+    server.shutdown(); server.server_close()
+    bot_control.stop_event.clear(); bot_control.reload_event.clear(); bot_control.wake_event.clear()
+
+
+def raw_request(port, path, method="POST", headers=None):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method, data=b'' if method == "POST" else None, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=2) as resp: return resp.status
+    except urllib.error.HTTPError as e: return e.code
+
+
+def test_requests_without_the_run_token_are_rejected(control):
+    _, port = control
+    assert raw_request(port, "/stop") == 403
+    assert raw_request(port, "/status", method="GET") == 403
+    assert raw_request(port, "/stop", headers={bot_control.TOKEN_HEADER: "guess"}) == 403
+    assert not bot_control.stop_requested()
+
+
+def test_cross_origin_request_is_rejected_even_with_the_token(control):
+    _, port = control
+    headers = {bot_control.TOKEN_HEADER: bot_control.read_token("usd_m"), 'Origin': "https://example.com"}
+    assert raw_request(port, "/stop", headers=headers) == 403
+    assert not bot_control.stop_requested()
+
+
+def test_client_reads_the_token_file(control):
+    config, _ = control
+    assert bot_control.request_control("usd_m", "status", config)['market'] == "usd_m"
+    assert bot_control.request_control("usd_m", "reload", config) == {'result': 'reload requested'}
+    assert bot_control.consume_reload_request()
+    assert bot_control.request_control("usd_m", "stop", config) == {'result': 'stopping'}
+    assert bot_control.stop_requested()
+
+
+def test_non_loopback_host_is_not_used():
+    assert bot_control.get_control_address("usd_m", {'control_settings': {'host': "0.0.0.0"}})[0] == bot_control.CONTROL_HOST
+    assert bot_control.get_control_address("usd_m", {'control_settings': {'host': "::1"}})[0] == "::1"
+
+
+def test_tracked_orders_come_from_the_position_file():
+    assert bot_control.get_tracked_orders(None) == []
+    long = bot_control.get_tracked_orders({'entry_price': 100, 'quantity': 1, 'sl_target': 95, 'tp_target': 110})
+    assert [(o['type'], o['side'], o['stopPrice']) for o in long] == [("STOP_MARKET", "SELL", 95), ("TAKE_PROFIT", "SELL", 110)]
+    short = bot_control.get_tracked_orders({'entry_price': 100, 'quantity': 1, 'sl_target': 105, 'tp_target': 0})
+    assert [(o['type'], o['side']) for o in short] == [("STOP_MARKET", "BUY")]
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import bot_replay
+import candle_store
+
+DAY = date(2024, 5, 1)
+INTERVALS = ("1m", "15m", "4h")
+CONFIG = {
+    'mode': "Live", 'exchange_sim': {'data_mode': "Live"},
+    'usd_m_settings': {'symbol': "BTCUSDT", 'timeframe': "15m", 'leverage': 5, 'quantity': 0.01},
+    'indicator_settings': {'min_conditions': 4, 'min_exit_conditions': 2},
+}
+
+
+def store_random_walk(market, symbol, start_ms, end_ms, seed=3):
+    # 1분봉 랜덤 워크를 만들고 상위 타임프레임은 1분봉을 묶어 저장 (리플레이가 읽는 캔들 저장소)
+    rng = np.random.default_rng(seed)
+    ts = np.arange(start_ms, end_ms, 60_000)
+    close = 50000 * np.exp(np.cumsum(rng.normal(0, 0.0015, len(ts))))
+    open_ = np.r_[50000, close[:-1]]
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0005, len(ts))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0005, len(ts))))
+    volume = rng.gamma(2, 5, len(ts))
+    conn = candle_store._connect("Live")
+    for interval in INTERVALS:
+        k = candle_store.INTERVAL_MS[interval] // 60_000
+        rows = [(market, symbol, interval, int(ts[i]), float(open_[i]), float(high[i:i + k].max()), float(low[i:i + k].min()),
+                 float(close[i + k - 1]), float(volume[i:i + k].sum()), int(ts[i]) + k * 60_000 - 1) for i in range(0, len(ts) // k * k, k)]
+        conn.executemany("INSERT OR IGNORE INTO candles VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.commit(); conn.close()
+
+
+def test_replay_runs_one_cycle_per_candle(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, 'CANDLE_FOLDER', str(tmp_path / "candles"))
+    start_ms = int(datetime(2024, 5, 1).timestamp() * 1000)
+    store_random_walk("USD-M", "BTCUSDT", start_ms - 12 * 86_400_000, start_ms + 2 * 86_400_000)
+
+    result = bot_replay.run_replay("USD-M", DAY, DAY, CONFIG, run_dir=str(tmp_path / "run"))
+    decisions = result['decisions']
+    assert result['cycles'] == len(decisions)
+    candle_times = pd.to_datetime(decisions['candle_time'])
+    assert candle_times.is_monotonic_increasing
+    assert candle_times.nunique() == 96 # 15분봉 하루: 주기마다 직전 확정 캔들 하나
+    assert candle_times.iloc[0] == pd.Timestamp(datetime(2024, 4, 30, 23, 45))
+    entries = decisions['decision'].isin(["LONG_ENTRY", "SHORT_ENTRY"]).sum()
+    assert entries >= 1 and len(result['fills']) >= entries
+
+    saved = bot_replay.load_decisions(result['run_dir'])
+    assert len(saved) == len(decisions) and list(saved['decision']) == list(decisions['decision'])
+    assert bot_replay.diff_decisions(decisions, saved).empty
+
+
+def test_diff_decisions_reports_changed_and_missing_candles():
+    times = pd.date_range("2024-05-01", periods=4, freq="15min")
+    replay = pd.DataFrame({'candle_time': times.astype(str), 'decision': ["WAIT", "LONG_ENTRY", "HOLD", "HOLD"]})
+    backtest = pd.DataFrame({'candle_time': times[:3], 'decision': ["WAIT", "WAIT", "HOLD"]})
+    # 같은 캔들이 여러 번 기록되면 마지막 판단으로 비교
+    replay = pd.concat([replay, pd.DataFrame({'candle_time': [str(times[0])], 'decision': ["WAIT"]})], ignore_index=True)
+
+    diff = bot_replay.diff_decisions(replay, backtest)
+    assert list(diff['candle_time']) == [times[1], times[3]]
+    assert list(diff['decision_replay']) == ["LONG_ENTRY", "HOLD"]
+    assert list(diff['decision_backtest']) == ["WAIT", "MISSING"]
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+import exchange_sim
+
+T0 = 1_699_999_980_000 # 1분봉 경계
+MINUTE = 60_000
+
+
+def make_engine(bars):
+    """bars: [(open, high, low, close), ...] 1분봉. 첫 봉이 확정된 시각(T0 + 1분)에 시작."""
+    feed = exchange_sim.RecordedFeed("Test")
+    opens, highs, lows, closes = (np.array(column, dtype=float) for column in zip(*bars))
+    feed.series[("USD-M", "BTCUSDT", "1m")] = {'open_time': T0 + MINUTE * np.arange(len(bars), dtype=np.int64), 'open': opens, 'high': highs,
+                                               'low': lows, 'close': closes, 'volume': np.ones(len(bars))}
+    settings = dict(exchange_sim.DEFAULT_SIM_SETTINGS, taker_fee={"Spot": 0.0, "USD-M": 0.0, "COIN-M": 0.0})
+    return exchange_sim.MatchingEngine(feed, settings), T0 + MINUTE
+
+
+def open_long(engine, now, qty=1.0):
+    engine.create_order("USD-M", {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': qty}, now)
+
+
+def place_stop(engine, now, side, stop_price, algo=False):
+    key = 'triggerPrice' if algo else 'stopPrice'
+    return engine.create_order("USD-M", {'symbol': 'BTCUSDT', 'side': side, 'type': 'STOP_MARKET', key: stop_price, 'closePosition': 'true'}, now, algo=algo)
+
+
+def stop_trades(engine):
+    return [t for t in engine.trades["USD-M"] if t['id'] > 1]
+
+
+@pytest.mark.parametrize("algo", [False, True])
+def test_stop_fills_at_stop_price_on_the_first_touching_candle(algo):
+    engine, now = make_engine([(100, 100, 100, 100), (100, 101, 96, 97), (97, 98, 94, 96), (96, 96, 90, 91)])
+    open_long(engine, now)
+    place_stop(engine, now, "SELL", 95, algo)
+    engine.process("USD-M", now + 3 * MINUTE)
+    [trade] = stop_trades(engine)
+    assert float(trade['price']) == 95.0
+    assert trade['time'] == T0 + 3 * MINUTE - 1 # 닿은 캔들(세 번째)의 마감 시각
+    assert engine.get_position("USD-M", "BTCUSDT")['amt'] == 0.0
+    assert engine.open_orders["USD-M"] == []
+
+
+def test_gap_through_stop_fills_at_open():
+    engine, now = make_engine([(100, 100, 100, 100), (100, 101, 99, 100), (90, 91, 88, 89)])
+    open_long(engine, now)
+    place_stop(engine, now, "SELL", 95)
+    engine.process("USD-M", now + 2 * MINUTE)
+    assert float(stop_trades(engine)[0]['price']) == 90.0 # 스톱가가 아니라 갭 시가
+
+
+def test_short_stop_gap_up_fills_at_open():
+    engine, now = make_engine([(100, 100, 100, 100), (110, 112, 109, 111)])
+    engine.create_order("USD-M", {'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'MARKET', 'quantity': 1.0}, now)
+    place_stop(engine, now, "BUY", 105)
+    engine.process("USD-M", now + MINUTE)
+    assert float(stop_trades(engine)[0]['price']) == 110.0
+    assert float(stop_trades(engine)[0]['realizedPnl']) == pytest.approx(-10.0)
+
+
+def test_stop_is_not_triggered_by_candles_before_it_was_placed():
+    engine, now = make_engine([(100, 100, 90, 100), (100, 101, 99, 100), (100, 101, 99, 100)])
+    open_long(engine, now)
+    place_stop(engine, now, "SELL", 95) # 첫 캔들 저가 90 은 주문 전
+    engine.process("USD-M", now + 2 * MINUTE)
+    assert stop_trades(engine) == []
+    assert len(engine.open_orders["USD-M"]) == 1
+
+
+def test_close_position_stop_without_position_expires():
+    engine, now = make_engine([(100, 100, 100, 100), (100, 101, 90, 91)])
+    place_stop(engine, now, "SELL", 95)
+    engine.process("USD-M", now + MINUTE)
+    assert engine.trades["USD-M"] == []
+    assert engine.open_orders["USD-M"] == []
+
+
+def isolated_long(engine, now):
+    pos = engine.get_position("USD-M", "BTCUSDT")
+    pos['margin_type'], pos['leverage'] = "ISOLATED", 20
+    open_long(engine, now) # 증거금 5, 청산가 약 95.38
+
+
+def test_stop_inside_liquidation_price_fills_first_on_the_same_candle():
+    engine, now = make_engine([(100, 100, 100, 100), (99, 99, 90, 91)])
+    isolated_long(engine, now)
+    place_stop(engine, now, "SELL", 96)
+    engine.process("USD-M", now + MINUTE)
+    [trade] = stop_trades(engine)
+    assert float(trade['price']) == 96.0 and 'liquidation' not in trade
+    assert engine.balances["USD-M"]["USDT"] == pytest.approx(10000.0 - 4.0)
+
+
+def test_isolated_liquidation_loses_the_whole_margin():
+    engine, now = make_engine([(100, 100, 100, 100), (99, 99, 90, 91)])
+    isolated_long(engine, now)
+    assert engine.liquidation_price("USD-M", "BTCUSDT") == pytest.approx(95 / 0.996)
+    engine.process("USD-M", now + MINUTE)
+    [trade] = stop_trades(engine)
+    assert trade['liquidation']
+    assert engine.balances["USD-M"]["USDT"] == pytest.approx(10000.0 - 5.0)
+    assert engine.get_position("USD-M", "BTCUSDT")['amt'] == 0.0
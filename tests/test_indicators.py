@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+
+PARAMS = {'short_sma_len': 10, 'long_sma_len': 50, 'rsi_len': 14, 'bbands_len': 20, 'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9, 'atr_length': 14}
+
+
+@pytest.fixture
+def candles():
+    rng = np.random.default_rng(3)
+    n = 300
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    close[120:126] = close[119] # 가격 변화가 없는 구간 (RSI 0/0)
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    high[120:126] = low[120:126] = close[120:126]
+    return pd.DataFrame({'open': close, 'high': high, 'low': low, 'close': close, 'volume': rng.uniform(1, 100, n)})
+
+
+# pandas_ta 의 정의를 pandas ewm/rolling 으로 그대로 옮긴 기준값
+def ref_rma(series, length):
+    return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def ref_ema(series, length):
+    series = series.loc[series.first_valid_index():].copy()
+    seed = series.iloc[:length].mean()
+    series.iloc[:length - 1] = np.nan
+    series.iloc[length - 1] = seed
+    return series.ewm(span=length, adjust=False).mean()
+
+
+def non_zero_range(high, low):
+    diff = high - low
+    return diff + np.finfo(float).eps if (diff == 0).any() else diff
+
+
+def reference_columns(df):
+    close, high, low = df['close'], df['high'], df['low']
+    change = close.diff()
+    gain, loss = change.clip(lower=0), change.clip(upper=0)
+    gain_avg, loss_avg = ref_rma(gain, 14), ref_rma(loss, 14)
+    mid = close.rolling(20).mean()
+    deviation = 2.0 * close.rolling(20).std(ddof=0)
+    lower, upper = mid - deviation, mid + deviation
+    macd = ref_ema(close, 12) - ref_ema(close, 26)
+    signal = ref_ema(macd, 9).reindex(close.index)
+    raw_k = 100 * (close - low.rolling(14).min()) / non_zero_range(high.rolling(14).max(), low.rolling(14).min())
+    stoch_k = raw_k.rolling(3).mean()
+    prev_close = close.shift(1)
+    true_range = pd.concat([non_zero_range(high, low), (high - prev_close).abs(), (prev_close - low).abs()], axis=1).max(axis=1)
+    true_range.iloc[0] = np.nan
+    return {
+        'SMA_10': close.rolling(10).mean(), 'SMA_50': close.rolling(50).mean(),
+        'RSI_14': 100 * gain_avg / (gain_avg + loss_avg.abs()),
+        'BBL_20_2.0': lower, 'BBM_20_2.0': mid, 'BBU_20_2.0': upper,
+        'BBB_20_2.0': 100 * non_zero_range(upper, lower) / mid, 'BBP_20_2.0': non_zero_range(close, lower) / non_zero_range(upper, lower),
+        'MACD_12_26_9': macd, 'MACDh_12_26_9': macd - signal, 'MACDs_12_26_9': signal,
+        'STOCHk_14_3_3': stoch_k, 'STOCHd_14_3_3': stoch_k.rolling(3).mean(),
+        'SMA_20': df['volume'].rolling(20).mean(),
+        'ATRr_14': ref_rma(true_range, 14),
+    }
+
+
+def test_columns_match_pandas_reference(candles):
+    ours = indicators.add_indicator_columns(candles, PARAMS)
+    expected = reference_columns(candles)
+    assert set(expected) == set(ours.columns) - set(candles.columns) # pandas_ta 와 같은 열 이름
+    for name, values in expected.items():
+        np.testing.assert_allclose(ours[name].to_numpy(), values.to_numpy(), rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_ewm_matches_pandas_exactly(candles):
+    close = candles['close']
+    assert np.array_equal(indicators.rma(close.to_numpy(), 14), ref_rma(close, 14).to_numpy(), equal_nan=True)
+    assert np.array_equal(indicators.ema(close.to_numpy(), 12), ref_ema(close, 12).to_numpy(), equal_nan=True)
+
+
+def test_rsi_flat_prices_are_nan_without_warning():
+    with np.errstate(all='raise'):
+        result = indicators.rsi(np.full(40, 100.0), 14)
+    assert np.isnan(result).all()
+
+
+def test_two_dimensional_input_matches_per_column(candles):
+    rng = np.random.default_rng(5)
+    panel = np.column_stack([candles['close'].to_numpy(), candles['close'].to_numpy()[::-1] * rng.uniform(0.99, 1.01, len(candles))])
+    panel[:7, 1] = np.nan # 상장이 늦은 심볼
+    for func, args in ((indicators.sma, (20,)), (indicators.rsi, (14,)), (indicators.ema, (26,)), (indicators.rma, (14,))):
+        together = func(panel, *args)
+        for j in range(panel.shape[1]):
+            np.testing.assert_allclose(together[:, j], func(panel[:, j], *args), rtol=1e-12, equal_nan=True, err_msg=func.__name__)
+
+
+def test_bot_column_lookup_is_opt_in(candles):
+    ours = indicators.add_indicator_columns(candles, PARAMS)
+    volume_sma, atr = indicators.bot_column_names(PARAMS)
+    assert volume_sma not in ours and atr not in ours # 기본: 예전 봇처럼 대체값 (현재 거래량 / 0)
+    assert indicators.condition_column_names(PARAMS)['volume_sma'] == 'volume'
+    enabled = dict(PARAMS, use_volume_atr_columns=True)
+    volume_sma, atr = indicators.bot_column_names(enabled)
+    assert (volume_sma, atr) == ('SMA_20', 'ATRr_14') and volume_sma in ours and atr in ours
+    assert indicators.condition_column_names(enabled)['volume_sma'] == 'SMA_20'
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import monte_carlo
+from exchange_sim import DEFAULT_SIM_SETTINGS
+
+SETTINGS = {'leverage': 5, 'quantity': 0.01, 'taker_fee': 0.0004}
+
+
+def make_trades():
+    return pd.DataFrame({
+        'side': ["LONG", "SHORT", "LONG", "LONG", "SHORT", "LONG"],
+        'entry_price': [100.0, 110.0, 105.0, 98.0, 101.0, 100.0],
+        'exit_price': [104.0, 112.0, 103.0, 101.0, 95.0, 99.0],
+        'qty': [1.0, 1.0, 2.0, 1.0, 1.0, 3.0],
+        'mae_pct': [0.5, 2.5, 1.5, 0.2, 0.8, 1.0],
+    })
+
+
+def expected_pnl(trades, fee=SETTINGS['taker_fee']):
+    direction = np.where(trades['side'] == "LONG", 1.0, -1.0)
+    return direction * trades['qty'] * (trades['exit_price'] - trades['entry_price']) - fee * trades['qty'] * (trades['entry_price'] + trades['exit_price'])
+
+
+def test_shuffle_keeps_terminal_pnl_and_varies_drawdown():
+    trades = make_trades()
+    summary, samples = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, {'method': "shuffle", 'simulations': 500, 'workers': 1})
+    assert summary['simulations'] == 500 and summary['liquidated_trades'] == 0
+    np.testing.assert_allclose(samples['terminal_pnl'], expected_pnl(trades).sum())
+    assert samples['max_drawdown'].min() < samples['max_drawdown'].max() # 순서만 다르다
+    assert summary['prob_loss_pct'] in (0.0, 100.0)
+
+
+def test_same_seed_gives_same_samples_across_workers(monkeypatch):
+    trades = make_trades()
+    mc_settings = {'simulations': 400, 'seed': 7, 'fee_jitter_pct': 20.0, 'extra_slippage_bps': 5.0, 'workers': 1}
+    _, first = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, mc_settings)
+    _, again = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, mc_settings)
+    _, other = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, dict(mc_settings, seed=8))
+    for key in first: np.testing.assert_array_equal(first[key], again[key])
+    assert not np.array_equal(first['terminal_pnl'], other['terminal_pnl'])
+
+    monkeypatch.setattr(monte_carlo, 'CHUNK_CELLS', 100 * len(trades)) # 100개씩 4묶음 -> 묶음마다 시드가 따로
+    _, serial = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, mc_settings)
+    _, parallel = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, dict(mc_settings, workers=2))
+    for key in serial:
+        assert len(parallel[key]) == 400
+        np.testing.assert_array_equal(serial[key], parallel[key])
+
+
+def test_trade_past_liquidation_distance_loses_its_margin():
+    trades = make_trades()
+    leverage = 10
+    limit_pct = (1 / leverage - DEFAULT_SIM_SETTINGS['maintenance_margin_rate']) * 100
+    trades.loc[1, 'mae_pct'] = limit_pct + 0.1 # 최종적으로는 이익이었어도 보유 중 청산 거리를 넘었다
+    summary, samples = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, {'method': "shuffle", 'simulations': 50, 'workers': 1},
+                                                   leverage=leverage)
+    assert summary['liquidated_trades'] == 1 and summary['leverage'] == leverage
+
+    pnl = expected_pnl(trades)
+    entry = trades.loc[1, 'qty'] * trades.loc[1, 'entry_price']
+    pnl[1] = -entry / leverage - SETTINGS['taker_fee'] * entry
+    np.testing.assert_allclose(samples['terminal_pnl'], pnl.sum())
+
+    # 같은 체결이라도 레버리지가 낮으면 청산 거리 안쪽
+    summary, _ = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS, {'simulations': 10, 'workers': 1}, leverage=2)
+    assert summary['liquidated_trades'] == 0
+    # 현물은 청산이 없다
+    summary, _ = monte_carlo.run_monte_carlo(trades, "Spot", "BTCUSDT", SETTINGS, {'simulations': 10, 'workers': 1}, leverage=leverage)
+    assert summary['liquidated_trades'] == 0
+
+
+def test_quantity_scales_pnl_and_small_capital_is_ruined():
+    trades = make_trades().assign(exit_price=lambda t: np.where(t['side'] == "LONG", t['entry_price'] - 5, t['entry_price'] + 5)) # 모두 손실
+    summary, samples = monte_carlo.run_monte_carlo(trades, "USD-M", "BTCUSDT", SETTINGS,
+                                                   {'method': "shuffle", 'simulations': 20, 'workers': 1, 'initial_capital': 100.0}, quantity=0.02)
+    np.testing.assert_allclose(samples['terminal_pnl'], 2 * expected_pnl(trades).sum())
+    assert summary['quantity'] == pytest.approx(0.02)
+    assert summary['prob_loss_pct'] == 100.0 and summary['risk_of_ruin_pct'] == 100.0
+
+
+def test_no_trades_returns_empty_summary():
+    summary, samples = monte_carlo.run_monte_carlo(make_trades().iloc[:0], "USD-M", "BTCUSDT", SETTINGS)
+    assert summary == {'simulations': 0, 'trades': 0} and samples == {}
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicators
+from candle_series import CandleSeries
+from candle_store import INTERVAL_MS
+from mtf_engine import FIELDS, MultiTimeframeEngine
+
+START = 1_704_067_200_000 # 2024-01-01 00:00 UTC
+BASE = "15m"
+PARAMS = {'short_sma_len': 10, 'long_sma_len': 50, 'rsi_len': 14, 'bbands_len': 20, 'macd_fast': 12, 'macd_slow': 26, 'macd_signal': 9, 'atr_length': 14}
+LIMIT = 200 # 봇의 get_market_data limit
+
+
+@pytest.fixture(scope="module")
+def base():
+    rng = np.random.default_rng(11)
+    n = 1500
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    open_time = START + INTERVAL_MS[BASE] * np.arange(n, dtype=np.int64)
+    return pd.DataFrame({'open_time': open_time, 'open': open_, 'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n)),
+                         'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n)), 'close': close, 'volume': rng.uniform(1, 50, n),
+                         'close_time': open_time + INTERVAL_MS[BASE] - 1})
+
+
+def resample(df, interval):
+    # 거래소가 주는 상위 타임프레임 캔들 = 같은 구간 기준 캔들의 pandas resample OHLCV
+    frame = df.set_index(pd.to_datetime(df['open_time'], unit='ms'))
+    out = frame.resample(pd.Timedelta(milliseconds=INTERVAL_MS[interval])).agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+    out.insert(0, 'open_time', out.index.as_unit('ms').asi8)
+    out['close_time'] = out['open_time'] + INTERVAL_MS[interval] - 1
+    return out.reset_index(drop=True)
+
+
+def to_series(df):
+    return CandleSeries(*(df[field].to_numpy() for field in FIELDS))
+
+
+def run_engine(base, timeframes, stop, start=LIMIT):
+    # 봇 주기처럼 기준 캔들 LIMIT+1 개(마지막은 진행 중)를 받을 때마다 update, 필요한 타임프레임만 씨앗
+    engine = MultiTimeframeEngine(BASE, timeframes, PARAMS)
+    seeded = []
+    for live in range(start, stop):
+        engine.update(to_series(base.iloc[live - LIMIT:live + 1]))
+        for interval in engine.needs_seed():
+            engine.seed(interval, to_series(resample(base.iloc[:live + 1], interval).tail(engine.history)))
+            seeded.append((live, interval))
+    return engine, seeded
+
+
+@pytest.mark.parametrize("interval", ["1h", "4h"])
+def test_aggregated_candles_and_indicators_match_resample(base, interval):
+    live = len(base) - 3
+    engine, seeded = run_engine(base, ["1h", "4h"], live + 1)
+    assert [s for s in seeded if s[1] == interval] == [(LIMIT, interval)] # 처음 한 번만 씨앗
+    series = engine.series(interval)
+    expected = resample(base.iloc[:live + 1], interval)
+    closed = expected[expected['close_time'] < base['open_time'].iloc[live]].tail(engine.history)
+    for field in FIELDS:
+        np.testing.assert_allclose(series[field][:-1], closed[field].to_numpy(), rtol=1e-12, err_msg=field)
+        assert series[field][-1] == pytest.approx(expected[field].iloc[-1]) # 진행 중 캔들 = 지금까지의 기준 캔들 합
+    reference = indicators.compute_indicator_columns(*(closed[f].to_numpy() for f in ('high', 'low', 'close', 'volume')), PARAMS)
+    for name, values in reference.items():
+        np.testing.assert_allclose(series[name][:-1], values, rtol=1e-12, equal_nan=True, err_msg=name)
+        assert np.isnan(series[name][-1])
+
+
+def test_missing_base_candles_force_a_new_seed(base):
+    engine, _ = run_engine(base, ["1h"], LIMIT + 10)
+    gap = base.drop(index=range(LIMIT + 20, LIMIT + 24)) # 기준 캔들 한 시간 누락
+    engine.update(to_series(gap.iloc[LIMIT + 30 - LIMIT:LIMIT + 30 - 4 + 1]))
+    assert engine.needs_seed() == ["1h"]
+    assert engine.series("1h") is None
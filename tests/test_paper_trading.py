@@ -0,0 +1,50 @@
+import json
+import multiprocessing
+
+import numpy as np
+import requests
+
+import exchange_sim
+import paper_trading
+
+ORDERS_PER_PROCESS = 15
+PROCESSES = 4
+
+
+class FlatFeed:
+    """가격이 고정된 시세 원천 (공개 요청 없이 매칭 엔진만 돌린다)."""
+    base_interval = "1m"
+
+    def price(self, market, symbol, now_ms):
+        return 100.0
+
+    def book(self, market, symbol, now_ms):
+        return 100.0, 100.0
+
+    def path(self, market, symbol, from_ms, to_ms):
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+
+
+def place_orders(state_folder, count):
+    # 봇/대시보드처럼 프로세스마다 자기 엔진을 두고 같은 상태 파일을 쓴다
+    settings = paper_trading.get_paper_settings({})
+    exchange = exchange_sim.SimExchange({}, feed=FlatFeed(), settings=settings)
+    session = requests.Session()
+    session.mount("https://", paper_trading.PaperTransport(exchange, state_folder))
+    for _ in range(count):
+        response = session.post("https://api.binance.com/api/v3/order", data={'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quoteOrderQty': '10'})
+        assert response.status_code == 200, response.text
+
+
+def test_processes_sharing_state_file_keep_every_order(tmp_path):
+    workers = [multiprocessing.Process(target=place_orders, args=(str(tmp_path), ORDERS_PER_PROCESS)) for _ in range(PROCESSES)]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join(60)
+    assert [worker.exitcode for worker in workers] == [0] * PROCESSES
+
+    with open(paper_trading.get_state_path("Spot", str(tmp_path)), encoding='utf-8') as f: state = json.load(f)
+    trades = state['trades']
+    assert len(trades) == PROCESSES * ORDERS_PER_PROCESS
+    assert len({t['orderId'] for t in trades}) == len(trades)
+    assert state['balances']['USDT'] < 10000.0 - 10 * len(trades) + 1
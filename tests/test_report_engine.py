@@ -0,0 +1,79 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import report_engine
+
+
+def reference_fifo(is_buy, qty, effective_qty, quote_qty, buy_fee, sell_fee):
+    # 로트 큐를 직접 돌리는 선입선출 (match_spot_fifo 의 기준값)
+    lots = deque() # [남은 수량, 단위 원가(수수료 포함), 단위 원가(수수료 제외)]
+    gross, net, unmatched = [], [], []
+    for buy, q, eq, quote, bfee, sfee in zip(is_buy, qty, effective_qty, quote_qty, buy_fee, sell_fee):
+        if buy:
+            lots.append([eq, (quote + bfee) / eq, quote / eq])
+            gross.append(0.0); net.append(0.0); unmatched.append(0.0)
+            continue
+        remaining, cost, gross_cost = q, 0.0, 0.0
+        while remaining > 1e-15 and lots:
+            take = min(remaining, lots[0][0])
+            cost += take * lots[0][1]; gross_cost += take * lots[0][2]
+            lots[0][0] -= take; remaining -= take
+            if lots[0][0] <= 1e-15: lots.popleft()
+        matched = q - remaining
+        gross.append(quote * matched / q - gross_cost)
+        net.append((quote - sfee) * matched / q - cost)
+        unmatched.append(remaining)
+    return np.array(gross), np.array(net), np.array(unmatched)
+
+
+def run_both(is_buy, qty, price, buy_fee=None, sell_fee=None, base_fee=None):
+    is_buy = np.array(is_buy, dtype=bool)
+    qty, price = np.array(qty, dtype=float), np.array(price, dtype=float)
+    quote_qty = qty * price
+    buy_fee = np.zeros(len(qty)) if buy_fee is None else np.array(buy_fee, dtype=float)
+    sell_fee = np.zeros(len(qty)) if sell_fee is None else np.array(sell_fee, dtype=float)
+    effective_qty = qty - (np.zeros(len(qty)) if base_fee is None else np.array(base_fee, dtype=float))
+    args = (is_buy, qty, effective_qty, quote_qty, buy_fee, sell_fee)
+    return report_engine.match_spot_fifo(*args), reference_fifo(*args)
+
+
+def test_partial_lots_are_consumed_in_order():
+    (gross, net, unmatched), _ = run_both([True, True, False, False], [1.0, 2.0, 1.5, 1.5], [100, 110, 120, 130])
+    # 첫 매도: 1.0@100 + 0.5@110 -> 1.5*120 - 155 = 25, 두 번째: 1.5@110 -> 1.5*130 - 165 = 30
+    assert gross == pytest.approx([0.0, 0.0, 25.0, 30.0])
+    assert net == pytest.approx(gross)
+    assert unmatched == pytest.approx([0.0, 0.0, 0.0, 0.0])
+
+
+def test_sell_before_any_buy_is_unmatched():
+    (gross, net, unmatched), _ = run_both([False, True, False], [0.5, 1.0, 1.5], [100, 100, 110])
+    assert unmatched == pytest.approx([0.5, 0.0, 0.5])
+    assert gross == pytest.approx([0.0, 0.0, 10.0]) # 1.0 만 대응 -> 110 - 100
+
+
+def test_matches_loop_reference_with_fees():
+    rng = np.random.default_rng(7)
+    n = 300
+    is_buy = rng.random(n) < 0.55
+    qty = np.round(rng.uniform(0.01, 2.0, n), 4)
+    price = rng.uniform(90, 110, n)
+    buy_fee = np.where(is_buy & (rng.random(n) < 0.5), qty * price * 0.001, 0.0)   # 견적 자산 수수료
+    base_fee = np.where(is_buy & (buy_fee == 0), qty * 0.001, 0.0)                 # 기초 자산 수수료
+    sell_fee = np.where(~is_buy, qty * price * 0.001, 0.0)
+    fast, slow = run_both(is_buy, qty, price, buy_fee, sell_fee, base_fee)
+    for got, expected in zip(fast, slow):
+        np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_prepare_fills_spot_round_trip():
+    df = pd.DataFrame({
+        'id': [1, 2, 3], 'time': [1000, 2000, 3000], 'side': ['BUY', 'BUY', 'SELL'],
+        'price': [100.0, 120.0, 130.0], 'qty': [1.0, 1.0, 2.0], 'quote_qty': [100.0, 120.0, 260.0],
+        'commission': [0.1, 0.0, 0.26], 'commission_asset': ['USDT', 'USDT', 'USDT'], 'realized_pnl': [0.0, 0.0, 0.0]})
+    fills = report_engine.prepare_fills(df, 'Spot', 'BTCUSDT')
+    assert fills['realized_pnl'].tolist() == pytest.approx([0.0, 0.0, 40.0])
+    assert fills['cash_flow'].tolist() == pytest.approx([0.0, 0.0, 260.0 - 0.26 - 220.1])
+    assert fills['trip_id'].nunique() == 1 and bool(fills['flat_after'].iloc[-1])
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import strategy_profiles
+
+CONFIG = {
+    'indicator_settings': {'min_conditions': 4, 'min_exit_conditions': 2, 'rsi_oversold': 30, 'use_volume': False},
+    'htf_settings': {'use_htf_filter': True, 'htf_timeframe': "4h"},
+    'atr_settings': {'use_atr_sl_tp': False},
+}
+DEFAULTS = {'stop_loss_pct': 2.0, 'take_profit_pct': 4.0, 'quantity': 0.01}
+
+
+class FlatSharedFeed(strategy_profiles.SharedFeed):
+    """현재가는 begin_cycle 값, 1분봉은 없음 (거래소 요청 없이 모의 계좌만 돌린다)."""
+
+    def path(self, market, symbol, from_ms, to_ms):
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+
+
+def profile_config(*profiles):
+    return dict(CONFIG, strategy_profiles=list(profiles))
+
+
+def test_load_profiles_overrides_only_given_values():
+    config = profile_config(
+        {'name': "aggressive", 'indicator_settings': {'min_conditions': 2}, 'htf_settings': {'use_htf_filter': False}, 'quantity': "0.05"},
+        {'name': "plain"},
+        {'name': "aggressive", 'indicator_settings': {'min_conditions': 7}}, # 이름 중복
+        {'name': "off", 'enabled': False},
+        {'name': "  "},
+    )
+    profiles = strategy_profiles.load_profiles(config, "USD-M", DEFAULTS)
+    assert [p['name'] for p in profiles] == ["aggressive", "plain"]
+
+    aggressive, plain = profiles
+    assert aggressive['min_conditions'] == 2 and not aggressive['use_htf_filter']
+    assert aggressive['rsi_oversold'] == 30 and not aggressive['use_volume'] # 나머지는 봇 설정 그대로
+    assert aggressive['quantity'] == 0.05 and isinstance(aggressive['quantity'], float)
+    assert plain['min_conditions'] == 4 and plain['min_exit_conditions'] == 2 and plain['use_htf_filter']
+    assert (plain['stop_loss_pct'], plain['take_profit_pct'], plain['quantity']) == (2.0, 4.0, 0.01)
+    assert plain['execution'] == "paper" and not plain['use_atr_sl_tp']
+    assert CONFIG['indicator_settings']['min_conditions'] == 4 # 봇 설정은 바뀌지 않는다
+
+
+def test_spot_profile_reads_quote_quantity():
+    config = profile_config({'name': "spot", 'quantity_usdt': 25, 'quantity': 3})
+    profile, = strategy_profiles.load_profiles(config, "Spot", dict(DEFAULTS, quantity=10))
+    assert profile['quantity'] == 25 and isinstance(profile['quantity'], int)
+
+
+def test_paper_executor_enters_and_closes_futures_position(tmp_path, monkeypatch):
+    monkeypatch.setattr(strategy_profiles, 'PROFILE_FOLDER', str(tmp_path))
+    profile, = strategy_profiles.load_profiles(profile_config({'name': "paper a/b"}), "USD-M", DEFAULTS)
+    feed = FlatSharedFeed(None)
+    feed.begin_cycle("USD-M", "BTCUSDT", 100.0, 1_700_000_000_000)
+    executor = strategy_profiles.ProfileExecutor(CONFIG, "USD-M", "BTCUSDT", profile, feed)
+    assert executor.folder.startswith(str(tmp_path)) and "paper_a_b" in executor.folder
+    executor.prepare(10, "ISOLATED")
+
+    position = executor.enter(False, 100.0, 0.0, 2)
+    entry = position['entry_price']
+    assert entry == pytest.approx(100.0, rel=1e-3)
+    assert (position['sl_target'], position['tp_target']) == (round(entry * 1.02, 2), round(entry * 0.96, 2)) # 숏, 고정 % SL/TP
+    assert executor.get_position() == pytest.approx(-0.01)
+    assert executor.load_position() == position
+    assert [o['orderType'] for o in executor.api("get_open_orders")(symbol="BTCUSDT", conditional=True)] == ["STOP_MARKET"] # USD-M 손절은 algoOrder
+
+    executor.close(executor.get_position(), 3)
+    assert executor.get_position() == 0.0
+    assert executor.load_position() is None
+    assert executor.api("get_open_orders")(symbol="BTCUSDT", conditional=True) == [] # 손절 주문도 함께 취소
+
+
+def test_paper_executor_spot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(strategy_profiles, 'PROFILE_FOLDER', str(tmp_path))
+    profile, = strategy_profiles.load_profiles(profile_config({'name': "spot"}), "Spot", dict(DEFAULTS, quantity=20.0))
+    feed = FlatSharedFeed(None)
+    feed.begin_cycle("Spot", "BTCUSDT", 100.0, 1_700_000_000_000)
+    executor = strategy_profiles.ProfileExecutor(CONFIG, "Spot", "BTCUSDT", profile, feed)
+
+    position = executor.enter(True, 100.0, 0.0, 2)
+    assert position['quantity'] == pytest.approx(0.2, rel=1e-2)
+    assert position['sl_target'] < position['entry_price'] < position['tp_target']
+    assert executor.get_position() == pytest.approx(position['quantity'], rel=1e-2) # 잔고는 수수료(기초 자산)만큼 적다
+
+    executor.close(min(executor.get_position(), position['quantity']), 5)
+    assert executor.get_position() < 1e-5 # 수량 단위 아래 끝수만 남는다
+    assert executor.load_position() is None
+
+
+def test_live_profile_needs_its_own_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(strategy_profiles, 'PROFILE_FOLDER', str(tmp_path))
+    config = profile_config({'name': "live", 'execution': "live"}, {'name': "paper"})
+    profiles = strategy_profiles.load_profiles(config, "USD-M", DEFAULTS)
+    with pytest.raises(ValueError):
+        strategy_profiles.ProfileExecutor(config, "USD-M", "BTCUSDT", profiles[0], FlatSharedFeed(None))
+
+    # 봇 계정 키로 대신 실행하지 않고 그 프로필만 꺼 둔다
+    host = strategy_profiles.ProfileHost(config, "USD-M", "BTCUSDT", {}, profiles, None, price_decimals=2)
+    live, paper = host.executors
+    assert live is None and paper is not None
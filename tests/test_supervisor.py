@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import supervisor
+
+SUPERVISOR_SCRIPT = os.path.abspath(supervisor.__file__)
+
+
+class ExitedProcess:
+    pid = 4321
+
+    def __init__(self, code):
+        self.returncode = code
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def sup(monkeypatch):
+    instance = supervisor.Supervisor()
+    assigned = []
+    monkeypatch.setattr(instance, "assign", assigned.append)
+    return instance, assigned
+
+
+def exited_bot(instance, code, now):
+    bot = instance.bots['usd_m']
+    bot.update(desired=True, process=ExitedProcess(code), assigned_at=now - 5, state='starting')
+    return bot
+
+
+def test_config_error_exit_marks_the_bot_failed(sup):
+    instance, assigned = sup
+    bot = exited_bot(instance, supervisor.CONFIG_ERROR_EXIT_CODE, now=1000.0)
+    instance.check_bot('usd_m', 1000.0)
+    assert (bot['state'], bot['desired'], bot['last_exit_code']) == ('failed', False, supervisor.CONFIG_ERROR_EXIT_CODE)
+    instance.check_bot('usd_m', 5000.0)
+    assert assigned == [] # 다시 시작하지 않음
+
+
+def test_crash_is_restarted_with_backoff(sup):
+    instance, assigned = sup
+    bot = exited_bot(instance, 3, now=1000.0)
+    instance.check_bot('usd_m', 1000.0)
+    assert bot['state'] == 'backoff' and bot['next_start_at'] == 1000.0 + supervisor.BACKOFF_BASE_SEC
+    instance.check_bot('usd_m', bot['next_start_at'])
+    assert assigned == ['usd_m']
+
+
+def test_worker_turns_import_time_exit_into_config_error(tmp_path):
+    (tmp_path / "exit_at_import.py").write_text('print("오류: config.json 파일 없음."); exit()\n', encoding='utf-8')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), os.environ.get('PYTHONPATH', '')]))
+    result = subprocess.run([sys.executable, SUPERVISOR_SCRIPT, "--worker"], input="exit_at_import\n", text=True, capture_output=True, env=env, timeout=120)
+    assert result.returncode == supervisor.CONFIG_ERROR_EXIT_CODE, result.stderr
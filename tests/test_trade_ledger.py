@@ -0,0 +1,50 @@
+from contextlib import closing
+
+import trade_ledger
+
+
+class FakeClient:
+    """futures_account_trades 만 흉내 (fromId 이후 limit 건씩)."""
+
+    def __init__(self, trades):
+        self.trades = trades
+        self.calls = []
+
+    def futures_account_trades(self, symbol, fromId, limit):
+        self.calls.append(fromId)
+        return [t for t in self.trades if t['symbol'] == symbol and t['id'] >= fromId][:limit]
+
+
+def make_trade(trade_id, side='BUY'):
+    return {'symbol': 'BTCUSDT', 'id': trade_id, 'orderId': trade_id * 10, 'time': 1_700_000_000_000 + trade_id * 1000,
+            'side': side, 'price': '100', 'qty': '0.5', 'quoteQty': '50', 'commission': '0.02',
+            'commissionAsset': 'USDT', 'realizedPnl': '0', 'maker': False}
+
+
+def test_sync_pages_and_resumes_from_last_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_ledger, 'LEDGER_FOLDER', str(tmp_path))
+    monkeypatch.setattr(trade_ledger, 'PAGE_LIMIT', 2)
+    client = FakeClient([make_trade(i) for i in range(1, 6)])
+
+    assert trade_ledger.sync_trades(client, 'Test', 'USD-M', 'BTCUSDT') == 5
+    assert client.calls == [0, 3, 5]
+
+    client.trades.append(make_trade(6, 'SELL'))
+    assert trade_ledger.sync_trades(client, 'Test', 'USD-M', 'BTCUSDT') == 0 # 최소 동기화 간격 안
+    assert trade_ledger.sync_trades(client, 'Test', 'USD-M', 'BTCUSDT', force=True) == 1
+    assert client.calls[-1] == 6
+
+    df = trade_ledger.query_trades('Test', 'USD-M', 'BTCUSDT', 0, 2_000_000_000_000)
+    assert df['id'].tolist() == [1, 2, 3, 4, 5, 6]
+    assert df['side'].iloc[-1] == 'SELL'
+    assert trade_ledger.get_first_trade_time('Test', 'USD-M', 'BTCUSDT') == 1_700_000_001_000
+
+
+def test_sync_ignores_duplicate_trades(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_ledger, 'LEDGER_FOLDER', str(tmp_path))
+    client = FakeClient([make_trade(1), make_trade(2)])
+    trade_ledger.sync_trades(client, 'Test', 'USD-M', 'BTCUSDT')
+    # 동기화 상태가 지워져 처음부터 다시 받아도 같은 거래는 한 번만 저장된다
+    with closing(trade_ledger._connect('Test')) as conn, conn: conn.execute("DELETE FROM sync_state")
+    assert trade_ledger.sync_trades(client, 'Test', 'USD-M', 'BTCUSDT') == 0
+    assert len(trade_ledger.query_trades('Test', 'USD-M', 'BTCUSDT', 0, 2_000_000_000_000)) == 2
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import candle_store
+import universe_backtest
+
+HOUR_MS = candle_store.INTERVAL_MS['1h']
+START_MS = 1_714_521_600_000
+
+
+def store_candles(market, symbol, interval, count, start_ms=START_MS):
+    interval_ms = candle_store.INTERVAL_MS[interval]
+    close = 100 + np.arange(count, dtype=float)
+    rows = [(market, symbol, interval, start_ms + i * interval_ms, c - 0.5, c + 1, c - 1, c, 10.0 + i, start_ms + (i + 1) * interval_ms - 1)
+            for i, c in enumerate(close)]
+    conn = candle_store._connect("Live")
+    conn.executemany("INSERT OR IGNORE INTO candles VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+    conn.commit(); conn.close()
+
+
+def use_tmp_folders(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, 'CANDLE_FOLDER', str(tmp_path / "candles"))
+    monkeypatch.setattr(universe_backtest, 'CACHE_FOLDER', str(tmp_path / "cache"))
+
+
+def test_exported_series_reads_back_like_the_store(tmp_path, monkeypatch):
+    use_tmp_folders(tmp_path, monkeypatch)
+    store_candles("USD-M", "BTCUSDT", "1h", 48)
+    store_candles("USD-M", "BTCUSDT", "1m", 120)
+    first_ms, last_ms = START_MS, START_MS + 47 * HOUR_MS
+    path = universe_backtest.export_series("Live", "USD-M", "BTCUSDT", "1h", first_ms, last_ms)
+    assert os.path.exists(path) and np.load(path, mmap_mode='r').shape == (len(universe_backtest.MEMMAP_FIELDS), 48)
+
+    load_candles = universe_backtest._make_loader("Live", "USD-M", "BTCUSDT", {'1h': path})
+    for start_ms, end_ms in [(first_ms, last_ms), (START_MS + 5 * HOUR_MS, START_MS + 20 * HOUR_MS), (START_MS + 5 * HOUR_MS + 1, START_MS + 6 * HOUR_MS - 1)]:
+        expected = candle_store.query_candles("Live", "USD-M", "BTCUSDT", "1h", start_ms, end_ms)[universe_backtest.MEMMAP_FIELDS].astype(float)
+        pd.testing.assert_frame_equal(load_candles('1h', start_ms, end_ms), expected)
+
+    # 내보내지 않은 타임프레임 (SL/TP 판정용 1분봉) 은 캔들 저장소에서
+    minutes = load_candles('1m', START_MS, START_MS + 30 * 60_000)
+    assert len(minutes) == 31 and 'close_time' in minutes
+
+
+def test_export_reuses_file_and_replaces_older_range(tmp_path, monkeypatch):
+    use_tmp_folders(tmp_path, monkeypatch)
+    store_candles("USD-M", "BTCUSDT", "1h", 24)
+    store_candles("USD-M", "BTCUSDT", "4h", 6)
+    old = universe_backtest.export_series("Live", "USD-M", "BTCUSDT", "1h", START_MS, START_MS + 23 * HOUR_MS)
+    other = universe_backtest.export_series("Live", "USD-M", "BTCUSDT", "4h", START_MS, START_MS + 20 * HOUR_MS)
+    mtime = os.stat(old).st_mtime_ns
+    assert universe_backtest.export_series("Live", "USD-M", "BTCUSDT", "1h", START_MS, START_MS + 23 * HOUR_MS) == old
+    assert os.stat(old).st_mtime_ns == mtime
+
+    store_candles("USD-M", "BTCUSDT", "1h", 30) # 새 캔들 -> 파일 이름의 구간이 바뀐다
+    new = universe_backtest.export_series("Live", "USD-M", "BTCUSDT", "1h", START_MS, START_MS + 29 * HOUR_MS)
+    assert new != old and not os.path.exists(old) and os.path.exists(other)
+    assert np.load(new)[0, -1] == START_MS + 29 * HOUR_MS
+    assert not [name for name in os.listdir(universe_backtest.CACHE_FOLDER) if ".tmp" in name]
@@ -0,0 +1,106 @@
+# trade_ledger.py (로컬 거래 원장: 시장/심볼별 fromId 증분 동기화 + 전체 페이지 조회 + 중복 제거)
+#  - 과거 날짜 조회는 API 호출 없이 원장(SQLite)에서 바로 읽는다
+#  - 동기화는 마지막으로 받은 거래 ID 다음부터(fromId) 페이지 끝까지 가져온다
+
+import os, time, sqlite3, threading
+from contextlib import closing
+import pandas as pd
+
+LEDGER_FOLDER = "ledger"
+PAGE_LIMIT = 1000           # userTrades / myTrades 한 번에 받을 수 있는 최대 건수
+SYNC_MIN_INTERVAL_SEC = 30  # 같은 시장/심볼은 이 시간 안에 다시 동기화하지 않음
+TRADE_COLUMNS = ['market', 'symbol', 'id', 'order_id', 'time', 'side', 'price', 'qty', 'quote_qty', 'base_qty',
+                 'commission', 'commission_asset', 'realized_pnl', 'is_maker']
+
+_sync_locks = {}
+_sync_locks_guard = threading.Lock()
+
+def get_ledger_path(mode):
+    return os.path.join(LEDGER_FOLDER, f"trade_ledger_{mode.lower()}.db")
+
+def _connect(mode):
+    if not os.path.exists(LEDGER_FOLDER): os.makedirs(LEDGER_FOLDER, exist_ok=True)
+    conn = sqlite3.connect(get_ledger_path(mode), timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS trades (
+        market TEXT NOT NULL, symbol TEXT NOT NULL, id INTEGER NOT NULL, order_id INTEGER, time INTEGER NOT NULL,
+        side TEXT, price REAL, qty REAL, quote_qty REAL, base_qty REAL, commission REAL, commission_asset TEXT,
+        realized_pnl REAL, is_maker INTEGER, PRIMARY KEY (market, symbol, id))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_time ON trades (market, symbol, time)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS sync_state (
+        market TEXT NOT NULL, symbol TEXT NOT NULL, last_id INTEGER, last_time INTEGER, synced_at INTEGER,
+        PRIMARY KEY (market, symbol))""")
+    return conn
+
+def _fetch_page(client, market, symbol, from_id):
+    if market == "USD-M": return client.futures_account_trades(symbol=symbol, fromId=from_id, limit=PAGE_LIMIT)
+    if market == "COIN-M": return client.futures_coin_account_trades(symbol=symbol, fromId=from_id, limit=PAGE_LIMIT)
+    return client.get_my_trades(symbol=symbol, fromId=from_id, limit=PAGE_LIMIT)
+
+def _to_row(market, trade):
+    # 선물: side/realizedPnl 제공, 현물: isBuyer로 방향 판단 (실현 손익 없음)
+    side = trade.get('side') or ('BUY' if trade.get('isBuyer') else 'SELL')
+    is_maker = trade.get('maker', trade.get('isMaker', False))
+    def num(key):
+        value = trade.get(key)
+        return float(value) if value not in (None, '') else None
+    return (market, trade['symbol'], int(trade['id']), trade.get('orderId'), int(trade['time']), side,
+            num('price'), num('qty'), num('quoteQty'), num('baseQty'), num('commission'), trade.get('commissionAsset'),
+            num('realizedPnl') or 0.0, int(bool(is_maker)))
+
+def get_sync_state(mode, market, symbol):
+    with closing(_connect(mode)) as conn, conn:
+        row = conn.execute("SELECT last_id, last_time, synced_at FROM sync_state WHERE market=? AND symbol=?", (market, symbol)).fetchone()
+    return dict(zip(('last_id', 'last_time', 'synced_at'), row)) if row else None
+
+def sync_trades(client, mode, market, symbol, force=False):
+    """마지막 거래 ID 이후의 거래를 모두 받아 원장에 추가. 새로 저장된 건수를 반환."""
+    key = (mode, market, symbol)
+    with _sync_locks_guard: lock = _sync_locks.setdefault(key, threading.Lock())
+    with lock:
+        state = get_sync_state(mode, market, symbol) or {'last_id': None, 'last_time': None, 'synced_at': None}
+        if not force and state['synced_at'] and time.time() * 1000 - state['synced_at'] < SYNC_MIN_INTERVAL_SEC * 1000:
+            return 0
+        from_id = state['last_id'] + 1 if state['last_id'] is not None else 0
+        inserted = 0
+        sync_started = int(time.time() * 1000)
+        with closing(_connect(mode)) as conn, conn:
+            while True:
+                page = _fetch_page(client, market, symbol, from_id)
+                if page:
+                    cursor = conn.executemany(f"INSERT OR IGNORE INTO trades VALUES ({', '.join('?' * len(TRADE_COLUMNS))})",
+                                              [_to_row(market, t) for t in page])
+                    inserted += cursor.rowcount
+                    last = max(page, key=lambda t: int(t['id']))
+                    state['last_id'], state['last_time'] = int(last['id']), int(last['time'])
+                    from_id = state['last_id'] + 1
+                    # 페이지마다 진행 상황을 저장 -> 중간에 실패해도 다음 동기화는 이어서 진행
+                    conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                                 (market, symbol, state['last_id'], state['last_time'], state['synced_at']))
+                    conn.commit()
+                if len(page) < PAGE_LIMIT: break
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                         (market, symbol, state['last_id'], state['last_time'], sync_started))
+        return inserted
+
+def is_range_synced(mode, market, symbol, end_ms):
+    # 조회 구간 끝 이후에 동기화가 끝났다면 그 구간의 거래는 이미 원장에 모두 있다
+    state = get_sync_state(mode, market, symbol)
+    return bool(state and state['synced_at'] and state['synced_at'] > end_ms)
+
+def get_first_trade_time(mode, market, symbol):
+    with closing(_connect(mode)) as conn, conn:
+        row = conn.execute("SELECT MIN(time) FROM trades WHERE market=? AND symbol=?", (market, symbol)).fetchone()
+    return row[0] if row else None
+
+def query_trades(mode, market, symbol, start_ms, end_ms):
+    with closing(_connect(mode)) as conn, conn:
+        return pd.read_sql_query("SELECT * FROM trades WHERE market=? AND symbol=? AND time BETWEEN ? AND ? ORDER BY time, id",
+                                 conn, params=(market, symbol, int(start_ms), int(end_ms)))
+
+def iter_trades(mode, market, symbol, start_ms, end_ms, chunksize=5000):
+    # 긴 기간의 거래 상세를 청크 단위로 흘려보낸다
+    conn = _connect(mode)
+    try:
+        yield from pd.read_sql_query("SELECT * FROM trades WHERE market=? AND symbol=? AND time BETWEEN ? AND ? ORDER BY time, id",
+                                     conn, params=(market, symbol, int(start_ms), int(end_ms)), chunksize=chunksize)
+    finally: conn.close()
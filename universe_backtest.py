@@ -0,0 +1,144 @@
+# universe_backtest.py (전 종목 백테스트: 한 설정을 여러 심볼 x 타임프레임에 병렬로 돌려 indicator_settings 가 일반화되는지 확인)
+#  - 캔들은 SQLite 에서 한 번만 꺼내 universe/cache/ 의 .npy 파일로 저장 -> 작업 프로세스는 np.load(mmap_mode='r') 로 열어
+#    OS 페이지 캐시를 함께 쓴다 (프로세스마다 복사본을 만들지 않음). 파일 이름에 저장 구간이 들어가 새 캔들이 생기면 다시 만든다
+#  - 진행 중 작업은 작업 프로세스 수의 두 배까지만 -> 종목이 몇 개든 메모리 사용량이 일정
+#  - 끝난 종목부터 universe/<시장>_<시각>/symbol_stats.csv, trades.csv 에 바로 추가, 전체/타임프레임별 집계는 aggregate.json
+#  - 심볼마다 수량 단위가 달라 집계는 손익 금액이 아니라 체결 수익률(return_pct) 기준
+#  실행: python universe_backtest.py [USD-M|COIN-M|Spot] 시작일 종료일 [타임프레임,...]
+
+import os, sys, json, time
+from datetime import datetime, date
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+import backtest
+import candle_store
+import report_engine
+from exchange_sim import SETTINGS_KEYS
+
+UNIVERSE_FOLDER = "universe"
+CACHE_FOLDER = os.path.join(UNIVERSE_FOLDER, "cache")
+MEMMAP_FIELDS = ['open_time', 'open', 'high', 'low', 'close', 'volume'] # (필드 x 캔들) 순서로 저장 -> 필드 하나가 연속 메모리
+IN_FLIGHT_PER_WORKER = 2
+STATS_COLUMNS = ['symbol', 'timeframe', 'trades', 'win_rate', 'total_pnl', 'avg_return_pct', 'total_return_pct', 'max_drawdown', 'profit_factor',
+                 'ambiguous_bars', 'resolved_by_sub_candles', 'error']
+
+def get_cache_path(data_mode, market, symbol, interval, first_ms, last_ms):
+    return os.path.join(CACHE_FOLDER, f"{data_mode.lower()}_{market}_{symbol}_{interval}_{first_ms}_{last_ms}.npy")
+
+def export_series(data_mode, market, symbol, interval, first_ms, last_ms):
+    """저장된 캔들 전 구간을 .npy 로 한 번 꺼낸다 (이미 있으면 그대로). 경로 반환."""
+    path = get_cache_path(data_mode, market, symbol, interval, first_ms, last_ms)
+    if os.path.exists(path): return path
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    candles = candle_store.query_candles(data_mode, market, symbol, interval, first_ms, last_ms)
+    tmp_path = path[:-4] + ".tmp.npy"
+    array = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=(len(MEMMAP_FIELDS), len(candles)))
+    for i, field in enumerate(MEMMAP_FIELDS): array[i] = candles[field].to_numpy(dtype=float)
+    array.flush(); del array
+    os.replace(tmp_path, path)
+    prefix = os.path.basename(get_cache_path(data_mode, market, symbol, interval, "", ""))[:-5] # 같은 심볼/타임프레임의 이전 구간 파일 정리
+    for name in os.listdir(CACHE_FOLDER):
+        if name.startswith(prefix) and name.count('_') == prefix.count('_') + 1 and os.path.join(CACHE_FOLDER, name) != path:
+            os.remove(os.path.join(CACHE_FOLDER, name))
+    return path
+
+def _make_loader(data_mode, market, symbol, paths):
+    # backtest_symbol 의 load_candles: 내보낸 타임프레임은 공유 배열에서 잘라 읽고, 나머지(SL/TP 판정용 1분봉)는 캔들 저장소에서
+    def load_candles(interval, start_ms, end_ms):
+        if interval not in paths: return candle_store.query_candles(data_mode, market, symbol, interval, start_ms, end_ms)
+        array = np.load(paths[interval], mmap_mode='r')
+        lo, hi = np.searchsorted(array[0], start_ms, side='left'), np.searchsorted(array[0], end_ms, side='right')
+        return pd.DataFrame({field: array[i, lo:hi] for i, field in enumerate(MEMMAP_FIELDS)})
+    return load_candles
+
+def _backtest_task(config, market, symbol, timeframe, start_ms, end_ms, data_mode, paths):
+    # 작업 프로세스에서 실행: (종목 요약 행, 체결 DataFrame)
+    row = {'symbol': symbol, 'timeframe': timeframe}
+    try:
+        trades, summary = backtest.backtest_symbol(config, market, symbol, timeframe, start_ms, end_ms, data_mode,
+                                                   load_candles=_make_loader(data_mode, market, symbol, paths))
+    except Exception as e:
+        return dict(row, trades=0, error=str(e)), pd.DataFrame()
+    if not trades.empty: summary['total_return_pct'] = float(trades['return_pct'].sum())
+    return dict(row, **summary, error=""), trades.assign(symbol=symbol, timeframe=timeframe)
+
+def _new_aggregate():
+    return {'symbols': 0, 'profitable_symbols': 0, 'errors': 0, 'trades': 0, 'wins': 0, 'sum_return_pct': 0.0, 'gross_win_pct': 0.0, 'gross_loss_pct': 0.0}
+
+def _update_aggregate(aggregate, row, trades):
+    aggregate['symbols'] += 1
+    aggregate['errors'] += bool(row['error'])
+    if trades.empty: return
+    returns = trades['return_pct'].to_numpy()
+    aggregate['profitable_symbols'] += bool(returns.sum() > 0)
+    aggregate['trades'] += len(returns)
+    aggregate['wins'] += int((returns > 0).sum())
+    aggregate['sum_return_pct'] += float(returns.sum())
+    aggregate['gross_win_pct'] += float(returns[returns > 0].sum())
+    aggregate['gross_loss_pct'] -= float(returns[returns < 0].sum())
+
+def _finish_aggregate(aggregate):
+    trades = aggregate['trades']
+    return dict(aggregate, win_rate=aggregate['wins'] / trades * 100 if trades else 0.0,
+                avg_return_pct=aggregate['sum_return_pct'] / trades if trades else 0.0,
+                profit_factor=aggregate['gross_win_pct'] / aggregate['gross_loss_pct'] if aggregate['gross_loss_pct'] else float('inf'),
+                profitable_symbols_pct=aggregate['profitable_symbols'] / aggregate['symbols'] * 100 if aggregate['symbols'] else 0.0)
+
+def _append_csv(frame, path):
+    if frame.empty: return
+    frame.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def run_universe(config, market, start_ms, end_ms, symbols=None, timeframes=None, data_mode=None, run_dir=None, workers=None, progress=None):
+    """심볼 x 타임프레임 전체를 병렬 백테스트. symbols 가 없으면 캔들 저장소에 해당 타임프레임이 있는 모든 심볼.
+    progress(완료 수, 전체 수, 종목 요약 행) 콜백. 반환: {'run_dir', 'aggregate': {'ALL': ..., 타임프레임: ...}, 'elapsed_sec'}."""
+    started = time.time()
+    data_mode = data_mode or config.get("mode", "Test")
+    settings = backtest.load_backtest_settings(config, market)
+    timeframes = timeframes or [config.get(SETTINGS_KEYS[market], {}).get("timeframe", "1h")]
+    series = candle_store.list_stored_series(data_mode, market)
+    stored = {(r.symbol, r.interval): (int(r.first_open_time), int(r.last_open_time)) for r in series.itertuples()}
+    symbols = symbols or sorted({symbol for symbol, interval in stored if interval in timeframes})
+    tasks = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes if (symbol, timeframe) in stored]
+
+    run_dir = run_dir or os.path.join(UNIVERSE_FOLDER, f"{market}_{datetime.now():%Y%m%d-%H%M%S}")
+    os.makedirs(run_dir, exist_ok=True)
+    stats_path, trades_path = os.path.join(run_dir, 'symbol_stats.csv'), os.path.join(run_dir, 'trades.csv')
+    aggregates = {'ALL': _new_aggregate(), **{timeframe: _new_aggregate() for timeframe in timeframes}}
+
+    def handle(future):
+        row, trades = future.result()
+        _append_csv(pd.DataFrame([row], columns=STATS_COLUMNS), stats_path)
+        _append_csv(trades, trades_path)
+        for key in ('ALL', row['timeframe']): _update_aggregate(aggregates[key], row, trades)
+        if progress: progress(aggregates['ALL']['symbols'], len(tasks), row)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for symbol, timeframe in tasks:
+            paths = {interval: export_series(data_mode, market, symbol, interval, *stored[(symbol, interval)])
+                     for interval in {timeframe, settings['htf_timeframe']} if (symbol, interval) in stored}
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done: handle(future)
+            pending.add(pool.submit(_backtest_task, config, market, symbol, timeframe, start_ms, end_ms, data_mode, paths))
+        for future in pending: handle(future)
+
+    aggregate = {key: _finish_aggregate(value) for key, value in aggregates.items()}
+    with open(os.path.join(run_dir, 'aggregate.json'), 'w', encoding='utf-8') as f:
+        json.dump({'market': market, 'start_ms': start_ms, 'end_ms': end_ms, 'timeframes': timeframes, 'aggregate': aggregate,
+                   'indicator_settings': config.get("indicator_settings", {})}, f, ensure_ascii=False, indent=4)
+    return {'run_dir': run_dir, 'aggregate': aggregate, 'elapsed_sec': time.time() - started}
+
+if __name__ == '__main__':
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    with open('config.json', 'r') as f: config = json.load(f)
+    market = sys.argv[1] if len(sys.argv) > 1 else "USD-M"
+    start = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else date.today().replace(day=1)
+    end = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+    timeframes = sys.argv[4].split(',') if len(sys.argv) > 4 else None
+    result = run_universe(config, market, *report_engine.get_range_ms(start, end), timeframes=timeframes,
+                          progress=lambda done, total, row: print(f"[{done}/{total}] {row['symbol']} {row['timeframe']}: {row.get('trades', 0)}건 {row['error']}"))
+    for key, value in result['aggregate'].items(): print(key, {k: round(v, 2) if isinstance(v, float) else v for k, v in value.items()})
+    print(f"{result['elapsed_sec']:.1f}초 -> {result['run_dir']}")